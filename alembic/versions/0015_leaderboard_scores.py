@@ -0,0 +1,59 @@
+"""materialized monthly leaderboard scores
+
+Revision ID: 0015_leaderboard_scores
+Revises: 1029a8cd345f
+Create Date: 2026-10-18 09:00:00.000000
+
+The leaderboard previously summed the month's transactions per user on every
+request. Scores are now kept per (month, user_id) and updated as transactions
+succeed; this migration creates the table and backfills it from history.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0015_leaderboard_scores'
+down_revision: Union[str, None] = '1029a8cd345f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'leaderboard_scores',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('score', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('tx_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('month', 'user_id', name='uq_leaderboard_scores_month_user'),
+    )
+    op.create_index('ix_leaderboard_scores_id', 'leaderboard_scores', ['id'], unique=False)
+    op.create_index('ix_leaderboard_scores_user_id', 'leaderboard_scores', ['user_id'], unique=False)
+    op.create_index('ix_leaderboard_scores_month_score', 'leaderboard_scores', ['month', 'score'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            """
+            INSERT INTO leaderboard_scores (month, user_id, score, tx_count, created_at, updated_at)
+            SELECT to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM'), user_id, SUM(amount), COUNT(*), now(), now()
+            FROM transactions
+            WHERE lower(status::text) = 'success'
+              AND lower(tx_type::text) IN ('data', 'airtime', 'cable', 'electricity', 'exam')
+            GROUP BY 1, 2
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leaderboard_scores_month_score', table_name='leaderboard_scores')
+    op.drop_index('ix_leaderboard_scores_user_id', table_name='leaderboard_scores')
+    op.drop_index('ix_leaderboard_scores_id', table_name='leaderboard_scores')
+    op.drop_table('leaderboard_scores')
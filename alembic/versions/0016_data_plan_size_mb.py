@@ -0,0 +1,73 @@
+"""precomputed data_size_mb and plan_code_suffix on data_plans
+
+Revision ID: 0016_data_plan_size_mb
+Revises: 0015_leaderboard_scores
+Create Date: 2026-10-18 10:00:00.000000
+
+Agent volume stats used to parse every plan's data_size label and scan all
+plans to match legacy codes by suffix. Both values are now stored on the row;
+the suffix is indexed for the legacy-code lookup.
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0016_data_plan_size_mb'
+down_revision: Union[str, None] = '0015_leaderboard_scores'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _size_mb(size_str):
+    # Mirrors app.models.data_plan.parse_data_size_mb (kept inline so the
+    # migration does not depend on application code).
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(GB|MB)", str(size_str or "").strip().upper())
+    if not match:
+        return 0
+    val = float(match.group(1))
+    return int(round(val * 1024 if match.group(2) == "GB" else val))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('data_plans')]
+    if 'data_size_mb' not in columns:
+        op.add_column('data_plans', sa.Column('data_size_mb', sa.Integer(), nullable=True))
+    if 'plan_code_suffix' not in columns:
+        op.add_column('data_plans', sa.Column('plan_code_suffix', sa.String(length=64), nullable=True))
+        op.create_index('ix_data_plans_plan_code_suffix', 'data_plans', ['plan_code_suffix'], unique=False)
+
+    plans = sa.table(
+        'data_plans',
+        sa.column('id', sa.Integer),
+        sa.column('plan_code', sa.String),
+        sa.column('data_size', sa.String),
+        sa.column('data_size_mb', sa.Integer),
+        sa.column('plan_code_suffix', sa.String),
+    )
+    rows = conn.execute(sa.select(plans.c.id, plans.c.plan_code, plans.c.data_size)).fetchall()
+    for row in rows:
+        conn.execute(
+            plans.update()
+            .where(plans.c.id == row.id)
+            .values(
+                data_size_mb=_size_mb(row.data_size),
+                plan_code_suffix=str(row.plan_code or '').split(':')[-1] or None,
+            )
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('data_plans')]
+    if 'plan_code_suffix' in columns:
+        op.drop_index('ix_data_plans_plan_code_suffix', table_name='data_plans')
+        op.drop_column('data_plans', 'plan_code_suffix')
+    if 'data_size_mb' in columns:
+        op.drop_column('data_plans', 'data_size_mb')
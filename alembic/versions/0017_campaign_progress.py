@@ -0,0 +1,47 @@
+"""incremental campaign progress counters
+
+Revision ID: 0017_campaign_progress
+Revises: 0016_data_plan_size_mb
+Create Date: 2026-10-18 11:00:00.000000
+
+get_active_campaigns recomputed every VOLUME campaign from the user's full
+transaction history. Progress is now kept per (campaign, user), seeded from
+history on first read and incremented as transactions succeed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0017_campaign_progress'
+down_revision: Union[str, None] = '0016_data_plan_size_mb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'campaign_progress',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('campaign_id', sa.Integer(), sa.ForeignKey('reward_campaigns.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('window_start', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('data_mb', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('airtime_amount', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('tx_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_seeded', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('campaign_id', 'user_id', name='uq_campaign_progress_campaign_user'),
+    )
+    op.create_index('ix_campaign_progress_id', 'campaign_progress', ['id'], unique=False)
+    op.create_index('ix_campaign_progress_user_id', 'campaign_progress', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_campaign_progress_user_id', table_name='campaign_progress')
+    op.drop_index('ix_campaign_progress_id', table_name='campaign_progress')
+    op.drop_table('campaign_progress')
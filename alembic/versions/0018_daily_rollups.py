@@ -0,0 +1,51 @@
+"""daily fact rollups for admin analytics and finance
+
+Revision ID: 0018_daily_rollups
+Revises: 0017_campaign_progress
+Create Date: 2026-10-18 12:00:00.000000
+
+Admin analytics and the finance overview summed transactions,
+service_transactions and api_logs on every load. They now read per-day totals
+from daily_rollups. Existing history is backfilled by 0032_backfill_daily_rollups;
+the nightly job (scripts/rebuild_daily_rollups.py) recomputes the day that just
+closed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0018_daily_rollups'
+down_revision: Union[str, None] = '0017_campaign_progress'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('tx_type', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('network', sa.String(length=64), nullable=False, server_default=''),
+        sa.Column('tx_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Numeric(16, 2), nullable=False, server_default='0'),
+        sa.Column('base_cost', sa.Numeric(16, 2), nullable=False, server_default='0'),
+        sa.Column('fee_estimate', sa.Numeric(16, 2), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'kind', 'tx_type', 'status', 'network', name='uq_daily_rollups_key'),
+    )
+    op.create_index('ix_daily_rollups_id', 'daily_rollups', ['id'], unique=False)
+    op.create_index('ix_daily_rollups_kind_status_day', 'daily_rollups', ['kind', 'status', 'day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_rollups_kind_status_day', table_name='daily_rollups')
+    op.drop_index('ix_daily_rollups_id', table_name='daily_rollups')
+    op.drop_table('daily_rollups')
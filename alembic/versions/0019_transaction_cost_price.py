@@ -0,0 +1,38 @@
+"""capture cost price and margin on transactions
+
+Revision ID: 0019_transaction_cost_price
+Revises: 0018_daily_rollups
+Create Date: 2026-10-18 13:00:00.000000
+
+Finance COGS joined transactions to today's data_plans.base_price. Purchases
+now record cost_price (and margin = amount - cost_price) when they are made;
+existing data purchases are backfilled from the current catalog, which is the
+best figure available for them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0019_transaction_cost_price'
+down_revision: Union[str, None] = '0018_daily_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('cost_price', sa.Numeric(12, 2), nullable=True))
+    op.add_column('transactions', sa.Column('margin', sa.Numeric(12, 2), nullable=True))
+    op.execute(
+        "UPDATE transactions SET cost_price = ("
+        "SELECT MIN(dp.base_price) FROM data_plans dp WHERE dp.plan_code = transactions.data_plan_code"
+        ") WHERE tx_type = 'DATA' AND cost_price IS NULL AND data_plan_code IS NOT NULL"
+    )
+    op.execute("UPDATE transactions SET margin = amount - cost_price WHERE cost_price IS NOT NULL AND margin IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('transactions', 'margin')
+    op.drop_column('transactions', 'cost_price')
@@ -0,0 +1,70 @@
+"""trigram search indexes for admin transaction and user search
+
+Revision ID: 0020_search_indexes
+Revises: 0019_transaction_cost_price
+Create Date: 2026-10-18 14:00:00.000000
+
+Admin search used ILIKE '%q%' on unindexed columns. On Postgres, pg_trgm GIN
+indexes now serve substring matches (built CONCURRENTLY so the big tables stay
+writable); other dialects get plain btree indexes for prefix matching. Phone
+columns get btree indexes for exact/prefix phone lookups.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0020_search_indexes'
+down_revision: Union[str, None] = '0019_transaction_cost_price'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, column, already covered by a btree index)
+TRGM_INDEXES = (
+    ('ix_transactions_reference_trgm', 'transactions', 'reference', True),
+    ('ix_transactions_external_reference_trgm', 'transactions', 'external_reference', False),
+    ('ix_transactions_data_plan_code_trgm', 'transactions', 'data_plan_code', False),
+    ('ix_service_transactions_reference_trgm', 'service_transactions', 'reference', True),
+    ('ix_service_transactions_external_reference_trgm', 'service_transactions', 'external_reference', False),
+    ('ix_service_transactions_product_code_trgm', 'service_transactions', 'product_code', False),
+    ('ix_users_email_trgm', 'users', 'email', True),
+    ('ix_users_phone_number_trgm', 'users', 'phone_number', True),
+    ('ix_users_full_name_trgm', 'users', 'full_name', False),
+)
+
+PHONE_INDEXES = (
+    ('ix_transactions_recipient_phone', 'transactions', 'recipient_phone'),
+    ('ix_service_transactions_customer', 'service_transactions', 'customer'),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        with op.get_context().autocommit_block():
+            for name, table, column, _ in TRGM_INDEXES:
+                op.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+                )
+            for name, table, column in PHONE_INDEXES:
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column})')
+        return
+
+    for name, table, column, covered in TRGM_INDEXES:
+        if not covered:
+            op.create_index(name, table, [column], unique=False)
+    for name, table, column in PHONE_INDEXES:
+        op.create_index(name, table, [column], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+    for name, table, _ in PHONE_INDEXES:
+        op.drop_index(name, table_name=table)
+    for name, table, _, covered in TRGM_INDEXES:
+        if is_postgres or not covered:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,71 @@
+"""promo ledger with atomic stock counters
+
+Revision ID: 0021_promo_ledger
+Revises: 0020_search_indexes
+Create Date: 2026-10-19 09:00:00.000000
+
+Promo availability was a COUNT(DISTINCT user_id) over successful transactions
+at the promo price on every plan listing and purchase. Promos now carry a
+remaining-stock counter and one redemption row per (promo, user). The
+settings-driven MTN 1GB promo is created (and its past buyers backfilled) on
+application startup, where the PROMO_MTN_1GB_* settings are available.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0021_promo_ledger'
+down_revision: Union[str, None] = '0020_search_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'promos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=64), nullable=False),
+        sa.Column('network', sa.String(length=32), nullable=False),
+        sa.Column('plan_code', sa.String(length=64), nullable=False),
+        sa.Column('price', sa.Numeric(12, 2), nullable=False),
+        sa.Column('stock_limit', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('remaining', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('code'),
+    )
+    op.create_index('ix_promos_id', 'promos', ['id'], unique=False)
+    op.create_index('ix_promos_network_plan_code', 'promos', ['network', 'plan_code'], unique=False)
+
+    op.create_table(
+        'promo_redemptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('promo_id', sa.Integer(), sa.ForeignKey('promos.id'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('transaction_reference', sa.String(length=64), nullable=False),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('promo_id', 'user_id', name='uq_promo_redemptions_promo_user'),
+    )
+    op.create_index('ix_promo_redemptions_id', 'promo_redemptions', ['id'], unique=False)
+    op.create_index('ix_promo_redemptions_user_id', 'promo_redemptions', ['user_id'], unique=False)
+    op.create_index(
+        'ix_promo_redemptions_transaction_reference', 'promo_redemptions', ['transaction_reference'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_promo_redemptions_transaction_reference', table_name='promo_redemptions')
+    op.drop_index('ix_promo_redemptions_user_id', table_name='promo_redemptions')
+    op.drop_index('ix_promo_redemptions_id', table_name='promo_redemptions')
+    op.drop_table('promo_redemptions')
+    op.drop_index('ix_promos_network_plan_code', table_name='promos')
+    op.drop_index('ix_promos_id', table_name='promos')
+    op.drop_table('promos')
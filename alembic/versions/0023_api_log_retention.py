@@ -0,0 +1,69 @@
+"""api_logs minute rollups and archive
+
+Revision ID: 0023_api_log_retention
+Revises: 0022_idempotency_keys
+Create Date: 2026-10-19 11:00:00.000000
+
+api_logs grew by one row per provider call forever. scripts/archive_api_logs.py
+now rolls raw rows into api_log_minutes (calls, successes, p50/p95/max
+duration per minute and service) and moves rows past the retention window into
+api_logs_archive. The created_at index serves both the rollup range scans and
+the archive batches.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0023_api_log_retention'
+down_revision: Union[str, None] = '0022_idempotency_keys'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_api_logs_created_at', 'api_logs', ['created_at'], unique=False)
+
+    op.create_table(
+        'api_log_minutes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('minute', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('service', sa.String(length=64), nullable=False),
+        sa.Column('call_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('success_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('duration_total_ms', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('duration_p50_ms', sa.Numeric(10, 2), nullable=False, server_default='0'),
+        sa.Column('duration_p95_ms', sa.Numeric(10, 2), nullable=False, server_default='0'),
+        sa.Column('duration_max_ms', sa.Numeric(10, 2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('minute', 'service', name='uq_api_log_minutes_minute_service'),
+    )
+    op.create_index('ix_api_log_minutes_id', 'api_log_minutes', ['id'], unique=False)
+
+    op.create_table(
+        'api_logs_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('service', sa.String(length=64), nullable=False),
+        sa.Column('endpoint', sa.String(length=255), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=False),
+        sa.Column('duration_ms', sa.Numeric(10, 2), nullable=False),
+        sa.Column('reference', sa.String(length=64), nullable=True),
+        sa.Column('success', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_api_logs_archive_reference', 'api_logs_archive', ['reference'], unique=False)
+    op.create_index('ix_api_logs_archive_created_at', 'api_logs_archive', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_api_logs_archive_created_at', table_name='api_logs_archive')
+    op.drop_index('ix_api_logs_archive_reference', table_name='api_logs_archive')
+    op.drop_table('api_logs_archive')
+    op.drop_index('ix_api_log_minutes_id', table_name='api_log_minutes')
+    op.drop_table('api_log_minutes')
+    op.drop_index('ix_api_logs_created_at', table_name='api_logs')
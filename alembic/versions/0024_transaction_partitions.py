@@ -0,0 +1,43 @@
+"""optional monthly partitioning of transactions and service_transactions
+
+Revision ID: 0024_transaction_partitions
+Revises: 0023_api_log_retention
+Create Date: 2026-10-19 13:00:00.000000
+
+With DB_PARTITION_TRANSACTIONS=true on Postgres, both tables are rebuilt as
+RANGE (created_at) partitioned parents with one partition per month, a DEFAULT
+partition, and a trigger-maintained <table>_references table that keeps
+reference globally unique (see app.services.partitions). The rows are copied
+under an exclusive lock, so run this in a maintenance window on large tables.
+Otherwise (SQLite, or the flag off) this revision does nothing; the tables can
+be converted later with scripts/manage_partitions.py --convert.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.config import get_settings
+from app.services.partitions import PARTITIONED_TABLES, convert_to_partitioned, convert_to_unpartitioned
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0024_transaction_partitions'
+down_revision: Union[str, None] = '0023_api_log_retention'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not get_settings().db_partition_transactions:
+        return
+    for table in PARTITIONED_TABLES:
+        convert_to_partitioned(bind, table)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for table in PARTITIONED_TABLES:
+        convert_to_unpartitioned(bind, table)
@@ -0,0 +1,65 @@
+"""composite indexes for the hot ledger, history and reconciler queries
+
+Revision ID: 0025_composite_indexes
+Revises: 0024_transaction_partitions
+Create Date: 2026-10-19 15:00:00.000000
+
+Found with scripts/audit_indexes.py (app.services.index_audit):
+
+- wallet_ledger (wallet_id, reference, entry_type): the duplicate-entry check
+  run on every credit and debit only had reference and (wallet_id, entry_type);
+- (user_id, created_at) on transactions and service_transactions, (wallet_id,
+  created_at) on wallet_ledger and (referrer_id, created_at) on referrals for
+  per-user history, agent stats and statements;
+- transactions (tx_type, status, created_at) for the pending reconciler. It
+  replaces (tx_type, status), which is a prefix of it.
+
+On Postgres the indexes are built CONCURRENTLY, except on partitioned tables
+(see 0024), where Postgres does not support it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.services.partitions import is_partitioned
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0025_composite_indexes'
+down_revision: Union[str, None] = '0024_transaction_partitions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ('ix_wallet_ledger_wallet_reference_type', 'wallet_ledger', ['wallet_id', 'reference', 'entry_type']),
+    ('ix_wallet_ledger_wallet_created_at', 'wallet_ledger', ['wallet_id', 'created_at']),
+    ('ix_transactions_user_created_at', 'transactions', ['user_id', 'created_at']),
+    ('ix_transactions_type_status_created_at', 'transactions', ['tx_type', 'status', 'created_at']),
+    ('ix_service_transactions_user_created_at', 'service_transactions', ['user_id', 'created_at']),
+    ('ix_referrals_referrer_created_at', 'referrals', ['referrer_id', 'created_at']),
+)
+
+REPLACED = ('ix_transactions_type_status', 'transactions', ['tx_type', 'status'])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+        op.drop_index(REPLACED[0], table_name=REPLACED[1])
+        return
+
+    partitioned = {table for _, table, _ in INDEXES if is_partitioned(bind, table)}
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            concurrently = '' if table in partitioned else 'CONCURRENTLY '
+            op.execute(f'CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+        op.execute(f'DROP INDEX IF EXISTS {REPLACED[0]}')
+
+
+def downgrade() -> None:
+    op.create_index(REPLACED[0], REPLACED[1], REPLACED[2], unique=False)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
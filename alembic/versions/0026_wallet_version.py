@@ -0,0 +1,29 @@
+"""wallets.version for the balance read cache
+
+Revision ID: 0026_wallet_version
+Revises: 0025_composite_indexes
+Create Date: 2026-10-19 16:00:00.000000
+
+Every balance change now bumps wallets.version. app.services.wallet_cache
+writes the new balance through to its cache only when the version is newer
+than the cached one.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0026_wallet_version'
+down_revision: Union[str, None] = '0025_composite_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('wallets', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('wallets', 'version')
@@ -0,0 +1,46 @@
+"""wallet_stripes: optional sub-balances for high-volume wallets
+
+Revision ID: 0027_wallet_stripes
+Revises: 0026_wallet_version
+Create Date: 2026-10-19 18:00:00.000000
+
+A wallet with stripe_count > 0 spreads its balance over that many
+wallet_stripes rows so concurrent debits update different rows
+(app.services.wallet_stripes). Existing wallets keep stripe_count = 0.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0027_wallet_stripes'
+down_revision: Union[str, None] = '0026_wallet_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('wallets', sa.Column('stripe_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table(
+        'wallet_stripes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('wallet_id', sa.Integer(), sa.ForeignKey('wallets.id'), nullable=False),
+        sa.Column('stripe_no', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Numeric(12, 2), server_default='0', nullable=False),
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint('wallet_id', 'stripe_no', name='uq_wallet_stripes_wallet_stripe'),
+    )
+
+
+def downgrade() -> None:
+    # Fold striped funds back into the wallet row before the stripes go away.
+    op.execute(
+        "UPDATE wallets SET balance = balance + COALESCE("
+        "(SELECT SUM(s.balance) FROM wallet_stripes s WHERE s.wallet_id = wallets.id), 0)"
+    )
+    op.drop_table('wallet_stripes')
+    op.drop_column('wallets', 'stripe_count')
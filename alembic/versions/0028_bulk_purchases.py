@@ -0,0 +1,58 @@
+"""bulk_purchases and bulk_purchase_items
+
+Revision ID: 0028_bulk_purchases
+Revises: 0027_wallet_stripes
+Create Date: 2026-10-19 20:00:00.000000
+
+A bulk data order is paid with one wallet debit (reference batch_id); each
+item is an ordinary DATA transaction whose reference is stored on the item
+(app.services.bulk_purchase).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0028_bulk_purchases'
+down_revision: Union[str, None] = '0027_wallet_stripes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'bulk_purchases',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('batch_id', sa.String(length=40), nullable=False, unique=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('source', sa.String(length=16), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('refunded_amount', sa.Numeric(12, 2), server_default='0', nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_bulk_purchases_user_id', 'bulk_purchases', ['user_id'])
+    op.create_table(
+        'bulk_purchase_items',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('bulk_purchase_id', sa.Integer(), sa.ForeignKey('bulk_purchases.id'), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=64), nullable=False, unique=True),
+        sa.Column('phone_number', sa.String(length=32), nullable=False),
+        sa.Column('plan_code', sa.String(length=64), nullable=False),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint('bulk_purchase_id', 'position', name='uq_bulk_purchase_items_position'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('bulk_purchase_items')
+    op.drop_index('ix_bulk_purchases_user_id', table_name='bulk_purchases')
+    op.drop_table('bulk_purchases')
@@ -0,0 +1,41 @@
+"""bulk airtime: batch kind, airtime item columns
+
+Revision ID: 0029_bulk_airtime
+Revises: 0028_bulk_purchases
+Create Date: 2026-10-19 21:00:00.000000
+
+Bulk purchases can now be airtime batches: items carry a network and the
+face value sent to the recipient instead of a data plan code.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0029_bulk_airtime'
+down_revision: Union[str, None] = '0028_bulk_purchases'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('bulk_purchases', sa.Column('kind', sa.String(length=16), server_default='data', nullable=False))
+    with op.batch_alter_table('bulk_purchase_items') as batch_op:
+        batch_op.alter_column('plan_code', existing_type=sa.String(length=64), nullable=True)
+        batch_op.add_column(sa.Column('network', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('face_value', sa.Numeric(12, 2), nullable=True))
+
+
+def downgrade() -> None:
+    op.execute(
+        "DELETE FROM bulk_purchase_items WHERE bulk_purchase_id IN "
+        "(SELECT id FROM bulk_purchases WHERE kind <> 'data')"
+    )
+    op.execute("DELETE FROM bulk_purchases WHERE kind <> 'data'")
+    with op.batch_alter_table('bulk_purchase_items') as batch_op:
+        batch_op.drop_column('face_value')
+        batch_op.drop_column('network')
+        batch_op.alter_column('plan_code', existing_type=sa.String(length=64), nullable=False)
+    op.drop_column('bulk_purchases', 'kind')
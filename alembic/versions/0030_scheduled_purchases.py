@@ -0,0 +1,54 @@
+"""scheduled_purchases
+
+Revision ID: 0030_scheduled_purchases
+Revises: 0029_bulk_airtime
+Create Date: 2026-10-19 22:00:00.000000
+
+Recurring data / airtime purchases. The worker claims due rows through
+ix_scheduled_purchases_due with FOR UPDATE SKIP LOCKED
+(app.services.scheduled_purchases).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0030_scheduled_purchases'
+down_revision: Union[str, None] = '0029_bulk_airtime'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scheduled_purchases',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('phone_number', sa.String(length=32), nullable=False),
+        sa.Column('plan_code', sa.String(length=64), nullable=True),
+        sa.Column('network', sa.String(length=32), nullable=True),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=True),
+        sa.Column('interval', sa.String(length=16), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_reference', sa.String(length=64), nullable=True),
+        sa.Column('last_status', sa.String(length=24), nullable=True),
+        sa.Column('last_error', sa.String(length=255), nullable=True),
+        sa.Column('failure_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_scheduled_purchases_id', 'scheduled_purchases', ['id'])
+    op.create_index('ix_scheduled_purchases_user_id', 'scheduled_purchases', ['user_id'])
+    op.create_index('ix_scheduled_purchases_due', 'scheduled_purchases', ['is_active', 'next_run_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scheduled_purchases_due', table_name='scheduled_purchases')
+    op.drop_index('ix_scheduled_purchases_user_id', table_name='scheduled_purchases')
+    op.drop_index('ix_scheduled_purchases_id', table_name='scheduled_purchases')
+    op.drop_table('scheduled_purchases')
@@ -0,0 +1,28 @@
+"""bulk_purchases.heartbeat_at
+
+Revision ID: 0031_bulk_purchase_heartbeat
+Revises: 0030_scheduled_purchases
+Create Date: 2026-10-20 09:00:00.000000
+
+The bulk runner refreshes heartbeat_at while it works, so stalled-batch
+recovery only finalizes batches whose runner is gone.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0031_bulk_purchase_heartbeat'
+down_revision: Union[str, None] = '0030_scheduled_purchases'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('bulk_purchases', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('bulk_purchases', 'heartbeat_at')
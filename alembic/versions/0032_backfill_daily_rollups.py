@@ -0,0 +1,46 @@
+"""backfill daily_rollups from the source tables
+
+Revision ID: 0032_backfill_daily_rollups
+Revises: 0031_bulk_purchase_heartbeat
+Create Date: 2026-10-20 10:00:00.000000
+
+0018 created daily_rollups empty, so admin analytics and the finance overview
+read zeros until the nightly job first ran. This rebuilds every closed day
+from the earliest record. Today is only included while the table is still
+empty, i.e. before the flush-time counters have written anything to it.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.services.rollups import earliest_source_day, rebuild_daily_rollups
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0032_backfill_daily_rollups'
+down_revision: Union[str, None] = '0031_bulk_purchase_heartbeat'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    session = Session(bind=op.get_bind())
+    try:
+        start = earliest_source_day(session)
+        if start is None:
+            return
+        today = datetime.now(timezone.utc).date()
+        empty = session.execute(sa.text('SELECT 1 FROM daily_rollups LIMIT 1')).first() is None
+        end = today if empty else today - timedelta(days=1)
+        if start <= end:
+            rebuild_daily_rollups(session, start, end)
+    finally:
+        session.close()
+
+
+def downgrade() -> None:
+    # The rows are derived data; the rollups of 0018 stay in place.
+    pass
@@ -0,0 +1,31 @@
+"""scheduled_purchases.anchor_day and offset_seconds
+
+Revision ID: 0033_scheduled_purchase_anchor
+Revises: 0032_backfill_daily_rollups
+Create Date: 2026-10-20 11:00:00.000000
+
+Monthly runs are clamped from the day of the first requested run instead of
+the previous (possibly clamped) run, and are computed on requested times with
+the schedule's spread offset added back.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0033_scheduled_purchase_anchor'
+down_revision: Union[str, None] = '0032_backfill_daily_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('scheduled_purchases', sa.Column('anchor_day', sa.Integer(), nullable=True))
+    op.add_column('scheduled_purchases', sa.Column('offset_seconds', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('scheduled_purchases', 'offset_seconds')
+    op.drop_column('scheduled_purchases', 'anchor_day')
@@ -0,0 +1,59 @@
+"""text_pattern_ops prefix indexes and lower(email) for admin search
+
+Revision ID: 0034_search_prefix_indexes
+Revises: 0033_scheduled_purchase_anchor
+Create Date: 2026-10-21 09:00:00.000000
+
+Reference, email and phone searches were ``>= x AND < x || U+10FFFF`` ranges,
+which a non-C collation can order past matching rows. On Postgres they are now
+``LIKE 'x%'``, and these text_pattern_ops indexes serve them (built
+CONCURRENTLY). Emails are matched on lower(email) on every dialect, so that
+expression gets an index everywhere.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0034_search_prefix_indexes'
+down_revision: Union[str, None] = '0033_scheduled_purchase_anchor'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PREFIX_INDEXES = (
+    ('ix_transactions_reference_prefix', 'transactions', 'reference'),
+    ('ix_transactions_external_reference_prefix', 'transactions', 'external_reference'),
+    ('ix_transactions_recipient_phone_prefix', 'transactions', 'recipient_phone'),
+    ('ix_service_transactions_reference_prefix', 'service_transactions', 'reference'),
+    ('ix_service_transactions_external_reference_prefix', 'service_transactions', 'external_reference'),
+    ('ix_service_transactions_customer_prefix', 'service_transactions', 'customer'),
+    ('ix_users_phone_number_prefix', 'users', 'phone_number'),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, column in PREFIX_INDEXES:
+                op.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column} text_pattern_ops)'
+                )
+            op.execute(
+                'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_lower '
+                'ON users (lower(email) text_pattern_ops)'
+            )
+        return
+
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.drop_index('ix_users_email_lower', table_name='users')
+    if bind.dialect.name == 'postgresql':
+        for name, table, _ in PREFIX_INDEXES:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,32 @@
+"""idempotency_keys.claimed_at
+
+Revision ID: 0035_idempotency_claimed_at
+Revises: 0034_search_prefix_indexes
+Create Date: 2026-10-21 10:00:00.000000
+
+A key left in_flight by a crashed worker answered every retry with 409 until
+it expired a day later. The claim time is stored so a retry can take over a
+claim older than the in-flight timeout.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0035_idempotency_claimed_at'
+down_revision: Union[str, None] = '0034_search_prefix_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'idempotency_keys',
+        sa.Column('claimed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'claimed_at')
@@ -8,12 +8,12 @@ from pydantic import BaseModel
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, select, union_all, String, cast, inspect
+from sqlalchemy import func, or_, select, union_all, String, cast, inspect, literal, update, case
 from app.core.database import get_db
 from app.core.config import get_settings
 from app.dependencies import require_admin
 from app.services.monitoring import check_provider_balances
-from app.models import User, UserRole, Wallet, WalletLedger, Transaction, ServiceTransaction, TransactionStatus, TransactionType, PricingRule, PricingRole, MarginType, ApiLog, DataPlan, TransactionDispute, DisputeStatus, AdminAuditLog, ServiceToggle, Referral
+from app.models import User, UserRole, Wallet, WalletLedger, WalletStripe, LedgerType, Transaction, ServiceTransaction, TransactionStatus, TransactionType, PricingRule, PricingRole, MarginType, ApiLog, ApiLogArchive, DataPlan, TransactionDispute, DisputeStatus, AdminAuditLog, ServiceToggle, Referral, Promo
 from app.schemas.admin import (
     FundUserWalletRequest,
     PricingRuleUpdate,
@@ -32,13 +32,26 @@ from app.schemas.admin import (
     AdminReferralsResponse,
     ReconcileTransactionRequest,
     ReconcileTransactionsBulkRequest,
+    WalletStripesRequest,
 )
 from app.services.wallet import get_or_create_wallet, credit_wallet, debit_wallet
-from app.services.pricing import build_service_pricing_key, parse_pricing_key
+from app.services.wallet_cache import mark_wallets_changed
+from app.services.wallet_stripes import collapse_stripes, set_stripe_count, stripe_view
+from app.services.pricing import build_service_pricing_key, invalidate_pricing_table, parse_pricing_key
+from app.services.api_log_retention import api_health
+from app.services.exports import EXPORT_FORMATS, streaming_export
+from app.services.fraud import reset_velocity, velocity_snapshot
+from app.services.log_writer import log_writer, write_audit_log
+from app.services.promos import MTN_1GB_PROMO_CODE, promo_snapshot
+from app.services.rollups import empty_totals, rollup_totals
+from app.services.search import classify_search, dialect_of, search_clause
+from app.utils.cache import get_cached, set_cached
+from app.utils.pagination import COUNT_CACHE_TTL_SECONDS, decode_cursor, encode_cursor, keyset_before, resolve_total
 from app.api.v1.endpoints.data import _invalidate_plans_cache
 
 router = APIRouter()
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Simple TTL cache for analytics
 _ANALYTICS_CACHE: Dict[str, Any] = {}
@@ -138,11 +151,12 @@ def _coerce_type(value: Optional[str]) -> Optional[TransactionType]:
 
 
 def _as_utc_start(d: date) -> datetime:
-    return datetime.combine(d, time.min).replace(tzinfo=timezone.utc)
+    # `time` is the time module here (imported after datetime.time), so use datetime.min/max.
+    return datetime.combine(d, datetime.min.time()).replace(tzinfo=timezone.utc)
 
 
 def _as_utc_end(d: date) -> datetime:
-    return datetime.combine(d, time.max).replace(tzinfo=timezone.utc)
+    return datetime.combine(d, datetime.max.time()).replace(tzinfo=timezone.utc)
 
 
 def _normalize_status_value(value) -> str:
@@ -184,6 +198,25 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _user_search_clause(search, db: Session):
+    return search_clause(
+        search,
+        dialect_of(db),
+        emails=(User.email,),
+        phones=(User.phone_number,),
+        texts=(User.full_name,),
+    )
+
+
+def _decode_cursor(cursor: Optional[str], types: tuple) -> Optional[list]:
+    if not cursor or not cursor.strip():
+        return None
+    try:
+        return decode_cursor(cursor.strip(), types)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 def _ensure_utc(value: Optional[datetime]) -> Optional[datetime]:
     if value is None:
         return None
@@ -224,82 +257,45 @@ def analytics(admin=Depends(require_admin), db: Session = Depends(get_db)):
             "tx_count": 0
         })
 
-    total_revenue = db.query(func.sum(Transaction.amount)).filter(Transaction.status == TransactionStatus.SUCCESS).scalar() or 0
-    
-    # Calculate total cost estimate across ALL transactions (so Wallet Funds correctly zero out profit)
-    total_cost_estimate = (
-        db.query(func.sum(func.coalesce(DataPlan.base_price, Transaction.amount)))
-        .select_from(Transaction)
-        .outerjoin(DataPlan, Transaction.data_plan_code == DataPlan.plan_code)
-        .filter(Transaction.status == TransactionStatus.SUCCESS)
-        .scalar()
-        or 0
+    # Transaction, service and API-call totals come from the daily_rollups fact
+    # table (kept current at flush time and repaired nightly), so loading the
+    # dashboard never aggregates the transactions/service_transactions/api_logs tables.
+    success = TransactionStatus.SUCCESS.value
+    tx_by_type = rollup_totals(db, kinds=("transaction",), statuses=(success,), group_by=("tx_type",))
+    service_totals = rollup_totals(db, kinds=("service",), statuses=(success,)).get((), empty_totals())
+    today_by_status = rollup_totals(
+        db, kinds=("transaction", "service"), since=day_start_utc.date(), group_by=("status",)
     )
-    
-    data_revenue = (
-        db.query(func.sum(Transaction.amount))
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type == TransactionType.DATA,
-        )
-        .scalar()
-        or 0
-    )
-    # Estimate cost from the current plan catalog base_price (not historical).
-    data_cost_estimate = (
-        db.query(func.sum(func.coalesce(DataPlan.base_price, Transaction.amount)))
-        .select_from(Transaction)
-        .outerjoin(DataPlan, Transaction.data_plan_code == DataPlan.plan_code)
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type == TransactionType.DATA,
-        )
-        .scalar()
-        or 0
+    api_by_status = rollup_totals(db, kinds=("api",), group_by=("status",))
+    success_by_day = rollup_totals(
+        db, kinds=("transaction", "service"), statuses=(success,), since=months_starts[0].date(), group_by=("day",)
     )
+
+    total_revenue = sum((row["amount"] for row in tx_by_type.values()), Decimal("0"))
+    # Cost estimate spans ALL successful transactions (so Wallet Funds correctly zero out profit).
+    total_cost_estimate = sum((row["base_cost"] for row in tx_by_type.values()), Decimal("0"))
+    data_totals = tx_by_type.get((TransactionType.DATA.value,), empty_totals())
+    data_revenue = data_totals["amount"]
+    # Data cost is the cost_price captured on each transaction at purchase time.
+    data_cost_estimate = data_totals["base_cost"]
     gross_profit_estimate = float(total_revenue or 0) - float(total_cost_estimate or 0)
     gross_margin_pct = (float(gross_profit_estimate) / float(total_revenue) * 100.0) if float(total_revenue) else 0.0
     total_users = db.query(func.count(User.id)).scalar() or 0
     active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar() or 0
 
-    today_successful_tx = db.query(func.count(Transaction.id)).filter(
-        Transaction.status == TransactionStatus.SUCCESS,
-        Transaction.created_at >= day_start_utc
-    ).scalar() or 0
-    today_failed_tx = db.query(func.count(Transaction.id)).filter(
-        Transaction.status.in_([TransactionStatus.FAILED, TransactionStatus.REFUNDED]),
-        Transaction.created_at >= day_start_utc
-    ).scalar() or 0
-    today_pending_tx = db.query(func.count(Transaction.id)).filter(
-        Transaction.status == TransactionStatus.PENDING,
-        Transaction.created_at >= day_start_utc
-    ).scalar() or 0
-
-    if inspect(db.bind).has_table("service_transactions"):
-        today_successful_st = db.query(func.count(ServiceTransaction.id)).filter(
-            ServiceTransaction.status == TransactionStatus.SUCCESS.value,
-            ServiceTransaction.created_at >= day_start_utc
-        ).scalar() or 0
-        today_failed_st = db.query(func.count(ServiceTransaction.id)).filter(
-            ServiceTransaction.status.in_([TransactionStatus.FAILED.value, TransactionStatus.REFUNDED.value]),
-            ServiceTransaction.created_at >= day_start_utc
-        ).scalar() or 0
-        today_pending_st = db.query(func.count(ServiceTransaction.id)).filter(
-            ServiceTransaction.status == TransactionStatus.PENDING.value,
-            ServiceTransaction.created_at >= day_start_utc
-        ).scalar() or 0
-        
-        today_successful_tx += today_successful_st
-        today_failed_tx += today_failed_st
-        today_pending_tx += today_pending_st
+    def _status_count(totals: dict, *statuses: str) -> int:
+        return sum(totals.get((status,), empty_totals())["tx_count"] for status in statuses)
 
+    today_successful_tx = _status_count(today_by_status, success)
+    today_failed_tx = _status_count(today_by_status, TransactionStatus.FAILED.value, TransactionStatus.REFUNDED.value)
+    today_pending_tx = _status_count(today_by_status, TransactionStatus.PENDING.value)
     daily_tx = today_successful_tx + today_failed_tx + today_pending_tx
 
-    api_success = db.query(func.count(ApiLog.id)).filter(ApiLog.success == 1).scalar() or 0
-    api_failed = db.query(func.count(ApiLog.id)).filter(ApiLog.success == 0).scalar() or 0
-    service_revenue = 0
-    service_cost_estimate = 0
-    service_profit_estimate = 0
+    api_success = _status_count(api_by_status, "success")
+    api_failed = _status_count(api_by_status, "failed")
+    service_revenue = float(service_totals["amount"])
+    service_cost_estimate = float(service_totals["base_cost"])
+    service_profit_estimate = service_revenue - service_cost_estimate
     reports_open = 0
     reports_resolved = 0
     promo_users_used = 0
@@ -316,86 +312,36 @@ def analytics(admin=Depends(require_admin), db: Session = Depends(get_db)):
     period_starts["weekly"] = week_start_utc
     period_starts["monthly"] = month_start_utc
 
-    def _apply_period_totals(created_at, revenue: float, cost: float):
-        created_utc = _ensure_utc(created_at)
-        if not created_utc:
-            return
+    def _apply_period_totals(day_at: datetime, revenue: float, cost: float, count: int):
         for key, start_at in period_starts.items():
-            if created_utc >= start_at:
+            if day_at >= start_at:
                 target = period_profit_estimates[key]
                 target["revenue"] += revenue
                 target["cost_estimate"] += cost
                 target["profit_estimate"] += revenue - cost
-                target["tx_count"] += 1
+                target["tx_count"] += count
 
-    def _apply_trends(created_at, revenue: float, cost: float):
-        created_utc = _ensure_utc(created_at)
-        if not created_utc:
-            return
+    def _apply_trends(day_at: datetime, revenue: float, cost: float, count: int):
         matched_bucket = None
         for bucket in trend_buckets:
-            if created_utc >= bucket["start"]:
+            if day_at >= bucket["start"]:
                 matched_bucket = bucket
         if matched_bucket:
             matched_bucket["revenue"] += revenue
             matched_bucket["cost_estimate"] += cost
             matched_bucket["profit_estimate"] += revenue - cost
-            matched_bucket["tx_count"] += 1
+            matched_bucket["tx_count"] += count
 
-    try:
-        data_period_rows = (
-            db.query(Transaction.created_at, Transaction.amount, DataPlan.base_price)
-            .outerjoin(DataPlan, Transaction.data_plan_code == DataPlan.plan_code)
-            .filter(
-                Transaction.status == TransactionStatus.SUCCESS,
-                Transaction.created_at >= months_starts[0],
-            )
-            .all()
-        )
+    for (day,), totals in success_by_day.items():
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        day_at = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        revenue_num = float(totals["amount"])
+        cost_num = float(totals["base_cost"])
+        _apply_period_totals(day_at, revenue_num, cost_num, totals["tx_count"])
+        _apply_trends(day_at, revenue_num, cost_num, totals["tx_count"])
 
-        for created_at, amount, base_price in data_period_rows:
-            revenue_num = float(amount or 0)
-            try:
-                cost_num = float(base_price) if base_price is not None else revenue_num
-            except Exception:
-                cost_num = revenue_num
-            _apply_period_totals(created_at, revenue_num, cost_num)
-            _apply_trends(created_at, revenue_num, cost_num)
-
-        if inspect(db.bind).has_table("service_transactions"):
-            rows = (
-                db.query(ServiceTransaction)
-                .filter(ServiceTransaction.status == TransactionStatus.SUCCESS.value)
-                .all()
-            )
-            for tx in rows:
-                amt = float(tx.amount or 0)
-                meta = tx.meta or {}
-                base = meta.get("base_amount")
-                try:
-                    base_num = float(base) if base is not None else amt
-                except Exception:
-                    base_num = amt
-                service_revenue += amt
-                service_cost_estimate += base_num
-            service_profit_estimate = service_revenue - service_cost_estimate
-            service_period_rows = (
-                db.query(ServiceTransaction.created_at, ServiceTransaction.amount, ServiceTransaction.meta)
-                .filter(
-                    ServiceTransaction.status == TransactionStatus.SUCCESS.value,
-                    ServiceTransaction.created_at >= months_starts[0],
-                )
-                .all()
-            )
-            for created_at, amount, meta in service_period_rows:
-                revenue_num = float(amount or 0)
-                base = (meta or {}).get("base_amount") if isinstance(meta, dict) else None
-                try:
-                    cost_num = float(base) if base is not None else revenue_num
-                except Exception:
-                    cost_num = revenue_num
-                _apply_period_totals(created_at, revenue_num, cost_num)
-                _apply_trends(created_at, revenue_num, cost_num)
+    try:
         if inspect(db.bind).has_table("transaction_disputes"):
             reports_open = (
                 db.query(func.count(TransactionDispute.id))
@@ -410,26 +356,12 @@ def analytics(admin=Depends(require_admin), db: Session = Depends(get_db)):
                 or 0
             )
         if bool(settings.promo_mtn_1gb_enabled) and promo_limit > 0:
-            promo_network = str(settings.promo_mtn_1gb_network or "mtn").strip().lower()
-            promo_suffix = str(settings.promo_mtn_1gb_plan_code or "1001").strip().lower()
-            promo_users_used = int(
-                db.query(func.count(func.distinct(Transaction.user_id)))
-                .filter(
-                    Transaction.tx_type == TransactionType.DATA,
-                    Transaction.status == TransactionStatus.SUCCESS,
-                    func.lower(Transaction.network) == promo_network,
-                    or_(
-                        func.lower(Transaction.data_plan_code) == promo_suffix,
-                        func.lower(Transaction.data_plan_code).like(f"%:{promo_suffix}"),
-                    ),
-                )
-                .scalar()
-                or 0
-            )
-            promo_remaining = max(promo_limit - promo_users_used, 0)
-            promo_active = promo_remaining > 0
+            promo = promo_snapshot(db.query(Promo).filter(Promo.code == MTN_1GB_PROMO_CODE).first())
+            promo_users_used = promo["users_used"]
+            promo_remaining = promo["remaining"]
+            promo_active = promo["active"]
     except Exception:
-        # Keep analytics endpoint resilient when the service table is not yet available.
+        # Keep analytics endpoint resilient when optional tables are not yet available.
         pass
 
     period_profit_payload = {}
@@ -440,12 +372,9 @@ def analytics(admin=Depends(require_admin), db: Session = Depends(get_db)):
             "profit_estimate": round(float(values["profit_estimate"]), 2),
             "tx_count": int(values["tx_count"]),
         }
-        
-    total_tx_count = db.query(func.count(Transaction.id)).filter(Transaction.status == TransactionStatus.SUCCESS).scalar() or 0
-    if inspect(db.bind).has_table("service_transactions"):
-        total_st_count = db.query(func.count(ServiceTransaction.id)).filter(ServiceTransaction.status == TransactionStatus.SUCCESS.value).scalar() or 0
-        total_tx_count += total_st_count
-        
+
+    total_tx_count = sum(row["tx_count"] for row in tx_by_type.values()) + service_totals["tx_count"]
+
     period_profit_payload["all_time"] = {
         "revenue": round(float(total_revenue or 0) + float(service_revenue or 0), 2),
         "cost_estimate": round(float(total_cost_estimate or 0) + float(service_cost_estimate or 0), 2),
@@ -512,6 +441,8 @@ def list_all_transactions(
     to_date: Optional[date] = Query(default=None),
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
 ):
     if page < 1:
         raise HTTPException(status_code=400, detail="page must be >= 1")
@@ -520,6 +451,9 @@ def list_all_transactions(
 
     status_enum = _coerce_status(status)
     type_enum = _coerce_type(tx_type)
+    cursor_values = _decode_cursor(cursor, (datetime, int, str))
+    search = classify_search(q)
+    dialect = dialect_of(db)
 
     # Test stubs (and some lightweight DB wrappers) don't implement Session.execute.
     # Fall back to the ORM query used previously so unit tests keep working.
@@ -528,14 +462,15 @@ def list_all_transactions(
             db.query(Transaction, User.email.label("user_email"))
             .join(User, Transaction.user_id == User.id)
         )
-        if q:
-            needle = f"%{q.strip()}%"
+        if search:
             query = query.filter(
-                or_(
-                    Transaction.reference.ilike(needle),
-                    Transaction.external_reference.ilike(needle),
-                    Transaction.data_plan_code.ilike(needle),
-                    User.email.ilike(needle),
+                search_clause(
+                    search,
+                    dialect,
+                    references=(Transaction.reference, Transaction.external_reference),
+                    emails=(User.email,),
+                    phones=(Transaction.recipient_phone,),
+                    texts=(Transaction.data_plan_code,),
                 )
             )
         if status_enum is not None:
@@ -549,10 +484,25 @@ def list_all_transactions(
         if to_date:
             query = query.filter(Transaction.created_at <= _as_utc_end(to_date))
 
-        total = query.count()
+        total, total_is_estimate = resolve_total(
+            db,
+            cache_key="admin:transactions:orm-count:" + "|".join(
+                str(v or "") for v in (q, status_enum, type_enum, network, from_date, to_date)
+            ),
+            count=query.count,
+            exact=exact_count,
+            estimate_tables=() if (search or status_enum or type_enum or network or from_date or to_date) else ("transactions",),
+        )
+        # Same (created_at, id, source) keyset as the main branch so cursors are interchangeable.
+        sort_key = (Transaction.created_at, Transaction.id, literal("transaction", String))
+        if cursor_values:
+            query = query.filter(keyset_before(sort_key, cursor_values))
+            offset = 0
+        else:
+            offset = (page - 1) * page_size
         rows = (
-            query.order_by(Transaction.id.desc())
-            .offset((page - 1) * page_size)
+            query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+            .offset(offset)
             .limit(page_size)
             .all()
         )
@@ -574,7 +524,18 @@ def list_all_transactions(
                     "failure_reason": tx.failure_reason,
                 }
             )
-        return {"items": items, "total": total, "page": page, "page_size": page_size}
+        next_cursor = None
+        if len(rows) == page_size:
+            last_tx = rows[-1][0]
+            next_cursor = encode_cursor(last_tx.created_at, last_tx.id, "transaction")
+        return {
+            "items": items,
+            "total": int(total),
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "total_is_estimate": total_is_estimate,
+        }
 
     base_sel = (
         select(
@@ -589,6 +550,8 @@ def list_all_transactions(
             Transaction.data_plan_code.label("data_plan_code"),
             Transaction.external_reference.label("external_reference"),
             Transaction.failure_reason.label("failure_reason"),
+            Transaction.recipient_phone.label("customer"),
+            literal("transaction", String).label("source"),
         )
         .select_from(Transaction)
     )
@@ -612,6 +575,8 @@ def list_all_transactions(
                 ServiceTransaction.product_code.label("data_plan_code"),
                 ServiceTransaction.external_reference.label("external_reference"),
                 ServiceTransaction.failure_reason.label("failure_reason"),
+                ServiceTransaction.customer.label("customer"),
+                literal("service", String).label("source"),
             )
             .select_from(ServiceTransaction)
         )
@@ -619,15 +584,18 @@ def list_all_transactions(
     else:
         combined = base_sel.subquery("all_tx")
 
+    # Searches are routed by pattern (reference/email/phone/free text) so each
+    # kind hits an index; see app.services.search.
     where = []
-    if q:
-        needle = f"%{q.strip()}%"
+    if search:
         where.append(
-            or_(
-                combined.c.reference.ilike(needle),
-                combined.c.external_reference.ilike(needle),
-                combined.c.data_plan_code.ilike(needle),
-                User.email.ilike(needle),
+            search_clause(
+                search,
+                dialect,
+                references=(combined.c.reference, combined.c.external_reference),
+                emails=(User.email,),
+                phones=(combined.c.customer,),
+                texts=(combined.c.data_plan_code,),
             )
         )
     if status_enum is not None:
@@ -641,6 +609,29 @@ def list_all_transactions(
     if to_date:
         where.append(combined.c.created_at <= _as_utc_end(to_date))
 
+    count_sel = select(func.count()).select_from(combined)
+    if search:
+        count_sel = count_sel.join(User, combined.c.user_id == User.id)
+    filtered = bool(where)
+    total, total_is_estimate = resolve_total(
+        db,
+        cache_key="admin:transactions:count:" + "|".join(
+            str(v or "") for v in (q, status_enum, type_enum, network, from_date, to_date)
+        ),
+        count=lambda: db.execute(count_sel.where(*where)).scalar(),
+        exact=exact_count,
+        estimate_tables=() if filtered else (("transactions", "service_transactions") if has_services else ("transactions",)),
+    )
+
+    # Keyset pagination: a cursor resumes after the last row served; without one,
+    # fall back to OFFSET for page-number navigation.
+    sort_key = (combined.c.created_at, combined.c.id, combined.c.source)
+    if cursor_values:
+        where.append(keyset_before(sort_key, cursor_values))
+        offset = 0
+    else:
+        offset = (page - 1) * page_size
+
     columns = [
         combined.c.id.label("id"),
         combined.c.created_at.label("created_at"),
@@ -654,38 +645,26 @@ def list_all_transactions(
         combined.c.data_plan_code.label("data_plan_code"),
         combined.c.external_reference.label("external_reference"),
         combined.c.failure_reason.label("failure_reason"),
+        combined.c.source.label("source"),
     ]
 
-    if q:
-        total = db.execute(
-            select(func.count())
-            .select_from(combined)
-            .join(User, combined.c.user_id == User.id)
-            .where(*where)
-        ).scalar() or 0
-        
+    if search:
         query_sel = (
             select(*columns)
             .select_from(combined)
             .join(User, combined.c.user_id == User.id)
             .where(*where)
-            .order_by(combined.c.created_at.desc(), combined.c.id.desc())
-            .offset((page - 1) * page_size)
+            .order_by(*(col.desc() for col in sort_key))
+            .offset(offset)
             .limit(page_size)
         )
         rows = db.execute(query_sel).mappings().all()
     else:
-        total = db.execute(
-            select(func.count())
-            .select_from(combined)
-            .where(*where)
-        ).scalar() or 0
-        
         paginated_subquery = (
             select(combined)
             .where(*where)
-            .order_by(combined.c.created_at.desc(), combined.c.id.desc())
-            .offset((page - 1) * page_size)
+            .order_by(*(col.desc() for col in sort_key))
+            .offset(offset)
             .limit(page_size)
             .subquery("paginated_tx")
         )
@@ -704,10 +683,15 @@ def list_all_transactions(
                 paginated_subquery.c.data_plan_code.label("data_plan_code"),
                 paginated_subquery.c.external_reference.label("external_reference"),
                 paginated_subquery.c.failure_reason.label("failure_reason"),
+                paginated_subquery.c.source.label("source"),
             )
             .select_from(paginated_subquery)
             .join(User, paginated_subquery.c.user_id == User.id)
-            .order_by(paginated_subquery.c.created_at.desc(), paginated_subquery.c.id.desc())
+            .order_by(
+                paginated_subquery.c.created_at.desc(),
+                paginated_subquery.c.id.desc(),
+                paginated_subquery.c.source.desc(),
+            )
         )
         rows = db.execute(query_sel).mappings().all()
 
@@ -718,7 +702,19 @@ def list_all_transactions(
         row["tx_type"] = _normalize_type_value(row.get("tx_type"))
         items.append(row)
 
-    return {"items": items, "total": int(total), "page": page, "page_size": page_size}
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"], last["source"])
+
+    return {
+        "items": items,
+        "total": int(total),
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "total_is_estimate": total_is_estimate,
+    }
 
 
 @router.get("/transactions/{reference}")
@@ -741,6 +737,11 @@ def get_transaction_details(
             .filter(ApiLog.reference == tx.reference)
             .order_by(ApiLog.created_at.desc())
             .first()
+        ) or (
+            db.query(ApiLogArchive)
+            .filter(ApiLogArchive.reference == tx.reference)
+            .order_by(ApiLogArchive.created_at.desc())
+            .first()
         )
         provider_trace = {
             "provider": tx.provider or ("amigo" if _normalize_type_value(tx.tx_type) == "data" else "unknown"),
@@ -821,34 +822,39 @@ def list_users(
     q: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
 ):
     if page < 1:
         raise HTTPException(status_code=400, detail="page must be >= 1")
     if page_size < 1 or page_size > 200:
         raise HTTPException(status_code=400, detail="page_size must be between 1 and 200")
+    cursor_values = _decode_cursor(cursor, (int,))
 
     ref_subquery = (
         db.query(func.count(Referral.id))
         .filter(Referral.referrer_id == User.id)
         .correlate(User)
-        .as_scalar()
+        .scalar_subquery()
     )
 
     query = db.query(User, ref_subquery.label("referral_count"))
-    if q:
-        needle = f"%{q.strip()}%"
-        query = query.filter(
-            or_(
-                User.email.ilike(needle),
-                User.full_name.ilike(needle),
-                User.phone_number.ilike(needle),
-            )
-        )
+    search = classify_search(q)
+    if search:
+        query = query.filter(_user_search_clause(search, db))
 
-    total = query.count()
+    total, total_is_estimate = resolve_total(
+        db,
+        cache_key=f"admin:users:count:{q or ''}",
+        count=query.count,
+        exact=exact_count,
+        estimate_tables=() if q else ("users",),
+    )
+    if cursor_values:
+        query = query.filter(User.id < cursor_values[0])
     users = (
         query.order_by(User.id.desc())
-        .offset((page - 1) * page_size)
+        .offset(0 if cursor_values else (page - 1) * page_size)
         .limit(page_size)
         .all()
     )
@@ -870,89 +876,116 @@ def list_users(
             }
         )
 
-    return {"items": items, "total": total, "page": page, "page_size": page_size}
+    next_cursor = encode_cursor(users[-1][0].id) if len(users) == page_size else None
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "total_is_estimate": total_is_estimate,
+    }
+
 
+USER_DETAIL_PREVIEW_SIZE = 20
 
-@router.get("/users/{user_id}/details")
-def get_user_details(
-    user_id: int,
-    admin=Depends(require_admin),
-    db: Session = Depends(get_db),
-):
+
+def _get_user_or_404(db: Session, user_id: int) -> User:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    return user
 
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
-    recent_items = []
 
-    data_rows = (
-        db.query(Transaction)
-        .filter(Transaction.user_id == user_id)
-        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
-        .all()
-    )
-    for tx in data_rows:
-        recent_items.append(
-            {
-                "id": tx.id,
-                "created_at": tx.created_at,
-                "reference": tx.reference,
-                "tx_type": _normalize_type_value(tx.tx_type),
-                "status": _normalize_status_value(tx.status),
-                "amount": tx.amount,
-                "network": tx.network,
-                "data_plan_code": tx.data_plan_code,
-                "external_reference": tx.external_reference,
-                "failure_reason": tx.failure_reason,
-            }
-        )
+def _check_page_size(page_size: int) -> None:
+    if page_size < 1 or page_size > 200:
+        raise HTTPException(status_code=400, detail="page_size must be between 1 and 200")
 
-    has_services = False
-    try:
-        has_services = inspect(db.bind).has_table("service_transactions")
-    except Exception:
-        has_services = False
 
-    if has_services:
-        service_rows = (
-            db.query(ServiceTransaction)
-            .filter(ServiceTransaction.user_id == user_id)
-            .order_by(ServiceTransaction.created_at.desc(), ServiceTransaction.id.desc())
-            .all()
+def _user_activity_page(
+    db: Session,
+    user_id: int,
+    *,
+    sources: tuple[str, ...],
+    cursor_values: Optional[list],
+    page_size: int,
+) -> tuple[list[dict], Optional[str]]:
+    """One keyset page of a user's transactions and/or service transactions, newest first."""
+    selects = []
+    if "transaction" in sources:
+        selects.append(
+            select(
+                Transaction.id.label("id"),
+                Transaction.created_at.label("created_at"),
+                Transaction.reference.label("reference"),
+                func.lower(cast(Transaction.tx_type, String)).label("tx_type"),
+                func.lower(cast(Transaction.status, String)).label("status"),
+                Transaction.amount.label("amount"),
+                Transaction.network.label("network"),
+                Transaction.data_plan_code.label("data_plan_code"),
+                Transaction.external_reference.label("external_reference"),
+                Transaction.failure_reason.label("failure_reason"),
+                literal("transaction", String).label("source"),
+            ).where(Transaction.user_id == user_id)
         )
-        for tx in service_rows:
-            recent_items.append(
-                {
-                    "id": tx.id,
-                    "created_at": tx.created_at,
-                    "reference": tx.reference,
-                    "tx_type": _normalize_type_value(tx.tx_type),
-                    "status": _normalize_status_value(tx.status),
-                    "amount": tx.amount,
-                    "network": tx.provider,
-                    "data_plan_code": tx.product_code,
-                    "external_reference": tx.external_reference,
-                    "failure_reason": tx.failure_reason,
-                }
-            )
+    if "service" in sources and inspect(db.bind).has_table("service_transactions"):
+        selects.append(
+            select(
+                ServiceTransaction.id.label("id"),
+                ServiceTransaction.created_at.label("created_at"),
+                ServiceTransaction.reference.label("reference"),
+                func.lower(ServiceTransaction.tx_type).label("tx_type"),
+                func.lower(ServiceTransaction.status).label("status"),
+                ServiceTransaction.amount.label("amount"),
+                ServiceTransaction.provider.label("network"),
+                ServiceTransaction.product_code.label("data_plan_code"),
+                ServiceTransaction.external_reference.label("external_reference"),
+                ServiceTransaction.failure_reason.label("failure_reason"),
+                literal("service", String).label("source"),
+            ).where(ServiceTransaction.user_id == user_id)
+        )
+    if not selects:
+        return [], None
 
-    floor_utc = datetime.min.replace(tzinfo=timezone.utc)
-    recent_items.sort(
-        key=lambda item: _ensure_utc(item.get("created_at")) or floor_utc,
-        reverse=True,
-    )
+    feed = (union_all(*selects) if len(selects) > 1 else selects[0]).subquery("user_tx")
+    sort_key = (feed.c.created_at, feed.c.id, feed.c.source)
+    stmt = select(feed)
+    if cursor_values:
+        stmt = stmt.where(keyset_before(sort_key, cursor_values))
+    rows = db.execute(stmt.order_by(*(col.desc() for col in sort_key)).limit(page_size)).mappings().all()
+
+    items = []
+    for r in rows:
+        row = dict(r)
+        row["status"] = _normalize_status_value(row.get("status"))
+        row["tx_type"] = _normalize_type_value(row.get("tx_type"))
+        items.append(row)
+    next_cursor = None
+    if len(rows) == page_size:
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"], rows[-1]["source"])
+    return items, next_cursor
 
-    referrals_query = (
+
+def _user_referrals_page(
+    db: Session,
+    user_id: int,
+    *,
+    cursor_values: Optional[list],
+    page_size: int,
+) -> tuple[list[dict], Optional[str]]:
+    sort_key = (Referral.created_at, Referral.id)
+    query = (
         db.query(Referral, User)
         .join(User, Referral.referred_user_id == User.id)
         .filter(Referral.referrer_id == user_id)
-        .order_by(Referral.created_at.desc())
-        .all()
     )
-    referral_list = []
-    for ref, ref_user in referrals_query:
-        referral_list.append({
+    if cursor_values:
+        query = query.filter(keyset_before(sort_key, cursor_values))
+    rows = query.order_by(*(col.desc() for col in sort_key)).limit(page_size).all()
+
+    items = []
+    for ref, ref_user in rows:
+        items.append({
             "id": ref.id,
             "referred_user_id": ref.referred_user_id,
             "referred_email": ref_user.email,
@@ -962,6 +995,70 @@ def get_user_details(
             "created_at": ref.created_at,
             "reward_amount": float(ref.reward_amount or 0),
         })
+    next_cursor = encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if len(rows) == page_size else None
+    return items, next_cursor
+
+
+def _user_activity_summary(db: Session, user_id: int) -> dict:
+    """Per-status counts and amounts for the profile header, aggregated in SQL."""
+    by_status: Dict[str, Dict[str, Any]] = {}
+
+    def _add(status, count, amount):
+        bucket = by_status.setdefault(_normalize_status_value(status), {"count": 0, "amount": Decimal("0")})
+        bucket["count"] += int(count or 0)
+        bucket["amount"] += Decimal(str(amount or 0))
+
+    last_activity = []
+    for status, count, amount, latest in (
+        db.query(Transaction.status, func.count(Transaction.id), func.sum(Transaction.amount), func.max(Transaction.created_at))
+        .filter(Transaction.user_id == user_id)
+        .group_by(Transaction.status)
+        .all()
+    ):
+        _add(status, count, amount)
+        last_activity.append(latest)
+    if inspect(db.bind).has_table("service_transactions"):
+        for status, count, amount, latest in (
+            db.query(
+                ServiceTransaction.status,
+                func.count(ServiceTransaction.id),
+                func.sum(ServiceTransaction.amount),
+                func.max(ServiceTransaction.created_at),
+            )
+            .filter(ServiceTransaction.user_id == user_id)
+            .group_by(ServiceTransaction.status)
+            .all()
+        ):
+            _add(status, count, amount)
+            last_activity.append(latest)
+
+    referral_count = db.query(func.count(Referral.id)).filter(Referral.referrer_id == user_id).scalar() or 0
+    latest_values = [_ensure_utc(value) for value in last_activity if value is not None]
+    return {
+        "transaction_count": sum(bucket["count"] for bucket in by_status.values()),
+        "successful_spend": by_status.get(TransactionStatus.SUCCESS.value, {}).get("amount", Decimal("0")),
+        "by_status": by_status,
+        "referral_count": int(referral_count),
+        "last_activity_at": max(latest_values) if latest_values else None,
+    }
+
+
+@router.get("/users/{user_id}/details")
+def get_user_details(
+    user_id: int,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    # Profile header: aggregates plus the first page of each list. The full
+    # history is served by the paginated /users/{user_id}/... sub-resources.
+    user = _get_user_or_404(db, user_id)
+    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+    recent_items, transactions_cursor = _user_activity_page(
+        db, user_id, sources=("transaction", "service"), cursor_values=None, page_size=USER_DETAIL_PREVIEW_SIZE
+    )
+    referral_list, referrals_cursor = _user_referrals_page(
+        db, user_id, cursor_values=None, page_size=USER_DETAIL_PREVIEW_SIZE
+    )
 
     return {
         "user": {
@@ -978,15 +1075,318 @@ def get_user_details(
             "developer_status": getattr(user, "developer_status", "none"),
         },
         "wallet": {
-            "balance": wallet.balance if wallet else 0,
+            "balance": wallet.total_balance if wallet else 0,
             "is_locked": wallet.is_locked if wallet else False,
             "updated_at": wallet.updated_at if wallet else None,
         },
+        "summary": _user_activity_summary(db, user_id),
         "recent_transactions": recent_items,
+        "recent_transactions_next_cursor": transactions_cursor,
         "referred_users": referral_list,
+        "referred_users_next_cursor": referrals_cursor,
     }
 
 
+@router.get("/users/{user_id}/activity")
+def get_user_activity(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Combined transaction and service-transaction history, newest first."""
+    _check_page_size(page_size)
+    _get_user_or_404(db, user_id)
+    items, next_cursor = _user_activity_page(
+        db,
+        user_id,
+        sources=("transaction", "service"),
+        cursor_values=_decode_cursor(cursor, (datetime, int, str)),
+        page_size=page_size,
+    )
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
+
+@router.get("/users/{user_id}/transactions")
+def get_user_transactions(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    _check_page_size(page_size)
+    _get_user_or_404(db, user_id)
+    items, next_cursor = _user_activity_page(
+        db,
+        user_id,
+        sources=("transaction",),
+        cursor_values=_decode_cursor(cursor, (datetime, int, str)),
+        page_size=page_size,
+    )
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
+
+@router.get("/users/{user_id}/service-transactions")
+def get_user_service_transactions(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    _check_page_size(page_size)
+    _get_user_or_404(db, user_id)
+    items, next_cursor = _user_activity_page(
+        db,
+        user_id,
+        sources=("service",),
+        cursor_values=_decode_cursor(cursor, (datetime, int, str)),
+        page_size=page_size,
+    )
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
+
+@router.get("/users/{user_id}/referrals")
+def get_user_referrals(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    _check_page_size(page_size)
+    _get_user_or_404(db, user_id)
+    items, next_cursor = _user_referrals_page(
+        db, user_id, cursor_values=_decode_cursor(cursor, (datetime, int)), page_size=page_size
+    )
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
+
+@router.get("/users/{user_id}/ledger")
+def get_user_ledger(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    _check_page_size(page_size)
+    _get_user_or_404(db, user_id)
+    cursor_values = _decode_cursor(cursor, (datetime, int))
+    sort_key = (WalletLedger.created_at, WalletLedger.id)
+    query = (
+        db.query(WalletLedger)
+        .join(Wallet, WalletLedger.wallet_id == Wallet.id)
+        .filter(Wallet.user_id == user_id)
+    )
+    if cursor_values:
+        query = query.filter(keyset_before(sort_key, cursor_values))
+    entries = query.order_by(*(col.desc() for col in sort_key)).limit(page_size).all()
+
+    items = [
+        {
+            "id": entry.id,
+            "created_at": entry.created_at,
+            "reference": entry.reference,
+            "entry_type": entry.entry_type.value if hasattr(entry.entry_type, "value") else str(entry.entry_type),
+            "amount": entry.amount,
+            "description": entry.description,
+        }
+        for entry in entries
+    ]
+    next_cursor = encode_cursor(entries[-1].created_at, entries[-1].id) if len(entries) == page_size else None
+    return {"items": items, "next_cursor": next_cursor, "page_size": page_size}
+
+
+@router.get("/users/{user_id}/velocity")
+def get_user_velocity(user_id: int, admin=Depends(require_admin), db: Session = Depends(get_db)):
+    """Rolling 24 hour purchase counters checked by the fraud guard."""
+    _get_user_or_404(db, user_id)
+    return velocity_snapshot(db, user_id)
+
+
+@router.post("/users/{user_id}/velocity/reset")
+def reset_user_velocity(user_id: int, admin=Depends(require_admin), db: Session = Depends(get_db)):
+    _get_user_or_404(db, user_id)
+    before = velocity_snapshot(db, user_id)
+    reset_velocity(db, user_id)
+    db.add(AdminAuditLog(
+        admin_email=admin.email,
+        action="fraud_velocity_reset",
+        target=str(user_id),
+        details={
+            "purchase_count": before["purchase_count"],
+            "purchase_total": str(before["purchase_total"]),
+        },
+    ))
+    db.commit()
+    return velocity_snapshot(db, user_id)
+
+
+@router.get("/users/{user_id}/wallet/stripes")
+def get_wallet_stripes(user_id: int, admin=Depends(require_admin), db: Session = Depends(get_db)):
+    """How a striped wallet's balance is spread; stripe_count 0 means a single-row wallet."""
+    _get_user_or_404(db, user_id)
+    return stripe_view(db, get_or_create_wallet(db, user_id))
+
+
+@router.put("/users/{user_id}/wallet/stripes")
+def update_wallet_stripes(
+    user_id: int, payload: WalletStripesRequest, admin=Depends(require_admin), db: Session = Depends(get_db)
+):
+    _get_user_or_404(db, user_id)
+    wallet = get_or_create_wallet(db, user_id)
+    previous = wallet.stripe_count
+    set_stripe_count(db, wallet, payload.stripes)
+    db.add(AdminAuditLog(
+        admin_email=admin.email,
+        action="wallet_stripes_update",
+        target=str(user_id),
+        details={"previous": previous, "stripes": payload.stripes},
+    ))
+    db.commit()
+    return stripe_view(db, wallet)
+
+
+def _export_format(fmt: str) -> str:
+    value = (fmt or "").strip().lower()
+    if value not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return value
+
+
+def _export_window(stmt, column, from_date: Optional[date], to_date: Optional[date]):
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must be on or before to_date")
+    if from_date:
+        stmt = stmt.where(column >= _as_utc_start(from_date))
+    if to_date:
+        stmt = stmt.where(column <= _as_utc_end(to_date))
+    return stmt
+
+
+def _export_filename(name: str, from_date: Optional[date], to_date: Optional[date]) -> str:
+    return "_".join([name, *(d.isoformat() for d in (from_date, to_date) if d)])
+
+
+@router.get("/exports/transactions")
+def export_transactions(
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+    status: Optional[str] = None,
+    tx_type: Optional[str] = None,
+    from_date: Optional[date] = Query(default=None),
+    to_date: Optional[date] = Query(default=None),
+    format: str = "csv",
+):
+    fmt = _export_format(format)
+    status_enum = _coerce_status(status)
+    type_enum = _coerce_type(tx_type)
+    stmt = (
+        select(
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.reference,
+            User.email.label("user_email"),
+            Transaction.tx_type,
+            Transaction.status,
+            Transaction.amount,
+            Transaction.cost_price,
+            Transaction.network,
+            Transaction.recipient_phone,
+            Transaction.data_plan_code,
+            Transaction.provider,
+            Transaction.external_reference,
+            Transaction.failure_reason,
+        )
+        .join(User, Transaction.user_id == User.id)
+        .order_by(Transaction.created_at, Transaction.id)
+    )
+    if status_enum:
+        stmt = stmt.where(Transaction.status == status_enum)
+    if type_enum:
+        stmt = stmt.where(Transaction.tx_type == type_enum)
+    stmt = _export_window(stmt, Transaction.created_at, from_date, to_date)
+    return streaming_export(db, stmt, fmt, _export_filename("transactions", from_date, to_date))
+
+
+@router.get("/exports/service-transactions")
+def export_service_transactions(
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+    status: Optional[str] = None,
+    tx_type: Optional[str] = None,
+    from_date: Optional[date] = Query(default=None),
+    to_date: Optional[date] = Query(default=None),
+    format: str = "csv",
+):
+    fmt = _export_format(format)
+    status_enum = _coerce_status(status)
+    stmt = (
+        select(
+            ServiceTransaction.id,
+            ServiceTransaction.created_at,
+            ServiceTransaction.reference,
+            User.email.label("user_email"),
+            ServiceTransaction.tx_type,
+            ServiceTransaction.status,
+            ServiceTransaction.amount,
+            ServiceTransaction.provider,
+            ServiceTransaction.customer,
+            ServiceTransaction.product_code,
+            ServiceTransaction.external_reference,
+            ServiceTransaction.failure_reason,
+        )
+        .join(User, ServiceTransaction.user_id == User.id)
+        .order_by(ServiceTransaction.created_at, ServiceTransaction.id)
+    )
+    if status_enum:
+        stmt = stmt.where(ServiceTransaction.status == status_enum.value)
+    if tx_type and tx_type.strip():
+        stmt = stmt.where(ServiceTransaction.tx_type == tx_type.strip().lower())
+    stmt = _export_window(stmt, ServiceTransaction.created_at, from_date, to_date)
+    return streaming_export(db, stmt, fmt, _export_filename("service_transactions", from_date, to_date))
+
+
+@router.get("/exports/wallet-ledger")
+def export_wallet_ledger(
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+    entry_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    from_date: Optional[date] = Query(default=None),
+    to_date: Optional[date] = Query(default=None),
+    format: str = "csv",
+):
+    fmt = _export_format(format)
+    stmt = (
+        select(
+            WalletLedger.id,
+            WalletLedger.created_at,
+            WalletLedger.reference,
+            Wallet.user_id,
+            User.email.label("user_email"),
+            WalletLedger.entry_type,
+            WalletLedger.amount,
+            WalletLedger.description,
+        )
+        .join(Wallet, WalletLedger.wallet_id == Wallet.id)
+        .join(User, Wallet.user_id == User.id)
+        .order_by(WalletLedger.created_at, WalletLedger.id)
+    )
+    if entry_type and entry_type.strip():
+        try:
+            stmt = stmt.where(WalletLedger.entry_type == LedgerType(entry_type.strip().lower()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid entry_type")
+    if user_id is not None:
+        stmt = stmt.where(Wallet.user_id == user_id)
+    stmt = _export_window(stmt, WalletLedger.created_at, from_date, to_date)
+    return streaming_export(db, stmt, fmt, _export_filename("wallet_ledger", from_date, to_date))
+
+
 @router.get("/wallets")
 @cache_endpoint(ttl_seconds=15)
 def list_wallets(
@@ -995,57 +1395,70 @@ def list_wallets(
     q: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
 ):
     if page < 1:
         raise HTTPException(status_code=400, detail="page must be >= 1")
     if page_size < 1 or page_size > 200:
         raise HTTPException(status_code=400, detail="page_size must be between 1 and 200")
+    cursor_values = _decode_cursor(cursor, (int,))
 
     query = (
         db.query(User, Wallet)
         .outerjoin(Wallet, Wallet.user_id == User.id)
         .filter(User.role != UserRole.ADMIN)
     )
-    if q:
-        needle = f"%{q.strip()}%"
-        query = query.filter(
-            or_(
-                User.email.ilike(needle),
-                User.full_name.ilike(needle),
-                User.phone_number.ilike(needle),
-            )
-        )
+    search = classify_search(q)
+    if search:
+        query = query.filter(_user_search_clause(search, db))
 
-    total = query.count()
+    total, total_is_estimate = resolve_total(
+        db,
+        cache_key=f"admin:wallets:count:{q or ''}",
+        count=query.count,
+        exact=exact_count,
+    )
+    if cursor_values:
+        query = query.filter(User.id < cursor_values[0])
     rows = (
         query.order_by(User.id.desc())
-        .offset((page - 1) * page_size)
+        .offset(0 if cursor_values else (page - 1) * page_size)
         .limit(page_size)
         .all()
     )
 
-    from sqlalchemy import func
-    balance_query = (
-        db.query(func.sum(Wallet.balance))
+    # Wallet rows and stripes are summed separately: total_balance would run
+    # its stripes subquery once per wallet.
+    wallet_sum = (
+        select(func.coalesce(func.sum(Wallet.balance), 0))
         .select_from(User)
-        .outerjoin(Wallet, Wallet.user_id == User.id)
-        .filter(User.role != UserRole.ADMIN)
+        .join(Wallet, Wallet.user_id == User.id)
+        .where(User.role != UserRole.ADMIN)
     )
-    if q:
-        needle = f"%{q.strip()}%"
-        balance_query = balance_query.filter(
-            or_(
-                User.email.ilike(needle),
-                User.full_name.ilike(needle),
-                User.phone_number.ilike(needle),
-            )
-        )
-    total_balance_res = balance_query.scalar()
-    aggregate_balance = float(total_balance_res) if total_balance_res is not None else 0.0
+    stripe_sum = (
+        select(func.coalesce(func.sum(WalletStripe.balance), 0))
+        .select_from(WalletStripe)
+        .join(Wallet, Wallet.id == WalletStripe.wallet_id)
+        .join(User, User.id == Wallet.user_id)
+        .where(User.role != UserRole.ADMIN)
+    )
+    if search:
+        wallet_sum = wallet_sum.where(_user_search_clause(search, db))
+        stripe_sum = stripe_sum.where(_user_search_clause(search, db))
+    balance_query = db.query(wallet_sum.scalar_subquery() + stripe_sum.scalar_subquery())
+    # The aggregate moves with every purchase; like the total it is cached
+    # briefly unless an exact figure is requested.
+    balance_cache_key = f"admin:wallets:balance:{q or ''}"
+    aggregate_balance = None if exact_count else get_cached(balance_cache_key)
+    if aggregate_balance is None:
+        total_balance_res = balance_query.scalar()
+        aggregate_balance = float(total_balance_res) if total_balance_res is not None else 0.0
+        set_cached(balance_cache_key, aggregate_balance, ttl_seconds=COUNT_CACHE_TTL_SECONDS)
 
     items = []
     for user, wallet in rows:
-        balance = float(wallet.balance) if wallet and wallet.balance is not None else 0.0
+        balance = float(wallet.total_balance) if wallet and wallet.total_balance is not None else 0.0
         items.append(
             {
                 "user_id": user.id,
@@ -1064,6 +1477,8 @@ def list_wallets(
         "total": total,
         "page": page,
         "page_size": page_size,
+        "next_cursor": encode_cursor(rows[-1][0].id) if len(rows) == page_size else None,
+        "total_is_estimate": total_is_estimate,
         "aggregate_balance": round(aggregate_balance, 2),
     }
 
@@ -1139,7 +1554,7 @@ def _reconcile_single_reference(*, db: Session, admin_email: str, reference: str
                 .first()
             )
             if not existing_reversal:
-                if Decimal(wallet.balance) < Decimal(tx.amount):
+                if Decimal(wallet.total_balance) < Decimal(tx.amount):
                     raise HTTPException(
                         status_code=409,
                         detail="User wallet balance is lower than refunded amount. Manual recovery required before reconciliation.",
@@ -1193,7 +1608,7 @@ def _reconcile_single_reference(*, db: Session, admin_email: str, reference: str
             .first()
         )
         if not existing_reversal:
-            if Decimal(wallet.balance) < Decimal(service_tx.amount):
+            if Decimal(wallet.total_balance) < Decimal(service_tx.amount):
                 raise HTTPException(
                     status_code=409,
                     detail="User wallet balance is lower than refunded amount. Manual recovery required before reconciliation.",
@@ -1344,12 +1759,10 @@ def _fail_refund_single_reference(*, db: Session, admin_email: str, reference: s
     }
 
 
-@router.post("/transactions/reconcile-delivered-bulk")
-def reconcile_transactions_delivered_bulk(
-    payload: ReconcileTransactionsBulkRequest,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db),
-):
+BULK_RECONCILE_MAX_REFERENCES = 1000
+
+
+def _bulk_references(payload: ReconcileTransactionsBulkRequest) -> list[str]:
     refs: list[str] = []
     seen = set()
     for item in payload.references or []:
@@ -1361,87 +1774,297 @@ def reconcile_transactions_delivered_bulk(
 
     if not refs:
         raise HTTPException(status_code=400, detail="references must contain at least one reference")
-    if len(refs) > 200:
-        raise HTTPException(status_code=400, detail="maximum 200 references per request")
+    if len(refs) > BULK_RECONCILE_MAX_REFERENCES:
+        raise HTTPException(
+            status_code=400, detail=f"maximum {BULK_RECONCILE_MAX_REFERENCES} references per request"
+        )
+    return refs
+
+
+def _lock_bulk_targets(db: Session, refs: list[str]) -> dict[str, tuple[str, Any]]:
+    """Load and row-lock every referenced transaction: one query per table."""
+    targets: dict[str, tuple[str, Any]] = {}
+    for tx in (
+        db.query(Transaction)
+        .filter(Transaction.reference.in_(refs))
+        .order_by(Transaction.id)
+        .with_for_update()
+        .all()
+    ):
+        targets[tx.reference] = ("transaction", tx)
+    missing = [ref for ref in refs if ref not in targets]
+    if missing and inspect(db.bind).has_table("service_transactions"):
+        for service_tx in (
+            db.query(ServiceTransaction)
+            .filter(ServiceTransaction.reference.in_(missing))
+            .order_by(ServiceTransaction.id)
+            .with_for_update()
+            .all()
+        ):
+            targets[service_tx.reference] = ("service_transaction", service_tx)
+    return targets
+
+
+def _lock_bulk_wallets(db: Session, user_ids: set[int]) -> dict[int, Wallet]:
+    wallets = {
+        wallet.user_id: wallet
+        for wallet in (
+            db.query(Wallet)
+            .filter(Wallet.user_id.in_(user_ids))
+            .order_by(Wallet.id)
+            .with_for_update()
+            .all()
+        )
+    }
+    created = [Wallet(user_id=user_id, balance=0) for user_id in user_ids if user_id not in wallets]
+    if created:
+        db.add_all(created)
+        db.flush()
+        wallets.update({wallet.user_id: wallet for wallet in created})
+    return wallets
+
+
+def _existing_ledger_refs(db: Session, refs: list[str], entry_type: LedgerType) -> set[tuple[int, str]]:
+    if not refs:
+        return set()
+    return {
+        (wallet_id, reference)
+        for wallet_id, reference in db.query(WalletLedger.wallet_id, WalletLedger.reference)
+        .filter(WalletLedger.reference.in_(refs), WalletLedger.entry_type == entry_type)
+        .all()
+    }
+
+
+def _apply_wallet_deltas(db: Session, deltas: dict[int, Decimal]) -> None:
+    """Apply every wallet's net balance change in a single UPDATE."""
+    deltas = {wallet_id: delta for wallet_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    db.execute(
+        update(Wallet)
+        .where(Wallet.id.in_(list(deltas)))
+        .values(balance=Wallet.balance + case(deltas, value=Wallet.id), version=Wallet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    mark_wallets_changed(db, deltas)
+
+
+def _bulk_failure(ref: str, status_code: int, detail: str) -> dict:
+    return {"reference": ref, "ok": False, "detail": detail, "status_code": status_code}
+
+
+def _bulk_success(ref: str, source: str, previous_status: str, new_status: str, wallet_action: str) -> dict:
+    return {
+        "reference": ref,
+        "ok": True,
+        "result": {
+            "status": "ok",
+            "reference": ref,
+            "source": source,
+            "previous_status": previous_status,
+            "new_status": new_status,
+            "wallet_action": wallet_action,
+        },
+    }
+
+
+def _can_write_audit(db: Session) -> bool:
+    try:
+        return bool(inspect(db.bind).has_table("admin_audit_logs"))
+    except Exception:
+        return False
+
+
+def _commit_bulk(
+    db: Session,
+    refs: list[str],
+    results: dict[str, dict],
+    audit_logs: list[AdminAuditLog],
+    *,
+    can_write_audit: bool,
+) -> list[dict]:
+    try:
+        if can_write_audit:
+            db.add_all(audit_logs)
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Bulk reconciliation commit failed")
+        return [_bulk_failure(ref, 500, str(exc)) for ref in refs]
+    return [results[ref] for ref in refs]
+
+
+def _bulk_reconcile_delivered(db: Session, *, admin_email: str, refs: list[str], note: str) -> list[dict]:
+    """Set-based counterpart of _reconcile_single_reference: one lock, one balance UPDATE, one commit."""
+    can_write_audit = _can_write_audit(db)
+    targets = _lock_bulk_targets(db, refs)
+    results = {ref: _bulk_failure(ref, 404, "Transaction reference not found") for ref in refs if ref not in targets}
+
+    refunded = {
+        ref: row for ref, (_, row) in targets.items()
+        if _normalize_status_value(row.status) == TransactionStatus.REFUNDED.value
+    }
+    wallets = _lock_bulk_wallets(db, {row.user_id for row in refunded.values()}) if refunded else {}
+    reversed_already = _existing_ledger_refs(db, [f"REVERSAL_{ref}" for ref in refunded], LedgerType.DEBIT)
+    # Reversals are charged to the wallet row, so striped funds are pulled back into it first.
+    unstriped = {wallet.id: collapse_stripes(db, wallet.id) for wallet in wallets.values() if wallet.stripe_count}
+    available = {
+        wallet.id: Decimal(wallet.balance or 0) + unstriped.get(wallet.id, Decimal("0")) for wallet in wallets.values()
+    }
+    deltas: dict[int, Decimal] = {}
+    audit_logs = []
 
-    note = (payload.note or "").strip() or "Bulk delivered reconciliation after customer confirmation."
-    results = []
-    ok = 0
-    failed = 0
     for ref in refs:
-        try:
-            item_result = _reconcile_single_reference(
-                db=db,
-                admin_email=admin.email,
-                reference=ref,
-                note=note,
-            )
-            ok += 1
-            results.append({"reference": ref, "ok": True, "result": item_result})
-        except HTTPException as exc:
-            failed += 1
-            results.append({"reference": ref, "ok": False, "detail": exc.detail, "status_code": exc.status_code})
-        except Exception as exc:
-            failed += 1
-            results.append({"reference": ref, "ok": False, "detail": str(exc), "status_code": 500})
+        if ref not in targets:
+            continue
+        source, row = targets[ref]
+        previous_status = _normalize_status_value(row.status)
+        wallet_action = "none"
+
+        if ref in refunded:
+            wallet = wallets[row.user_id]
+            reversal_ref = f"REVERSAL_{ref}"
+            if (wallet.id, reversal_ref) not in reversed_already:
+                amount = Decimal(row.amount)
+                if wallet.is_locked:
+                    results[ref] = _bulk_failure(ref, 423, "Wallet is locked")
+                    continue
+                if available[wallet.id] < amount:
+                    results[ref] = _bulk_failure(
+                        ref,
+                        409,
+                        "User wallet balance is lower than refunded amount. Manual recovery required before reconciliation.",
+                    )
+                    continue
+                available[wallet.id] -= amount
+                deltas[wallet.id] = deltas.get(wallet.id, Decimal("0")) - amount
+                db.add(WalletLedger(
+                    wallet_id=wallet.id,
+                    amount=amount,
+                    entry_type=LedgerType.DEBIT,
+                    reference=reversal_ref,
+                    description=f"Refund reversal for delivered transaction {ref}",
+                ))
+            wallet_action = "refund_reversal_debit"
+
+        # Status changes stay on the ORM rows so the status-change hooks see
+        # them; the flush batches the UPDATEs.
+        row.status = TransactionStatus.SUCCESS if source == "transaction" else TransactionStatus.SUCCESS.value
+        row.failure_reason = None
+        audit_logs.append(AdminAuditLog(
+            admin_email=admin_email,
+            action="reconcile_delivered",
+            target=ref,
+            details={
+                "source": source,
+                "previous_status": previous_status,
+                "new_status": TransactionStatus.SUCCESS.value,
+                "wallet_action": wallet_action,
+                "note": note,
+                "bulk": True,
+            },
+        ))
+        results[ref] = _bulk_success(ref, source, previous_status, TransactionStatus.SUCCESS.value, wallet_action)
+
+    _apply_wallet_deltas(db, deltas)
+    return _commit_bulk(db, refs, results, audit_logs, can_write_audit=can_write_audit)
+
+
+def _bulk_fail_refund(db: Session, *, admin_email: str, refs: list[str], note: str) -> list[dict]:
+    """Set-based counterpart of _fail_refund_single_reference: one lock, one balance UPDATE, one commit."""
+    can_write_audit = _can_write_audit(db)
+    targets = _lock_bulk_targets(db, refs)
+    results = {ref: _bulk_failure(ref, 404, "Transaction reference not found") for ref in refs if ref not in targets}
+
+    pending = {}
+    for ref, (_, row) in targets.items():
+        if _normalize_status_value(row.status) == TransactionStatus.PENDING.value:
+            pending[ref] = row
+        else:
+            results[ref] = _bulk_failure(ref, 409, "Only pending transactions can be failed and refunded.")
+
+    wallets = _lock_bulk_wallets(db, {row.user_id for row in pending.values()}) if pending else {}
+    refund_refs = {ref: f"ADMIN_REFUND_{ref}"[:64] for ref in pending}
+    credited_already = _existing_ledger_refs(db, list(refund_refs.values()), LedgerType.CREDIT)
+    deltas: dict[int, Decimal] = {}
+    audit_logs = []
+    failure_reason = _safe_reason(note)
+
+    for ref in refs:
+        if ref not in pending:
+            continue
+        source, row = targets[ref]
+        wallet = wallets[row.user_id]
+        if wallet.is_locked:
+            results[ref] = _bulk_failure(ref, 423, "Wallet is locked")
+            continue
+        refund_ref = refund_refs[ref]
+        if (wallet.id, refund_ref) not in credited_already:
+            amount = Decimal(row.amount)
+            deltas[wallet.id] = deltas.get(wallet.id, Decimal("0")) + amount
+            db.add(WalletLedger(
+                wallet_id=wallet.id,
+                amount=amount,
+                entry_type=LedgerType.CREDIT,
+                reference=refund_ref,
+                description=f"Admin refund for pending transaction {ref}",
+            ))
+
+        row.status = TransactionStatus.REFUNDED if source == "transaction" else TransactionStatus.REFUNDED.value
+        row.failure_reason = failure_reason
+        audit_logs.append(AdminAuditLog(
+            admin_email=admin_email,
+            action="fail_refund_pending",
+            target=ref,
+            details={
+                "source": source,
+                "previous_status": TransactionStatus.PENDING.value,
+                "new_status": TransactionStatus.REFUNDED.value,
+                "wallet_action": "manual_refund_credit",
+                "refund_reference": refund_ref,
+                "note": note,
+                "bulk": True,
+            },
+        ))
+        results[ref] = _bulk_success(
+            ref, source, TransactionStatus.PENDING.value, TransactionStatus.REFUNDED.value, "manual_refund_credit"
+        )
+
+    _apply_wallet_deltas(db, deltas)
+    return _commit_bulk(db, refs, results, audit_logs, can_write_audit=can_write_audit)
 
+
+def _bulk_response(refs: list[str], results: list[dict]) -> dict:
+    succeeded = sum(1 for item in results if item["ok"])
     return {
         "status": "ok",
         "processed": len(refs),
-        "succeeded": ok,
-        "failed": failed,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
         "results": results,
     }
 
 
-@router.post("/transactions/fail-and-refund-bulk")
-def fail_and_refund_pending_transactions_bulk(
+@router.post("/transactions/reconcile-delivered-bulk")
+def reconcile_transactions_delivered_bulk(
     payload: ReconcileTransactionsBulkRequest,
     admin: User = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    refs: list[str] = []
-    seen = set()
-    for item in payload.references or []:
-        ref = str(item or "").strip()
-        if not ref or ref in seen:
-            continue
-        refs.append(ref)
-        seen.add(ref)
+    refs = _bulk_references(payload)
+    note = (payload.note or "").strip() or "Bulk delivered reconciliation after customer confirmation."
+    return _bulk_response(refs, _bulk_reconcile_delivered(db, admin_email=admin.email, refs=refs, note=note))
 
-    if not refs:
-        raise HTTPException(status_code=400, detail="references must contain at least one reference")
-    if len(refs) > 200:
-        raise HTTPException(status_code=400, detail="maximum 200 references per request")
 
+@router.post("/transactions/fail-and-refund-bulk")
+def fail_and_refund_pending_transactions_bulk(
+    payload: ReconcileTransactionsBulkRequest,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    refs = _bulk_references(payload)
     note = (payload.note or "").strip() or "Bulk admin fail+refund after provider-confirmed failure."
-    results = []
-    ok = 0
-    failed = 0
-    for ref in refs:
-        try:
-            item_result = _fail_refund_single_reference(
-                db=db,
-                admin_email=admin.email,
-                reference=ref,
-                note=note,
-            )
-            ok += 1
-            results.append({"reference": ref, "ok": True, "result": item_result})
-        except HTTPException as exc:
-            failed += 1
-            results.append({"reference": ref, "ok": False, "detail": exc.detail, "status_code": exc.status_code})
-        except Exception as exc:
-            failed += 1
-            results.append({"reference": ref, "ok": False, "detail": str(exc), "status_code": 500})
-
-    return {
-        "status": "ok",
-        "processed": len(refs),
-        "succeeded": ok,
-        "failed": failed,
-        "results": results,
-    }
+    return _bulk_response(refs, _bulk_fail_refund(db, admin_email=admin.email, refs=refs, note=note))
 
 
 @router.get("/reports", response_model=AdminReportsResponse)
@@ -1453,11 +2076,14 @@ def list_reports(
     status: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
 ):
     if page < 1:
         raise HTTPException(status_code=400, detail="page must be >= 1")
     if page_size < 1 or page_size > 200:
         raise HTTPException(status_code=400, detail="page_size must be between 1 and 200")
+    cursor_values = _decode_cursor(cursor, (datetime, int))
     try:
         if not inspect(db.bind).has_table("transaction_disputes"):
             return {"items": [], "total": 0, "page": page, "page_size": page_size}
@@ -1482,10 +2108,18 @@ def list_reports(
         if status_raw in {DisputeStatus.OPEN.value, DisputeStatus.RESOLVED.value, DisputeStatus.REJECTED.value}:
             query = query.filter(TransactionDispute.status == DisputeStatus(status_raw))
 
-    total = query.count()
+    total, total_is_estimate = resolve_total(
+        db,
+        cache_key=f"admin:reports:count:{q or ''}|{status or ''}",
+        count=query.count,
+        exact=exact_count,
+    )
+    sort_key = (TransactionDispute.created_at, TransactionDispute.id)
+    if cursor_values:
+        query = query.filter(keyset_before(sort_key, cursor_values))
     rows = (
-        query.order_by(TransactionDispute.created_at.desc(), TransactionDispute.id.desc())
-        .offset((page - 1) * page_size)
+        query.order_by(*(col.desc() for col in sort_key))
+        .offset(0 if cursor_values else (page - 1) * page_size)
         .limit(page_size)
         .all()
     )
@@ -1507,7 +2141,17 @@ def list_reports(
             }
         )
 
-    return {"items": items, "total": total, "page": page, "page_size": page_size}
+    next_cursor = None
+    if len(rows) == page_size:
+        next_cursor = encode_cursor(rows[-1][0].created_at, rows[-1][0].id)
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "total_is_estimate": total_is_estimate,
+    }
 
 
 @router.patch("/reports/{report_id}", response_model=AdminReportOut)
@@ -1577,8 +2221,11 @@ def fund_user_wallet(payload: FundUserWalletRequest, admin=Depends(require_admin
         raise HTTPException(status_code=404, detail="User not found")
     wallet = get_or_create_wallet(db, user.id)
     
-    if payload.amount < 0 and wallet.balance + payload.amount < 0:
+    if payload.amount < 0 and wallet.total_balance + payload.amount < 0:
         raise HTTPException(status_code=400, detail="Adjustment would result in negative balance")
+    if payload.amount < 0 and wallet.stripe_count:
+        # Negative adjustments land on the wallet row; make sure it holds the funds.
+        collapse_stripes(db, wallet.id)
         
     import uuid
     ref = f"ADMIN_{user.id}_{uuid.uuid4().hex[:8]}"
@@ -1628,13 +2275,14 @@ def update_pricing(payload: PricingRuleUpdate, admin=Depends(require_admin), db:
     db.add(audit_log)
     db.commit()
 
-    # Clear pricing cache
+    # Clear pricing caches
+    invalidate_pricing_table()
     keys_to_delete = [k for k in _GENERIC_CACHE.keys() if k.startswith("get_pricing_rules")]
     for k in keys_to_delete:
         _GENERIC_CACHE.pop(k, None)
         
     # Invalidate data plans cache if data pricing changed
-    if tx_type == "data":
+    if not tx_type or tx_type == "data":
         _invalidate_plans_cache()
 
     return {"status": "ok", "network": network}
@@ -1740,7 +2388,7 @@ def adjust_user_wallet(
         )
         db.add(tx)
     elif payload.action == "debit":
-        if wallet.balance < payload.amount:
+        if wallet.total_balance < payload.amount:
             raise HTTPException(status_code=400, detail="Insufficient balance for debit")
         debit_wallet(db, wallet, payload.amount, tx_ref, f"Admin debit: {payload.reason}")
         tx = Transaction(
@@ -1756,16 +2404,15 @@ def adjust_user_wallet(
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
     
-    db.commit()
-    audit_log = AdminAuditLog(
+    write_audit_log(
+        db,
         admin_email=admin.email,
         action=f"wallet_adjust_{payload.action}",
         target=str(payload.user_id),
         details={"amount": float(payload.amount), "reason": payload.reason}
     )
-    db.add(audit_log)
     db.commit()
-    return {"status": "ok", "new_balance": wallet.balance}
+    return {"status": "ok", "new_balance": wallet.total_balance}
 
 
 @router.get("/services/toggles", response_model=list[ServiceToggleOut])
@@ -2020,15 +2667,33 @@ def get_audit_logs(
     page: int = 1,
     page_size: int = 50,
     reference: Optional[str] = None,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
     admin=Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    cursor_values = _decode_cursor(cursor, (datetime, int))
     query = db.query(AdminAuditLog)
     if reference:
         query = query.filter(AdminAuditLog.target == reference.strip())
-    total = query.count()
+    total, total_is_estimate = resolve_total(
+        db,
+        cache_key=f"admin:audit_logs:count:{reference or ''}",
+        count=query.count,
+        exact=exact_count,
+        estimate_tables=() if reference else ("admin_audit_logs",),
+    )
+    sort_key = (AdminAuditLog.created_at, AdminAuditLog.id)
+    if cursor_values:
+        query = query.filter(keyset_before(sort_key, cursor_values))
     items = []
-    for log in query.order_by(AdminAuditLog.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all():
+    logs = (
+        query.order_by(*(col.desc() for col in sort_key))
+        .offset(0 if cursor_values else (page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    for log in logs:
         items.append({
             "id": log.id,
             "admin_email": log.admin_email,
@@ -2041,7 +2706,9 @@ def get_audit_logs(
         "items": items,
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "next_cursor": encode_cursor(logs[-1].created_at, logs[-1].id) if len(logs) == page_size else None,
+        "total_is_estimate": total_is_estimate,
     }
 
 @router.post("/data-plans/clean-legacy")
@@ -2354,6 +3021,17 @@ def suspend_developer_access(
     return {"status": "ok", "message": "Developer successfully suspended."}
 
 
+@router.get("/api-health")
+def get_api_health(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Provider call volume, success rate and latency per service, from the per-minute rollups."""
+    since = _utcnow() - timedelta(hours=hours)
+    return {"since": since, "hours": hours, "services": api_health(db, since)}
+
+
 @router.get("/provider-balances")
 def get_provider_balances(admin: User = Depends(require_admin), db: Session = Depends(get_db)):
     """
@@ -2372,3 +3050,11 @@ def trigger_balance_checks(db: Session = Depends(get_db)):
     return {"status": "ok", "balances": results}
 
 
+
+
+@router.get("/system/log-writer")
+def get_log_writer_stats(admin: User = Depends(require_admin)):
+    """
+    Queue depth and overflow counters of this worker's buffered log writer.
+    """
+    return {"status": "ok", "log_writer": log_writer.stats()}
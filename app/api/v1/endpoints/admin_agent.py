@@ -20,6 +20,7 @@ from app.models import (
     AgentRewardStatus,
     AgentStat,
 )
+from app.services.log_writer import write_audit_log
 from app.services.wallet import get_or_create_wallet, credit_wallet
 from app.schemas.admin_agent import (
     RewardCampaignCreate,
@@ -72,25 +73,24 @@ def create_campaign(
         is_agent_only=payload.is_agent_only,
     )
     db.add(campaign)
-    db.commit()
-    db.refresh(campaign)
-
-    db.add(
-        AdminAuditLog(
-            admin_email=admin.email,
-            action="agent_campaign_create",
-            target=str(campaign.id),
-            details={
-                "title": campaign.title,
-                "campaign_type": campaign.campaign_type,
-                "target_metric": campaign.target_metric,
-                "target_value": str(campaign.target_value),
-                "reward_amount": str(campaign.reward_amount),
-                "is_agent_only": campaign.is_agent_only,
-            },
-        )
+    db.flush()
+
+    write_audit_log(
+        db,
+        admin_email=admin.email,
+        action="agent_campaign_create",
+        target=str(campaign.id),
+        details={
+            "title": campaign.title,
+            "campaign_type": campaign.campaign_type,
+            "target_metric": campaign.target_metric,
+            "target_value": str(campaign.target_value),
+            "reward_amount": str(campaign.reward_amount),
+            "is_agent_only": campaign.is_agent_only,
+        },
     )
     db.commit()
+    db.refresh(campaign)
     return campaign
 
 
@@ -127,8 +127,6 @@ def update_campaign(
 
     for field, value in update_data.items():
         setattr(campaign, field, value)
-    db.commit()
-    db.refresh(campaign)
 
     # Cast Decimal fields to string for JSON serialization in details
     audit_details = {}
@@ -138,15 +136,15 @@ def update_campaign(
         else:
             audit_details[k] = v
 
-    db.add(
-        AdminAuditLog(
-            admin_email=admin.email,
-            action="agent_campaign_update",
-            target=str(campaign.id),
-            details=audit_details,
-        )
+    write_audit_log(
+        db,
+        admin_email=admin.email,
+        action="agent_campaign_update",
+        target=str(campaign.id),
+        details=audit_details,
     )
     db.commit()
+    db.refresh(campaign)
     return campaign
 
 
@@ -163,22 +161,19 @@ def delete_campaign(
     rewards_count = db.query(AgentReward).filter(AgentReward.campaign_id == campaign_id).count()
     if rewards_count > 0:
         campaign.is_active = False
-        db.commit()
         action = "agent_campaign_deactivate"
         details = {"reason": "Campaign has associated rewards, deactivated instead of deleted"}
     else:
         db.delete(campaign)
-        db.commit()
         action = "agent_campaign_delete"
         details = {"reason": "No associated rewards, deleted from database"}
 
-    db.add(
-        AdminAuditLog(
-            admin_email=admin.email,
-            action=action,
-            target=str(campaign_id),
-            details=details,
-        )
+    write_audit_log(
+        db,
+        admin_email=admin.email,
+        action=action,
+        target=str(campaign_id),
+        details=details,
     )
     db.commit()
     return {"status": "success", "action": action}
@@ -258,25 +253,22 @@ def override_agent_stats(
     if payload.total_transactions is not None:
         stat.total_transactions = payload.total_transactions
 
-    db.commit()
-    db.refresh(stat)
-
-    db.add(
-        AdminAuditLog(
-            admin_email=admin.email,
-            action="agent_stat_override",
-            target=str(agent_id),
-            details={
-                "old": old_stats,
-                "new": {
-                    "total_data_mb": stat.total_data_mb,
-                    "total_airtime_amount": str(stat.total_airtime_amount),
-                    "total_transactions": stat.total_transactions,
-                },
+    write_audit_log(
+        db,
+        admin_email=admin.email,
+        action="agent_stat_override",
+        target=str(agent_id),
+        details={
+            "old": old_stats,
+            "new": {
+                "total_data_mb": stat.total_data_mb,
+                "total_airtime_amount": str(stat.total_airtime_amount),
+                "total_transactions": stat.total_transactions,
             },
-        )
+        },
     )
     db.commit()
+    db.refresh(stat)
 
     return {
         "id": stat.id,
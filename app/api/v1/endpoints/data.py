@@ -1,5 +1,4 @@
 import hashlib
-import httpx
 import logging
 import re
 import secrets
@@ -8,28 +7,39 @@ from decimal import Decimal
 from typing import List, Dict, Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.config import get_settings
 from app.dependencies import get_current_user, require_admin
-from app.models import User, UserRole, DataPlan, Transaction, TransactionStatus, TransactionType, ApiLog
-from app.schemas.data import DataPlanOut, BuyDataRequest
+from app.models import User, UserRole, DataPlan, Transaction, TransactionStatus, TransactionType
+from app.schemas.data import DataPlanOut, BuyDataRequest, BulkDataPurchaseRequest
 from app.services.amigo import (
     AmigoClient,
-    AmigoApiError,
     canonical_plan_code,
-    normalize_plan_code,
-    resolve_network_id,
      split_plan_code,
 )
 from app.providers.smeplug_provider import SMEPlugProvider
 from app.providers.autosync_provider import AutosyncProvider
 from app.services.bills import get_bills_provider
+from app.services.bulk_purchase import (
+    BulkOrder,
+    bulk_purchase_view,
+    create_bulk_purchase,
+    get_bulk_purchase,
+    start_bulk_purchase,
+    stream_bulk_purchase,
+)
+from app.services.data_routing import DataRoute, fallback_cost_prices, route_data_purchase
 from app.services.fraud import enforce_purchase_limits
-from app.services.wallet import get_or_create_wallet, debit_wallet, credit_wallet
-from app.services.pricing import get_price_for_user
+from app.services.idempotency import idempotent
+from app.services.log_writer import write_api_log
+from app.services.wallet import get_or_create_wallet, spendable_balance
+from app.services.wallet_holds import capture_hold, hold_transaction, place_hold, release_hold
+from app.services.pricing import get_price_for_user, quote_many
+from app.services.promos import active_promos, claim_promo, match_promo, promo_for_plan, redeemed_promo_ids
 from app.middlewares.rate_limit import limiter
 
 router = APIRouter()
@@ -61,84 +71,10 @@ def _clean_plan_label(name: str | None) -> str:
         return ""
     return str(name).replace("(Direct Data)", "").replace("Direct Data", "").strip()
 
-def _promo_plan_code_suffix(plan_code: str | None) -> str:
-    raw = str(plan_code or "").strip().lower()
-    if ":" in raw:
-        return raw.split(":")[-1]
-    return raw
-
-def _is_mtn_1gb_promo_plan(plan: DataPlan) -> bool:
-    if not getattr(settings, "promo_mtn_1gb_enabled", False):
-        return False
-    network = str(plan.network or "").strip().lower()
-    promo_nw = str(getattr(settings, "promo_mtn_1gb_network", "mtn")).strip().lower()
-    if network != promo_nw:
-        return False
-    suffix = _promo_plan_code_suffix(plan.plan_code)
-    promo_code = str(getattr(settings, "promo_mtn_1gb_plan_code", "1001")).strip().lower()
-    return suffix == promo_code
-
-def _count_mtn_1gb_promo_successes(db: Session) -> int:
-    network = str(getattr(settings, "promo_mtn_1gb_network", "mtn")).strip().lower()
-    promo_price = Decimal(str(getattr(settings, "promo_mtn_1gb_price", "199")))
-    count = (
-        db.query(func.count(func.distinct(Transaction.user_id)))
-        .filter(
-            Transaction.tx_type == TransactionType.DATA,
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.amount == promo_price,
-            func.lower(Transaction.network) == network,
-        )
-        .scalar()
-    )
-    return int(count or 0)
-
-def _mtn_1gb_promo_snapshot(db: Session) -> dict:
-    limit = max(int(getattr(settings, "promo_mtn_1gb_limit", 0)), 0)
-    enabled = bool(getattr(settings, "promo_mtn_1gb_enabled", False))
-    if not enabled or limit <= 0:
-        return {"active": False, "remaining": 0, "limit": limit, "price": Decimal("250")}
-    
-    consumed = _count_mtn_1gb_promo_successes(db)
-    remaining = max(limit - consumed, 0)
-    return {
-        "active": remaining > 0,
-        "remaining": remaining,
-        "limit": limit,
-        "price": Decimal(str(getattr(settings, "promo_mtn_1gb_price", "199")))
-    }
-
-def _user_has_used_mtn_1gb_promo(db: Session, user_id: int) -> bool:
-    network = str(getattr(settings, "promo_mtn_1gb_network", "mtn")).strip().lower()
-    promo_price = Decimal(str(getattr(settings, "promo_mtn_1gb_price", "199")))
-    row = (
-        db.query(Transaction.id)
-        .filter(
-            Transaction.user_id == int(user_id),
-            Transaction.tx_type == TransactionType.DATA,
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.amount == promo_price,
-            func.lower(Transaction.network) == network,
-        )
-        .first()
-    )
-    return bool(row)
-
 def _safe_reason(value: str, limit: int = 255) -> str:
     text = str(value or "").strip()
     return text[:limit] if text else "Unknown provider error"
 
-def _is_ambiguous_provider_error(exc: Exception) -> bool:
-    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
-        return True
-    msg = str(exc).strip().lower()
-    ambiguous_hints = (
-        "timeout", "timed out", "connection error", "connection reset", 
-        "non-json", "invalid json", "service unavailable", "remote protocol",
-        "network error", "connecterror", "readerror", "transport", "http error"
-    )
-    return any(hint in msg for hint in ambiguous_hints)
-
 def _upsert_plan_from_provider(db: Session, item: dict) -> bool:
     network = str(item.get("network") or "").lower()
     plan_code = str(item.get("plan_code") or "").strip()
@@ -268,39 +204,16 @@ def list_data_plans(user: User = Depends(get_current_user), db: Session = Depend
         except Exception as exc:
             logger.warning("Amigo sync failed: %s", exc)
 
-    promo_snapshot = _mtn_1gb_promo_snapshot(db)
-    user_promo_used = _user_has_used_mtn_1gb_promo(db, user.id)
-    
-    # PERFORMANCE OPTIMIZATION: Fetch pricing rules once to avoid N+1 query timeout
-    from app.models import PricingRule, PricingRole, UserRole
-    pricing_role = PricingRole.RESELLER if user.role == UserRole.RESELLER else PricingRole.USER
-    all_rules = db.query(PricingRule).filter(PricingRule.role == pricing_role).all()
-    rule_map = {str(r.network or "").strip().lower(): r for r in all_rules}
+    promos = active_promos(db)
+    user_redeemed = redeemed_promo_ids(db, user.id) if promos else set()
     
     priced = []
-    for plan in plans:
+    for quote in quote_many(db, plans, user.role):
+        plan = quote.plan
         try:
-            # User role specific price
             display = getattr(plan, "display_price", None)
-            agent_price = getattr(plan, "agent_price", None)
-            
-            if pricing_role == PricingRole.RESELLER and agent_price is not None:
-                price = Decimal(str(agent_price))
-            elif display is not None:
-                price = Decimal(str(display))
-            else:
-                rule = rule_map.get(str(plan.network or "").strip().lower())
-                margin = Decimal(str(rule.margin)) if rule else Decimal("0")
-                margin_type = str(getattr(rule, "margin_type", None) or "fixed").strip().lower()
-                if margin_type not in ("fixed", "percentage"):
-                    margin_type = "fixed"
-                
-                base = Decimal(str(plan.base_price or "0"))
-                if margin_type == "percentage":
-                    price = base + (base * margin / Decimal("100"))
-                else:
-                    price = base + margin
-            
+            price = quote.price
+
             # Promo logic from database fields
             promo_active = bool(getattr(plan, "promo_active", False))
             promo_old_price = getattr(plan, "promo_old_price", None)
@@ -314,15 +227,8 @@ def list_data_plans(user: User = Depends(get_current_user), db: Session = Depend
             if promo_active:
                 standard_price = price
                 if display is not None:
-                    # price is already display_price. Standard price would be calculated:
-                    rule = rule_map.get(str(plan.network or "").strip().lower())
-                    margin = Decimal(str(rule.margin)) if rule else Decimal("0")
-                    margin_type = str(getattr(rule, "margin_type", None) or "fixed").strip().lower()
-                    base = Decimal(str(plan.base_price or "0"))
-                    if margin_type == "percentage":
-                        standard_price = base + (base * margin / Decimal("100"))
-                    else:
-                        standard_price = base + margin
+                    # price is already display_price; the standard price is the margin price.
+                    standard_price = quote.margin_price
                 
                 if promo_old_price is None:
                     promo_old_price = standard_price
@@ -333,13 +239,16 @@ def list_data_plans(user: User = Depends(get_current_user), db: Session = Depend
                     if discount_pct > 0:
                         promo_label = f"{discount_pct}% off"
 
-            # Fallback/Legacy MTN 1GB Promo config settings compatibility
-            if not promo_active and plan.network == "mtn" and _is_mtn_1gb_promo_plan(plan):
+            # Limited-stock promos from the promo ledger (e.g. MTN 1GB), while
+            # stock lasts and the user has not redeemed it yet.
+            stock_promo = match_promo(promos, plan)
+            if not promo_active and stock_promo and stock_promo.remaining > 0 and stock_promo.id not in user_redeemed:
                 promo_active = True
                 promo_old_price = price
-                price = settings.promo_mtn_1gb_price
+                price = Decimal(str(stock_promo.price))
                 promo_label = "PROMO"
-                promo_limit = settings.promo_mtn_1gb_limit
+                promo_limit = stock_promo.stock_limit
+                promo_remaining = stock_promo.remaining
                 
             priced.append(
                 DataPlanOut(
@@ -386,6 +295,7 @@ def list_data_plans(user: User = Depends(get_current_user), db: Session = Depend
 
 @router.post("/purchase")
 @limiter.limit("5/minute")
+@idempotent("data.purchase")
 def buy_data(request: Request, payload: BuyDataRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
         return _buy_data_impl(request, payload, user, db)
@@ -397,10 +307,10 @@ def buy_data(request: Request, payload: BuyDataRequest, user: User = Depends(get
         logger.error(f"FATAL BUY_DATA CRASH: {err_detail}")
         raise HTTPException(status_code=500, detail=f"FATAL: {str(e)}\n\n{err_detail}")
 
-def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Session):
-    plan_code_input = str(payload.plan_code or "").strip()
-    payload_network = str(payload.network or "").strip().lower()
-    
+def _find_active_plan(db: Session, plan_code: str | None, network: str | None) -> DataPlan | None:
+    plan_code_input = str(plan_code or "").strip()
+    payload_network = str(network or "").strip().lower()
+
     plan_query = db.query(DataPlan).filter(DataPlan.plan_code == plan_code_input, DataPlan.is_active == True)
     if payload_network:
         plan_query = plan_query.filter(func.lower(DataPlan.network) == payload_network)
@@ -416,7 +326,11 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
         suffix_matches = suffix_query.all()
         if len(suffix_matches) == 1:
             plan = suffix_matches[0]
-            
+    return plan
+
+
+def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Session):
+    plan = _find_active_plan(db, payload.plan_code, payload.network)
     if not plan:
         raise HTTPException(status_code=404, detail="Active data plan not found.")
 
@@ -424,30 +338,21 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
     if not phone:
         raise HTTPException(status_code=400, detail="Recipient phone number is required.")
 
-    enforce_purchase_limits(db, user_id=user.id, amount=Decimal(str(plan.base_price)), tx_type="data")
-    
     price = get_price_for_user(db, plan, user.role)
-    if _is_mtn_1gb_promo_plan(plan):
-        promo = _mtn_1gb_promo_snapshot(db)
-        if promo["active"] and not _user_has_used_mtn_1gb_promo(db, user.id):
-            promo_price = Decimal(str(promo["price"]))
-            if promo_price < price:
-                price = promo_price
-
+    enforce_purchase_limits(db, user_id=user.id, amount=price, tx_type="data")
     wallet = get_or_create_wallet(db, user.id)
-    if wallet.balance < price:
-        raise HTTPException(status_code=400, detail="Insufficient wallet balance.")
-
     reference = f"DATA-{int(time.time())}-{secrets.token_hex(4)}".upper()
-    
-    # 1. DEBIT WALLET
-    try:
-        debit_wallet(db, wallet, price, reference, f"Data Purchase: {plan.plan_name} ({phone})")
-    except Exception as e:
-        logger.error(f"Wallet debit failed: {e}")
-        raise HTTPException(status_code=400, detail="Wallet debit failed.")
 
-    # 2. CREATE PENDING TRANSACTION
+    # The claim is flushed with this session and rolls back with it if the
+    # debit below fails; a later failure/refund releases it via the status hook.
+    promo = promo_for_plan(db, plan)
+    if promo and Decimal(str(promo.price)) < price and claim_promo(db, promo, user_id=user.id, reference=reference):
+        price = Decimal(str(promo.price))
+
+    if spendable_balance(wallet) < price:
+        raise HTTPException(status_code=400, detail="Insufficient wallet balance.")
+    
+    # 1-2. HOLD FUNDS: debit + PENDING transaction in one commit
     transaction = Transaction(
         user_id=user.id,
         amount=price,
@@ -458,120 +363,28 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
         recipient_phone=phone,
         data_plan_code=plan.plan_code,
         provider=plan.provider,
-        provider_plan_id=plan.provider_plan_id
+        provider_plan_id=plan.provider_plan_id,
+        cost_price=plan.base_price,
     )
-    db.add(transaction)
-    db.commit()
+    try:
+        hold = place_hold(db, wallet, transaction, f"Data Purchase: {plan.plan_name} ({phone})")
+    except Exception as e:
+        logger.error(f"Wallet debit failed: {e}")
+        raise HTTPException(status_code=400, detail="Wallet debit failed.")
 
     # -----------------------------
     # Release DB connection to avoid pool starvation on slow HTTP requests
     # -----------------------------
-    tx_id = transaction.id
     user_id = user.id
     fcm_token = user.fcm_token
     
-    plan_network = str(plan.network or "").lower()
-    plan_provider = str(plan.provider or "").strip().lower()
-    plan_provider_plan_id = plan.provider_plan_id
-    plan_plan_code = plan.plan_code
-    plan_plan_name = plan.plan_name
-    plan_data_size = plan.data_size
-    plan_fallback_provider = str(plan.fallback_provider or "").strip().lower() if plan.fallback_provider else None
-    plan_fallback_provider_plan_id = plan.fallback_provider_plan_id
+    route = DataRoute.from_plan(plan, fallback_cost_prices(db, [plan]).get(plan.plan_code))
     
     db.close()
 
     # 3. ROUTE TO PROVIDER
-    provider_res = {"status": "pending", "error": "Provider routing failed"}
-    network_key = plan_network
-    
     start_time = time.time()
-
-    def _execute_provider(p_name, p_plan_id):
-        p_res = {"status": "pending", "error": "Provider routing failed"}
-        tx_provider = p_name
-        try:
-            if p_name in ("smeplug", "sim"):
-                sme = SMEPlugProvider()
-                sme_network_map = {"mtn": 1, "airtel": 2, "9mobile": 3, "glo": 4}
-                net_id = sme_network_map.get(network_key, 2)
-                p_res = sme.purchase_network_data(net_id, phone, p_plan_id or plan_plan_code, reference)
-                tx_provider = "smeplug"
-
-            elif p_name == "autosync":
-                autosync = AutosyncProvider()
-                p_res = autosync.purchase_network_data(
-                    network=network_key, 
-                    phone=phone, 
-                    plan_id=p_plan_id or plan_plan_code, 
-                    client_request_id=reference,
-                    data_type=getattr(plan, "data_type", "Gifting")
-                )
-                tx_provider = "autosync"
-
-            elif p_name == "amigo" or (not p_name and network_key in {"mtn", "glo", "airtel", "9mobile"}):
-                amigo = AmigoClient()
-                amigo_network_id = resolve_network_id(network_key)
-                amigo_payload = {
-                    "network": amigo_network_id,
-                    "mobile_number": phone,
-                    "plan": normalize_plan_code(plan_plan_code),
-                    "Ported_number": True
-                }
-                tx_provider = "amigo"
-                try:
-                    res = amigo.purchase_data(amigo_payload, idempotency_key=reference)
-                    if res.get("success") or str(res.get("status")).lower() in {"delivered", "success", "successful"}:
-                        p_res = {"status": "success", "provider_reference": str(res.get("reference") or "")}
-                    elif str(res.get("status")).lower() in {"pending", "processing"}:
-                        p_res = {"status": "pending", "provider_reference": str(res.get("reference") or "")}
-                    else:
-                        p_res = {"status": "failed", "error": res.get("message") or "Amigo reported failure"}
-                except AmigoApiError as e:
-                    err_msg = str(e)
-                    if _is_ambiguous_provider_error(e):
-                        logger.warning("Amigo reported ambiguous error for reference %s. Marking as pending for safety: %s", reference, err_msg)
-                        p_res = {"status": "pending", "error": err_msg}
-                    else:
-                        logger.warning("Amigo reported hard failure for reference %s. Failing immediately: %s", reference, err_msg)
-                        p_res = {"status": "failed", "error": err_msg}
-
-            elif p_name == "clubkonnect" or (not p_name and network_key == "9mobile"):
-                bills = get_bills_provider()
-                tx_provider = "clubkonnect"
-                res = bills.purchase_data(network_key, phone, p_plan_id or plan_plan_code, amount=float(price), request_id=reference)
-                if res.ok:
-                    p_res = {"status": "success", "provider_reference": res.external_reference}
-                elif res.is_pending:
-                    p_res = {"status": "pending", "provider_reference": res.external_reference}
-                else:
-                    p_res = {"status": "failed", "error": res.message}
-                    
-            elif network_key == "airtel":
-                sme = SMEPlugProvider()
-                p_res = sme.purchase_network_data(2, phone, p_plan_id or plan_plan_code, reference)
-                tx_provider = "smeplug"
-
-            else:
-                p_res = {"status": "failed", "error": f"No provider configured for network: {network_key}"}
-
-        except Exception as exc:
-            logger.error("Data purchase provider exception: %s", exc)
-            if _is_ambiguous_provider_error(exc):
-                p_res = {"status": "pending", "error": f"Provider timeout/error: {str(exc)}"}
-            else:
-                p_res = {"status": "failed", "error": str(exc)}
-                
-        return p_res, tx_provider
-
-    provider_res, transaction_provider = _execute_provider(plan_provider, plan_provider_plan_id)
-    
-    # Fallback Routing
-    if provider_res.get("status") == "failed" and plan_fallback_provider:
-        logger.warning(f"Primary provider {plan_provider} failed for {reference} ({provider_res.get('error')}). Routing to fallback: {plan_fallback_provider}")
-        # Optionally append a suffix to reference so the second provider doesn't treat it as duplicate if it's the same provider
-        # But we'll just use the same reference as it's a completely different provider API.
-        provider_res, transaction_provider = _execute_provider(plan_fallback_provider, plan_fallback_provider_plan_id)
+    provider_res, transaction_provider = route_data_purchase(route, phone, reference, price)
 
     duration_ms = (time.time() - start_time) * 1000
     
@@ -579,51 +392,58 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
     from app.core.database import SessionLocal
     db2 = SessionLocal()
     try:
-        transaction = db2.query(Transaction).get(tx_id)
-        user = db2.query(User).get(user_id)
-        wallet = get_or_create_wallet(db2, user_id)
-        
-        transaction.provider = transaction_provider
-
-        # 4. HANDLE RESULT
+        # 4. HANDLE RESULT: settle the hold and record referral activity in one commit
         final_status = provider_res.get("status", "pending")
-        transaction.status = TransactionStatus.SUCCESS if final_status == "success" else (TransactionStatus.FAILED if final_status == "failed" else TransactionStatus.PENDING)
+        if final_status == "success":
+            transaction = capture_hold(db2, hold)
+        elif final_status == "failed":
+            transaction = release_hold(
+                db2,
+                hold,
+                f"Refund: {route.plan_name} purchase failed",
+                failure_reason=_safe_reason(provider_res.get("error")),
+            )
+        else:
+            # Left PENDING; the reconcile worker settles it later.
+            transaction = hold_transaction(db2, hold)
+        transaction.provider = transaction_provider
         transaction.external_reference = provider_res.get("provider_reference")
-        
-        if final_status == "failed":
-            transaction.failure_reason = _safe_reason(provider_res.get("error"))
-            credit_wallet(db2, wallet, price, reference, f"Refund: {plan_plan_name} purchase failed")
-            transaction.status = TransactionStatus.REFUNDED
-
-        db2.commit()
+        if provider_res.get("cost_price") is not None:
+            # Served by the fallback provider: keep the margin of the purchase that went through.
+            transaction.cost_price = provider_res["cost_price"]
 
         if final_status == "success":
             try:
                 from app.services.referrals import record_referral_data_activity
-                mb_size = _parse_size_gb(plan_data_size) * 1024.0
-                record_referral_data_activity(db2, user=user, tx_type="data", amount=price, data_mb=mb_size)
-                db2.commit()
+                mb_size = _parse_size_gb(route.data_size) * 1024.0
+                # A failure here must not undo the settled purchase.
+                with db2.begin_nested():
+                    user = db2.get(User, user_id)
+                    record_referral_data_activity(db2, user=user, tx_type="data", amount=price, data_mb=mb_size)
             except Exception as ref_exc:
                 logger.error("Failed to record referral activity: %s", ref_exc)
 
+        db2.commit()
+
         from app.services.push_notification import PushNotificationService
         if final_status == "success" and fcm_token:
             PushNotificationService.send_to_token(
                 token=fcm_token,
                 title="Data Purchase Successful",
-                body=f"Your purchase of {plan_plan_name} for {phone} was successful.",
+                body=f"Your purchase of {route.plan_name} for {phone} was successful.",
                 data={"type": "transaction", "reference": reference, "status": "success"}
             )
         elif final_status == "failed" and fcm_token:
             PushNotificationService.send_to_token(
                 token=fcm_token,
                 title="Data Purchase Failed",
-                body=f"Your purchase of {plan_plan_name} for {phone} failed and you have been refunded.",
+                body=f"Your purchase of {route.plan_name} for {phone} failed and you have been refunded.",
                 data={"type": "transaction", "reference": reference, "status": "failed"}
             )
 
         # Log API call
-        api_log = ApiLog(
+        write_api_log(
+            db2,
             user_id=user_id,
             service=transaction.provider or "data",
             endpoint="/data/purchase",
@@ -632,8 +452,6 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
             reference=reference,
             success=1 if final_status == "success" else 0
         )
-        db2.add(api_log)
-        db2.commit()
 
         return {
             "status": final_status,
@@ -645,6 +463,51 @@ def _buy_data_impl(request: Request, payload: BuyDataRequest, user: User, db: Se
         db2.close()
 
 
+@router.post("/bulk-purchase")
+@limiter.limit("5/minute")
+@idempotent("data.bulk_purchase")
+def bulk_buy_data(request: Request, payload: BulkDataPurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if user.role not in (UserRole.RESELLER, UserRole.ADMIN):
+        raise HTTPException(status_code=403, detail="Bulk purchases are available to agents only.")
+    if len(payload.items) > settings.bulk_purchase_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A bulk purchase can have at most {settings.bulk_purchase_max_items} items.",
+        )
+    orders = []
+    for position, item in enumerate(payload.items):
+        plan = _find_active_plan(db, item.plan_code, item.network)
+        if not plan:
+            raise HTTPException(status_code=404, detail=f"Item {position}: active data plan not found.")
+        phone = str(item.phone_number or "").strip()
+        if not phone:
+            raise HTTPException(status_code=400, detail=f"Item {position}: recipient phone number is required.")
+        orders.append(BulkOrder(phone=phone, plan=plan))
+
+    # Promo prices are per-purchase offers and are not applied to bulk items.
+    batch = create_bulk_purchase(db, user, orders, source="app")
+    start_bulk_purchase(batch.batch_id)
+    return {
+        "status": batch.status,
+        "batch_id": batch.batch_id,
+        "item_count": batch.item_count,
+        "total_amount": batch.total_amount,
+        "stream_url": f"{settings.api_v1_prefix}/data/bulk-purchase/{batch.batch_id}/stream",
+    }
+
+
+@router.get("/bulk-purchase/{batch_id}")
+def get_bulk_data_purchase(batch_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return bulk_purchase_view(db, get_bulk_purchase(db, user, batch_id))
+
+
+@router.get("/bulk-purchase/{batch_id}/stream")
+def stream_bulk_data_purchase(batch_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    batch = get_bulk_purchase(db, user, batch_id)
+    db.close()
+    return StreamingResponse(stream_bulk_purchase(batch.batch_id), media_type="application/x-ndjson")
+
+
 @router.post("/sync", dependencies=[Depends(require_admin)])
 def sync_data_plans(db: Session = Depends(get_db)):
     """
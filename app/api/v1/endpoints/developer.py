@@ -7,12 +7,13 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Security, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from app.core.database import get_db
-from app.models import User, UserRole, Transaction, TransactionStatus, TransactionType, DataPlan, ApiLog
+from app.models import User, UserRole, Transaction, TransactionStatus, TransactionType, DataPlan
 from app.models.service_transaction import ServiceTransaction
 from app.schemas.developer import (
     DeveloperStatusResponse,
@@ -20,13 +21,25 @@ from app.schemas.developer import (
     ApiKeyResponse,
     DeveloperWalletBalanceResponse,
     DeveloperDataPurchaseRequest,
+    DeveloperBulkDataPurchaseRequest,
     DeveloperAirtimePurchaseRequest,
     DeveloperPurchaseResponse,
     WebhookConfigRequest
 )
-from app.services.wallet import get_or_create_wallet, debit_wallet, credit_wallet
-from app.services.pricing import get_price_for_user
+from app.services.bulk_purchase import (
+    BulkOrder,
+    bulk_purchase_view,
+    create_bulk_purchase,
+    get_bulk_purchase,
+    start_bulk_purchase,
+    stream_bulk_purchase,
+)
+from app.services.wallet import get_or_create_wallet, get_wallet_snapshot, spendable_balance
+from app.services.wallet_holds import capture_hold, hold_transaction, place_hold, release_hold
+from app.services.pricing import get_price_for_user, quote_many
 from app.services.fraud import enforce_purchase_limits
+from app.services.idempotency import idempotent
+from app.services.log_writer import write_api_log
 
 # Providers/Clients
 from app.providers.smeplug_provider import SMEPlugProvider
@@ -214,8 +227,7 @@ def get_wallet_balance_amigo_style(user: User = Depends(get_developer_user), db:
     if is_test:
         bal = SANDBOX_BALANCES.get(user.id, 1000000.0)
     else:
-        wallet = get_or_create_wallet(db, user.id)
-        bal = float(wallet.balance)
+        bal = float(get_wallet_snapshot(db, user.id).balance)
         
     return {
         "success": True,
@@ -319,8 +331,7 @@ def get_balance(user: User = Depends(get_developer_user), db: Session = Depends(
     if is_test:
         bal = Decimal(str(SANDBOX_BALANCES.get(user.id, 1000000.0)))
     else:
-        wallet = get_or_create_wallet(db, user.id)
-        bal = wallet.balance
+        bal = get_wallet_snapshot(db, user.id).balance
     return {"balance": bal, "currency": "NGN"}
 
 
@@ -328,8 +339,7 @@ def get_balance(user: User = Depends(get_developer_user), db: Session = Depends(
 def list_data_plans(user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
     plans = db.query(DataPlan).filter(DataPlan.is_active == True).all()
     result = []
-    for plan in plans:
-        price = get_price_for_user(db, plan, user)
+    for plan, price, _ in quote_many(db, plans, user.role):
         result.append({
             "plan_id": plan.id,
             "plan_code": plan.plan_code,
@@ -344,6 +354,7 @@ def list_data_plans(user: User = Depends(get_developer_user), db: Session = Depe
 
 @router.post("/data/purchase", response_model=DeveloperPurchaseResponse)
 @limiter.limit("30/minute")
+@idempotent("developer.data.purchase", payload_field="reference")
 def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest, user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
     # 1. Idempotency Check
     client_ref = f"DEV_{user.id}_{payload.reference.strip()}"
@@ -367,18 +378,12 @@ def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest,
         raise HTTPException(status_code=404, detail="Active data plan not found.")
 
     price = get_price_for_user(db, plan, user.role)
+    enforce_purchase_limits(db, user_id=user.id, amount=price, tx_type=TransactionType.DATA.value)
     wallet = get_or_create_wallet(db, user.id)
-    if wallet.balance < price:
+    if spendable_balance(wallet) < price:
         raise HTTPException(status_code=400, detail="Insufficient wallet balance.")
 
-    # 3. Debit Wallet
-    try:
-        debit_wallet(db, wallet, price, client_ref, f"API Data: {plan.plan_name} ({payload.phone_number})")
-    except Exception as e:
-        logger.error(f"Developer wallet debit failed: {e}")
-        raise HTTPException(status_code=400, detail="Wallet debit failed.")
-
-    # 4. Save transaction
+    # 3-4. Hold funds: debit + PENDING transaction in one commit
     tx = Transaction(
         user_id=user.id,
         amount=price,
@@ -389,10 +394,14 @@ def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest,
         recipient_phone=payload.phone_number.strip(),
         data_plan_code=plan.plan_code,
         provider=plan.provider,
-        provider_plan_id=plan.provider_plan_id
+        provider_plan_id=plan.provider_plan_id,
+        cost_price=plan.base_price,
     )
-    db.add(tx)
-    db.commit()
+    try:
+        hold = place_hold(db, wallet, tx, f"API Data: {plan.plan_name} ({payload.phone_number})")
+    except Exception as e:
+        logger.error(f"Developer wallet debit failed: {e}")
+        raise HTTPException(status_code=400, detail="Wallet debit failed.")
 
     # 5. Route to Provider
     provider_res = {"status": "pending", "error": "Provider routing failed"}
@@ -435,19 +444,25 @@ def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest,
 
     duration_ms = (time.time() - start_time) * 1000
 
-    # 6. Update Transaction Status
+    # 6. Settle the hold
     final_status = provider_res.get("status", "pending")
-    tx.status = TransactionStatus.SUCCESS if final_status == "success" else (TransactionStatus.FAILED if final_status == "failed" else TransactionStatus.PENDING)
+    if final_status == "success":
+        tx = capture_hold(db, hold)
+    elif final_status == "failed":
+        tx = release_hold(
+            db,
+            hold,
+            f"Refund: {plan.plan_name} API purchase failed",
+            failure_reason=str(provider_res.get("error"))[:255],
+        )
+    else:
+        tx = hold_transaction(db, hold)
     tx.external_reference = provider_res.get("provider_reference")
-    
-    if final_status == "failed":
-        tx.failure_reason = str(provider_res.get("error"))[:255]
-        credit_wallet(db, wallet, price, client_ref, f"Refund: {plan.plan_name} API purchase failed")
-        tx.status = TransactionStatus.REFUNDED
     db.commit()
 
     # 7. Write Log
-    api_log = ApiLog(
+    write_api_log(
+        db,
         user_id=user.id,
         service=tx.provider or "data_api",
         endpoint="/developer/data/purchase",
@@ -456,8 +471,6 @@ def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest,
         reference=client_ref,
         success=1 if final_status == "success" else 0
     )
-    db.add(api_log)
-    db.commit()
 
     return {
         "status": final_status,
@@ -467,8 +480,49 @@ def developer_buy_data(request: Request, payload: DeveloperDataPurchaseRequest,
     }
 
 
+@router.post("/data/bulk-purchase")
+@limiter.limit("10/minute")
+@idempotent("developer.data.bulk_purchase", payload_field=None)
+def developer_bulk_buy_data(request: Request, payload: DeveloperBulkDataPurchaseRequest, user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
+    references = [item.reference.strip() for item in payload.items]
+    if len(set(references)) != len(references) or not all(references):
+        raise HTTPException(status_code=422, detail="Every item needs its own non-empty reference.")
+
+    plan_ids = {item.plan_id for item in payload.items}
+    plans = {plan.id: plan for plan in db.query(DataPlan).filter(DataPlan.id.in_(plan_ids), DataPlan.is_active == True)}
+    orders = []
+    for item, reference in zip(payload.items, references):
+        plan = plans.get(item.plan_id)
+        if not plan or plan.network.lower() != item.network.strip().lower():
+            raise HTTPException(status_code=404, detail=f"{reference}: active data plan not found.")
+        orders.append(BulkOrder(phone=item.phone_number.strip(), plan=plan, reference=reference))
+
+    batch = create_bulk_purchase(db, user, orders, source="developer")
+    start_bulk_purchase(batch.batch_id)
+    return {
+        "status": batch.status,
+        "batch_id": batch.batch_id,
+        "item_count": batch.item_count,
+        "amount": batch.total_amount,
+        "message": "Processing",
+    }
+
+
+@router.get("/data/bulk-purchase/{batch_id}")
+def developer_get_bulk_purchase(batch_id: str, user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
+    return bulk_purchase_view(db, get_bulk_purchase(db, user, batch_id))
+
+
+@router.get("/data/bulk-purchase/{batch_id}/stream")
+def developer_stream_bulk_purchase(batch_id: str, user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
+    batch = get_bulk_purchase(db, user, batch_id)
+    db.close()
+    return StreamingResponse(stream_bulk_purchase(batch.batch_id), media_type="application/x-ndjson")
+
+
 @router.post("/airtime/purchase", response_model=DeveloperPurchaseResponse)
 @limiter.limit("30/minute")
+@idempotent("developer.airtime.purchase", payload_field="reference")
 def developer_buy_airtime(request: Request, payload: DeveloperAirtimePurchaseRequest, user: User = Depends(get_developer_user), db: Session = Depends(get_db)):
     client_ref = f"DEV_{user.id}_{payload.reference.strip()}"
     existing = db.query(ServiceTransaction).filter(ServiceTransaction.user_id == user.id, ServiceTransaction.reference == client_ref).first()
@@ -493,18 +547,12 @@ def developer_buy_airtime(request: Request, payload: DeveloperAirtimePurchaseReq
     if charge_amount <= 0:
         raise HTTPException(status_code=400, detail="Invalid final purchase amount.")
 
+    enforce_purchase_limits(db, user_id=user.id, amount=charge_amount, tx_type=TransactionType.AIRTIME.value)
     wallet = get_or_create_wallet(db, user.id)
-    if wallet.balance < charge_amount:
+    if spendable_balance(wallet) < charge_amount:
         raise HTTPException(status_code=400, detail="Insufficient wallet balance.")
 
-    # 1. Debit Wallet
-    try:
-        debit_wallet(db, wallet, charge_amount, client_ref, f"API Airtime: ₦{base_amount} ({payload.phone_number})")
-    except Exception as e:
-        logger.error(f"Developer airtime debit failed: {e}")
-        raise HTTPException(status_code=400, detail="Wallet debit failed.")
-
-    # 2. Save Transaction
+    # 1-2. Hold funds: debit + PENDING transaction in one commit
     tx = ServiceTransaction(
         user_id=user.id,
         reference=client_ref,
@@ -521,8 +569,11 @@ def developer_buy_airtime(request: Request, payload: DeveloperAirtimePurchaseReq
             "charge_amount": str(charge_amount),
         },
     )
-    db.add(tx)
-    db.commit()
+    try:
+        hold = place_hold(db, wallet, tx, f"API Airtime: ₦{base_amount} ({payload.phone_number})")
+    except Exception as e:
+        logger.error(f"Developer airtime debit failed: {e}")
+        raise HTTPException(status_code=400, detail="Wallet debit failed.")
 
     # 3. Route to Provider
     start_time = time.time()
@@ -541,19 +592,22 @@ def developer_buy_airtime(request: Request, payload: DeveloperAirtimePurchaseReq
 
     duration_ms = (time.time() - start_time) * 1000
 
-    # 4. Handle Result
+    # 4. Settle the hold
     final_status = provider_res.get("status", "pending")
-    tx.status = TransactionStatus.SUCCESS.value if final_status == "success" else (TransactionStatus.FAILED.value if final_status == "failed" else TransactionStatus.PENDING.value)
+    if final_status == "success":
+        tx = capture_hold(db, hold)
+    elif final_status == "failed":
+        tx = release_hold(
+            db, hold, "API Refund: Airtime purchase failed", failure_reason=str(provider_res.get("error"))[:255]
+        )
+    else:
+        tx = hold_transaction(db, hold)
     tx.external_reference = provider_res.get("provider_reference")
-
-    if final_status == "failed":
-        tx.failure_reason = str(provider_res.get("error"))[:255]
-        credit_wallet(db, wallet, charge_amount, client_ref, "API Refund: Airtime purchase failed")
-        tx.status = TransactionStatus.REFUNDED.value
     db.commit()
 
     # 5. Write Log
-    api_log = ApiLog(
+    write_api_log(
+        db,
         user_id=user.id,
         service="airtime_api",
         endpoint="/developer/airtime/purchase",
@@ -562,8 +616,6 @@ def developer_buy_airtime(request: Request, payload: DeveloperAirtimePurchaseReq
         reference=client_ref,
         success=1 if final_status == "success" else 0
     )
-    db.add(api_log)
-    db.commit()
 
     return {
         "status": final_status,
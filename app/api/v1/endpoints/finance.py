@@ -1,19 +1,21 @@
 import logging
 from decimal import Decimal
 from typing import Any, List, Optional
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.dependencies import get_current_user, require_admin
+from app.services.exports import EXPORT_FORMATS, streaming_export
+from app.services.rollups import empty_totals, rollup_totals
 from app.models import (
     Transaction, TransactionStatus, TransactionType,
-    DataPlan, AgentReward, AgentRewardStatus,
-    Referral, ReferralStatus, Wallet,
+    AgentReward, AgentRewardStatus,
+    Referral, ReferralStatus, Wallet, WalletStripe,
     FinancialLedger, FinancialCategory, EntryType,
     User
 )
@@ -73,65 +75,39 @@ def get_finance_overview(
     """
     Get strict financial metrics separating Revenue, Expenses, Liabilities, and Equity.
     """
+    # Transaction totals are read from the daily_rollups fact table rather than
+    # summed over the transactions table on every load.
+    tx_by_type = rollup_totals(
+        db, kinds=("transaction",), statuses=(TransactionStatus.SUCCESS.value,), group_by=("tx_type",)
+    )
+
+    def _type_totals(tx_type: TransactionType) -> dict:
+        return tx_by_type.get((tx_type.value,), empty_totals())
+
     # 1. REVENUE (Exclude WALLET_FUND and WALLET_TRANSFER)
     service_tx_types = [
-        TransactionType.DATA.value,
-        TransactionType.AIRTIME.value,
-        TransactionType.CABLE.value,
-        TransactionType.ELECTRICITY.value,
-        TransactionType.EXAM.value
+        TransactionType.DATA,
+        TransactionType.AIRTIME,
+        TransactionType.CABLE,
+        TransactionType.ELECTRICITY,
+        TransactionType.EXAM
     ]
-    
-    revenue_amount = (
-        db.query(func.sum(Transaction.amount))
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type.in_(service_tx_types)
-        )
-        .scalar()
-        or 0
-    )
-    revenue = Decimal(str(revenue_amount))
+    revenue = sum((_type_totals(tx_type)["amount"] for tx_type in service_tx_types), Decimal("0"))
 
     # 2. COGS (Cost of Goods Sold)
-    # Estimate Data COGS using current DataPlan base_price
-    data_cogs_amount = (
-        db.query(func.sum(func.coalesce(DataPlan.base_price, Transaction.amount)))
-        .select_from(Transaction)
-        .outerjoin(DataPlan, Transaction.data_plan_code == DataPlan.plan_code)
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type == TransactionType.DATA
-        )
-        .scalar()
-        or 0
-    )
-    data_cogs = Decimal(str(data_cogs_amount))
+    # Data COGS uses the cost_price captured on each transaction at purchase time
+    data_cogs = _type_totals(TransactionType.DATA)["base_cost"]
 
     # Estimate Airtime COGS (Assuming average 3% discount across networks if exact cost isn't logged)
     # Using 0.97 * amount for estimation.
-    airtime_revenue_amount = (
-        db.query(func.sum(Transaction.amount))
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type == TransactionType.AIRTIME
-        )
-        .scalar()
-        or 0
-    )
-    airtime_cogs = Decimal(str(airtime_revenue_amount)) * Decimal("0.97")
+    airtime_cogs = _type_totals(TransactionType.AIRTIME)["amount"] * Decimal("0.97")
 
     # Other services COGS (Assume cost = amount for now, or 1% discount)
-    other_revenue_amount = (
-        db.query(func.sum(Transaction.amount))
-        .filter(
-            Transaction.status == TransactionStatus.SUCCESS,
-            Transaction.tx_type.in_([TransactionType.CABLE.value, TransactionType.ELECTRICITY.value, TransactionType.EXAM.value])
-        )
-        .scalar()
-        or 0
+    other_revenue = sum(
+        (_type_totals(tx_type)["amount"] for tx_type in (TransactionType.CABLE, TransactionType.ELECTRICITY, TransactionType.EXAM)),
+        Decimal("0"),
     )
-    other_cogs = Decimal(str(other_revenue_amount)) * Decimal("0.99") # Estimate 1% discount
+    other_cogs = other_revenue * Decimal("0.99") # Estimate 1% discount
 
     total_cogs = data_cogs + airtime_cogs + other_cogs
 
@@ -155,30 +131,20 @@ def get_finance_overview(
     )
     referral_expense = Decimal(str(referral_expense_amount))
 
-    # 5. PAYMENT FEES (Estimate based on WALLET_FUND transactions)
-    # 0.5% for Billstack, assuming all unlabelled are 1.5% like Paystack
-    wallet_funds = db.query(Transaction.amount, Transaction.provider).filter(
-        Transaction.status == TransactionStatus.SUCCESS,
-        Transaction.tx_type == TransactionType.WALLET_FUND
-    ).all()
-    
-    payment_fees = Decimal("0.0")
-    for amount, provider in wallet_funds:
-        amt = Decimal(str(amount))
-        if provider and "billstack" in str(provider).lower():
-            payment_fees += amt * Decimal("0.005")
-        elif provider and "monnify" in str(provider).lower():
-            # Monnify flat fee or 1% usually, let's assume 1% capped
-            payment_fees += min(amt * Decimal("0.01"), Decimal("2000.0"))
-        else:
-            # Paystack 1.5%
-            payment_fees += amt * Decimal("0.015")
+    # 5. PAYMENT FEES (Estimated per WALLET_FUND transaction when it is rolled up;
+    # see app.services.rollups.estimate_payment_fee)
+    payment_fees = _type_totals(TransactionType.WALLET_FUND)["fee_estimate"]
 
     # 6. NET PROFIT
     net_profit = gross_margin - promo_expense - referral_expense - payment_fees
 
     # 7. CUSTOMER WALLET LIABILITY
-    wallet_liability_amount = db.query(func.sum(Wallet.balance)).scalar() or 0
+    # Wallet rows plus all stripes; summing total_balance would run its
+    # stripes subquery once per wallet.
+    wallet_liability_amount = db.query(
+        select(func.coalesce(func.sum(Wallet.balance), 0)).scalar_subquery()
+        + select(func.coalesce(func.sum(WalletStripe.balance), 0)).scalar_subquery()
+    ).scalar() or 0
     wallet_liability = Decimal(str(wallet_liability_amount))
 
     # 8. COMPANY ASSETS (Provider Balances)
@@ -313,3 +279,45 @@ def get_ledger(
         query = query.filter(FinancialLedger.category == category)
     
     return query.order_by(FinancialLedger.created_at.desc()).offset(skip).limit(limit).all()
+
+@router.get("/ledger/export")
+def export_ledger(
+    category: Optional[FinancialCategory] = None,
+    status: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: str = "csv",
+    db: Session = Depends(get_db),
+    user: User = Depends(require_admin)
+):
+    """
+    Stream the financial ledger as CSV or NDJSON for reconciliation.
+    """
+    fmt = (format or "").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    stmt = select(
+        FinancialLedger.id,
+        FinancialLedger.created_at,
+        FinancialLedger.reference,
+        FinancialLedger.category,
+        FinancialLedger.entry_type,
+        FinancialLedger.amount,
+        FinancialLedger.status,
+        FinancialLedger.party,
+        FinancialLedger.source,
+        FinancialLedger.source_id,
+        FinancialLedger.description,
+    ).order_by(FinancialLedger.created_at, FinancialLedger.id)
+    if category:
+        stmt = stmt.where(FinancialLedger.category == category)
+    if status and status.strip():
+        stmt = stmt.where(FinancialLedger.status == status.strip().lower())
+    if from_date:
+        stmt = stmt.where(FinancialLedger.created_at >= datetime.combine(from_date, datetime.min.time(), tzinfo=timezone.utc))
+    if to_date:
+        stmt = stmt.where(FinancialLedger.created_at <= datetime.combine(to_date, datetime.max.time(), tzinfo=timezone.utc))
+
+    filename = "_".join(["financial_ledger", *(d.isoformat() for d in (from_date, to_date) if d)])
+    return streaming_export(db, stmt, fmt, filename)
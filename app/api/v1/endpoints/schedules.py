@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from app.api.v1.endpoints.data import _find_active_plan
+from app.api.v1.endpoints.services import _ensure_service_table, _infer_nigeria_network
+from app.core.database import get_db
+from app.dependencies import get_current_user
+from app.middlewares.rate_limit import limiter
+from app.models import ScheduledPurchase, User
+from app.schemas.schedules import ScheduledPurchaseCreate, ScheduledPurchaseOut
+from app.services.bulk_purchase import AIRTIME, DATA
+from app.services.scheduled_purchases import cancel_schedule, create_schedule
+
+router = APIRouter()
+
+
+@router.post("", response_model=ScheduledPurchaseOut)
+@limiter.limit("10/minute")
+def create_scheduled_purchase(
+    request: Request,
+    payload: ScheduledPurchaseCreate,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    phone = payload.phone_number.strip()
+    if payload.kind == DATA:
+        plan = _find_active_plan(db, payload.plan_code, payload.network)
+        if not plan:
+            raise HTTPException(status_code=404, detail="Active data plan not found.")
+        return create_schedule(
+            db,
+            user,
+            kind=DATA,
+            phone=phone,
+            interval=payload.interval,
+            start_at=payload.start_at,
+            plan_code=plan.plan_code,
+            network=plan.network,
+        )
+
+    if payload.amount is None:
+        raise HTTPException(status_code=400, detail="Amount is required for scheduled airtime.")
+    _ensure_service_table(db)
+    selected_network = str(payload.network or "").strip().lower()
+    inferred_network = _infer_nigeria_network(phone)
+    if selected_network and inferred_network and inferred_network != selected_network:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Phone number appears to be {inferred_network.upper()}. "
+                f"Selected network {selected_network.upper()} does not match."
+            ),
+        )
+    network = selected_network or inferred_network
+    if not network:
+        raise HTTPException(status_code=400, detail=f"Could not tell the network of {phone}.")
+    return create_schedule(
+        db,
+        user,
+        kind=AIRTIME,
+        phone=phone,
+        interval=payload.interval,
+        start_at=payload.start_at,
+        network=network,
+        amount=Decimal(payload.amount),
+    )
+
+
+@router.get("", response_model=list[ScheduledPurchaseOut])
+def list_scheduled_purchases(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return (
+        db.query(ScheduledPurchase)
+        .filter(ScheduledPurchase.user_id == user.id)
+        .order_by(ScheduledPurchase.is_active.desc(), ScheduledPurchase.next_run_at)
+        .all()
+    )
+
+
+@router.delete("/{schedule_id}", response_model=ScheduledPurchaseOut)
+def cancel_scheduled_purchase(schedule_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return cancel_schedule(db, user, schedule_id)
@@ -4,15 +4,18 @@ import logging
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import inspect
 
+from app.core.config import get_settings
 from app.core.database import get_db
 from app.dependencies import get_current_user
 from app.middlewares.rate_limit import limiter
-from app.models import User, TransactionStatus, TransactionType, ServiceTransaction
+from app.models import User, UserRole, TransactionStatus, TransactionType, ServiceTransaction
 from app.schemas.services import (
     AirtimePurchaseRequest,
+    BulkAirtimePurchaseRequest,
     CablePurchaseRequest,
     CableVerifyRequest,
     ElectricityPurchaseRequest,
@@ -20,24 +23,23 @@ from app.schemas.services import (
     ExamPurchaseRequest,
     ServicesCatalogOut,
 )
-from app.services.bills import get_bills_provider
+from app.services.bills import PROVIDER_PENDING_STATUS, get_bills_provider, is_transport_error, provider_result_status
+from app.services.bulk_purchase import (
+    AirtimeOrder,
+    bulk_purchase_view,
+    create_bulk_airtime,
+    get_bulk_purchase,
+    start_bulk_purchase,
+    stream_bulk_purchase,
+)
 from app.services.fraud import enforce_purchase_limits
-from app.services.wallet import get_or_create_wallet, debit_wallet, credit_wallet
+from app.services.idempotency import idempotent
+from app.services.wallet import get_or_create_wallet, debit_wallet, credit_wallet, spendable_balance
 from app.services.pricing import get_service_charge_for_user
 
 router = APIRouter()
+settings = get_settings()
 logger = logging.getLogger(__name__)
-_PROVIDER_PENDING_STATUS = {"pending", "processing", "queued", "in_progress", "submitted", "accepted"}
-_TRANSPORT_ERROR_MARKERS = (
-    "network error",
-    "timed out",
-    "timeout",
-    "connection reset",
-    "connection aborted",
-    "connection refused",
-    "temporarily unavailable",
-    "service unavailable",
-)
 _PENDING_CONFIRMATION_MESSAGE = "Provider confirmation delayed. Purchase is being verified. Check history shortly."
 
 _NETWORK_PREFIXES: dict[str, set[str]] = {
@@ -69,20 +71,6 @@ def _client_request_reference(prefix: str, user_id: int, request_id: str | None)
     return f"{prefix}_{digest}"
 
 
-def _provider_status(result) -> str:
-    meta = result.meta or {}
-    for provider_key in ("vtpass", "clubkonnect"):
-        status = str((meta.get(provider_key) or {}).get("status") or "").strip().lower()
-        if status:
-            return status
-    return str(meta.get("status") or "").strip().lower()
-
-
-def _is_transport_error(exc: Exception) -> bool:
-    message = str(exc or "").strip().lower()
-    return any(marker in message for marker in _TRANSPORT_ERROR_MARKERS)
-
-
 def _mark_pending_confirmation(db: Session, tx: ServiceTransaction, result_meta: dict | None = None) -> None:
     tx.status = TransactionStatus.PENDING.value
     tx.failure_reason = _PENDING_CONFIRMATION_MESSAGE
@@ -189,6 +177,7 @@ def exam_packages(exam: str, user: User = Depends(get_current_user)):
 
 @router.post("/airtime/purchase")
 @limiter.limit("5/minute")
+@idempotent("airtime.purchase")
 def purchase_airtime(request: Request, payload: AirtimePurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     _ensure_service_table(db)
     wallet = get_or_create_wallet(db, user.id)
@@ -213,7 +202,7 @@ def purchase_airtime(request: Request, payload: AirtimePurchaseRequest, user: Us
             ),
         )
     enforce_purchase_limits(db, user_id=user.id, amount=charge_amount, tx_type=TransactionType.AIRTIME.value)
-    if Decimal(wallet.balance) < charge_amount:
+    if spendable_balance(wallet) < charge_amount:
         raise HTTPException(status_code=400, detail="Insufficient balance")
 
     reference = _client_request_reference("AIRTIME", user.id, getattr(payload, "client_request_id", None)) or _ref("AIRTIME")
@@ -262,7 +251,7 @@ def purchase_airtime(request: Request, payload: AirtimePurchaseRequest, user: Us
         try:
             tx = db2.query(ServiceTransaction).get(tx_id)
             wallet = get_or_create_wallet(db2, user_id)
-            if _is_transport_error(exc):
+            if is_transport_error(exc):
                 logger.warning("Airtime provider confirmation delayed ref=%s error=%s", reference, exc)
                 _mark_pending_confirmation(db2, tx, {"provider_error": str(exc)})
                 return {"reference": reference, "status": tx.status, "message": _PENDING_CONFIRMATION_MESSAGE}
@@ -281,8 +270,8 @@ def purchase_airtime(request: Request, payload: AirtimePurchaseRequest, user: Us
         tx = db2.query(ServiceTransaction).get(tx_id)
         wallet = get_or_create_wallet(db2, user_id)
         
-        provider_status = _provider_status(result)
-        if provider_status in _PROVIDER_PENDING_STATUS:
+        provider_status = provider_result_status(result)
+        if provider_status in PROVIDER_PENDING_STATUS:
             tx.status = TransactionStatus.PENDING.value
             tx.external_reference = result.external_reference
             if result.meta:
@@ -331,8 +320,57 @@ def purchase_airtime(request: Request, payload: AirtimePurchaseRequest, user: Us
         db2.close()
 
 
+@router.post("/airtime/bulk-purchase")
+@limiter.limit("5/minute")
+@idempotent("airtime.bulk_purchase")
+def bulk_purchase_airtime(request: Request, payload: BulkAirtimePurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if user.role not in (UserRole.RESELLER, UserRole.ADMIN):
+        raise HTTPException(status_code=403, detail="Bulk purchases are available to agents only.")
+    _ensure_service_table(db)
+    orders = []
+    for position, item in enumerate(payload.items):
+        phone = item.phone_number.strip()
+        selected_network = str(item.network or "").strip().lower()
+        inferred_network = _infer_nigeria_network(phone)
+        if selected_network and inferred_network and inferred_network != selected_network:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Item {position}: phone number appears to be {inferred_network.upper()}. "
+                    f"Selected network {selected_network.upper()} does not match."
+                ),
+            )
+        network = selected_network or inferred_network
+        if not network:
+            raise HTTPException(status_code=400, detail=f"Item {position}: could not tell the network of {phone}.")
+        orders.append(AirtimeOrder(phone=phone, network=network, face_value=Decimal(item.amount)))
+
+    batch = create_bulk_airtime(db, user, orders, source="app")
+    start_bulk_purchase(batch.batch_id)
+    return {
+        "status": batch.status,
+        "batch_id": batch.batch_id,
+        "item_count": batch.item_count,
+        "total_amount": batch.total_amount,
+        "stream_url": f"{settings.api_v1_prefix}/services/airtime/bulk-purchase/{batch.batch_id}/stream",
+    }
+
+
+@router.get("/airtime/bulk-purchase/{batch_id}")
+def get_bulk_airtime_purchase(batch_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return bulk_purchase_view(db, get_bulk_purchase(db, user, batch_id, kind=TransactionType.AIRTIME.value))
+
+
+@router.get("/airtime/bulk-purchase/{batch_id}/stream")
+def stream_bulk_airtime_purchase(batch_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    batch = get_bulk_purchase(db, user, batch_id, kind=TransactionType.AIRTIME.value)
+    db.close()
+    return StreamingResponse(stream_bulk_purchase(batch.batch_id), media_type="application/x-ndjson")
+
+
 @router.post("/cable/purchase")
 @limiter.limit("5/minute")
+@idempotent("cable.purchase")
 def purchase_cable(request: Request, payload: CablePurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     _ensure_service_table(db)
     wallet = get_or_create_wallet(db, user.id)
@@ -347,7 +385,7 @@ def purchase_cable(request: Request, payload: CablePurchaseRequest, user: User =
     if charge_amount <= 0:
         raise HTTPException(status_code=400, detail="Final amount must be greater than zero")
     enforce_purchase_limits(db, user_id=user.id, amount=charge_amount, tx_type=TransactionType.CABLE.value)
-    if Decimal(wallet.balance) < charge_amount:
+    if spendable_balance(wallet) < charge_amount:
         raise HTTPException(status_code=400, detail="Insufficient balance")
 
     reference = _client_request_reference("CABLE", user.id, getattr(payload, "client_request_id", None)) or _ref("CABLE")
@@ -406,7 +444,7 @@ def purchase_cable(request: Request, payload: CablePurchaseRequest, user: User =
         try:
             tx = db2.query(ServiceTransaction).get(tx_id)
             wallet = get_or_create_wallet(db2, user_id)
-            if _is_transport_error(exc):
+            if is_transport_error(exc):
                 logger.warning("Cable provider confirmation delayed ref=%s error=%s", reference, exc)
                 _mark_pending_confirmation(db2, tx, {"provider_error": str(exc)})
                 return {"reference": reference, "status": tx.status, "message": _PENDING_CONFIRMATION_MESSAGE}
@@ -425,8 +463,8 @@ def purchase_cable(request: Request, payload: CablePurchaseRequest, user: User =
         tx = db2.query(ServiceTransaction).get(tx_id)
         wallet = get_or_create_wallet(db2, user_id)
 
-        provider_status = _provider_status(result)
-        if provider_status in _PROVIDER_PENDING_STATUS:
+        provider_status = provider_result_status(result)
+        if provider_status in PROVIDER_PENDING_STATUS:
             tx.status = TransactionStatus.PENDING.value
             tx.external_reference = result.external_reference
             if result.meta:
@@ -543,6 +581,7 @@ def cable_verify(
 
 @router.post("/electricity/purchase")
 @limiter.limit("5/minute")
+@idempotent("electricity.purchase")
 def purchase_electricity(request: Request, payload: ElectricityPurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     _ensure_service_table(db)
     disco = str(payload.disco or "").strip().lower()
@@ -560,7 +599,7 @@ def purchase_electricity(request: Request, payload: ElectricityPurchaseRequest,
     if charge_amount <= 0:
         raise HTTPException(status_code=400, detail="Final amount must be greater than zero")
     enforce_purchase_limits(db, user_id=user.id, amount=charge_amount, tx_type=TransactionType.ELECTRICITY.value)
-    if Decimal(wallet.balance) < charge_amount:
+    if spendable_balance(wallet) < charge_amount:
         raise HTTPException(status_code=400, detail="Insufficient balance")
 
     reference = _client_request_reference("ELECTRICITY", user.id, getattr(payload, "client_request_id", None)) or _ref("ELECTRICITY")
@@ -618,7 +657,7 @@ def purchase_electricity(request: Request, payload: ElectricityPurchaseRequest,
         try:
             tx = db2.query(ServiceTransaction).get(tx_id)
             wallet = get_or_create_wallet(db2, user_id)
-            if _is_transport_error(exc):
+            if is_transport_error(exc):
                 logger.warning("Electricity provider confirmation delayed ref=%s error=%s", reference, exc)
                 _mark_pending_confirmation(db2, tx, {"provider_error": str(exc)})
                 return {"reference": reference, "status": tx.status, "message": _PENDING_CONFIRMATION_MESSAGE, "token": (tx.meta or {}).get("token")}
@@ -637,8 +676,8 @@ def purchase_electricity(request: Request, payload: ElectricityPurchaseRequest,
         tx = db2.query(ServiceTransaction).get(tx_id)
         wallet = get_or_create_wallet(db2, user_id)
 
-        provider_status = _provider_status(result)
-        if provider_status in _PROVIDER_PENDING_STATUS:
+        provider_status = provider_result_status(result)
+        if provider_status in PROVIDER_PENDING_STATUS:
             tx.status = TransactionStatus.PENDING.value
             tx.external_reference = result.external_reference
             if result.meta:
@@ -778,6 +817,7 @@ def electricity_verify(request: Request, payload: ElectricityVerifyRequest, user
 
 @router.post("/exam/purchase")
 @limiter.limit("5/minute")
+@idempotent("exam.purchase")
 def purchase_exam_pin(request: Request, payload: ExamPurchaseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     _ensure_service_table(db)
     exam_key = str(payload.exam or "").strip().lower()
@@ -811,7 +851,7 @@ def purchase_exam_pin(request: Request, payload: ExamPurchaseRequest, user: User
     enforce_purchase_limits(db, user_id=user.id, amount=charge_amount, tx_type=TransactionType.EXAM.value)
 
     wallet = get_or_create_wallet(db, user.id)
-    if Decimal(wallet.balance) < charge_amount:
+    if spendable_balance(wallet) < charge_amount:
         raise HTTPException(status_code=400, detail="Insufficient balance")
 
     reference = _client_request_reference("EXAM", user.id, getattr(payload, "client_request_id", None)) or _ref("EXAM")
@@ -869,7 +909,7 @@ def purchase_exam_pin(request: Request, payload: ExamPurchaseRequest, user: User
         try:
             tx = db2.query(ServiceTransaction).get(tx_id)
             wallet = get_or_create_wallet(db2, user_id)
-            if _is_transport_error(exc):
+            if is_transport_error(exc):
                 logger.warning("Exam provider confirmation delayed ref=%s error=%s", reference, exc)
                 _mark_pending_confirmation(db2, tx, {"provider_error": str(exc)})
                 return {"reference": reference, "status": tx.status, "pins": (tx.meta or {}).get("pins", []), "message": _PENDING_CONFIRMATION_MESSAGE}
@@ -888,8 +928,8 @@ def purchase_exam_pin(request: Request, payload: ExamPurchaseRequest, user: User
         tx = db2.query(ServiceTransaction).get(tx_id)
         wallet = get_or_create_wallet(db2, user_id)
 
-        provider_status = _provider_status(result)
-        if provider_status in _PROVIDER_PENDING_STATUS:
+        provider_status = provider_result_status(result)
+        if provider_status in PROVIDER_PENDING_STATUS:
             tx.status = TransactionStatus.PENDING.value
             tx.external_reference = result.external_reference
             if result.meta:
@@ -12,7 +12,13 @@ from app.dependencies import get_current_user, require_admin
 from app.models import User, Transaction, TransactionType, TransactionStatus
 from sqlalchemy import or_
 from app.schemas.wallet import WalletOut, FundWalletRequest, LedgerOut, BankTransferAccountsResponse, CreateBankTransferAccountsRequest, BankAccountOut, TransferVerifyRequest, TransferVerifyResponse, TransferRequest
-from app.services.wallet import get_or_create_wallet, credit_wallet, verify_transfer_recipient, execute_wallet_transfer
+from app.services.wallet import (
+    get_or_create_wallet,
+    get_wallet_snapshot,
+    credit_wallet,
+    verify_transfer_recipient,
+    execute_wallet_transfer,
+)
 from app.services.referrals import record_referral_first_deposit_reward
 from app.services.paystack import (
     create_paystack_checkout,
@@ -213,8 +219,7 @@ def _to_paystack_phone(value: str | None) -> str | None:
 
 @router.get("/me", response_model=WalletOut)
 def get_wallet(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    wallet = get_or_create_wallet(db, user.id)
-    return wallet
+    return get_wallet_snapshot(db, user.id)
 
 
 @router.get("/ledger", response_model=list[LedgerOut])
@@ -47,6 +47,10 @@ class Settings(BaseSettings):
     db_pool_timeout: int = 15
     db_pool_recycle: int = 1200
     db_pool_pre_ping: bool = True
+    # Postgres only: monthly range partitions for transactions/service_transactions
+    # (see app.services.partitions), created this many months ahead.
+    db_partition_transactions: bool = False
+    db_partition_months_ahead: int = 3
 
     # Redis (optional)
     redis_url: Optional[str] = None
@@ -95,6 +99,37 @@ class Settings(BaseSettings):
     # provider failure signal, we settle it as success to prevent false-negative
     # customer experience for already-delivered data.
     pending_reconcile_auto_success_seconds: int = 120
+    # API/audit logs are written off the request path in multi-row batches.
+    log_buffer_enabled: bool = True
+    log_buffer_flush_interval_ms: int = 500
+    log_buffer_batch_size: int = 200
+    log_buffer_max_records: int = 10000
+    # Balance read cache (app.services.wallet_cache); shared through Redis when REDIS_URL is set.
+    wallet_cache_enabled: bool = True
+    wallet_cache_ttl_seconds: int = 300
+    # Upper bound for per-wallet stripes (app.services.wallet_stripes).
+    wallet_stripes_max: int = 32
+    # Bulk data purchases (app.services.bulk_purchase). Concurrency bounds the
+    # provider calls in flight across all running batches. A processing batch
+    # whose runner has not checked in for stall_seconds is finalized.
+    bulk_purchase_max_items: int = 100
+    bulk_purchase_concurrency: int = 8
+    bulk_purchase_stall_seconds: int = 1800
+    # Scheduled purchases (app.services.scheduled_purchases): due schedules are
+    # claimed every window, up to batch_size at a time. Each schedule runs at a
+    # fixed offset of up to spread_seconds after its requested time, so
+    # renewals that land on the same moment (start of the month) are spread out.
+    # A claimed run whose batch was never opened is requeued after stall_seconds.
+    scheduled_purchases_enabled: bool = True
+    scheduled_purchase_window_seconds: int = 60
+    scheduled_purchase_batch_size: int = 200
+    scheduled_purchase_spread_seconds: int = 7200
+    scheduled_purchase_max_per_user: int = 50
+    scheduled_purchase_max_failures: int = 3
+    scheduled_purchase_stall_seconds: int = 600
+    # Raw api_logs older than this are rolled up per minute and moved to api_logs_archive.
+    api_log_retention_days: int = 14
+    api_log_archive_batch_size: int = 5000
     promo_mtn_1gb_enabled: bool = False
     promo_mtn_1gb_limit: int = 50
     promo_mtn_1gb_price: Decimal = Decimal("199")
@@ -1,6 +1,6 @@
 import importlib.util
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import DDL, create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from urllib.parse import urlparse
 from app.core.config import get_settings
@@ -10,6 +10,14 @@ class Base(DeclarativeBase):
     pass
 
 
+# Trigram search indexes (see app.services.search) need pg_trgm before create_all builds them.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
@@ -14,11 +14,21 @@ from urllib.parse import urlparse
 from app.core.database import Base, engine, SessionLocal
 from app.core.logging import configure_logging
 from app.middlewares.rate_limit import limiter
-from app.models import User, UserRole
+from app.models import User, UserRole, WalletStripe
 from app.services.pending_reconcile import (
     start_pending_reconcile_worker,
     stop_pending_reconcile_worker,
 )
+from app.services.log_writer import start_log_writer, stop_log_writer
+from app.services.scheduled_purchases import (
+    start_scheduled_purchase_worker,
+    stop_scheduled_purchase_worker,
+)
+# Registers the flush-time counter updates for transactions moving to SUCCESS.
+import app.services.leaderboard  # noqa: F401
+import app.services.rollups  # noqa: F401
+from app.services.promos import sync_configured_promos
+from app.services.partitions import ensure_all_partitions
 import os
 from fastapi.staticfiles import StaticFiles
 
@@ -134,6 +144,8 @@ def ensure_tables():
     # Pending reconcile must run in both production (auto_create_tables=False)
     # and local bootstrap mode.
     start_pending_reconcile_worker()
+    start_log_writer()
+    start_scheduled_purchase_worker()
     if not settings.auto_create_tables:
         _bootstrap_admins()
         _ensure_user_phone_column()
@@ -144,7 +156,10 @@ def ensure_tables():
         _ensure_data_plan_fallback_columns()
         _ensure_data_plan_data_type_column()
         _ensure_data_plan_text_lengths()
+        _ensure_data_plan_size_columns()
         _ensure_transaction_provider_columns()
+        _ensure_transaction_cost_columns()
+        _ensure_wallet_columns()
         _ensure_campaign_activated_at_column()
         _ensure_campaign_is_agent_only_column()
         _ensure_user_agent_upgrade_seen_column()
@@ -153,6 +168,8 @@ def ensure_tables():
         _ensure_user_developer_columns()
         _ensure_user_webhook_columns()
         _ensure_user_profile_image_url_column()
+        _sync_configured_promos()
+        _ensure_transaction_partitions()
         return
 
     # Optional local fallback for fresh environments.
@@ -172,18 +189,25 @@ def ensure_tables():
     _ensure_data_plan_fallback_columns()
     _ensure_data_plan_data_type_column()
     _ensure_data_plan_text_lengths()
+    _ensure_data_plan_size_columns()
     _ensure_transaction_provider_columns()
+    _ensure_transaction_cost_columns()
+    _ensure_wallet_columns()
     _ensure_campaign_is_agent_only_column()
     _ensure_user_kyc_hash_columns()
     _ensure_broadcast_announcement_button_columns()
     _ensure_user_developer_columns()
     _ensure_user_webhook_columns()
     _ensure_user_profile_image_url_column()
+    _sync_configured_promos()
+    _ensure_transaction_partitions()
 
 
 @app.on_event("shutdown")
 def shutdown_workers():
     stop_pending_reconcile_worker()
+    stop_log_writer()
+    stop_scheduled_purchase_worker()
 
 @app.get("/")
 def root():
@@ -420,6 +444,39 @@ def _ensure_data_plan_text_lengths() -> None:
         logging.getLogger(__name__).warning("Could not ensure data_plans text lengths: %s", exc)
 
 
+def _ensure_data_plan_size_columns() -> None:
+    try:
+        inspector = inspect(engine)
+        if not inspector.has_table("data_plans"):
+            return
+        cols = {c["name"] for c in inspector.get_columns("data_plans")}
+        statements: list[str] = []
+        if "data_size_mb" not in cols:
+            statements.append("ALTER TABLE data_plans ADD COLUMN data_size_mb INTEGER")
+        if "plan_code_suffix" not in cols:
+            statements.append("ALTER TABLE data_plans ADD COLUMN plan_code_suffix VARCHAR(64)")
+
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            if "plan_code_suffix" not in cols:
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_data_plans_plan_code_suffix ON data_plans (plan_code_suffix)"))
+            # Backfill rows written before the derived columns existed.
+            from app.models.data_plan import parse_data_size_mb, plan_code_suffix
+            rows = conn.execute(
+                text("SELECT id, plan_code, data_size FROM data_plans WHERE data_size_mb IS NULL OR plan_code_suffix IS NULL")
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    text("UPDATE data_plans SET data_size_mb = :mb, plan_code_suffix = :suffix WHERE id = :id"),
+                    {"mb": parse_data_size_mb(row.data_size), "suffix": plan_code_suffix(row.plan_code), "id": row.id},
+                )
+        if statements or rows:
+            logging.getLogger(__name__).info("Ensured data_plans size/suffix columns (%s row(s) backfilled).", len(rows))
+    except Exception as exc:
+        logging.getLogger(__name__).warning("Could not ensure data_plans size columns: %s", exc)
+
+
 def _ensure_transaction_provider_columns() -> None:
     try:
         inspector = inspect(engine)
@@ -447,6 +504,53 @@ def _ensure_transaction_provider_columns() -> None:
         logging.getLogger(__name__).warning("Could not ensure transactions provider columns: %s", exc)
 
 
+def _ensure_transaction_cost_columns() -> None:
+    try:
+        inspector = inspect(engine)
+        if not inspector.has_table("transactions"):
+            return
+        cols = {c["name"] for c in inspector.get_columns("transactions")}
+        statements: list[str] = []
+        if "cost_price" not in cols:
+            statements.append("ALTER TABLE transactions ADD COLUMN cost_price NUMERIC(12, 2)")
+        if "margin" not in cols:
+            statements.append("ALTER TABLE transactions ADD COLUMN margin NUMERIC(12, 2)")
+
+        if not statements:
+            return
+
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            # Backfill existing data purchases from the current catalog.
+            conn.execute(text(
+                "UPDATE transactions SET cost_price = ("
+                "SELECT MIN(dp.base_price) FROM data_plans dp WHERE dp.plan_code = transactions.data_plan_code"
+                ") WHERE tx_type = 'DATA' AND cost_price IS NULL AND data_plan_code IS NOT NULL"
+            ))
+            conn.execute(text("UPDATE transactions SET margin = amount - cost_price WHERE cost_price IS NOT NULL AND margin IS NULL"))
+        logging.getLogger(__name__).info("Added transactions cost_price/margin columns.")
+    except Exception as exc:
+        logging.getLogger(__name__).warning("Could not ensure transactions cost columns: %s", exc)
+
+
+def _ensure_wallet_columns() -> None:
+    try:
+        inspector = inspect(engine)
+        if not inspector.has_table("wallets"):
+            return
+        cols = {c["name"] for c in inspector.get_columns("wallets")}
+        with engine.begin() as conn:
+            if "version" not in cols:
+                conn.execute(text("ALTER TABLE wallets ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+                logging.getLogger(__name__).info("Added wallets.version column for the balance cache.")
+            if "stripe_count" not in cols:
+                conn.execute(text("ALTER TABLE wallets ADD COLUMN stripe_count INTEGER NOT NULL DEFAULT 0"))
+                logging.getLogger(__name__).info("Added wallets.stripe_count column.")
+        WalletStripe.__table__.create(bind=engine, checkfirst=True)
+    except Exception as exc:
+        logging.getLogger(__name__).warning("Could not ensure wallets version/stripe columns: %s", exc)
+
 def _ensure_campaign_activated_at_column() -> None:
     try:
         inspector = inspect(engine)
@@ -587,6 +691,21 @@ def _ensure_user_profile_image_url_column() -> None:
         logging.getLogger(__name__).warning("Could not ensure users profile_image_url column: %s", exc)
 
 
+def _sync_configured_promos() -> None:
+    # Mirror the PROMO_MTN_1GB_* settings into the promo ledger (created by
+    # migration 0021) and re-derive its remaining stock.
+    db = SessionLocal()
+    try:
+        if not inspect(engine).has_table("promos"):
+            return
+        sync_configured_promos(db)
+    except Exception as exc:
+        db.rollback()
+        logging.getLogger(__name__).warning("Could not sync configured promos: %s", exc)
+    finally:
+        db.close()
+
+
 @app.get("/healthz")
 @app.head("/healthz")
 def healthz():
@@ -616,3 +735,12 @@ def readyz():
         )
     finally:
         db.close()
+
+
+def _ensure_transaction_partitions() -> None:
+    # Partitioned Postgres tables only: make sure the next months exist before
+    # inserts for them arrive (the daily cron does the same).
+    try:
+        ensure_all_partitions(engine)
+    except Exception as exc:
+        logging.getLogger(__name__).warning("Could not ensure transaction partitions: %s", exc)
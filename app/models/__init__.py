@@ -1,6 +1,6 @@
 from app.models.user import User, UserRole
 from app.models.referral import Referral, ReferralContribution, ReferralStatus
-from app.models.wallet import Wallet
+from app.models.wallet import Wallet, WalletStripe
 from app.models.wallet_ledger import WalletLedger, LedgerType
 from app.models.transaction import Transaction, TransactionStatus, TransactionType
 from app.models.service_transaction import ServiceTransaction
@@ -8,13 +8,19 @@ from app.models.transaction_dispute import TransactionDispute, DisputeStatus
 from app.models.broadcast_announcement import BroadcastAnnouncement, AnnouncementLevel
 from app.models.data_plan import DataPlan
 from app.models.pricing_rule import PricingRule, PricingRole, MarginType
-from app.models.api_log import ApiLog
+from app.models.api_log import ApiLog, ApiLogArchive, ApiLogMinute
 from app.models.service_toggle import ServiceToggle
 from app.models.admin_audit_log import AdminAuditLog
 from app.models.virtual_account import VirtualAccount, VirtualAccountProvider, VirtualAccountStatus
-from app.models.agent import RewardCampaign, CampaignType, AgentReward, AgentRewardStatus, AgentStat
+from app.models.agent import RewardCampaign, CampaignType, AgentReward, AgentRewardStatus, AgentStat, CampaignProgress
 from app.models.system_setting import SystemSetting
 from app.models.financial_ledger import FinancialLedger, FinancialCategory, EntryType
+from app.models.leaderboard_score import LeaderboardScore
+from app.models.daily_rollup import DailyRollup
+from app.models.promo import Promo, PromoRedemption
+from app.models.idempotency_key import IdempotencyKey
+from app.models.bulk_purchase import BulkPurchase, BulkPurchaseItem
+from app.models.scheduled_purchase import ScheduledPurchase
 
 __all__ = [
     "User",
@@ -23,6 +29,7 @@ __all__ = [
     "ReferralContribution",
     "ReferralStatus",
     "Wallet",
+    "WalletStripe",
     "WalletLedger",
     "LedgerType",
     "Transaction",
@@ -38,6 +45,8 @@ __all__ = [
     "PricingRole",
     "MarginType",
     "ApiLog",
+    "ApiLogArchive",
+    "ApiLogMinute",
     "ServiceToggle",
     "AdminAuditLog",
     "VirtualAccount",
@@ -48,8 +57,17 @@ __all__ = [
     "AgentReward",
     "AgentRewardStatus",
     "AgentStat",
+    "CampaignProgress",
     "SystemSetting",
     "FinancialLedger",
     "FinancialCategory",
     "EntryType",
+    "LeaderboardScore",
+    "DailyRollup",
+    "Promo",
+    "PromoRedemption",
+    "IdempotencyKey",
+    "BulkPurchase",
+    "BulkPurchaseItem",
+    "ScheduledPurchase",
 ]
@@ -61,3 +61,26 @@ class AgentStat(Base, TimestampMixin):
     total_transactions = Column(Integer, default=0, nullable=False)
 
     agent = relationship("User", foreign_keys=[agent_id])
+
+
+class CampaignProgress(Base, TimestampMixin):
+    """
+    Running per-user totals for a VOLUME campaign since ``window_start``.
+
+    Seeded once from history on first read, then incremented as the user's
+    transactions succeed (see app.services.campaign_progress).
+    """
+
+    __tablename__ = "campaign_progress"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "user_id", name="uq_campaign_progress_campaign_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("reward_campaigns.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    window_start = Column(DateTime(timezone=True), nullable=True)
+    data_mb = Column(Numeric(14, 2), default=0, nullable=False)
+    airtime_amount = Column(Numeric(14, 2), default=0, nullable=False)
+    tx_count = Column(Integer, default=0, nullable=False)
+    is_seeded = Column(Boolean, default=False, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Index
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Numeric, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.base import TimestampMixin
@@ -20,3 +20,45 @@ class ApiLog(Base, TimestampMixin):
 
 
 Index("ix_api_logs_service_status", ApiLog.service, ApiLog.status_code)
+Index("ix_api_logs_created_at", ApiLog.created_at)
+
+
+class ApiLogMinute(Base):
+    """
+    Provider call health per (minute, service), rolled up from api_logs.
+
+    Kept after the raw rows are archived, so API-health numbers never scan
+    api_logs. Percentiles are exact within the minute.
+    """
+
+    __tablename__ = "api_log_minutes"
+    __table_args__ = (
+        UniqueConstraint("minute", "service", name="uq_api_log_minutes_minute_service"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    minute = Column(DateTime(timezone=True), nullable=False)  # UTC, truncated to the minute
+    service = Column(String(64), nullable=False)
+    call_count = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    duration_total_ms = Column(Numeric(14, 2), nullable=False, default=0)
+    duration_p50_ms = Column(Numeric(10, 2), nullable=False, default=0)
+    duration_p95_ms = Column(Numeric(10, 2), nullable=False, default=0)
+    duration_max_ms = Column(Numeric(10, 2), nullable=False, default=0)
+
+
+class ApiLogArchive(Base):
+    """Raw api_logs rows past the retention window, moved out of the hot table as-is."""
+
+    __tablename__ = "api_logs_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=True)
+    service = Column(String(64), nullable=False)
+    endpoint = Column(String(255), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    duration_ms = Column(Numeric(10, 2), nullable=False)
+    reference = Column(String(64), nullable=True, index=True)
+    success = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class BulkPurchase(Base, TimestampMixin):
+    """
+    One bulk order: many data (phone, plan) or airtime (phone, amount) items
+    paid for with a single wallet debit (reference ``batch_id``). Each item is
+    an ordinary DATA transaction, or an airtime service transaction; failed
+    items are refunded together in one credit once the batch has run (see
+    app.services.bulk_purchase).
+    """
+
+    __tablename__ = "bulk_purchases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String(40), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(16), nullable=False, default="data", server_default="data")  # data | airtime
+    source = Column(String(16), nullable=False, default="app")  # app | developer | scheduled
+    status = Column(String(16), nullable=False, default="processing")  # processing | completed
+    item_count = Column(Integer, nullable=False)
+    total_amount = Column(Numeric(12, 2), nullable=False)
+    refunded_amount = Column(Numeric(12, 2), nullable=False, default=0)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the runner while it works; recovery only touches batches whose runner went quiet.
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    items = relationship("BulkPurchaseItem", back_populates="bulk_purchase", order_by="BulkPurchaseItem.position")
+
+
+class BulkPurchaseItem(Base, TimestampMixin):
+    """An item of a bulk order; its status is that of the (service) transaction with the same reference."""
+
+    __tablename__ = "bulk_purchase_items"
+    __table_args__ = (
+        UniqueConstraint("bulk_purchase_id", "position", name="uq_bulk_purchase_items_position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    bulk_purchase_id = Column(Integer, ForeignKey("bulk_purchases.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    reference = Column(String(64), unique=True, nullable=False)
+    phone_number = Column(String(32), nullable=False)
+    plan_code = Column(String(64), nullable=True)  # data items
+    network = Column(String(32), nullable=True)  # airtime items
+    # Airtime sent to the recipient; ``amount`` is what the wallet paid for it.
+    face_value = Column(Numeric(12, 2), nullable=True)
+    amount = Column(Numeric(12, 2), nullable=False)
+
+    bulk_purchase = relationship("BulkPurchase", back_populates="items")
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Date, Integer, String, Numeric, Index, UniqueConstraint
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class DailyRollup(Base, TimestampMixin):
+    """
+    Per-day fact totals behind the admin analytics and finance dashboards.
+
+    One row per (day, kind, tx_type, status, network). Transaction and service
+    rows move between status buckets as their status changes; "api" rows count
+    provider API calls. A nightly job recomputes recent days from the source
+    tables to repair drift.
+    """
+
+    __tablename__ = "daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "kind", "tx_type", "status", "network", name="uq_daily_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)  # UTC calendar day of created_at
+    kind = Column(String(16), nullable=False)  # transaction|service|api
+    tx_type = Column(String(64), nullable=False)  # tx type, or service name for api rows
+    status = Column(String(16), nullable=False)
+    network = Column(String(64), nullable=False, default="")  # network/provider, "" when unknown
+    tx_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(16, 2), nullable=False, default=0)
+    base_cost = Column(Numeric(16, 2), nullable=False, default=0)  # cost_price / service base_amount captured at purchase
+    fee_estimate = Column(Numeric(16, 2), nullable=False, default=0)  # payment gateway fees (wallet funding)
+
+
+Index("ix_daily_rollups_kind_status_day", DailyRollup.kind, DailyRollup.status, DailyRollup.day)
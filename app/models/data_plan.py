@@ -1,8 +1,29 @@
+import re
+
 from sqlalchemy import Column, Integer, String, Numeric, Boolean, Index
+from sqlalchemy.orm import validates
 from app.core.database import Base
 from app.models.base import TimestampMixin
 
 
+def parse_data_size_mb(size_str: str | None) -> int:
+    """Parse labels like "1.5GB" or "500 MB" into whole megabytes (0 if unknown)."""
+    if not size_str:
+        return 0
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(GB|MB)", str(size_str).strip().upper())
+    if not match:
+        return 0
+    val = float(match.group(1))
+    return int(round(val * 1024 if match.group(2) == "GB" else val))
+
+
+def plan_code_suffix(plan_code: str | None) -> str | None:
+    """Provider-local part of a canonical plan code ("amigo:mtn:1001" -> "1001")."""
+    if not plan_code:
+        return None
+    return str(plan_code).split(":")[-1]
+
+
 class DataPlan(Base, TimestampMixin):
     __tablename__ = "data_plans"
 
@@ -23,6 +44,10 @@ class DataPlan(Base, TimestampMixin):
     fallback_provider = Column(String(64), nullable=True, index=True)
     fallback_provider_plan_id = Column(String(64), nullable=True, index=True)
     data_type = Column(String(64), nullable=True, index=True)
+    # Derived from data_size/plan_code so volume reports can aggregate in SQL
+    # and match legacy (non-canonical) plan codes with an indexed lookup.
+    data_size_mb = Column(Integer, nullable=True)
+    plan_code_suffix = Column(String(64), nullable=True, index=True)
 
     # Marketing/Promotion Fields
     promo_active = Column(Boolean, default=False, nullable=False)
@@ -31,6 +56,16 @@ class DataPlan(Base, TimestampMixin):
     cashback_amount = Column(Numeric(12, 2), nullable=True, default=None)
     cashback_label = Column(String(255), nullable=True, default=None)
 
+    @validates("data_size")
+    def _derive_data_size_mb(self, key, value):
+        self.data_size_mb = parse_data_size_mb(value)
+        return value
+
+    @validates("plan_code")
+    def _derive_plan_code_suffix(self, key, value):
+        self.plan_code_suffix = plan_code_suffix(value)
+        return value
+
 
 Index("ix_data_plans_network_active", DataPlan.network, DataPlan.is_active)
 Index("ix_data_plans_promo_active", DataPlan.promo_active)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, JSON, String, UniqueConstraint, func
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class IdempotencyKey(Base, TimestampMixin):
+    """
+    A purchase request identified by the client's Idempotency-Key header (or
+    ``client_request_id``), scoped to the user.
+
+    The row is written ``in_flight`` before any wallet or provider work and
+    holds the final response once the request finishes, so retries are
+    answered from here. ``claimed_at`` lets a retry take over a claim whose
+    request died without finishing it.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(128), nullable=False)
+    scope = Column(String(64), nullable=False)  # endpoint, e.g. "data.purchase"
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False, default="in_flight")  # in_flight | completed
+    response_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
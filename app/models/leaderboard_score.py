@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Index, UniqueConstraint
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class LeaderboardScore(Base, TimestampMixin):
+    """
+    Materialized monthly leaderboard totals, one row per (month, user).
+
+    Rows are maintained incrementally as transactions enter/leave SUCCESS so the
+    leaderboard never has to aggregate the month's transactions on read.
+    """
+
+    __tablename__ = "leaderboard_scores"
+    __table_args__ = (
+        UniqueConstraint("month", "user_id", name="uq_leaderboard_scores_month_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String(7), nullable=False)  # "YYYY-MM" (UTC)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    score = Column(Numeric(14, 2), nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+
+Index("ix_leaderboard_scores_month_score", LeaderboardScore.month, LeaderboardScore.score)
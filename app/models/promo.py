@@ -0,0 +1,42 @@
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, Numeric, String, UniqueConstraint
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class Promo(Base, TimestampMixin):
+    """
+    A limited-stock promo price on a data plan (e.g. MTN 1GB at N199 for the
+    first 50 users).
+
+    ``remaining`` is the live stock counter: a redemption is a single
+    conditional decrement, so availability checks never scan transactions.
+    """
+
+    __tablename__ = "promos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String(64), unique=True, nullable=False)
+    network = Column(String(32), nullable=False)
+    plan_code = Column(String(64), nullable=False)  # provider-agnostic plan code suffix, e.g. "1001"
+    price = Column(Numeric(12, 2), nullable=False)
+    stock_limit = Column(Integer, nullable=False, default=0)
+    remaining = Column(Integer, nullable=False, default=0)
+    is_active = Column(Boolean, nullable=False, default=True)
+
+
+class PromoRedemption(Base, TimestampMixin):
+    """One row per user who holds a promo; released again if the purchase fails or is refunded."""
+
+    __tablename__ = "promo_redemptions"
+    __table_args__ = (
+        UniqueConstraint("promo_id", "user_id", name="uq_promo_redemptions_promo_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    promo_id = Column(Integer, ForeignKey("promos.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    transaction_reference = Column(String(64), nullable=False, index=True)
+    amount = Column(Numeric(12, 2), nullable=False)
+
+
+Index("ix_promos_network_plan_code", Promo.network, Promo.plan_code)
@@ -70,4 +70,5 @@ class ReferralContribution(Base, TimestampMixin):
 
 
 Index("ix_referrals_referrer_status", Referral.referrer_id, Referral.status)
+Index("ix_referrals_referrer_created_at", Referral.referrer_id, Referral.created_at)
 Index("ix_referral_contributions_referral_reversed", ReferralContribution.referral_id, ReferralContribution.reversed_at)
@@ -0,0 +1,37 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class ScheduledPurchase(Base, TimestampMixin):
+    """
+    A data plan or airtime top-up bought for ``phone_number`` on a schedule
+    (once, daily, weekly or monthly). Due schedules are claimed in windows and
+    bought as bulk batches (see app.services.scheduled_purchases).
+    """
+
+    __tablename__ = "scheduled_purchases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(16), nullable=False)  # data | airtime
+    phone_number = Column(String(32), nullable=False)
+    plan_code = Column(String(64), nullable=True)  # data
+    network = Column(String(32), nullable=True)  # airtime
+    amount = Column(Numeric(12, 2), nullable=True)  # airtime face value
+    interval = Column(String(16), nullable=False)  # once | daily | weekly | monthly
+    # Day of month of the requested first run; monthly runs are clamped from it.
+    anchor_day = Column(Integer, nullable=True)
+    # Spread offset added to every requested run time.
+    offset_seconds = Column(Integer, nullable=False, default=0)
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    last_reference = Column(String(64), nullable=True)
+    last_status = Column(String(24), nullable=True)
+    last_error = Column(String(255), nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0)
+
+
+# The claim query: active schedules by due time.
+Index("ix_scheduled_purchases_due", ScheduledPurchase.is_active, ScheduledPurchase.next_run_at)
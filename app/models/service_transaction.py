@@ -36,5 +36,35 @@ class ServiceTransaction(Base, TimestampMixin):
 
 Index("ix_service_transactions_user_status", ServiceTransaction.user_id, ServiceTransaction.status)
 Index("ix_service_transactions_created_at", ServiceTransaction.created_at)
+Index("ix_service_transactions_user_created_at", ServiceTransaction.user_id, ServiceTransaction.created_at)
+Index("ix_service_transactions_customer", ServiceTransaction.customer)
 
+# Admin search (app.services.search): pg_trgm GIN indexes on Postgres. Columns
+# without another index keep a plain btree elsewhere for prefix matching.
+Index(
+    "ix_service_transactions_reference_trgm", ServiceTransaction.reference,
+    postgresql_using="gin", postgresql_ops={"reference": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_service_transactions_external_reference_trgm", ServiceTransaction.external_reference,
+    postgresql_using="gin", postgresql_ops={"external_reference": "gin_trgm_ops"},
+)
+Index(
+    "ix_service_transactions_product_code_trgm", ServiceTransaction.product_code,
+    postgresql_using="gin", postgresql_ops={"product_code": "gin_trgm_ops"},
+)
 
+# Prefix search on Postgres: LIKE 'x%' needs text_pattern_ops under a non-C
+# collation. Other dialects use the plain btree indexes above.
+Index(
+    "ix_service_transactions_reference_prefix", ServiceTransaction.reference,
+    postgresql_ops={"reference": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_service_transactions_external_reference_prefix", ServiceTransaction.external_reference,
+    postgresql_ops={"external_reference": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_service_transactions_customer_prefix", ServiceTransaction.customer,
+    postgresql_ops={"customer": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
@@ -1,6 +1,7 @@
 import enum
+from decimal import Decimal
 from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Enum, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.core.database import Base
 from app.models.base import TimestampMixin
 
@@ -38,11 +39,55 @@ class Transaction(Base, TimestampMixin):
     provider = Column(String(64), nullable=True, index=True)
     provider_plan_id = Column(String(64), nullable=True, index=True)
     failure_reason = Column(String(255), nullable=True)
+    # Provider cost and margin captured when the purchase is made, so finance
+    # sums never depend on today's plan catalog. NULL for non-purchase rows.
+    cost_price = Column(Numeric(12, 2), nullable=True)
+    margin = Column(Numeric(12, 2), nullable=True)
 
     user = relationship("User", back_populates="transactions")
 
+    @validates("amount", "cost_price")
+    def _sync_margin(self, key, value):
+        amount = value if key == "amount" else self.__dict__.get("amount")
+        cost_price = value if key == "cost_price" else self.__dict__.get("cost_price")
+        if amount is not None and cost_price is not None:
+            self.margin = Decimal(str(amount)) - Decimal(str(cost_price))
+        return value
+
 
 Index("ix_transactions_user_status", Transaction.user_id, Transaction.status)
-Index("ix_transactions_type_status", Transaction.tx_type, Transaction.status)
+# Pending reconciler: tx_type/status equality, oldest created_at first.
+Index("ix_transactions_type_status_created_at", Transaction.tx_type, Transaction.status, Transaction.created_at)
+Index("ix_transactions_user_created_at", Transaction.user_id, Transaction.created_at)
 Index("ix_transactions_created_at", Transaction.created_at)
+Index("ix_transactions_recipient_phone", Transaction.recipient_phone)
+
+# Admin search (app.services.search): pg_trgm GIN indexes on Postgres. Columns
+# without another index keep a plain btree elsewhere for prefix matching.
+Index(
+    "ix_transactions_reference_trgm", Transaction.reference,
+    postgresql_using="gin", postgresql_ops={"reference": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_transactions_external_reference_trgm", Transaction.external_reference,
+    postgresql_using="gin", postgresql_ops={"external_reference": "gin_trgm_ops"},
+)
+Index(
+    "ix_transactions_data_plan_code_trgm", Transaction.data_plan_code,
+    postgresql_using="gin", postgresql_ops={"data_plan_code": "gin_trgm_ops"},
+)
 
+# Prefix search on Postgres: LIKE 'x%' needs text_pattern_ops under a non-C
+# collation. Other dialects use the plain btree indexes above.
+Index(
+    "ix_transactions_reference_prefix", Transaction.reference,
+    postgresql_ops={"reference": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_transactions_external_reference_prefix", Transaction.external_reference,
+    postgresql_ops={"external_reference": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_transactions_recipient_phone_prefix", Transaction.recipient_phone,
+    postgresql_ops={"recipient_phone": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, Enum, Index, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Enum, Index, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.base import TimestampMixin
@@ -71,3 +71,28 @@ class User(Base, TimestampMixin):
 
 
 Index("ix_users_role_active", User.role, User.is_active)
+
+# Admin search (app.services.search): pg_trgm GIN indexes on Postgres. Columns
+# without another index keep a plain btree elsewhere for prefix matching.
+Index(
+    "ix_users_email_trgm", User.email,
+    postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_users_phone_number_trgm", User.phone_number,
+    postgresql_using="gin", postgresql_ops={"phone_number": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_users_full_name_trgm", User.full_name,
+    postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"},
+)
+# Prefix search: emails match on lower(email) on every dialect. On Postgres,
+# LIKE 'x%' needs text_pattern_ops under a non-C collation.
+Index(
+    "ix_users_email_lower", func.lower(User.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_users_phone_number_prefix", User.phone_number,
+    postgresql_ops={"phone_number": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
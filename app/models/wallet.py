@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, Boolean, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Boolean, Index, UniqueConstraint, func, select
+from sqlalchemy.orm import column_property, relationship
 from app.core.database import Base
 from app.models.base import TimestampMixin
 
@@ -9,11 +9,41 @@ class Wallet(Base, TimestampMixin):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    # With striping enabled this is the unallocated part of the balance; the
+    # rest sits in wallet_stripes (see total_balance).
     balance = Column(Numeric(12, 2), default=0, nullable=False)
     is_locked = Column(Boolean, default=False, nullable=False)
+    # Bumped on every balance change; orders snapshots in the balance read cache.
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Number of wallet_stripes rows debits are spread over; 0 = single-row wallet.
+    stripe_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     user = relationship("User", back_populates="wallet")
     ledger_entries = relationship("WalletLedger", back_populates="wallet")
 
 
+class WalletStripe(Base, TimestampMixin):
+    """A sub-balance of a striped wallet, so concurrent debits lock different rows."""
+
+    __tablename__ = "wallet_stripes"
+    __table_args__ = (UniqueConstraint("wallet_id", "stripe_no", name="uq_wallet_stripes_wallet_stripe"),)
+
+    id = Column(Integer, primary_key=True)
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False)
+    stripe_no = Column(Integer, nullable=False)
+    balance = Column(Numeric(12, 2), default=0, server_default="0", nullable=False)
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+
+
 Index("ix_wallets_user_id", Wallet.user_id)
+
+# What the user sees as their balance: the wallet row plus its stripes.
+# Deferred, so only code that reads it pays for the subquery.
+Wallet.total_balance = column_property(
+    Wallet.balance
+    + select(func.coalesce(func.sum(WalletStripe.balance), 0))
+    .where(WalletStripe.wallet_id == Wallet.id)
+    .correlate_except(WalletStripe)
+    .scalar_subquery(),
+    deferred=True,
+)
@@ -24,3 +24,6 @@ class WalletLedger(Base, TimestampMixin):
 
 
 Index("ix_wallet_ledger_wallet_id_type", WalletLedger.wallet_id, WalletLedger.entry_type)
+# Duplicate-entry check in credit/debit (app.services.wallet._find_matching_ledger).
+Index("ix_wallet_ledger_wallet_reference_type", WalletLedger.wallet_id, WalletLedger.reference, WalletLedger.entry_type)
+Index("ix_wallet_ledger_wallet_created_at", WalletLedger.wallet_id, WalletLedger.created_at)
@@ -61,6 +61,8 @@ class AdminTransactionsResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 
 class AdminUserOut(BaseModel):
@@ -83,6 +85,8 @@ class AdminUsersResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 
 class AdminReportOut(BaseModel):
@@ -106,6 +110,8 @@ class AdminReportsResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 
 class AdminReportActionRequest(BaseModel):
@@ -120,6 +126,10 @@ class AdjustWalletRequest(BaseModel):
     reason: str
 
 
+class WalletStripesRequest(BaseModel):
+    stripes: int  # 0 turns striping off
+
+
 class ReconcileTransactionRequest(BaseModel):
     reference: str
     note: Optional[str] = None
@@ -228,6 +238,8 @@ class AdminAuditLogsResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 
 class AdminReferralOut(BaseModel):
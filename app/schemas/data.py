@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 
 class DataPlanOut(BaseModel):
@@ -33,3 +33,14 @@ class BuyDataRequest(BaseModel):
     phone_number: str
     ported_number: bool = True
     network: Optional[str] = None
+
+
+class BulkDataItem(BaseModel):
+    plan_code: str
+    phone_number: str
+    network: Optional[str] = None
+
+
+class BulkDataPurchaseRequest(BaseModel):
+    client_request_id: Optional[str] = Field(default=None, max_length=128)
+    items: List[BulkDataItem]
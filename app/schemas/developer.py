@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
 
 # Pydantic v1 since project uses Pydantic v1.x
@@ -41,6 +41,10 @@ class DeveloperDataPurchaseRequest(BaseModel):
     reference: str = Field(..., description="Unique developer transaction reference")
 
 
+class DeveloperBulkDataPurchaseRequest(BaseModel):
+    items: List[DeveloperDataPurchaseRequest] = Field(..., description="Data purchases to make in one batch")
+
+
 class DeveloperAirtimePurchaseRequest(BaseModel):
     phone_number: str = Field(..., description="Recipient phone number")
     network: str = Field(..., description="MTN, GLO, AIRTEL, or 9MOBILE")
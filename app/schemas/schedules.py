@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional
+
+
+class ScheduledPurchaseCreate(BaseModel):
+    kind: str = Field(..., regex="^(data|airtime)$")
+    phone_number: str = Field(..., min_length=7, max_length=20)
+    interval: str = Field("monthly", regex="^(once|daily|weekly|monthly)$")
+    # Defaults to now; the first run is spread up to a couple of hours after it.
+    start_at: Optional[datetime] = None
+    # data
+    plan_code: Optional[str] = Field(default=None, max_length=64)
+    # airtime (network inferred from the number when omitted) and data plan lookups
+    network: Optional[str] = Field(default=None, min_length=2, max_length=32)
+    amount: Optional[Decimal] = Field(default=None, gt=0)
+
+
+class ScheduledPurchaseOut(BaseModel):
+    id: int
+    kind: str
+    phone_number: str
+    plan_code: Optional[str] = None
+    network: Optional[str] = None
+    amount: Optional[Decimal] = None
+    interval: str
+    next_run_at: datetime
+    is_active: bool
+    last_run_at: Optional[datetime] = None
+    last_reference: Optional[str] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+    failure_count: int = 0
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
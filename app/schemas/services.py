@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from decimal import Decimal
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 
 class AirtimePurchaseRequest(BaseModel):
@@ -10,6 +10,19 @@ class AirtimePurchaseRequest(BaseModel):
     amount: Decimal = Field(..., gt=0)
 
 
+
+class BulkAirtimeItem(BaseModel):
+    phone_number: str = Field(..., min_length=7, max_length=20)
+    amount: Decimal = Field(..., gt=0)
+    # Inferred from the number's prefix when omitted.
+    network: Optional[str] = Field(default=None, min_length=2, max_length=32)
+
+
+class BulkAirtimePurchaseRequest(BaseModel):
+    client_request_id: Optional[str] = Field(default=None, max_length=128)
+    items: List[BulkAirtimeItem]
+
+
 class CablePurchaseRequest(BaseModel):
     client_request_id: Optional[str] = Field(default=None, max_length=128)
     provider: str = Field(..., min_length=2, max_length=64)
@@ -1,38 +1,74 @@
 from datetime import datetime, timezone, date
 from decimal import Decimal
+import logging
+
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, literal, select, update
+from sqlalchemy.exc import IntegrityError
 
 from app.models.user import User, UserRole
 from app.models.transaction import Transaction, TransactionStatus, TransactionType
 from app.models.service_transaction import ServiceTransaction
 from app.models.wallet import Wallet
-from app.models.agent import RewardCampaign, AgentReward, AgentStat, CampaignType
+from app.models.data_plan import DataPlan, parse_data_size_mb, plan_code_suffix
+from app.models.agent import RewardCampaign, AgentReward, AgentRewardStatus, AgentStat, CampaignType, CampaignProgress
 from app.models.referral import Referral, ReferralStatus
+from app.services.transaction_events import StatusChange, on_status_change
+
+logger = logging.getLogger(__name__)
+
+NAIRA_PER_GB_ESTIMATE = 400.0
+DATA_METRICS = ("data_volume_gb", "data_gb")
+AIRTIME_METRICS = ("airtime_volume", "airtime_amount")
 
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
-import re
+def resolve_plan_sizes_mb(db: Session | Connection, codes) -> dict[str, int]:
+    """
+    Map plan codes to data sizes in MB using the precomputed DataPlan columns.
+
+    Codes are matched exactly first, then by provider-local suffix (legacy rows
+    store "1001" where the plan is now "amigo:mtn:1001"). Unknown codes are left
+    out so callers can fall back to an amount-based estimate.
+    """
+    codes = {str(code) for code in codes if code}
+    if not codes:
+        return {}
+    suffixes = {plan_code_suffix(code) for code in codes}
+    rows = db.execute(
+        select(DataPlan.plan_code, DataPlan.plan_code_suffix, DataPlan.data_size, DataPlan.data_size_mb)
+        .where(or_(DataPlan.plan_code.in_(codes), DataPlan.plan_code_suffix.in_(suffixes)))
+        .order_by(DataPlan.id.asc())
+    ).all()
+    exact: dict[str, int] = {}
+    by_suffix: dict[str, int] = {}
+    for row in rows:
+        mb = row.data_size_mb if row.data_size_mb is not None else parse_data_size_mb(row.data_size)
+        exact[row.plan_code] = mb
+        by_suffix.setdefault(row.plan_code_suffix or plan_code_suffix(row.plan_code), mb)
+
+    resolved: dict[str, int] = {}
+    for code in codes:
+        if code in exact:
+            resolved[code] = exact[code]
+        elif plan_code_suffix(code) in by_suffix:
+            resolved[code] = by_suffix[plan_code_suffix(code)]
+    return resolved
+
+
+def _data_gb(sizes_mb: dict[str, int], code: str | None, count: int, amount: Decimal) -> float:
+    mb = sizes_mb.get(code) if code else None
+    if mb is None:
+        return float(amount or 0) / NAIRA_PER_GB_ESTIMATE  # Fallback to estimation based on N400/GB
+    return (mb / 1024.0) * count
 
-def _parse_size_gb(size_str: str | None) -> float:
-    if not size_str:
-        return 0.0
-    try:
-        s = str(size_str).strip().upper()
-        match = re.search(r"(\d+(?:\.\d+)?)\s*(GB|MB)", s)
-        if not match:
-            return 0.0
-        val = float(match.group(1))
-        unit = match.group(2)
-        return val if unit == "GB" else val / 1024.0
-    except Exception:
-        return 0.0
 
 def get_agent_dashboard_stats(db: Session, user: User) -> dict:
     wallet = db.query(Wallet).filter(Wallet.user_id == user.id).first()
-    wallet_balance = wallet.balance if wallet else Decimal("0.00")
+    wallet_balance = wallet.total_balance if wallet else Decimal("0.00")
 
     now = _utcnow()
     today_start = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
@@ -48,61 +84,78 @@ def get_agent_dashboard_stats(db: Session, user: User) -> dict:
         today_start = today_start.replace(tzinfo=None)
         month_start = month_start.replace(tzinfo=None)
 
-    # Calculate Data and Airtime Sales
-    today_txs = db.query(Transaction).filter(
-        Transaction.user_id == user.id,
-        Transaction.status == TransactionStatus.SUCCESS,
-        Transaction.created_at >= today_start
-    ).all()
-    
-    today_svc_txs = db.query(ServiceTransaction).filter(
-        ServiceTransaction.user_id == user.id,
-        ServiceTransaction.status == "success",
-        ServiceTransaction.created_at >= today_start
-    ).all()
+    # Aggregate the month's successful sales in SQL, grouped by plan code so GB
+    # can be derived per distinct plan instead of per transaction.
+    tx_is_today = Transaction.created_at >= today_start
+    tx_rows = (
+        db.query(
+            Transaction.tx_type,
+            Transaction.data_plan_code,
+            func.sum(case((tx_is_today, 1), else_=0)).label("today_count"),
+            func.sum(case((tx_is_today, Transaction.amount), else_=0)).label("today_amount"),
+            func.count(Transaction.id).label("month_count"),
+            func.sum(Transaction.amount).label("month_amount"),
+        )
+        .filter(
+            Transaction.user_id == user.id,
+            Transaction.status == TransactionStatus.SUCCESS,
+            Transaction.created_at >= month_start,
+            Transaction.tx_type.in_([TransactionType.DATA, TransactionType.AIRTIME]),
+        )
+        .group_by(Transaction.tx_type, Transaction.data_plan_code)
+        .all()
+    )
+
+    svc_type = func.lower(ServiceTransaction.tx_type)
+    svc_is_today = ServiceTransaction.created_at >= today_start
+    svc_rows = (
+        db.query(
+            svc_type.label("tx_type"),
+            ServiceTransaction.product_code,
+            func.sum(case((svc_is_today, 1), else_=0)).label("today_count"),
+            func.sum(case((svc_is_today, ServiceTransaction.amount), else_=0)).label("today_amount"),
+            func.count(ServiceTransaction.id).label("month_count"),
+            func.sum(ServiceTransaction.amount).label("month_amount"),
+        )
+        .filter(
+            ServiceTransaction.user_id == user.id,
+            ServiceTransaction.status == "success",
+            ServiceTransaction.created_at >= month_start,
+            svc_type.in_(["data", "airtime"]),
+        )
+        .group_by(svc_type, ServiceTransaction.product_code)
+        .all()
+    )
+
+    # (is_data, plan_code, today_count, today_amount, month_count, month_amount)
+    groups = [
+        (row.tx_type == TransactionType.DATA, row.data_plan_code, row.today_count, row.today_amount, row.month_count, row.month_amount)
+        for row in tx_rows
+    ] + [
+        (row.tx_type == "data", row.product_code, row.today_count, row.today_amount, row.month_count, row.month_amount)
+        for row in svc_rows
+    ]
+
+    sizes_mb = resolve_plan_sizes_mb(db, [code for is_data, code, *_ in groups if is_data])
 
     today_data_naira = Decimal("0.00")
     today_airtime_naira = Decimal("0.00")
-    
-    for tx in today_txs:
-        if tx.tx_type == TransactionType.DATA:
-            today_data_naira += tx.amount
-        elif tx.tx_type == TransactionType.AIRTIME:
-            today_airtime_naira += tx.amount
-            
-    for stx in today_svc_txs:
-        if stx.tx_type.lower() == "airtime":
-            today_airtime_naira += stx.amount
-        elif stx.tx_type.lower() == "data":
-            today_data_naira += stx.amount
-
-    # -- MONTH --
-    month_txs = db.query(Transaction).filter(
-        Transaction.user_id == user.id,
-        Transaction.status == TransactionStatus.SUCCESS,
-        Transaction.created_at >= month_start
-    ).all()
-    
-    month_svc_txs = db.query(ServiceTransaction).filter(
-        ServiceTransaction.user_id == user.id,
-        ServiceTransaction.status == "success",
-        ServiceTransaction.created_at >= month_start
-    ).all()
-
     month_data_naira = Decimal("0.00")
     month_airtime_naira = Decimal("0.00")
-    
-    for tx in month_txs:
-        if tx.tx_type == TransactionType.DATA:
-            month_data_naira += tx.amount
-        elif tx.tx_type == TransactionType.AIRTIME:
-            month_airtime_naira += tx.amount
-            
-    for stx in month_svc_txs:
-        if stx.tx_type.lower() == "airtime":
-            month_airtime_naira += stx.amount
-        elif stx.tx_type.lower() == "data":
-            month_data_naira += stx.amount
+    today_data_gb = 0.0
+    month_data_gb = 0.0
+
+    for is_data, code, today_count, today_amount, month_count, month_amount in groups:
+        today_amount = Decimal(str(today_amount or 0))
+        month_amount = Decimal(str(month_amount or 0))
+        if is_data:
+            today_data_naira += today_amount
+            month_data_naira += month_amount
+            today_data_gb += _data_gb(sizes_mb, code, int(today_count or 0), today_amount)
+            month_data_gb += _data_gb(sizes_mb, code, int(month_count or 0), month_amount)
+        else:
+            today_airtime_naira += today_amount
+            month_airtime_naira += month_amount
 
     # Total Tx Count
     total_tx_count = db.query(Transaction).filter(Transaction.user_id == user.id).count() + \
@@ -110,71 +163,6 @@ def get_agent_dashboard_stats(db: Session, user: User) -> dict:
 
     # Agent Status
     agent_status = "Active" if (month_data_naira > 5000 or month_airtime_naira > 5000) else "Inactive"
-    
-    # Map exact plan sizes to calculate real GB sold
-    from app.models.data_plan import DataPlan
-    all_plans = db.query(DataPlan).all()
-    plan_map = {p.plan_code: _parse_size_gb(p.data_size) for p in all_plans}
-
-    today_data_gb = 0.0
-    for tx in today_txs:
-        if tx.tx_type == TransactionType.DATA:
-            gb = plan_map.get(tx.data_plan_code, None)
-            if gb is None and tx.data_plan_code:
-                parts = str(tx.data_plan_code).split(":")
-                raw_code = parts[-1]
-                for code, size in plan_map.items():
-                    if code.split(":")[-1] == raw_code:
-                        gb = size
-                        break
-            if gb is None:
-                gb = float(tx.amount) / 400.0  # Fallback to estimation based on N400/GB
-            today_data_gb += gb or 0.0
-
-    for stx in today_svc_txs:
-        if stx.tx_type.lower() == "data":
-            prod_code = getattr(stx, "product_code", "")
-            gb = plan_map.get(prod_code, None)
-            if gb is None and prod_code:
-                parts = str(prod_code).split(":")
-                raw_code = parts[-1]
-                for code, size in plan_map.items():
-                    if code.split(":")[-1] == raw_code:
-                        gb = size
-                        break
-            if gb is None:
-                gb = float(stx.amount) / 400.0
-            today_data_gb += gb or 0.0
-
-    month_data_gb = 0.0
-    for tx in month_txs:
-        if tx.tx_type == TransactionType.DATA:
-            gb = plan_map.get(tx.data_plan_code, None)
-            if gb is None and tx.data_plan_code:
-                parts = str(tx.data_plan_code).split(":")
-                raw_code = parts[-1]
-                for code, size in plan_map.items():
-                    if code.split(":")[-1] == raw_code:
-                        gb = size
-                        break
-            if gb is None:
-                gb = float(tx.amount) / 400.0
-            month_data_gb += gb or 0.0
-
-    for stx in month_svc_txs:
-        if stx.tx_type.lower() == "data":
-            prod_code = getattr(stx, "product_code", "")
-            gb = plan_map.get(prod_code, None)
-            if gb is None and prod_code:
-                parts = str(prod_code).split(":")
-                raw_code = parts[-1]
-                for code, size in plan_map.items():
-                    if code.split(":")[-1] == raw_code:
-                        gb = size
-                        break
-            if gb is None:
-                gb = float(stx.amount) / 400.0
-            month_data_gb += gb or 0.0
 
     return {
         "wallet_balance": wallet_balance,
@@ -187,146 +175,265 @@ def get_agent_dashboard_stats(db: Session, user: User) -> dict:
         "performance_summary": f"Great job! You've sold {round(month_data_gb, 1)}GB this month."
     }
 
+def _naive_utc(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _campaign_start(campaign: RewardCampaign) -> datetime | None:
+    return _naive_utc(campaign.activated_at or campaign.created_at)
+
+
+def _success_totals_since(db: Session, user_id: int, start: datetime | None) -> tuple[Decimal, Decimal, int]:
+    """(data_mb, airtime_naira, success_count) for a user's successful purchases since start."""
+    tx_query = db.query(
+        Transaction.tx_type,
+        Transaction.data_plan_code,
+        func.count(Transaction.id).label("count"),
+        func.sum(Transaction.amount).label("amount"),
+    ).filter(Transaction.user_id == user_id, Transaction.status == TransactionStatus.SUCCESS)
+    svc_type = func.lower(ServiceTransaction.tx_type)
+    svc_query = db.query(
+        svc_type.label("tx_type"),
+        ServiceTransaction.product_code,
+        func.count(ServiceTransaction.id).label("count"),
+        func.sum(ServiceTransaction.amount).label("amount"),
+    ).filter(ServiceTransaction.user_id == user_id, ServiceTransaction.status == "success")
+    if start is not None:
+        tx_query = tx_query.filter(Transaction.created_at >= start)
+        svc_query = svc_query.filter(ServiceTransaction.created_at >= start)
+    tx_rows = tx_query.group_by(Transaction.tx_type, Transaction.data_plan_code).all()
+    svc_rows = svc_query.group_by(svc_type, ServiceTransaction.product_code).all()
+
+    data_groups = [(row.data_plan_code, row.count, row.amount) for row in tx_rows if row.tx_type == TransactionType.DATA]
+    # Service-side data rows without a product code never counted toward volume.
+    data_groups += [(row.product_code, row.count, row.amount) for row in svc_rows if row.tx_type == "data" and row.product_code]
+    sizes_mb = resolve_plan_sizes_mb(db, [code for code, _, _ in data_groups])
+
+    data_gb = sum(_data_gb(sizes_mb, code, int(count or 0), Decimal(str(amount or 0))) for code, count, amount in data_groups)
+    airtime = sum(
+        (Decimal(str(row.amount or 0)) for row in tx_rows if row.tx_type == TransactionType.AIRTIME),
+        Decimal("0.00"),
+    ) + sum((Decimal(str(row.amount or 0)) for row in svc_rows if row.tx_type == "airtime"), Decimal("0.00"))
+    count = sum(int(row.count or 0) for row in tx_rows) + sum(int(row.count or 0) for row in svc_rows)
+    return Decimal(str(round(data_gb * 1024.0, 2))), airtime, count
+
+
+def _seed_campaign_progress(db: Session, campaign: RewardCampaign, user_id: int, *, force: bool = False) -> CampaignProgress:
+    start = _campaign_start(campaign)
+    row = (
+        db.query(CampaignProgress)
+        .filter(CampaignProgress.campaign_id == campaign.id, CampaignProgress.user_id == user_id)
+        .first()
+    )
+    if row is None:
+        # Commit an empty row first so concurrent successes increment it while
+        # the history below is computed under the row lock. A success that
+        # inserted the row itself makes this conflict once it commits.
+        db.add(CampaignProgress(campaign_id=campaign.id, user_id=user_id, window_start=start, is_seeded=False))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+    row = (
+        db.query(CampaignProgress)
+        .filter(CampaignProgress.campaign_id == campaign.id, CampaignProgress.user_id == user_id)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    if not force and row.is_seeded and _naive_utc(row.window_start) == start:
+        db.commit()
+        return row
+
+    data_mb, airtime, count = _success_totals_since(db, user_id, start)
+    row.window_start = start
+    row.data_mb = data_mb
+    row.airtime_amount = airtime
+    row.tx_count = count
+    row.is_seeded = True
+    db.commit()
+    return row
+
+
+def _campaign_progress_rows(db: Session, campaigns: list[RewardCampaign], user_id: int) -> dict[int, CampaignProgress]:
+    """One indexed lookup for all campaigns; rows missing or stale (re-activated) are reseeded."""
+    volume = [camp for camp in campaigns if camp.campaign_type == CampaignType.VOLUME]
+    if not volume:
+        return {}
+    rows = {
+        row.campaign_id: row
+        for row in db.query(CampaignProgress).filter(
+            CampaignProgress.user_id == user_id,
+            CampaignProgress.campaign_id.in_([camp.id for camp in volume]),
+        )
+    }
+    for camp in volume:
+        row = rows.get(camp.id)
+        if row is None or not row.is_seeded or _naive_utc(row.window_start) != _campaign_start(camp):
+            rows[camp.id] = _seed_campaign_progress(db, camp, user_id)
+    return rows
+
+
+def _campaign_progress_value(db: Session, campaign: RewardCampaign, user: User, row: CampaignProgress | None) -> float:
+    if campaign.campaign_type == CampaignType.VOLUME:
+        if row is None:
+            return 0.0
+        if campaign.target_metric in DATA_METRICS:
+            return float(row.data_mb or 0) / 1024.0
+        if campaign.target_metric in AIRTIME_METRICS:
+            return float(row.airtime_amount or 0)
+        if campaign.target_metric == "transactions":
+            return float(row.tx_count or 0)
+        return 0.0
+
+    if campaign.campaign_type == CampaignType.REFERRAL:
+        # Qualified referrals since the campaign was created
+        query = db.query(func.count(Referral.id)).filter(
+            Referral.referrer_id == user.id,
+            Referral.status.in_([ReferralStatus.QUALIFIED, ReferralStatus.REWARDED]),
+        )
+        camp_time = _naive_utc(campaign.created_at)
+        if camp_time is not None:
+            query = query.filter(Referral.created_at >= camp_time)
+        return float(query.scalar() or 0)
+    return 0.0
+
+
+def _moves_campaign_progress(change: StatusChange) -> bool:
+    success = TransactionStatus.SUCCESS.value
+    return change.became(success) or change.left(success)
+
+
+@on_status_change(wants=_moves_campaign_progress)
+def apply_campaign_progress_changes(connection: Connection, changes: list[StatusChange]) -> None:
+    success = TransactionStatus.SUCCESS.value
+    sizes_mb = resolve_plan_sizes_mb(
+        connection,
+        [change.product_code for change in changes if change.tx_type == "data"],
+    )
+    table = CampaignProgress.__table__
+    is_sqlite = connection.dialect.name == "sqlite"
+    for change in changes:
+        sign = 1 if change.became(success) else -1
+        data_mb = 0.0
+        airtime = Decimal("0")
+        if change.tx_type == "data" and (change.kind == "transaction" or change.product_code):
+            mb = sizes_mb.get(change.product_code) if change.product_code else None
+            if mb is None:
+                mb = float(change.amount) / NAIRA_PER_GB_ESTIMATE * 1024.0
+            data_mb = mb
+        elif change.tx_type == "airtime":
+            airtime = change.amount
+
+        occurred_at = change.created_at.replace(tzinfo=None) if is_sqlite else change.created_at
+        deltas = {
+            "data_mb": Decimal(str(round(data_mb, 2))) * sign,
+            "airtime_amount": airtime * sign,
+            "tx_count": sign,
+        }
+        _bump_campaign_progress(connection, table, change.user_id, occurred_at, deltas)
+
+
+def _bump_campaign_progress(connection: Connection, table, user_id: int, occurred_at: datetime, deltas: dict) -> None:
+    """Add ``deltas`` to the user's rows for active volume campaigns whose window includes ``occurred_at``.
+
+    Unseeded rows are updated (and missing ones inserted unseeded) too, so the
+    increment always holds the row lock. A seed running concurrently then
+    either waits for this transaction and reads it from history, or holds the
+    lock first and this increment lands on top of the seeded totals. Seeds
+    overwrite the counters, so deltas on unseeded rows are never double counted.
+    """
+    in_window = or_(table.c.window_start.is_(None), table.c.window_start <= occurred_at)
+    increments = {name: table.c[name] + value for name, value in deltas.items()}
+    active_campaigns = select(RewardCampaign.id).where(RewardCampaign.is_active == True)
+    dialect = connection.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        connection.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.campaign_id.in_(active_campaigns), in_window)
+            .values(updated_at=func.now(), **increments)
+        )
+        return
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    campaign_start = func.coalesce(RewardCampaign.activated_at, RewardCampaign.created_at)
+    campaigns = select(
+        RewardCampaign.id,
+        literal(user_id),
+        campaign_start,
+        *(literal(value) for value in deltas.values()),
+        literal(False),
+    ).where(
+        RewardCampaign.is_active == True,
+        RewardCampaign.campaign_type == CampaignType.VOLUME,
+        campaign_start <= occurred_at,
+    )
+    stmt = dialect_insert(table).from_select(
+        ["campaign_id", "user_id", "window_start", *deltas, "is_seeded"], campaigns
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.campaign_id, table.c.user_id],
+        set_={"updated_at": func.now(), **increments},
+        where=in_window,
+    )
+    connection.execute(stmt)
+
+
+def rebuild_campaign_progress(db: Session, campaign_ids: list[int] | None = None) -> int:
+    """Reseed every progress row of active volume campaigns from history; returns the rows rebuilt."""
+    query = db.query(RewardCampaign).filter(
+        RewardCampaign.is_active == True,
+        RewardCampaign.campaign_type == CampaignType.VOLUME,
+    )
+    if campaign_ids:
+        query = query.filter(RewardCampaign.id.in_(campaign_ids))
+    rebuilt = 0
+    for campaign in query.order_by(RewardCampaign.id).all():
+        user_ids = [
+            user_id
+            for (user_id,) in db.query(CampaignProgress.user_id)
+            .filter(CampaignProgress.campaign_id == campaign.id)
+            .order_by(CampaignProgress.user_id)
+        ]
+        for user_id in user_ids:
+            _seed_campaign_progress(db, campaign, user_id, force=True)
+            rebuilt += 1
+    return rebuilt
+
+
 def get_active_campaigns(db: Session, user: User) -> list[dict]:
     query = db.query(RewardCampaign).filter(RewardCampaign.is_active == True)
     if user.role == UserRole.USER:
         query = query.filter(RewardCampaign.is_agent_only == False)
     campaigns = query.all()
+    if not campaigns:
+        return []
+
+    progress_rows = _campaign_progress_rows(db, campaigns, user.id)
+    claimed_ids = {
+        campaign_id
+        for (campaign_id,) in db.query(AgentReward.campaign_id).filter(
+            AgentReward.agent_id == user.id,
+            AgentReward.campaign_id.in_([camp.id for camp in campaigns]),
+            AgentReward.status == AgentRewardStatus.CREDITED,
+        )
+    }
 
     results = []
     for camp in campaigns:
-        progress = 0.0
-        is_qualified = False
-        
-        if camp.campaign_type == CampaignType.VOLUME:
-            campaign_start = camp.activated_at or camp.created_at
-            
-            # Fetch all successful user transactions
-            all_txs = db.query(Transaction).filter(
-                Transaction.user_id == user.id,
-                Transaction.status == TransactionStatus.SUCCESS
-            ).all()
-            
-            all_stxs = db.query(ServiceTransaction).filter(
-                ServiceTransaction.user_id == user.id,
-                ServiceTransaction.status == "success"
-            ).all()
-            
-            # Normalize campaign start to naive UTC for safe comparison
-            camp_time = campaign_start
-            if camp_time and camp_time.tzinfo is not None:
-                camp_time = camp_time.astimezone(timezone.utc).replace(tzinfo=None)
-            
-            txs = []
-            for tx in all_txs:
-                tx_time = tx.created_at
-                if tx_time:
-                    if tx_time.tzinfo is not None:
-                        tx_time = tx_time.astimezone(timezone.utc).replace(tzinfo=None)
-                    if camp_time is None or tx_time >= camp_time:
-                        txs.append(tx)
-                        
-            stxs = []
-            for stx in all_stxs:
-                stx_time = stx.created_at
-                if stx_time:
-                    if stx_time.tzinfo is not None:
-                        stx_time = stx_time.astimezone(timezone.utc).replace(tzinfo=None)
-                    if camp_time is None or stx_time >= camp_time:
-                        stxs.append(stx)
-            
-            if camp.target_metric in ("data_volume_gb", "data_gb"):
-                # Fetch all data plans to map code to exact GB size
-                from app.models.data_plan import DataPlan
-                all_plans = db.query(DataPlan).all()
-                plan_map = {p.plan_code: _parse_size_gb(p.data_size) for p in all_plans}
-                
-                total_gb = 0.0
-                for tx in txs:
-                    if tx.tx_type == TransactionType.DATA:
-                        gb = plan_map.get(tx.data_plan_code, None)
-                        if gb is None and tx.data_plan_code:
-                            parts = str(tx.data_plan_code).split(":")
-                            raw_code = parts[-1]
-                            for code, size in plan_map.items():
-                                if code.split(":")[-1] == raw_code:
-                                    gb = size
-                                    break
-                        if gb is None:
-                            gb = float(tx.amount) / 400.0
-                        total_gb += gb or 0.0
-                        
-                for stx in stxs:
-                    if stx.tx_type.lower() == "data":
-                        prod_code = getattr(stx, "product_code", "")
-                        if prod_code:
-                            gb = plan_map.get(prod_code, None)
-                            if gb is None:
-                                parts = str(prod_code).split(":")
-                                raw_code = parts[-1]
-                                for code, size in plan_map.items():
-                                    if code.split(":")[-1] == raw_code:
-                                        gb = size
-                                        break
-                            if gb is None:
-                                gb = float(stx.amount) / 400.0
-                            total_gb += gb or 0.0
-                
-                progress = total_gb
-                is_qualified = progress >= float(camp.target_value)
-                
-            elif camp.target_metric in ("airtime_volume", "airtime_amount"):
-                airtime_naira = Decimal("0.00")
-                for tx in txs:
-                    if tx.tx_type == TransactionType.AIRTIME:
-                        airtime_naira += tx.amount
-                for stx in stxs:
-                    if stx.tx_type.lower() == "airtime":
-                        airtime_naira += stx.amount
-                        
-                progress = float(airtime_naira)
-                is_qualified = progress >= float(camp.target_value)
-                
-            elif camp.target_metric == "transactions":
-                progress = float(len(txs) + len(stxs))
-                is_qualified = progress >= float(camp.target_value)
-        
-        elif camp.campaign_type == CampaignType.REFERRAL:
-            # Check how many qualified referrals they have since campaign start
-            all_refs = db.query(Referral).filter(
-                Referral.referrer_id == user.id,
-                Referral.status.in_([ReferralStatus.QUALIFIED, ReferralStatus.REWARDED])
-            ).all()
-            
-            camp_time = camp.created_at
-            if camp_time and camp_time.tzinfo is not None:
-                camp_time = camp_time.astimezone(timezone.utc).replace(tzinfo=None)
-                
-            qualified_refs = 0
-            for ref in all_refs:
-                ref_time = ref.created_at
-                if ref_time:
-                    if ref_time.tzinfo is not None:
-                        ref_time = ref_time.astimezone(timezone.utc).replace(tzinfo=None)
-                    if camp_time is None or ref_time >= camp_time:
-                        qualified_refs += 1
-                        
-            progress = float(qualified_refs)
-            is_qualified = progress >= float(camp.target_value)
+        progress = _campaign_progress_value(db, camp, user, progress_rows.get(camp.id))
+        is_qualified = progress >= float(camp.target_value)
 
         # Ensure progress doesn't exceed target visually
         if progress > float(camp.target_value):
             progress = float(camp.target_value)
 
-        # Check if user has already claimed/received the reward
-        from app.models.agent import AgentRewardStatus
-        existing_reward = db.query(AgentReward).filter(
-            AgentReward.agent_id == user.id,
-            AgentReward.campaign_id == camp.id,
-            AgentReward.status == AgentRewardStatus.CREDITED
-        ).first()
-        is_claimed = existing_reward is not None
-
         results.append({
             "id": camp.id,
             "title": camp.title,
@@ -337,32 +444,36 @@ def get_active_campaigns(db: Session, user: User) -> list[dict]:
             "is_active": camp.is_active,
             "progress_value": round(progress, 2),
             "is_qualified": is_qualified,
-            "is_claimed": is_claimed,
+            "is_claimed": camp.id in claimed_ids,
             "is_agent_only": camp.is_agent_only
         })
     return results
 
 def claim_campaign_reward(db: Session, user: User, campaign_id: int) -> dict:
-    from app.models.agent import AgentRewardStatus
     from fastapi import HTTPException
-    from app.models.wallet import Wallet
     from app.services.wallet import get_or_create_wallet
-    
-    # Lock the user's wallet row to serialize claims and avoid parallel race conditions
-    wallet = db.query(Wallet).filter(Wallet.user_id == user.id).with_for_update().first()
-    if not wallet:
-        wallet = get_or_create_wallet(db, user.id)
-        wallet = db.query(Wallet).filter(Wallet.user_id == user.id).with_for_update().first()
 
     # Check if campaign exists and is active
     campaign = db.query(RewardCampaign).filter(
         RewardCampaign.id == campaign_id,
         RewardCampaign.is_active == True
     ).first()
-    
+
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found or inactive.")
-        
+
+    # Re-evaluate qualification from the campaign progress counters. Seeding a
+    # missing counter commits, so this runs before the wallet lock is taken.
+    progress_rows = _campaign_progress_rows(db, [campaign], user.id)
+    progress = _campaign_progress_value(db, campaign, user, progress_rows.get(campaign.id))
+    is_qualified = progress >= float(campaign.target_value)
+
+    # Lock the user's wallet row to serialize claims and avoid parallel race conditions
+    wallet = db.query(Wallet).filter(Wallet.user_id == user.id).with_for_update().first()
+    if not wallet:
+        wallet = get_or_create_wallet(db, user.id)
+        wallet = db.query(Wallet).filter(Wallet.user_id == user.id).with_for_update().first()
+
     # Idempotency check
     existing_reward = db.query(AgentReward).filter(
         AgentReward.agent_id == user.id,
@@ -378,122 +489,7 @@ def claim_campaign_reward(db: Session, user: User, campaign_id: int) -> dict:
             }
         elif existing_reward.status == AgentRewardStatus.PENDING:
             raise HTTPException(status_code=400, detail="Reward claim is pending processing.")
-            
-    # Re-evaluate qualification based on transactions since campaign activation
-    is_qualified = False
-    
-    if campaign.campaign_type == CampaignType.VOLUME:
-        campaign_start = campaign.activated_at or campaign.created_at
-        
-        # Fetch all successful user transactions
-        all_txs = db.query(Transaction).filter(
-            Transaction.user_id == user.id,
-            Transaction.status == TransactionStatus.SUCCESS
-        ).all()
-        
-        all_stxs = db.query(ServiceTransaction).filter(
-            ServiceTransaction.user_id == user.id,
-            ServiceTransaction.status == "success"
-        ).all()
-        
-        # Normalize campaign start to naive UTC for safe comparison
-        camp_time = campaign_start
-        if camp_time and camp_time.tzinfo is not None:
-            camp_time = camp_time.astimezone(timezone.utc).replace(tzinfo=None)
-        
-        txs = []
-        for tx in all_txs:
-            tx_time = tx.created_at
-            if tx_time:
-                if tx_time.tzinfo is not None:
-                    tx_time = tx_time.astimezone(timezone.utc).replace(tzinfo=None)
-                if camp_time is None or tx_time >= camp_time:
-                    txs.append(tx)
-                    
-        stxs = []
-        for stx in all_stxs:
-            stx_time = stx.created_at
-            if stx_time:
-                if stx_time.tzinfo is not None:
-                    stx_time = stx_time.astimezone(timezone.utc).replace(tzinfo=None)
-                if camp_time is None or stx_time >= camp_time:
-                    stxs.append(stx)
-        
-        if campaign.target_metric in ("data_volume_gb", "data_gb"):
-            from app.models.data_plan import DataPlan
-            all_plans = db.query(DataPlan).all()
-            plan_map = {p.plan_code: _parse_size_gb(p.data_size) for p in all_plans}
-            
-            total_gb = 0.0
-            for tx in txs:
-                if tx.tx_type == TransactionType.DATA:
-                    gb = plan_map.get(tx.data_plan_code, None)
-                    if gb is None and tx.data_plan_code:
-                        parts = str(tx.data_plan_code).split(":")
-                        raw_code = parts[-1]
-                        for code, size in plan_map.items():
-                            if code.split(":")[-1] == raw_code:
-                                gb = size
-                                break
-                    if gb is None:
-                        gb = float(tx.amount) / 250.0
-                    total_gb += gb or 0.0
-                    
-            for stx in stxs:
-                if stx.tx_type.lower() == "data":
-                    prod_code = getattr(stx, "product_code", "")
-                    if prod_code:
-                        gb = plan_map.get(prod_code, None)
-                        if gb is None:
-                            parts = str(prod_code).split(":")
-                            raw_code = parts[-1]
-                            for code, size in plan_map.items():
-                                if code.split(":")[-1] == raw_code:
-                                    gb = size
-                                    break
-                        if gb is None:
-                            gb = float(stx.amount) / 250.0
-                        total_gb += gb or 0.0
-                    
-            progress = total_gb
-            is_qualified = progress >= float(campaign.target_value)
-            
-        elif campaign.target_metric in ("airtime_volume", "airtime_amount"):
-            airtime_naira = Decimal("0.00")
-            for tx in txs:
-                if tx.tx_type == TransactionType.AIRTIME:
-                    airtime_naira += tx.amount
-            for stx in stxs:
-                if stx.tx_type.lower() == "airtime":
-                    airtime_naira += stx.amount
-                    
-            progress = float(airtime_naira)
-            is_qualified = progress >= float(campaign.target_value)
-            
-        elif campaign.target_metric == "transactions":
-            progress = float(len(txs) + len(stxs))
-            is_qualified = progress >= float(campaign.target_value)
-            
-    elif campaign.campaign_type == CampaignType.REFERRAL:
-        all_refs = db.query(Referral).filter(
-            Referral.referrer_id == user.id,
-            Referral.status.in_([ReferralStatus.QUALIFIED, ReferralStatus.REWARDED])
-        ).all()
-        
-        camp_time = campaign.created_at
-        if camp_time and camp_time.tzinfo is not None:
-            camp_time = camp_time.astimezone(timezone.utc).replace(tzinfo=None)
-            
-        qualified_refs = 0
-        for ref in all_refs:
-            ref_time = ref.created_at
-            if ref_time:
-                if ref_time.tzinfo is not None:
-                    ref_time = ref_time.astimezone(timezone.utc).replace(tzinfo=None)
-                if camp_time is None or ref_time >= camp_time:
-                    qualified_refs += 1
-        is_qualified = qualified_refs >= float(campaign.target_value)
-        
+
     if not is_qualified:
         raise HTTPException(status_code=400, detail="You do not meet the criteria to claim this reward.")
         
@@ -531,7 +527,6 @@ def claim_campaign_reward(db: Session, user: User, campaign_id: int) -> dict:
         db.commit()
     except Exception as e:
         db.rollback()
-        from sqlalchemy.exc import IntegrityError
         if isinstance(e, IntegrityError):
             raise HTTPException(status_code=400, detail="Reward already claimed or in progress.")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,184 @@
+"""
+Retention pipeline for api_logs.
+
+api_logs gets one row per provider call. An hourly job:
+
+1. rolls the raw rows into ``api_log_minutes`` (calls, successes and exact
+   p50/p95/max duration per minute and service), recomputing from where the
+   previous run stopped;
+2. moves raw rows older than ``api_log_retention_days`` into
+   ``api_logs_archive`` in id-ordered batches.
+
+Rolling up always runs first, so a raw row is only archived after its minute
+has been counted. API-health views read the minute rollups and the daily
+dashboard counts come from daily_rollups, so neither scans api_logs.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import ApiLog, ApiLogArchive, ApiLogMinute
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ROLLUP_BATCH_SIZE = 5000
+# Buffered log writes can land a few seconds after their created_at; the last
+# few minutes are recomputed on every run to pick them up.
+ROLLUP_LOOKBACK = timedelta(minutes=5)
+# A first run (or a long gap) is rolled up in chunks to bound memory.
+ROLLUP_CHUNK = timedelta(hours=6)
+
+_ARCHIVE_COLUMNS = (
+    "id", "user_id", "service", "endpoint", "status_code", "duration_ms", "reference", "success", "created_at", "updated_at",
+)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def floor_minute(value: datetime) -> datetime:
+    return _as_utc(value).replace(second=0, microsecond=0)
+
+
+def _percentile(ordered: list[Decimal], pct: int) -> Decimal:
+    # Nearest-rank percentile of an already sorted list.
+    if not ordered:
+        return Decimal("0")
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def rollup_api_log_minutes(db: Session, start: datetime, end: datetime) -> int:
+    """Recompute api_log_minutes for minutes in [start, end) from the raw rows in api_logs."""
+    start, end = floor_minute(start), floor_minute(end)
+    if start >= end:
+        return 0
+    groups: dict[tuple, list] = {}
+    rows = (
+        db.query(ApiLog.created_at, ApiLog.service, ApiLog.success, ApiLog.duration_ms)
+        .filter(ApiLog.created_at >= start, ApiLog.created_at < end)
+        .yield_per(ROLLUP_BATCH_SIZE)
+    )
+    for created_at, service, success, duration_ms in rows:
+        key = (floor_minute(created_at), str(service or "").strip().lower())
+        group = groups.setdefault(key, [[], 0])
+        group[0].append(Decimal(str(duration_ms or 0)))
+        group[1] += 1 if int(success or 0) else 0
+
+    minutes = []
+    for (minute, service), (durations, successes) in groups.items():
+        durations.sort()
+        minutes.append({
+            "minute": minute,
+            "service": service,
+            "call_count": len(durations),
+            "success_count": successes,
+            "duration_total_ms": sum(durations, Decimal("0")),
+            "duration_p50_ms": _percentile(durations, 50),
+            "duration_p95_ms": _percentile(durations, 95),
+            "duration_max_ms": durations[-1],
+        })
+    db.execute(
+        delete(ApiLogMinute)
+        .where(ApiLogMinute.minute >= start, ApiLogMinute.minute < end)
+        .execution_options(synchronize_session=False)
+    )
+    if minutes:
+        db.execute(insert(ApiLogMinute), minutes)
+    db.commit()
+    return len(minutes)
+
+
+def _rollup_start(db: Session) -> datetime | None:
+    earliest_raw = db.query(func.min(ApiLog.created_at)).scalar()
+    if earliest_raw is None:
+        return None
+    # Never recompute minutes whose raw rows have already been archived.
+    start = floor_minute(earliest_raw)
+    latest = db.query(func.max(ApiLogMinute.minute)).scalar()
+    if latest is not None:
+        start = max(start, floor_minute(latest) - ROLLUP_LOOKBACK)
+    return start
+
+
+def archive_api_logs(db: Session, before: datetime, *, batch_size: int | None = None) -> int:
+    """Move api_logs rows created before ``before`` into api_logs_archive; returns the number moved."""
+    batch_size = batch_size or settings.api_log_archive_batch_size
+    columns = [ApiLog.__table__.c[name] for name in _ARCHIVE_COLUMNS]
+    moved = 0
+    while True:
+        ids = [
+            row[0]
+            for row in db.query(ApiLog.id).filter(ApiLog.created_at < before).order_by(ApiLog.id).limit(batch_size).all()
+        ]
+        if not ids:
+            return moved
+        db.execute(
+            insert(ApiLogArchive).from_select(list(_ARCHIVE_COLUMNS), select(*columns).where(ApiLog.id.in_(ids)))
+        )
+        db.execute(delete(ApiLog).where(ApiLog.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        moved += len(ids)
+
+
+def run_api_log_retention(db: Session, *, now: datetime | None = None) -> dict:
+    now = _as_utc(now or datetime.now(timezone.utc))
+    rolled = 0
+    start = _rollup_start(db)
+    end = floor_minute(now)
+    while start is not None and start < end:
+        chunk_end = min(start + ROLLUP_CHUNK, end)
+        rolled += rollup_api_log_minutes(db, start, chunk_end)
+        start = chunk_end
+    cutoff = floor_minute(now - timedelta(days=max(int(settings.api_log_retention_days), 1)))
+    archived = archive_api_logs(db, cutoff)
+    logger.info("api_logs retention: %s minute row(s) rolled up, %s raw row(s) archived before %s.", rolled, archived, cutoff)
+    return {"minutes_rolled_up": rolled, "archived": archived, "cutoff": cutoff}
+
+
+def api_health(db: Session, since: datetime) -> list[dict]:
+    """Per-service call health since ``since`` from the minute rollups.
+
+    ``p50_ms`` is the call-weighted mean of the per-minute medians and
+    ``p95_ms`` the worst per-minute p95; ``avg_ms`` is exact.
+    """
+    rows = (
+        db.query(
+            ApiLogMinute.service,
+            func.sum(ApiLogMinute.call_count),
+            func.sum(ApiLogMinute.success_count),
+            func.sum(ApiLogMinute.duration_total_ms),
+            func.sum(ApiLogMinute.duration_p50_ms * ApiLogMinute.call_count),
+            func.max(ApiLogMinute.duration_p95_ms),
+            func.max(ApiLogMinute.duration_max_ms),
+        )
+        .filter(ApiLogMinute.minute >= floor_minute(since))
+        .group_by(ApiLogMinute.service)
+        .order_by(func.sum(ApiLogMinute.call_count).desc())
+        .all()
+    )
+    health = []
+    for service, calls, successes, total_ms, weighted_p50, p95, max_ms in rows:
+        calls = int(calls or 0)
+        successes = int(successes or 0)
+        health.append({
+            "service": service,
+            "calls": calls,
+            "successes": successes,
+            "failures": calls - successes,
+            "success_rate": round(successes / calls * 100.0, 2) if calls else 0.0,
+            "avg_ms": round(float(total_ms or 0) / calls, 2) if calls else 0.0,
+            "p50_ms": round(float(weighted_p50 or 0) / calls, 2) if calls else 0.0,
+            "p95_ms": float(p95 or 0),
+            "max_ms": float(max_ms or 0),
+        })
+    return health
@@ -43,6 +43,35 @@ class ProviderResult:
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+PROVIDER_PENDING_STATUS = {"pending", "processing", "queued", "in_progress", "submitted", "accepted"}
+_TRANSPORT_ERROR_MARKERS = (
+    "network error",
+    "timed out",
+    "timeout",
+    "connection reset",
+    "connection aborted",
+    "connection refused",
+    "temporarily unavailable",
+    "service unavailable",
+)
+
+
+def provider_result_status(result: ProviderResult) -> str:
+    """The provider's own status string for ``result`` (e.g. "pending"), lower-cased."""
+    meta = result.meta or {}
+    for provider_key in ("vtpass", "clubkonnect"):
+        status = str((meta.get(provider_key) or {}).get("status") or "").strip().lower()
+        if status:
+            return status
+    return str(meta.get("status") or "").strip().lower()
+
+
+def is_transport_error(exc: Exception) -> bool:
+    """True when ``exc`` leaves the purchase outcome unknown (timeouts, dropped connections)."""
+    message = str(exc or "").strip().lower()
+    return any(marker in message for marker in _TRANSPORT_ERROR_MARKERS)
+
+
 _VTPASS_SUCCESS_STATUS = {"delivered", "successful", "success", "completed", "done"}
 _VTPASS_PENDING_STATUS = {"pending", "processing", "queued", "in_progress", "submitted", "accepted"}
 _VTPASS_FAILURE_STATUS = {"failed", "fail", "error", "rejected", "declined", "cancelled", "canceled"}
@@ -0,0 +1,653 @@
+"""
+Bulk data and airtime purchases for agents and developers.
+
+A bulk order of up to ``bulk_purchase_max_items`` items is handled as one
+batch:
+
+- ``create_bulk_purchase`` (data: phone, plan) and ``create_bulk_airtime``
+  (phone, network, amount) price every item against one pricing-table lookup,
+  check the velocity limits for the whole order, and in a single commit
+  insert the batch, its items and one PENDING transaction per item (DATA
+  transactions, or airtime service transactions) and debit the total from the
+  wallet (one DEBIT ledger entry, reference ``batch_id``);
+- ``run_bulk_purchase`` (a background thread per batch) sends the items to the
+  providers through a shared pool of ``bulk_purchase_concurrency`` workers, so
+  at most that many provider calls are in flight across all batches. A batch
+  keeps at most that many items queued at a time and re-checks that each item
+  is still pending just before handing it over. Results are committed one item
+  at a time as they arrive, which is what the stream endpoint reads;
+- ``finalize_bulk_purchase`` refunds every failed item with one CREDIT entry
+  (reference ``<batch_id>-REFUND``) and marks the batch completed.
+
+Data items still pending when the batch completes are left to the pending
+reconcile worker, which skips items of batches that are still processing. The
+runner refreshes the batch's ``heartbeat_at`` while it works; the worker
+finalizes batches whose runner has gone quiet for ``bulk_purchase_stall_seconds``
+(``recover_stalled_bulk_purchases``). An item that fails after its batch was
+finalized that way is refunded on its own. Pending airtime items are confirmed
+like any other pending airtime purchase.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.models import (
+    BulkPurchase,
+    BulkPurchaseItem,
+    DataPlan,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+    Wallet,
+)
+from app.services.bills import PROVIDER_PENDING_STATUS, get_bills_provider, is_transport_error, provider_result_status
+from app.services.data_routing import DataRoute, fallback_cost_prices, route_data_purchase
+from app.services.fraud import enforce_purchase_limits
+from app.services.outbound_webhooks import dispatch_developer_webhook
+from app.services.pricing import quote_many, quote_service_charges
+from app.services.wallet import credit_wallet, debit_wallet, get_or_create_wallet, notify_wallet_debit, spendable_balance
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PROCESSING = "processing"
+COMPLETED = "completed"
+SCHEDULED_BATCH_PREFIX = "SCHED"
+
+DATA = TransactionType.DATA.value
+AIRTIME = TransactionType.AIRTIME.value
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class BulkOrder:
+    phone: str
+    plan: DataPlan
+    # The client's own reference (developer API); generated from the batch id otherwise.
+    reference: str | None = None
+
+
+@dataclass(frozen=True)
+class AirtimeOrder:
+    phone: str
+    network: str
+    # Airtime sent to the recipient; the wallet is charged this plus the margin.
+    face_value: Decimal
+
+
+@dataclass(frozen=True)
+class BulkJob:
+    """One provider call of a running batch."""
+
+    reference: str
+    phone: str
+    amount: Decimal
+    route: DataRoute | None = None  # data items
+    network: str | None = None  # airtime items
+    face_value: Decimal | None = None
+
+
+BulkPurchaseFn = Callable[[BulkJob], tuple[dict, str | None]]
+
+
+def _provider_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.bulk_purchase_concurrency), thread_name_prefix="bulk-purchase"
+            )
+        return _pool
+
+
+def _item_reference(user: User, batch_id: str, position: int, order: BulkOrder) -> str:
+    if order.reference:
+        return f"DEV_{user.id}_{order.reference}"
+    return f"{batch_id}-{position:03d}"
+
+
+def _record_model(kind: str) -> type:
+    return Transaction if kind == DATA else ServiceTransaction
+
+
+def _status(model: type, status: TransactionStatus):
+    # ServiceTransaction keeps plain string statuses.
+    return status if model is Transaction else status.value
+
+
+def _check_size(orders: list) -> None:
+    if not orders:
+        raise HTTPException(status_code=400, detail="A bulk purchase needs at least one item.")
+    if len(orders) > settings.bulk_purchase_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A bulk purchase can have at most {settings.bulk_purchase_max_items} items.",
+        )
+
+
+def _new_batch_id(source: str) -> str:
+    # Scheduled batches get their own prefix so their items are recognizable by reference alone.
+    prefix = SCHEDULED_BATCH_PREFIX if source == "scheduled" else "BULK"
+    return f"{prefix}-{int(time.time())}-{secrets.token_hex(4)}".upper()
+
+
+def _check_funds(db: Session, user: User, kind: str, amounts: list[Decimal]) -> tuple[Wallet, Decimal]:
+    total = sum(amounts, Decimal("0"))
+    enforce_purchase_limits(db, user_id=user.id, amount=total, tx_type=kind, count=len(amounts), largest=max(amounts))
+    wallet = get_or_create_wallet(db, user.id)
+    if spendable_balance(wallet) < total:
+        raise HTTPException(status_code=400, detail="Insufficient wallet balance.")
+    return wallet, total
+
+
+def _open_batch(
+    db: Session,
+    wallet: Wallet,
+    batch: BulkPurchase,
+    items: list[BulkPurchaseItem],
+    records: list,
+    description: str,
+) -> BulkPurchase:
+    """Insert the batch, its items and their PENDING records and debit the total, in one commit."""
+    try:
+        db.add(batch)
+        db.flush()
+        for item in items:
+            item.bulk_purchase_id = batch.id
+        # One flush: SQLAlchemy sends the rows of each table as a batched
+        # multi-row INSERT, and the status hooks still see every new record.
+        db.add_all(items)
+        db.add_all(records)
+        db.flush()
+        debit_wallet(db, wallet, batch.total_amount, batch.batch_id, description, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    notify_wallet_debit(wallet, batch.total_amount, batch.batch_id)
+    return batch
+
+
+def create_bulk_purchase(db: Session, user: User, orders: list[BulkOrder], *, source: str = "app") -> BulkPurchase:
+    """Price, limit-check and pay for ``orders`` in one commit; the items are then run by ``start_bulk_purchase``."""
+    _check_size(orders)
+    batch_id = _new_batch_id(source)
+    references = [_item_reference(user, batch_id, position, order) for position, order in enumerate(orders)]
+    taken = [
+        reference
+        for (reference,) in db.query(Transaction.reference).filter(Transaction.reference.in_(references))
+    ]
+    if taken:
+        raise HTTPException(status_code=409, detail={"message": "Duplicate references.", "references": taken})
+
+    plans = {order.plan.id: order.plan for order in orders}
+    prices = {quote.plan.id: quote.price for quote in quote_many(db, plans.values(), user.role)}
+    amounts = [prices[order.plan.id] for order in orders]
+    wallet, total = _check_funds(db, user, DATA, amounts)
+
+    batch = BulkPurchase(
+        batch_id=batch_id,
+        user_id=user.id,
+        kind=DATA,
+        source=source,
+        status=PROCESSING,
+        item_count=len(orders),
+        total_amount=total,
+        refunded_amount=Decimal("0"),
+    )
+    items = [
+        BulkPurchaseItem(
+            position=position,
+            reference=reference,
+            phone_number=order.phone,
+            plan_code=order.plan.plan_code,
+            amount=amount,
+        )
+        for position, (order, amount, reference) in enumerate(zip(orders, amounts, references))
+    ]
+    records = [
+        Transaction(
+            user_id=user.id,
+            amount=amount,
+            tx_type=TransactionType.DATA,
+            status=TransactionStatus.PENDING,
+            reference=reference,
+            network=order.plan.network,
+            recipient_phone=order.phone,
+            data_plan_code=order.plan.plan_code,
+            provider=order.plan.provider,
+            provider_plan_id=order.plan.provider_plan_id,
+            cost_price=order.plan.base_price,
+        )
+        for order, amount, reference in zip(orders, amounts, references)
+    ]
+    return _open_batch(db, wallet, batch, items, records, f"Bulk data purchase: {len(orders)} item(s)")
+
+
+def create_bulk_airtime(db: Session, user: User, orders: list[AirtimeOrder], *, source: str = "app") -> BulkPurchase:
+    """``create_bulk_purchase`` for airtime top-ups; every network's margin comes from one pricing-table lookup."""
+    _check_size(orders)
+    charges = quote_service_charges(
+        db, tx_type=AIRTIME, items=[(order.network, order.face_value) for order in orders], user_role=user.role
+    )
+    if any(charge <= 0 for charge, _ in charges):
+        raise HTTPException(status_code=400, detail="Final amount must be greater than zero")
+    amounts = [charge for charge, _ in charges]
+    wallet, total = _check_funds(db, user, AIRTIME, amounts)
+
+    batch_id = _new_batch_id(source)
+    batch = BulkPurchase(
+        batch_id=batch_id,
+        user_id=user.id,
+        kind=AIRTIME,
+        source=source,
+        status=PROCESSING,
+        item_count=len(orders),
+        total_amount=total,
+        refunded_amount=Decimal("0"),
+    )
+    items, records = [], []
+    for position, (order, (charge, margin)) in enumerate(zip(orders, charges)):
+        reference = f"{batch_id}-{position:03d}"
+        items.append(
+            BulkPurchaseItem(
+                position=position,
+                reference=reference,
+                phone_number=order.phone,
+                network=order.network,
+                face_value=order.face_value,
+                amount=charge,
+            )
+        )
+        records.append(
+            ServiceTransaction(
+                user_id=user.id,
+                reference=reference,
+                tx_type=AIRTIME,
+                amount=charge,
+                status=TransactionStatus.PENDING.value,
+                provider=order.network,
+                customer=order.phone,
+                meta={
+                    "network": order.network,
+                    "phone_number": order.phone,
+                    "base_amount": str(order.face_value),
+                    "margin_applied": str(margin),
+                    "charge_amount": str(charge),
+                    "batch_id": batch_id,
+                },
+            )
+        )
+    return _open_batch(db, wallet, batch, items, records, f"Bulk airtime purchase: {len(orders)} item(s)")
+
+
+def start_bulk_purchase(batch_id: str) -> None:
+    threading.Thread(target=run_bulk_purchase, args=(batch_id,), name=f"bulk-{batch_id}", daemon=True).start()
+
+
+def _pending_jobs(db: Session, batch: BulkPurchase) -> list[BulkJob]:
+    model = _record_model(batch.kind)
+    pending = (
+        db.query(BulkPurchaseItem)
+        .join(model, model.reference == BulkPurchaseItem.reference)
+        .filter(BulkPurchaseItem.bulk_purchase_id == batch.id, model.status == _status(model, TransactionStatus.PENDING))
+        .order_by(BulkPurchaseItem.position)
+    )
+    if batch.kind != DATA:
+        return [
+            BulkJob(
+                item.reference,
+                item.phone_number,
+                Decimal(item.amount),
+                network=item.network,
+                face_value=Decimal(item.face_value),
+            )
+            for item in pending
+        ]
+    rows = pending.join(DataPlan, DataPlan.plan_code == BulkPurchaseItem.plan_code).add_entity(DataPlan).all()
+    fallback_costs = fallback_cost_prices(db, {plan.plan_code: plan for _, plan in rows}.values())
+    return [
+        BulkJob(
+            item.reference,
+            item.phone_number,
+            Decimal(item.amount),
+            route=DataRoute.from_plan(plan, fallback_costs.get(plan.plan_code)),
+        )
+        for item, plan in rows
+    ]
+
+
+def buy_data_item(job: BulkJob) -> tuple[dict, str | None]:
+    return route_data_purchase(job.route, job.phone, job.reference, job.amount)
+
+
+def buy_airtime_item(job: BulkJob) -> tuple[dict, str | None]:
+    """One airtime top-up, classified the way ``/services/airtime/purchase`` classifies it."""
+    try:
+        result = get_bills_provider().purchase_airtime(job.network, job.phone, float(job.face_value))
+    except Exception as exc:
+        status = "pending" if is_transport_error(exc) else "failed"
+        return {"status": status, "error": str(exc) or "Provider failed", "meta": {"provider_error": str(exc)}}, None
+    outcome = {"provider_reference": result.external_reference, "error": result.message, "meta": result.meta}
+    if provider_result_status(result) in PROVIDER_PENDING_STATUS:
+        return {**outcome, "status": "pending"}, None
+    if result.success:
+        return {**outcome, "status": "success"}, None
+    return {**outcome, "status": "failed", "error": result.message or "Provider failed"}, None
+
+
+def _refund_late_failure(db: Session, batch_id: str, tx) -> bool:
+    """Refund a failed item on its own if its batch was already finalized (recovered while the item ran)."""
+    batch = db.query(BulkPurchase).filter(BulkPurchase.batch_id == batch_id).with_for_update().first()
+    if batch is None or batch.status == PROCESSING:
+        return False
+    amount = Decimal(tx.amount)
+    wallet = get_or_create_wallet(db, tx.user_id, commit=False)
+    credit_wallet(db, wallet, amount, f"{tx.reference}-REFUND", f"Bulk {batch.kind} refund: {tx.reference}", commit=False)
+    tx.status = _status(type(tx), TransactionStatus.REFUNDED)
+    batch.refunded_amount = Decimal(batch.refunded_amount or 0) + amount
+    return True
+
+
+def _record_result(db: Session, batch_id: str, kind: str, job: BulkJob, result: dict, provider: str | None) -> None:
+    """Commit one item's outcome. Failed items are refunded together by ``finalize_bulk_purchase``."""
+    model = _record_model(kind)
+    tx = db.query(model).filter(model.reference == job.reference).first()
+    if tx is None or tx.status != _status(model, TransactionStatus.PENDING):
+        return
+    status = result.get("status", "pending")
+    refunded = False
+    tx.provider = provider or tx.provider
+    tx.external_reference = result.get("provider_reference")
+    if result.get("cost_price") is not None and model is Transaction:
+        tx.cost_price = result["cost_price"]
+    if result.get("meta") and model is ServiceTransaction:
+        tx.meta = {**(tx.meta or {}), **result["meta"]}
+    if status == "success":
+        tx.status = _status(model, TransactionStatus.SUCCESS)
+        if model is Transaction:
+            try:
+                from app.services.referrals import trigger_referral_data_activity
+                # A failure here must not undo the delivered item.
+                with db.begin_nested():
+                    trigger_referral_data_activity(db, tx)
+            except Exception as exc:
+                logger.error("Failed to record referral activity for %s: %s", job.reference, exc)
+    elif status == "failed":
+        tx.status = _status(model, TransactionStatus.FAILED)
+        tx.failure_reason = str(result.get("error") or "Unknown provider error")[:255]
+        refunded = _refund_late_failure(db, batch_id, tx)
+    db.commit()
+    if status == "success" or refunded:
+        dispatch_developer_webhook(tx, tx.user)
+
+
+def _still_pending(db: Session, kind: str, reference: str) -> bool:
+    model = _record_model(kind)
+    status = db.query(model.status).filter(model.reference == reference).scalar()
+    return status == _status(model, TransactionStatus.PENDING)
+
+
+def _heartbeat_seconds() -> float:
+    # Several beats fit in the stall window, so one slow beat never looks like a dead runner.
+    return max(1.0, settings.bulk_purchase_stall_seconds / 6)
+
+
+def _heartbeat(db: Session, batch_id: str) -> None:
+    try:
+        db.query(BulkPurchase).filter(BulkPurchase.batch_id == batch_id).update(
+            {BulkPurchase.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Bulk purchase %s heartbeat failed: %s", batch_id, exc)
+
+
+def run_bulk_purchase(
+    batch_id: str,
+    *,
+    session_factory: Callable[[], Session] = SessionLocal,
+    purchase: BulkPurchaseFn | None = None,
+) -> None:
+    """Send every pending item of the batch to its provider, then finalize the batch."""
+    db = session_factory()
+    try:
+        batch = db.query(BulkPurchase).filter(BulkPurchase.batch_id == batch_id).first()
+        if batch is None or batch.status != PROCESSING:
+            return
+        kind = batch.kind
+        purchase = purchase or (buy_data_item if kind == DATA else buy_airtime_item)
+        jobs = _pending_jobs(db, batch)
+        # Also releases the connection while the provider calls run.
+        _heartbeat(db, batch_id)
+        last_beat = time.monotonic()
+
+        queue, futures = deque(jobs), {}
+        window = max(1, settings.bulk_purchase_concurrency)
+        while queue or futures:
+            while queue and len(futures) < window:
+                job = queue.popleft()
+                # Something else (a reconciler, an admin) may have settled it since the job list was built.
+                if _still_pending(db, kind, job.reference):
+                    futures[_provider_pool().submit(purchase, job)] = job
+            db.commit()
+            if not futures:
+                continue
+            # Wake up at least once per beat, even while queued behind other batches.
+            done, _ = wait(futures, timeout=_heartbeat_seconds(), return_when=FIRST_COMPLETED)
+            for future in done:
+                job = futures.pop(future)
+                try:
+                    result, provider = future.result()
+                except Exception as exc:
+                    # Outcome unknown: leave the item pending for reconciliation.
+                    logger.error("Bulk purchase item %s raised: %s", job.reference, exc)
+                    result, provider = {"status": "pending", "error": str(exc)}, None
+                try:
+                    _record_result(db, batch_id, kind, job, result, provider)
+                except Exception as exc:
+                    db.rollback()
+                    logger.error("Failed to record bulk purchase item %s: %s", job.reference, exc)
+            if time.monotonic() - last_beat >= _heartbeat_seconds():
+                _heartbeat(db, batch_id)
+                last_beat = time.monotonic()
+        finalize_bulk_purchase(db, batch_id)
+    except Exception:
+        db.rollback()
+        logger.exception("Bulk purchase %s failed", batch_id)
+    finally:
+        db.close()
+
+
+def _batch_records(db: Session, batch: BulkPurchase, model: type):
+    return (
+        db.query(model)
+        .join(BulkPurchaseItem, BulkPurchaseItem.reference == model.reference)
+        .filter(BulkPurchaseItem.bulk_purchase_id == batch.id)
+    )
+
+
+def _last_seen(batch: BulkPurchase) -> datetime:
+    seen = batch.heartbeat_at or batch.created_at
+    return seen.replace(tzinfo=timezone.utc) if seen.tzinfo is None else seen
+
+
+def finalize_bulk_purchase(db: Session, batch_id: str, *, stale_before: datetime | None = None) -> BulkPurchase | None:
+    """Refund the batch's failed items in one credit and mark it completed; idempotent.
+
+    With ``stale_before``, a batch whose runner checked in after that moment is left alone.
+    """
+    batch = db.query(BulkPurchase).filter(BulkPurchase.batch_id == batch_id).with_for_update().first()
+    if batch is None or batch.status != PROCESSING:
+        return batch
+    if stale_before is not None and _last_seen(batch) > stale_before:
+        db.rollback()
+        return batch
+    model = _record_model(batch.kind)
+    failed = (
+        _batch_records(db, batch, model)
+        .filter(model.status == _status(model, TransactionStatus.FAILED))
+        .order_by(model.id)
+        .with_for_update()
+        .all()
+    )
+    refund = sum((Decimal(tx.amount) for tx in failed), Decimal("0"))
+    try:
+        if refund:
+            wallet = get_or_create_wallet(db, batch.user_id, commit=False)
+            credit_wallet(
+                db,
+                wallet,
+                refund,
+                f"{batch_id}-REFUND",
+                f"Bulk {batch.kind} refund: {len(failed)} failed item(s)",
+                commit=False,
+            )
+            for tx in failed:
+                tx.status = _status(model, TransactionStatus.REFUNDED)
+        batch.refunded_amount = refund
+        batch.status = COMPLETED
+        batch.completed_at = datetime.now(timezone.utc)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for tx in failed:
+        dispatch_developer_webhook(tx, tx.user)
+    return batch
+
+
+def recover_stalled_bulk_purchases(db: Session) -> int:
+    """Finalize processing batches whose runner has not checked in for ``bulk_purchase_stall_seconds`` (it died)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.bulk_purchase_stall_seconds)
+    batch_ids = [
+        batch_id
+        for (batch_id,) in db.query(BulkPurchase.batch_id).filter(
+            BulkPurchase.status == PROCESSING,
+            func.coalesce(BulkPurchase.heartbeat_at, BulkPurchase.created_at) <= cutoff,
+        )
+    ]
+    recovered = 0
+    for batch_id in batch_ids:
+        try:
+            batch = finalize_bulk_purchase(db, batch_id, stale_before=cutoff)
+            if batch is not None and batch.status == COMPLETED:
+                recovered += 1
+        except Exception:
+            logger.exception("Recovering bulk purchase %s failed", batch_id)
+    return recovered
+
+
+def get_bulk_purchase(db: Session, user: User, batch_id: str, *, kind: str = DATA) -> BulkPurchase:
+    batch = (
+        db.query(BulkPurchase)
+        .filter(BulkPurchase.batch_id == batch_id, BulkPurchase.user_id == user.id, BulkPurchase.kind == kind)
+        .first()
+    )
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Bulk purchase not found.")
+    return batch
+
+
+def _item_rows(db: Session, batch: BulkPurchase) -> list[dict]:
+    prefix = f"DEV_{batch.user_id}_"
+    model = _record_model(batch.kind)
+    rows = (
+        db.query(BulkPurchaseItem, model.status, model.failure_reason)
+        .join(model, model.reference == BulkPurchaseItem.reference)
+        .filter(BulkPurchaseItem.bulk_purchase_id == batch.id)
+        .order_by(BulkPurchaseItem.position)
+        .all()
+    )
+    return [
+        {
+            "position": item.position,
+            "reference": item.reference[len(prefix):] if item.reference.startswith(prefix) else item.reference,
+            "phone_number": item.phone_number,
+            "plan_code": item.plan_code,
+            "network": item.network,
+            "face_value": Decimal(item.face_value) if item.face_value is not None else None,
+            "amount": Decimal(item.amount),
+            "status": status.value if hasattr(status, "value") else str(status),
+            "failure_reason": failure_reason,
+        }
+        for item, status, failure_reason in rows
+    ]
+
+
+def _summary(batch: BulkPurchase, items: list[dict]) -> dict:
+    counts: dict[str, int] = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return {
+        "batch_id": batch.batch_id,
+        "kind": batch.kind,
+        "status": batch.status,
+        "item_count": batch.item_count,
+        "total_amount": Decimal(batch.total_amount),
+        "refunded_amount": Decimal(batch.refunded_amount or 0),
+        "counts": counts,
+    }
+
+
+def bulk_purchase_view(db: Session, batch: BulkPurchase) -> dict:
+    items = _item_rows(db, batch)
+    return {**_summary(batch, items), "items": items}
+
+
+def _ndjson(line: dict) -> str:
+    return json.dumps(line, default=str, separators=(",", ":")) + "\n"
+
+
+def stream_bulk_purchase(
+    batch_id: str,
+    *,
+    session_factory: Callable[[], Session] = SessionLocal,
+    poll_seconds: float = 1.0,
+) -> Iterator[str]:
+    """NDJSON: one ``item`` line per item as it settles, then a ``summary`` line once the batch completes.
+
+    Each poll uses a short-lived session, so a slow client never holds a connection.
+    """
+    sent: set[int] = set()
+    deadline = time.monotonic() + settings.bulk_purchase_stall_seconds
+    while True:
+        db = session_factory()
+        try:
+            batch = db.query(BulkPurchase).filter(BulkPurchase.batch_id == batch_id).first()
+            if batch is None:
+                return
+            done = batch.status == COMPLETED or time.monotonic() >= deadline
+            items = _item_rows(db, batch)
+            for item in items:
+                if item["position"] in sent or (item["status"] == TransactionStatus.PENDING.value and not done):
+                    continue
+                sent.add(item["position"])
+                yield _ndjson({"type": "item", **item})
+            if done:
+                yield _ndjson({"type": "summary", **_summary(batch, items)})
+                return
+        finally:
+            db.close()
+        time.sleep(poll_seconds)
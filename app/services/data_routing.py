@@ -0,0 +1,192 @@
+"""
+Provider routing for data purchases.
+
+``route_data_purchase`` sends one purchase to the plan's provider and, when
+that provider reports a hard failure, to the plan's fallback provider. It
+works from a ``DataRoute`` snapshot of the plan, so callers can release their
+database session before the (slow) provider calls. Used by ``/data/purchase``
+and the bulk purchase runner.
+
+A result served by the fallback provider carries that provider's catalog cost
+as ``cost_price`` (when the catalog lists the fallback plan), so callers store
+the margin of the purchase that actually went through.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.models import DataPlan
+from app.providers.autosync_provider import AutosyncProvider
+from app.providers.smeplug_provider import SMEPlugProvider
+from app.services.amigo import AmigoApiError, AmigoClient, normalize_plan_code, resolve_network_id
+from app.services.bills import get_bills_provider
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DataRoute:
+    network: str
+    provider: str
+    provider_plan_id: str | None
+    plan_code: str
+    plan_name: str
+    data_size: str | None
+    data_type: str | None
+    fallback_provider: str | None
+    fallback_provider_plan_id: str | None
+    fallback_cost_price: Decimal | None = None
+
+    @classmethod
+    def from_plan(cls, plan: DataPlan, fallback_cost_price: Decimal | None = None) -> "DataRoute":
+        return cls(
+            network=str(plan.network or "").lower(),
+            provider=str(plan.provider or "").strip().lower(),
+            provider_plan_id=plan.provider_plan_id,
+            plan_code=plan.plan_code,
+            plan_name=plan.plan_name,
+            data_size=plan.data_size,
+            data_type=getattr(plan, "data_type", "Gifting"),
+            fallback_provider=str(plan.fallback_provider or "").strip().lower() if plan.fallback_provider else None,
+            fallback_provider_plan_id=plan.fallback_provider_plan_id,
+            fallback_cost_price=fallback_cost_price,
+        )
+
+
+def fallback_cost_prices(db: Session, plans: Iterable[DataPlan]) -> dict[str, Decimal]:
+    """plan_code -> base price of its fallback plan in the catalog, in one query."""
+    wanted = {
+        (str(plan.network or "").lower(), str(plan.fallback_provider).strip().lower(), str(plan.fallback_provider_plan_id)): plan.plan_code
+        for plan in plans
+        if plan.fallback_provider and plan.fallback_provider_plan_id
+    }
+    if not wanted:
+        return {}
+    rows = (
+        db.query(DataPlan.network, DataPlan.provider, DataPlan.provider_plan_id, DataPlan.base_price)
+        .filter(DataPlan.provider_plan_id.in_({key[2] for key in wanted}))
+        .all()
+    )
+    costs = {}
+    for network, provider, provider_plan_id, base_price in rows:
+        plan_code = wanted.get((str(network or "").lower(), str(provider or "").strip().lower(), str(provider_plan_id)))
+        if plan_code is not None:
+            costs[plan_code] = Decimal(base_price)
+    return costs
+
+
+def is_ambiguous_provider_error(exc: Exception) -> bool:
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    msg = str(exc).strip().lower()
+    ambiguous_hints = (
+        "timeout", "timed out", "connection error", "connection reset", 
+        "non-json", "invalid json", "service unavailable", "remote protocol",
+        "network error", "connecterror", "readerror", "transport", "http error"
+    )
+    return any(hint in msg for hint in ambiguous_hints)
+
+
+def _execute_provider(route: DataRoute, p_name: str | None, p_plan_id: str | None, phone: str, reference: str, price: Decimal) -> tuple[dict, str | None]:
+    network_key = route.network
+    plan_plan_code = route.plan_code
+    p_res = {"status": "pending", "error": "Provider routing failed"}
+    tx_provider = p_name
+    try:
+        if p_name in ("smeplug", "sim"):
+            sme = SMEPlugProvider()
+            sme_network_map = {"mtn": 1, "airtel": 2, "9mobile": 3, "glo": 4}
+            net_id = sme_network_map.get(network_key, 2)
+            p_res = sme.purchase_network_data(net_id, phone, p_plan_id or plan_plan_code, reference)
+            tx_provider = "smeplug"
+
+        elif p_name == "autosync":
+            autosync = AutosyncProvider()
+            p_res = autosync.purchase_network_data(
+                network=network_key, 
+                phone=phone, 
+                plan_id=p_plan_id or plan_plan_code, 
+                client_request_id=reference,
+                data_type=route.data_type
+            )
+            tx_provider = "autosync"
+
+        elif p_name == "amigo" or (not p_name and network_key in {"mtn", "glo", "airtel", "9mobile"}):
+            amigo = AmigoClient()
+            amigo_network_id = resolve_network_id(network_key)
+            amigo_payload = {
+                "network": amigo_network_id,
+                "mobile_number": phone,
+                "plan": normalize_plan_code(plan_plan_code),
+                "Ported_number": True
+            }
+            tx_provider = "amigo"
+            try:
+                res = amigo.purchase_data(amigo_payload, idempotency_key=reference)
+                if res.get("success") or str(res.get("status")).lower() in {"delivered", "success", "successful"}:
+                    p_res = {"status": "success", "provider_reference": str(res.get("reference") or "")}
+                elif str(res.get("status")).lower() in {"pending", "processing"}:
+                    p_res = {"status": "pending", "provider_reference": str(res.get("reference") or "")}
+                else:
+                    p_res = {"status": "failed", "error": res.get("message") or "Amigo reported failure"}
+            except AmigoApiError as e:
+                err_msg = str(e)
+                if is_ambiguous_provider_error(e):
+                    logger.warning("Amigo reported ambiguous error for reference %s. Marking as pending for safety: %s", reference, err_msg)
+                    p_res = {"status": "pending", "error": err_msg}
+                else:
+                    logger.warning("Amigo reported hard failure for reference %s. Failing immediately: %s", reference, err_msg)
+                    p_res = {"status": "failed", "error": err_msg}
+
+        elif p_name == "clubkonnect" or (not p_name and network_key == "9mobile"):
+            bills = get_bills_provider()
+            tx_provider = "clubkonnect"
+            res = bills.purchase_data(network_key, phone, p_plan_id or plan_plan_code, amount=float(price), request_id=reference)
+            if res.ok:
+                p_res = {"status": "success", "provider_reference": res.external_reference}
+            elif res.is_pending:
+                p_res = {"status": "pending", "provider_reference": res.external_reference}
+            else:
+                p_res = {"status": "failed", "error": res.message}
+
+        elif network_key == "airtel":
+            sme = SMEPlugProvider()
+            p_res = sme.purchase_network_data(2, phone, p_plan_id or plan_plan_code, reference)
+            tx_provider = "smeplug"
+
+        else:
+            p_res = {"status": "failed", "error": f"No provider configured for network: {network_key}"}
+
+    except Exception as exc:
+        logger.error("Data purchase provider exception: %s", exc)
+        if is_ambiguous_provider_error(exc):
+            p_res = {"status": "pending", "error": f"Provider timeout/error: {str(exc)}"}
+        else:
+            p_res = {"status": "failed", "error": str(exc)}
+
+    return p_res, tx_provider
+
+
+def route_data_purchase(route: DataRoute, phone: str, reference: str, price: Decimal) -> tuple[dict, str | None]:
+    """Buy ``route`` for ``phone``; returns (provider result, provider that handled it)."""
+    provider_res, transaction_provider = _execute_provider(
+        route, route.provider, route.provider_plan_id, phone, reference, price
+    )
+
+    # Fallback Routing
+    if provider_res.get("status") == "failed" and route.fallback_provider:
+        logger.warning(f"Primary provider {route.provider} failed for {reference} ({provider_res.get('error')}). Routing to fallback: {route.fallback_provider}")
+        # Optionally append a suffix to reference so the second provider doesn't treat it as duplicate if it's the same provider
+        # But we'll just use the same reference as it's a completely different provider API.
+        provider_res, transaction_provider = _execute_provider(
+            route, route.fallback_provider, route.fallback_provider_plan_id, phone, reference, price
+        )
+        if route.fallback_cost_price is not None:
+            provider_res = {**provider_res, "cost_price": route.fallback_cost_price}
+    return provider_res, transaction_provider
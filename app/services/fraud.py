@@ -1,8 +1,60 @@
+"""
+Purchase velocity guard.
+
+The Settings limits (single purchase, daily total, daily purchase count) are
+checked against rolling 24 hour counters per user instead of SUMs over the
+transactions tables. Each counter is a ring of 15 minute buckets with running
+totals, so a check touches at most one window's worth of buckets.
+
+Counters move on commit: a new purchase row adds to its bucket, a purchase that
+fails or is refunded gives its amount back, and a reconciled-delivered refund
+takes it again. Changes come from the flush-time status hook, so every purchase
+path is covered without wiring each call site.
+
+With REDIS_URL set, each bucket update is mirrored to a per-user Redis hash and
+checks read that hash, so all workers enforce one shared window. A hash is only
+trusted once it carries the ``warm`` marker, written when a worker seeds it from
+the database; a missing (expired, flushed) hash or one built from bare pushes is
+reseeded first. Users whose pushes were lost while Redis was down get their
+marker dropped once it is back, so the next check reseeds them. Without Redis
+(or when it is unreachable) each process falls back to its own counters, warmed
+once per user from that user's last 24 hours of purchases.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
 from fastapi import HTTPException
+from sqlalchemy import event, select, union_all
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.models import ServiceTransaction, Transaction, TransactionStatus, TransactionType
+from app.services.transaction_events import StatusChange, collect_status_changes
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+VELOCITY_WINDOW_SECONDS = 24 * 60 * 60
+VELOCITY_BUCKET_SECONDS = 15 * 60
+REDIS_RETRY_SECONDS = 30
+
+PURCHASE_TX_TYPES = (
+    TransactionType.DATA.value,
+    TransactionType.AIRTIME.value,
+    TransactionType.CABLE.value,
+    TransactionType.ELECTRICITY.value,
+    TransactionType.EXAM.value,
+)
+_RELEASED_STATUSES = (TransactionStatus.FAILED.value, TransactionStatus.REFUNDED.value)
+_PENDING_CHANGES_KEY = "fraud_velocity_changes"
+
+
 def _as_decimal(value) -> Decimal:
     if value is None:
         return Decimal("0")
@@ -20,17 +72,308 @@ def _fraud_error(message: str, code: str, hint: str, status_code: int = 429) ->
     )
 
 
+def _bucket_of(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) // VELOCITY_BUCKET_SECONDS
+
+
+def _current_bucket() -> int:
+    return int(time.time()) // VELOCITY_BUCKET_SECONDS
+
+
+class _Window:
+    """One user's bucketed 24 hour window with running totals."""
+
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self) -> None:
+        self.buckets: dict[int, list] = {}
+        self.count = 0
+        self.total = Decimal("0")
+
+    def expire(self, now_bucket: int) -> None:
+        oldest = now_bucket - VELOCITY_WINDOW_SECONDS // VELOCITY_BUCKET_SECONDS
+        for bucket in [b for b in self.buckets if b <= oldest]:
+            count, total = self.buckets.pop(bucket)
+            self.count -= count
+            self.total -= total
+
+    def add(self, bucket: int, count: int, amount: Decimal) -> None:
+        slot = self.buckets.setdefault(bucket, [0, Decimal("0")])
+        slot[0] += count
+        slot[1] += amount
+        self.count += count
+        self.total += amount
+
+
+class VelocityStore:
+    """Per-user windows for one database; the Redis mirror is shared by all workers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._windows: dict[int, _Window] = {}
+
+    def is_warm(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._windows
+
+    def seed(self, user_id: int, buckets: dict[int, tuple[int, Decimal]]) -> None:
+        window = _Window()
+        for bucket, (count, total) in buckets.items():
+            window.add(bucket, count, total)
+        window.expire(_current_bucket())
+        with self._lock:
+            self._windows[user_id] = window
+
+    def record(self, user_id: int, bucket: int, count: int, amount: Decimal) -> None:
+        now_bucket = _current_bucket()
+        if bucket <= now_bucket - VELOCITY_WINDOW_SECONDS // VELOCITY_BUCKET_SECONDS:
+            return
+        with self._lock:
+            window = self._windows.get(user_id)
+            # A user never checked here is warmed from the database on first check.
+            if window is None:
+                return
+            window.expire(now_bucket)
+            window.add(bucket, count, amount)
+
+    def totals(self, user_id: int) -> tuple[int, Decimal]:
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window is None:
+                return 0, Decimal("0")
+            window.expire(_current_bucket())
+            return max(window.count, 0), max(window.total, Decimal("0"))
+
+    def reset(self, user_id: int) -> None:
+        with self._lock:
+            self._windows[user_id] = _Window()
+
+
+class _RedisMirror:
+    """Per-user Redis hash of ``<bucket>:n`` / ``<bucket>:k`` (count, kobo) fields plus a ``warm`` marker."""
+
+    WARM_FIELD = "warm"
+
+    def __init__(self, url: str | None) -> None:
+        self._url = url
+        self._client = None
+        self._retry_at = 0.0
+        # Users whose pushes never reached Redis; their hashes are unmarked on recovery.
+        self._stale: set[int] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._url)
+
+    def _redis(self):
+        if not self._url or time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            try:
+                import redis
+
+                self._client = redis.Redis.from_url(self._url, socket_timeout=0.25, socket_connect_timeout=0.25)
+            except Exception as exc:
+                self._unavailable(exc)
+                return None
+        if self._stale:
+            self._unmark_stale(self._client)
+        return self._client
+
+    def _unmark_stale(self, client) -> None:
+        stale = set(self._stale)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id in stale:
+                pipe.hdel(self._key(user_id), self.WARM_FIELD)
+            pipe.execute()
+        except Exception as exc:
+            self._unavailable(exc)
+            return
+        self._stale -= stale
+
+    def available(self) -> bool:
+        return self._redis() is not None
+
+    def _unavailable(self, exc: Exception) -> None:
+        logger.warning("Fraud velocity Redis unavailable, using local counters: %s", exc)
+        self._client = None
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"fraud:velocity:{int(user_id)}"
+
+    def push(self, user_id: int, bucket: int, count: int, amount: Decimal) -> None:
+        client = self._redis()
+        if client is None:
+            if self.enabled:
+                self._stale.add(int(user_id))
+            return
+        key = self._key(user_id)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(key, f"{bucket}:n", count)
+            pipe.hincrby(key, f"{bucket}:k", int(amount * 100))
+            pipe.expire(key, VELOCITY_WINDOW_SECONDS + VELOCITY_BUCKET_SECONDS)
+            pipe.execute()
+        except Exception as exc:
+            self._stale.add(int(user_id))
+            self._unavailable(exc)
+
+    def warm(self, user_id: int, buckets: dict[int, tuple[int, Decimal]]) -> None:
+        """Replace the user's hash with ``buckets`` seeded from the database and mark it trusted."""
+        client = self._redis()
+        if client is None:
+            return
+        key = self._key(user_id)
+        fields = {self.WARM_FIELD: 1}
+        for bucket, (count, total) in buckets.items():
+            fields[f"{bucket}:n"] = int(count)
+            fields[f"{bucket}:k"] = int(total * 100)
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, VELOCITY_WINDOW_SECONDS + VELOCITY_BUCKET_SECONDS)
+            pipe.execute()
+        except Exception as exc:
+            self._unavailable(exc)
+
+    def pull(self, user_id: int) -> dict[int, tuple[int, Decimal]] | None:
+        """The shared window; None when Redis is unavailable or the hash is not marked warm."""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            fields = client.hgetall(self._key(user_id))
+        except Exception as exc:
+            self._unavailable(exc)
+            return None
+        buckets: dict[int, list] = {}
+        warm = False
+        for field, value in fields.items():
+            bucket, _, unit = (field.decode() if isinstance(field, bytes) else str(field)).partition(":")
+            if bucket == self.WARM_FIELD:
+                warm = True
+                continue
+            slot = buckets.setdefault(int(bucket), [0, Decimal("0")])
+            if unit == "n":
+                slot[0] = int(value)
+            else:
+                slot[1] = Decimal(int(value)) / 100
+        if not warm:
+            return None
+        return {bucket: (count, total) for bucket, (count, total) in buckets.items()}
+
+
+_stores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+_mirror = _RedisMirror(settings.redis_url)
+
+
+def _engine_of(db) -> object | None:
+    get_bind = getattr(db, "get_bind", None)
+    if get_bind is None:
+        return None
+    return getattr(get_bind(), "engine", None)
+
+
+def _store_for(engine) -> VelocityStore:
+    with _stores_lock:
+        store = _stores.get(engine)
+        if store is None:
+            store = _stores[engine] = VelocityStore()
+        return store
+
+
+def _purchases_since(db: Session, user_id: int, since: datetime) -> dict[int, tuple[int, Decimal]]:
+    purchases = union_all(
+        select(Transaction.created_at, Transaction.amount).where(
+            Transaction.user_id == user_id,
+            Transaction.created_at >= since,
+            Transaction.tx_type.in_([TransactionType(value) for value in PURCHASE_TX_TYPES]),
+            Transaction.status.notin_([TransactionStatus(value) for value in _RELEASED_STATUSES]),
+        ),
+        select(ServiceTransaction.created_at, ServiceTransaction.amount).where(
+            ServiceTransaction.user_id == user_id,
+            ServiceTransaction.created_at >= since,
+            ServiceTransaction.tx_type.in_(PURCHASE_TX_TYPES),
+            ServiceTransaction.status.notin_(_RELEASED_STATUSES),
+        ),
+    )
+    buckets: dict[int, list] = {}
+    for created_at, amount in db.execute(purchases).all():
+        slot = buckets.setdefault(_bucket_of(created_at), [0, Decimal("0")])
+        slot[0] += 1
+        slot[1] += _as_decimal(amount)
+    return {bucket: (count, total) for bucket, (count, total) in buckets.items()}
+
+
+def velocity_totals(db: Session, user_id: int) -> tuple[int, Decimal] | None:
+    """(purchase count, purchase total) over the last 24 hours, or None without an engine."""
+    engine = _engine_of(db)
+    if engine is None:
+        return None
+    store = _store_for(engine)
+    user_id = int(user_id)
+    shared = _mirror.pull(user_id)
+    if shared is not None:
+        store.seed(user_id, shared)
+    elif _mirror.available() or not store.is_warm(user_id):
+        # Redis is up but the hash is missing or untrusted, or this process is
+        # cold: the database is the authority; share what it says.
+        since = datetime.now(timezone.utc) - timedelta(seconds=VELOCITY_WINDOW_SECONDS)
+        buckets = _purchases_since(db, user_id, since)
+        store.seed(user_id, buckets)
+        _mirror.warm(user_id, buckets)
+    return store.totals(user_id)
+
+
+def velocity_snapshot(db: Session, user_id: int) -> dict:
+    totals = velocity_totals(db, user_id) or (0, Decimal("0"))
+    count, total = totals
+    count_limit = int(settings.fraud_daily_purchase_count_limit or 0)
+    total_limit = _as_decimal(settings.fraud_daily_total_limit_ngn)
+    return {
+        "user_id": int(user_id),
+        "window_hours": VELOCITY_WINDOW_SECONDS // 3600,
+        "purchase_count": count,
+        "purchase_total": total,
+        "source": "redis" if _mirror.enabled else "local",
+        "guard_enabled": bool(settings.fraud_guard_enabled),
+        "limits": {
+            "single_tx": _as_decimal(settings.fraud_single_tx_limit_ngn),
+            "daily_total": total_limit,
+            "daily_count": count_limit,
+        },
+        "remaining_count": max(count_limit - count, 0) if count_limit > 0 else None,
+        "remaining_total": max(total_limit - total, Decimal("0")) if total_limit > 0 else None,
+    }
+
+
+def reset_velocity(db: Session, user_id: int) -> None:
+    """Start a user's window from zero on every worker (e.g. after a verified bulk purchase)."""
+    engine = _engine_of(db)
+    if engine is not None:
+        _store_for(engine).reset(int(user_id))
+    # An empty but warm hash: deleting it would make the next check reseed
+    # the window from the database and undo the reset.
+    _mirror.warm(int(user_id), {})
+
+
 def enforce_purchase_limits(
     db: Session,
     *,
     user_id: int,
     amount: Decimal,
     tx_type: str,
+    count: int = 1,
+    largest: Decimal | None = None,
 ) -> None:
-    _ = db
-    _ = user_id
-    _ = tx_type
-
+    """``amount`` is the total of ``count`` purchases; ``largest`` (default ``amount``) is the biggest one."""
     amount = _as_decimal(amount)
     if amount <= 0:
         raise _fraud_error(
@@ -39,5 +382,71 @@ def enforce_purchase_limits(
             "Use a valid amount greater than zero.",
             status_code=400,
         )
-    # Unlimited mode: no single-transaction, daily count, or daily total caps.
-    return
+    if not settings.fraud_guard_enabled:
+        return
+
+    single_limit = _as_decimal(settings.fraud_single_tx_limit_ngn)
+    if single_limit > 0 and _as_decimal(amount if largest is None else largest) > single_limit:
+        raise _fraud_error(
+            "This purchase is above the single transaction limit.",
+            "FRAUD_SINGLE_TX_LIMIT",
+            f"Split the purchase into amounts of at most {single_limit:,.2f}.",
+        )
+
+    totals = velocity_totals(db, user_id)
+    if totals is None:
+        return
+    recent_count, total = totals
+    count_limit = int(settings.fraud_daily_purchase_count_limit or 0)
+    if count_limit > 0 and recent_count + count > count_limit:
+        logger.info("Purchase count limit hit: user=%s tx_type=%s count=%s", user_id, tx_type, recent_count)
+        raise _fraud_error(
+            "You have reached the maximum number of purchases for the last 24 hours.",
+            "FRAUD_DAILY_COUNT_LIMIT",
+            "Try again later or contact support to raise your limit.",
+        )
+    total_limit = _as_decimal(settings.fraud_daily_total_limit_ngn)
+    if total_limit > 0 and total + amount > total_limit:
+        logger.info("Purchase total limit hit: user=%s tx_type=%s total=%s", user_id, tx_type, total)
+        raise _fraud_error(
+            "This purchase would exceed your spending limit for the last 24 hours.",
+            "FRAUD_DAILY_TOTAL_LIMIT",
+            f"You can spend up to {max(total_limit - total, Decimal('0')):,.2f} more right now.",
+        )
+
+
+def _velocity_delta(change: StatusChange) -> int:
+    """+1 when a change starts counting against the window, -1 when it stops, else 0."""
+    if change.tx_type not in PURCHASE_TX_TYPES:
+        return 0
+    was_counted = change.old_status is not None and change.old_status not in _RELEASED_STATUSES
+    is_counted = change.new_status not in _RELEASED_STATUSES
+    return int(is_counted) - int(was_counted)
+
+
+@event.listens_for(Session, "after_flush")
+def _stage_velocity_changes(session: Session, flush_context) -> None:
+    staged = [change for change in collect_status_changes(session) if _velocity_delta(change)]
+    if staged:
+        session.info.setdefault(_PENDING_CHANGES_KEY, []).extend(staged)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_velocity_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_CHANGES_KEY, None)
+    if not changes:
+        return
+    engine = _engine_of(session)
+    if engine is None:
+        return
+    store = _store_for(engine)
+    for change in changes:
+        delta = _velocity_delta(change)
+        bucket = _bucket_of(change.created_at)
+        store.record(change.user_id, bucket, delta, change.amount * delta)
+        _mirror.push(change.user_id, bucket, delta, change.amount * delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_velocity_changes(session: Session) -> None:
+    session.info.pop(_PENDING_CHANGES_KEY, None)
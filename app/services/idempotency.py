@@ -0,0 +1,269 @@
+"""
+Idempotency keys for purchase endpoints.
+
+Clients on flaky networks retry purchases aggressively. A request carrying an
+Idempotency-Key header (or the payload's ``client_request_id``) is recorded
+per user before any wallet or provider work runs:
+
+* the first request claims the key (``in_flight``) and stores its response
+  when it finishes;
+* a retry of a finished request gets the stored response back without
+  touching the wallet, the provider or the transactions tables;
+* a retry while the first request is still running gets 409, and reusing a
+  key for a different request body gets 422;
+* a claim still ``in_flight`` after ``IDEMPOTENCY_IN_FLIGHT_TIMEOUT_SECONDS``
+  belonged to a request that died (worker killed, deploy) and is taken over by
+  the next retry of the same request.
+
+Client errors (4xx) release the key so a corrected retry can go through;
+server errors are stored, because the wallet may already have moved. An
+unexpected exception is stored as a 500 if the endpoint's session committed
+anything before it, and releases the key otherwise.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, event, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+# Longer than any purchase request can run (provider calls time out well inside it).
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT_SECONDS = 120
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def request_fingerprint(scope: str, payload) -> str:
+    body = jsonable_encoder(payload) if payload is not None else None
+    raw = json.dumps({"scope": scope, "body": body}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def idempotency_key_for(request, payload, payload_field: str | None) -> str | None:
+    headers = getattr(request, "headers", None)
+    key = headers.get(IDEMPOTENCY_KEY_HEADER) if headers is not None else None
+    if not key and payload_field:
+        key = getattr(payload, payload_field, None)
+    key = str(key or "").strip()
+    return key[:IDEMPOTENCY_KEY_MAX_LENGTH] or None
+
+
+def _idempotency_error(message: str, code: str, status_code: int) -> HTTPException:
+    return HTTPException(status_code=status_code, detail={"message": message, "code": code})
+
+
+def replay(record: IdempotencyKey, *, scope: str, request_hash: str):
+    """The stored outcome of ``record``, raised again when it was an error."""
+    if record.scope != scope or record.request_hash != request_hash:
+        raise _idempotency_error(
+            "This Idempotency-Key was already used for a different request.",
+            "IDEMPOTENCY_KEY_REUSED",
+            422,
+        )
+    if record.status != COMPLETED:
+        raise _idempotency_error(
+            "A request with this Idempotency-Key is still being processed.",
+            "IDEMPOTENCY_IN_FLIGHT",
+            409,
+        )
+    body = record.response_body
+    if (record.response_code or 200) >= 400:
+        raise HTTPException(status_code=record.response_code, detail=(body or {}).get("detail"))
+    return body
+
+
+def begin(db: Session, *, user_id: int, key: str, scope: str, request_hash: str) -> tuple[int | None, IdempotencyKey | None]:
+    """Claim ``key`` for this request.
+
+    Returns ``(record_id, None)`` when claimed, ``(None, record)`` when an
+    earlier request owns it, and ``(None, None)`` when the store is unavailable.
+    A stale ``in_flight`` claim for the same request is taken over.
+    """
+    try:
+        record = (
+            db.query(IdempotencyKey)
+            .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .first()
+        )
+        now = _utcnow()
+        if record is not None and _as_utc(record.expires_at) <= now:
+            db.delete(record)
+            db.flush()
+            record = None
+        if record is not None:
+            if _is_abandoned(record, scope=scope, request_hash=request_hash, now=now):
+                return _take_over(db, record, now=now)
+            return None, record
+
+        claim = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            scope=scope,
+            request_hash=request_hash,
+            status=IN_FLIGHT,
+            expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            claimed_at=now,
+        )
+        db.add(claim)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry claimed it first.
+            db.rollback()
+            return None, (
+                db.query(IdempotencyKey)
+                .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                .first()
+            )
+        return claim.id, None
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.warning("Idempotency store unavailable, processing without it: %s", exc)
+        return None, None
+
+
+def _is_abandoned(record: IdempotencyKey, *, scope: str, request_hash: str, now: datetime) -> bool:
+    return (
+        record.status == IN_FLIGHT
+        and record.scope == scope
+        and record.request_hash == request_hash
+        and _as_utc(record.claimed_at) <= now - timedelta(seconds=IDEMPOTENCY_IN_FLIGHT_TIMEOUT_SECONDS)
+    )
+
+
+def _take_over(db: Session, record: IdempotencyKey, *, now: datetime) -> tuple[int | None, IdempotencyKey | None]:
+    # Conditional on the stale claim time, so of two concurrent retries only one wins.
+    record_id = record.id
+    result = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == record_id,
+            IdempotencyKey.status == IN_FLIGHT,
+            IdempotencyKey.claimed_at <= now - timedelta(seconds=IDEMPOTENCY_IN_FLIGHT_TIMEOUT_SECONDS),
+        )
+        .values(claimed_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if not result.rowcount:
+        db.refresh(record)
+        return None, record
+    logger.warning("Idempotency key %s was abandoned in flight; a retry took it over", record_id)
+    return record_id, None
+
+
+def _finish(bind, record_id: int, statement) -> None:
+    # The endpoint may have closed or poisoned its own session by now.
+    session = Session(bind=bind)
+    try:
+        session.execute(statement.where(IdempotencyKey.id == record_id))
+        session.commit()
+    except SQLAlchemyError as exc:
+        session.rollback()
+        logger.error("Failed to finalize idempotency key %s: %s", record_id, exc)
+    finally:
+        session.close()
+
+
+def complete(bind, record_id: int, response_code: int, body) -> None:
+    _finish(
+        bind,
+        record_id,
+        update(IdempotencyKey).values(
+            status=COMPLETED,
+            response_code=response_code,
+            response_body=jsonable_encoder(body),
+        ),
+    )
+
+
+def release(bind, record_id: int) -> None:
+    _finish(bind, record_id, delete(IdempotencyKey))
+
+
+def purge_expired_keys(db: Session, *, now: datetime | None = None) -> int:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or _utcnow())))
+    db.commit()
+    return int(result.rowcount or 0)
+
+
+def idempotent(scope: str, *, payload_field: str | None = "client_request_id"):
+    """Answer retries of a purchase endpoint from the idempotency store.
+
+    The endpoint must take ``request``, ``payload``, ``user`` and ``db``
+    arguments; requests without a key run unchanged.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            payload = arguments.get("payload")
+            user = arguments.get("user")
+            db = arguments.get("db")
+            key = idempotency_key_for(arguments.get("request"), payload, payload_field)
+            if not key or user is None or not hasattr(db, "get_bind"):
+                return func(*args, **kwargs)
+
+            request_hash = request_fingerprint(scope, payload)
+            bind = db.get_bind()
+            record_id, existing = begin(db, user_id=user.id, key=key, scope=scope, request_hash=request_hash)
+            if existing is not None:
+                return replay(existing, scope=scope, request_hash=request_hash)
+            if record_id is None:
+                return func(*args, **kwargs)
+
+            commits = []
+
+            def count_commit(session):
+                commits.append(session)
+
+            event.listen(db, "after_commit", count_commit)
+            try:
+                result = func(*args, **kwargs)
+            except HTTPException as exc:
+                if exc.status_code < 500:
+                    release(bind, record_id)
+                else:
+                    complete(bind, record_id, exc.status_code, {"detail": exc.detail})
+                raise
+            except Exception:
+                if commits:
+                    complete(bind, record_id, 500, {"detail": "Internal error"})
+                else:
+                    release(bind, record_id)
+                raise
+            finally:
+                event.remove(db, "after_commit", count_commit)
+            complete(bind, record_id, 200, result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,201 @@
+"""
+Index audit: EXPLAIN a catalog of the hot queries and flag sequential scans.
+
+Each catalog entry mirrors a query an endpoint or worker runs on every
+request or tick (same filters and ordering, representative values). The
+audit compiles it with literal values and runs it through the database's own
+planner:
+
+- Postgres: ``EXPLAIN (FORMAT JSON)`` with ``enable_seqscan`` switched off for
+  the transaction. A ``Seq Scan`` that survives has no usable index, whatever
+  the table size.
+- SQLite: ``EXPLAIN QUERY PLAN``. A bare ``SCAN <table>`` is a full scan.
+
+Run it with ``scripts/audit_indexes.py`` after adding a query or changing an
+index; tests run it against the models' indexes on SQLite.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from app.models import (
+    ApiLog,
+    LedgerType,
+    Referral,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    WalletLedger,
+)
+
+_SINCE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+_RECONCILE_TYPES = [TransactionType.AIRTIME, TransactionType.CABLE, TransactionType.ELECTRICITY]
+
+
+@dataclass(frozen=True)
+class AuditQuery:
+    name: str
+    source: str
+    statement: Callable[[], Select]
+
+
+CATALOG: tuple[AuditQuery, ...] = (
+    AuditQuery(
+        "wallet.find_matching_ledger",
+        "app/services/wallet.py credit_wallet/debit_wallet",
+        lambda: select(WalletLedger)
+        .where(
+            WalletLedger.wallet_id == 1,
+            WalletLedger.amount == Decimal("100.00"),
+            WalletLedger.reference == "TX-AUDIT",
+            WalletLedger.description == "Data purchase",
+            WalletLedger.entry_type == LedgerType.DEBIT,
+        )
+        .order_by(WalletLedger.id.desc())
+        .limit(1),
+    ),
+    AuditQuery(
+        "wallet.ledger_history",
+        "GET /wallet/ledger",
+        lambda: select(WalletLedger).where(WalletLedger.wallet_id == 1).order_by(WalletLedger.id.desc()).limit(50),
+    ),
+    AuditQuery(
+        "admin.wallet_statement",
+        "GET /admin/users/{id}/ledger",
+        lambda: select(WalletLedger)
+        .where(WalletLedger.wallet_id == 1, WalletLedger.created_at >= _SINCE)
+        .order_by(WalletLedger.created_at, WalletLedger.id),
+    ),
+    AuditQuery(
+        "transactions.user_history",
+        "GET /transactions/me",
+        lambda: select(Transaction).where(Transaction.user_id == 1).order_by(Transaction.created_at.desc()).limit(50),
+    ),
+    AuditQuery(
+        "transactions.user_service_history",
+        "GET /transactions/me",
+        lambda: select(ServiceTransaction)
+        .where(ServiceTransaction.user_id == 1)
+        .order_by(ServiceTransaction.created_at.desc())
+        .limit(50),
+    ),
+    AuditQuery(
+        "transactions.by_reference",
+        "GET /admin/transactions/{reference}",
+        lambda: select(Transaction).where(Transaction.reference == "TX-AUDIT"),
+    ),
+    AuditQuery(
+        "reconcile.pending_data",
+        "app/services/pending_reconcile.py",
+        lambda: select(Transaction)
+        .where(
+            Transaction.tx_type == TransactionType.DATA,
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.created_at <= _SINCE,
+        )
+        .order_by(Transaction.created_at.asc())
+        .limit(30),
+    ),
+    AuditQuery(
+        "reconcile.pending_bills",
+        "app/services/pending_reconcile.py",
+        lambda: select(Transaction)
+        .where(
+            Transaction.tx_type.in_(_RECONCILE_TYPES),
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.created_at <= _SINCE,
+        )
+        .order_by(Transaction.created_at.asc())
+        .limit(30),
+    ),
+    AuditQuery(
+        "agent.month_sales",
+        "app/services/agent.py",
+        lambda: select(Transaction.tx_type, Transaction.amount).where(
+            Transaction.user_id == 1,
+            Transaction.status == TransactionStatus.SUCCESS,
+            Transaction.created_at >= _SINCE,
+        ),
+    ),
+    AuditQuery(
+        "fraud.velocity_warmup",
+        "app/services/fraud.py",
+        lambda: select(ServiceTransaction.created_at, ServiceTransaction.amount).where(
+            ServiceTransaction.user_id == 1,
+            ServiceTransaction.created_at >= _SINCE - timedelta(days=1),
+        ),
+    ),
+    AuditQuery(
+        "referrals.by_referrer",
+        "GET /admin/users/{id}/referrals",
+        lambda: select(Referral).where(Referral.referrer_id == 1).order_by(Referral.created_at.desc()).limit(20),
+    ),
+    AuditQuery(
+        "api_logs.by_reference",
+        "GET /admin/transactions/{reference}",
+        lambda: select(ApiLog).where(ApiLog.reference == "TX-AUDIT").order_by(ApiLog.created_at.desc()),
+    ),
+)
+
+
+def _compile(connection: Connection, statement: Select) -> str:
+    return str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _postgres_plan(connection: Connection, sql: str) -> tuple[list[str], list[str]]:
+    # SET LOCAL lasts until the enclosing transaction ends; rolling back the
+    # savepoint undoes it.
+    savepoint = connection.begin_nested()
+    try:
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    finally:
+        savepoint.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, scans = [], []
+    stack = [(plan[0]["Plan"], 0)]
+    while stack:
+        node, depth = stack.pop()
+        relation = node.get("Relation Name")
+        label = node["Node Type"] + (f" on {relation}" if relation else "")
+        if node.get("Index Name"):
+            label += f" using {node['Index Name']}"
+        lines.append("  " * depth + label)
+        if node["Node Type"] == "Seq Scan" and relation:
+            scans.append(relation)
+        stack.extend((child, depth + 1) for child in reversed(node.get("Plans", [])))
+    return lines, scans
+
+
+def _sqlite_plan(connection: Connection, sql: str) -> tuple[list[str], list[str]]:
+    lines, scans = [], []
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[-1]
+        lines.append(detail)
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            scans.append(detail.split()[1])
+    return lines, scans
+
+
+def audit_query(connection: Connection, query: AuditQuery) -> dict:
+    sql = _compile(connection, query.statement())
+    if connection.dialect.name == "postgresql":
+        plan, scans = _postgres_plan(connection, sql)
+    else:
+        plan, scans = _sqlite_plan(connection, sql)
+    return {"name": query.name, "source": query.source, "seq_scans": scans, "plan": plan}
+
+
+def run_index_audit(connection: Connection, catalog: tuple[AuditQuery, ...] = CATALOG) -> list[dict]:
+    """EXPLAIN every catalog query; entries with a non-empty ``seq_scans`` need an index."""
+    return [audit_query(connection, query) for query in catalog]
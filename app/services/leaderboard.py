@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import String, delete, func, insert, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import LeaderboardScore, Transaction, TransactionStatus, User, UserRole
+from app.services.transaction_events import StatusChange, on_status_change
+from app.utils.cache import delete_cached, get_cached, set_cached
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_TX_TYPES = ("data", "airtime", "cable", "electricity", "exam")
+TOP_USERS_LIMIT = 10
+TOP_USERS_CACHE_TTL_SECONDS = 30
+
+_table = LeaderboardScore.__table__
+
+
+def month_key(value: datetime | None = None) -> str:
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _top_cache_key(month: str) -> str:
+    return f"leaderboard:top:{month}"
+
+
+def _upsert_score(connection: Connection, *, month: str, user_id: int, score: Decimal, count: int) -> None:
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(_table).values(month=month, user_id=user_id, score=score, tx_count=count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_table.c.month, _table.c.user_id],
+            set_={
+                "score": _table.c.score + stmt.excluded.score,
+                "tx_count": _table.c.tx_count + stmt.excluded.tx_count,
+                "updated_at": func.now(),
+            },
+        )
+        connection.execute(stmt)
+        return
+
+    updated = connection.execute(
+        update(_table)
+        .where(_table.c.month == month, _table.c.user_id == user_id)
+        .values(score=_table.c.score + score, tx_count=_table.c.tx_count + count, updated_at=func.now())
+    ).rowcount
+    if not updated:
+        connection.execute(insert(_table).values(month=month, user_id=user_id, score=score, tx_count=count))
+
+
+def _moves_leaderboard(change: StatusChange) -> bool:
+    success = TransactionStatus.SUCCESS.value
+    return (
+        change.kind == "transaction"
+        and change.tx_type in LEADERBOARD_TX_TYPES
+        and (change.became(success) or change.left(success))
+    )
+
+
+@on_status_change(wants=_moves_leaderboard)
+def apply_leaderboard_changes(connection: Connection, changes: list[StatusChange]) -> None:
+    success = TransactionStatus.SUCCESS.value
+    deltas: dict[tuple[str, int], list] = {}
+    for change in changes:
+        sign = 1 if change.became(success) else -1
+        key = (month_key(change.created_at), change.user_id)
+        bucket = deltas.setdefault(key, [Decimal("0"), 0])
+        bucket[0] += change.amount * sign
+        bucket[1] += sign
+
+    for (month, user_id), (score, count) in deltas.items():
+        if score == 0 and count == 0:
+            continue
+        _upsert_score(connection, month=month, user_id=user_id, score=score, count=count)
+
+
+def get_top_scores(db: Session, month: str, limit: int = TOP_USERS_LIMIT) -> list[dict]:
+    cache_key = _top_cache_key(month)
+    cached = get_cached(cache_key)
+    if cached is not None:
+        return cached[:limit]
+
+    rows = (
+        db.query(
+            User.id,
+            User.full_name,
+            User.email,
+            User.profile_image_url,
+            LeaderboardScore.score,
+        )
+        .join(User, User.id == LeaderboardScore.user_id)
+        .filter(LeaderboardScore.month == month, LeaderboardScore.score > 0)
+        .filter(User.role == UserRole.USER)
+        .order_by(LeaderboardScore.score.desc(), LeaderboardScore.user_id.asc())
+        .limit(TOP_USERS_LIMIT)
+        .all()
+    )
+    top = [
+        {
+            "id": row.id,
+            "full_name": row.full_name,
+            "email": row.email,
+            "profile_image_url": row.profile_image_url,
+            "score": Decimal(str(row.score or 0)),
+        }
+        for row in rows
+    ]
+    set_cached(cache_key, top, ttl_seconds=TOP_USERS_CACHE_TTL_SECONDS)
+    return top[:limit]
+
+
+def get_user_rank(db: Session, month: str, user_id: int) -> tuple[int, Decimal]:
+    score = (
+        db.query(LeaderboardScore.score)
+        .filter(LeaderboardScore.month == month, LeaderboardScore.user_id == user_id)
+        .scalar()
+    )
+    score = Decimal(str(score or 0))
+    # Served by ix_leaderboard_scores_month_score.
+    higher = (
+        db.query(func.count(LeaderboardScore.id))
+        .filter(LeaderboardScore.month == month, LeaderboardScore.score > score)
+        .scalar()
+    )
+    return int(higher or 0) + 1, score
+
+
+def rebuild_leaderboard_month(db: Session, month: str) -> int:
+    """Recompute one month's scores from the transactions table (repair/backfill)."""
+    year, mon = (int(part) for part in month.split("-"))
+    start = datetime(year, mon, 1)
+    end = datetime(year + 1, 1, 1) if mon == 12 else datetime(year, mon + 1, 1)
+
+    rows = (
+        db.query(
+            Transaction.user_id,
+            func.sum(Transaction.amount).label("score"),
+            func.count(Transaction.id).label("tx_count"),
+        )
+        .filter(Transaction.status == TransactionStatus.SUCCESS)
+        .filter(Transaction.created_at >= start, Transaction.created_at < end)
+        .filter(func.lower(Transaction.tx_type.cast(String)).in_(LEADERBOARD_TX_TYPES))
+        .group_by(Transaction.user_id)
+        .all()
+    )
+    db.execute(delete(_table).where(_table.c.month == month))
+    if rows:
+        db.execute(
+            insert(_table),
+            [
+                {"month": month, "user_id": row.user_id, "score": row.score or 0, "tx_count": row.tx_count or 0}
+                for row in rows
+            ],
+        )
+    db.commit()
+    delete_cached(_top_cache_key(month))
+    logger.info("Rebuilt leaderboard for %s: %s user(s).", month, len(rows))
+    return len(rows)
@@ -0,0 +1,188 @@
+"""
+Buffered writer for ApiLog rows.
+
+Purchases used to end with their own ``add(log); commit()`` round trip. API
+log rows are now queued in process and a background thread writes them as
+multi-row INSERTs every ``log_buffer_flush_interval_ms`` or once
+``log_buffer_batch_size`` rows are waiting, and drains the queue on shutdown.
+
+The queue is bounded; when it is full, API logs are dropped and counted. A
+batch whose INSERT fails is retried row by row so one bad row does not take
+the others with it. API logs bypass the session's after_flush rollup counting,
+so the writer adds them to the daily rollups in the same transaction as the
+insert.
+
+Admin audit rows are not buffered: ``write_audit_log`` adds them to the admin
+action's own transaction, so they commit (or roll back) with it and are never
+lost to a crash or a failed batch.
+
+When the worker is not running (scripts, tests, or buffering disabled), each
+log is written immediately.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import AdminAuditLog, ApiLog
+from app.services.rollups import count_api_logs
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class BufferedLogWriter:
+    def __init__(self, *, max_records: int, batch_size: int, flush_interval_ms: int) -> None:
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = max(int(flush_interval_ms), 10) / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(int(max_records), 1))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats_lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            **{name: stats.get(name, 0) for name in ("enqueued", "written", "batches", "dropped", "retried", "failed")},
+        }
+
+    def submit(self, bind, model, values: dict) -> None:
+        now = datetime.now(timezone.utc)
+        values.setdefault("created_at", now)
+        values.setdefault("updated_at", values["created_at"])
+        record = (bind, model, values)
+        if not self.running:
+            self._write([record])
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Log buffer full (%s rows); dropped %s log", self._queue.maxsize, model.__tablename__)
+            return
+        self._count("enqueued")
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows taken off the queue."""
+        taken = 0
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return taken
+            taken += len(batch)
+            self._write(batch)
+
+    def _write(self, records: list) -> None:
+        groups: dict[tuple, list[dict]] = {}
+        for bind, model, values in records:
+            groups.setdefault((bind, model), []).append(values)
+        for (bind, model), rows in groups.items():
+            try:
+                self._insert(bind, model, rows)
+                self._count("batches")
+            except Exception as exc:
+                logger.warning("Batch of %s %s row(s) failed, retrying row by row: %s", len(rows), model.__tablename__, exc)
+                self._count("retried", len(rows))
+                for row in rows:
+                    try:
+                        self._insert(bind, model, [row])
+                    except Exception as row_exc:
+                        self._count("failed")
+                        logger.error("Failed to write %s row: %s", model.__tablename__, row_exc)
+
+    def _insert(self, bind, model, rows: list[dict]) -> None:
+        session = Session(bind=bind)
+        try:
+            session.execute(insert(model.__table__), rows)
+            if model is ApiLog:
+                count_api_logs(
+                    session.connection(),
+                    ((row.get("service"), row.get("success"), row.get("created_at")) for row in rows),
+                )
+            session.commit()
+            self._count("written", len(rows))
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+        # Drain whatever arrived after the worker's last pass.
+        self.flush()
+
+
+log_writer = BufferedLogWriter(
+    max_records=settings.log_buffer_max_records,
+    batch_size=settings.log_buffer_batch_size,
+    flush_interval_ms=settings.log_buffer_flush_interval_ms,
+)
+
+
+def write_api_log(db: Session, **values) -> None:
+    """Queue an ApiLog row; ``db`` only supplies the database to write to."""
+    log_writer.submit(db.get_bind(), ApiLog, values)
+
+
+def write_audit_log(db: Session, **values) -> None:
+    """Add an AdminAuditLog row to the admin action's transaction; the caller's commit writes both."""
+    db.add(AdminAuditLog(**values))
+
+
+def start_log_writer() -> None:
+    if not settings.log_buffer_enabled:
+        logger.info("Buffered log writer disabled by config.")
+        return
+    log_writer.start()
+
+
+def stop_log_writer() -> None:
+    log_writer.stop()
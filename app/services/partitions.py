@@ -0,0 +1,281 @@
+"""
+Monthly range partitioning of transactions and service_transactions (Postgres).
+
+Partitioning is opt-in (``DB_PARTITION_TRANSACTIONS``). When enabled, migration
+0024 (or ``scripts/manage_partitions.py --convert``) turns each table into a
+parent partitioned by ``RANGE (created_at)`` with one child per calendar month
+(UTC) plus a DEFAULT partition that catches anything outside the known months.
+The ORM keeps mapping the parent table, so queries and inserts are unchanged.
+Date-filtered queries only scan the months in range.
+
+Postgres requires every unique index on a partitioned table to include the
+partition key, so:
+
+- the primary key becomes ``(id, created_at)``; ids still come from the
+  original sequence and stay unique;
+- global ``reference`` uniqueness moves into a small ``<table>_references``
+  table maintained by a trigger. A duplicate reference still fails the INSERT
+  with a unique violation (IntegrityError), which the webhook handlers rely on.
+
+``ensure_partitions`` creates the upcoming months (run on startup and from the
+daily cron). ``detach_partitions_before`` detaches old months, which leaves
+them as standalone tables that can be dumped or dropped without touching the
+live table. Every function here is a no-op on SQLite and on unpartitioned
+Postgres tables.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+from app.core.config import get_settings
+from app.core.database import Base
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PARTITIONED_TABLES = ("transactions", "service_transactions")
+# Reference column widths, for the per-table uniqueness table.
+_REFERENCE_LENGTHS = {"transactions": 64, "service_transactions": 64}
+
+
+def month_floor(value: date | datetime) -> date:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_pdefault"
+
+
+def reference_table_name(table: str) -> str:
+    return f"{table}_references"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def partition_bounds_sql(month: date) -> str:
+    return f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+
+
+def planned_months(first: date | datetime, now: date | datetime, months_ahead: int) -> list[date]:
+    """Every month from ``first`` through ``months_ahead`` months after ``now``."""
+    month = month_floor(first)
+    last = add_months(month_floor(now), max(int(months_ahead), 0))
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _is_postgres(connection: Connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    if not _is_postgres(connection):
+        return False
+    return bool(
+        connection.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND c.relnamespace = to_regnamespace(current_schema())"
+            ),
+            {"table": table},
+        ).scalar()
+    )
+
+
+def existing_partitions(connection: Connection, table: str) -> set[str]:
+    rows = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "WHERE parent.relname = :table AND parent.relnamespace = to_regnamespace(current_schema())"
+        ),
+        {"table": table},
+    )
+    return {name for (name,) in rows}
+
+
+def _create_month_partition(connection: Connection, table: str, month: date) -> None:
+    name = partition_name(table, month)
+    bounds = {"start": datetime(month.year, month.month, 1, tzinfo=timezone.utc)}
+    next_month = add_months(month, 1)
+    bounds["end"] = datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+    default = default_partition_name(table)
+    stray = connection.execute(
+        text(f"SELECT count(*) FROM {default} WHERE created_at >= :start AND created_at < :end"), bounds
+    ).scalar()
+    if not stray:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {partition_bounds_sql(month)}"))
+    else:
+        # Postgres refuses a new partition while the DEFAULT partition holds
+        # rows for its range: move them into a standalone table, then attach it.
+        connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+        connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {partition_bounds_sql(month)}"))
+        logger.warning("Moved %s %s row(s) out of %s into %s.", stray, table, default, name)
+    connection.execute(text(f"ALTER TABLE {name} ENABLE ROW LEVEL SECURITY"))
+
+
+def ensure_partitions(
+    connection: Connection, table: str, *, now: datetime | None = None, months_ahead: int | None = None
+) -> list[str]:
+    """Create the missing monthly partitions from this month through ``months_ahead`` months ahead."""
+    if not is_partitioned(connection, table):
+        return []
+    now = now or datetime.now(timezone.utc)
+    months_ahead = settings.db_partition_months_ahead if months_ahead is None else months_ahead
+    existing = existing_partitions(connection, table)
+    created = []
+    for month in planned_months(now, now, months_ahead):
+        name = partition_name(table, month)
+        if name not in existing:
+            _create_month_partition(connection, table, month)
+            created.append(name)
+    return created
+
+
+def ensure_all_partitions(engine, *, now: datetime | None = None) -> dict[str, list[str]]:
+    if engine.dialect.name != "postgresql":
+        return {}
+    with engine.begin() as connection:
+        created = {table: ensure_partitions(connection, table, now=now) for table in PARTITIONED_TABLES}
+    for table, names in created.items():
+        if names:
+            logger.info("Created %s partition(s): %s", table, ", ".join(names))
+    return created
+
+
+def detach_partitions_before(connection: Connection, table: str, before: date) -> list[str]:
+    """Detach monthly partitions for months before ``before``; the tables themselves are kept."""
+    if not is_partitioned(connection, table):
+        return []
+    cutoff = partition_name(table, month_floor(before))
+    prefix = f"{table}_p"
+    detached = []
+    for name in sorted(existing_partitions(connection, table)):
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and suffix.isdigit() and name < cutoff:
+            connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            detached.append(name)
+    return detached
+
+
+def _create_model_indexes(connection: Connection, table: str, *, partitioned: bool) -> None:
+    for index in sorted(Base.metadata.tables[table].indexes, key=lambda idx: idx.name):
+        if partitioned and index.unique:
+            # Uniqueness is enforced by the references table instead.
+            columns = ", ".join(column.name for column in index.columns)
+            connection.execute(text(f"CREATE INDEX {index.name} ON {table} ({columns})"))
+        else:
+            connection.execute(CreateIndex(index))
+
+
+def convert_to_partitioned(connection: Connection, table: str, *, now: datetime | None = None) -> int:
+    """Rebuild ``table`` as a monthly partitioned table in place; returns the number of partitions created.
+
+    Runs inside the caller's transaction and holds an exclusive lock on the
+    table while rows are copied.
+    """
+    if not _is_postgres(connection) or is_partitioned(connection, table):
+        return 0
+    now = now or datetime.now(timezone.utc)
+    legacy = f"{table}_unpartitioned"
+    references = reference_table_name(table)
+
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    connection.execute(text(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    connection.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    connection.execute(text(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+
+    first = connection.execute(text(f"SELECT min(created_at) FROM {legacy}")).scalar() or now
+    months = planned_months(month_floor(first), month_floor(now), settings.db_partition_months_ahead)
+    for month in months:
+        connection.execute(text(f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} {partition_bounds_sql(month)}"))
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    # Constraint and index names are free again once the old table is gone.
+    connection.execute(text(f"DROP TABLE {legacy}"))
+    connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)"))
+    connection.execute(text(f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    _create_model_indexes(connection, table, partitioned=True)
+
+    connection.execute(
+        text(f"CREATE TABLE {references} (reference VARCHAR({_REFERENCE_LENGTHS[table]}) PRIMARY KEY)")
+    )
+    connection.execute(text(f"INSERT INTO {references} (reference) SELECT reference FROM {table}"))
+    connection.execute(
+        text(
+            f"""
+            CREATE OR REPLACE FUNCTION {table}_reference_guard() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM {references} WHERE reference = OLD.reference;
+                    RETURN OLD;
+                END IF;
+                IF TG_OP = 'UPDATE' THEN
+                    IF NEW.reference IS NOT DISTINCT FROM OLD.reference THEN
+                        RETURN NEW;
+                    END IF;
+                    DELETE FROM {references} WHERE reference = OLD.reference;
+                END IF;
+                INSERT INTO {references} (reference) VALUES (NEW.reference);
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql
+            """
+        )
+    )
+    connection.execute(
+        text(
+            f"CREATE TRIGGER {table}_reference_guard BEFORE INSERT OR UPDATE OF reference OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_reference_guard()"
+        )
+    )
+    for name in (table, references, default_partition_name(table), *(partition_name(table, m) for m in months)):
+        connection.execute(text(f"ALTER TABLE {name} ENABLE ROW LEVEL SECURITY"))
+    return len(months) + 1
+
+
+def convert_to_unpartitioned(connection: Connection, table: str) -> None:
+    """Undo ``convert_to_partitioned``. Rows in detached partitions are not brought back."""
+    if not is_partitioned(connection, table):
+        return
+    partitioned = f"{table}_partitioned"
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {partitioned}"))
+    connection.execute(text(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)"))
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {partitioned}"))
+    connection.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    connection.execute(text(f"DROP TABLE {partitioned} CASCADE"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {reference_table_name(table)}"))
+    connection.execute(text(f"DROP FUNCTION IF EXISTS {table}_reference_guard()"))
+    connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id)"))
+    connection.execute(text(f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    _create_model_indexes(connection, table, partitioned=False)
+    connection.execute(text(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY"))
@@ -6,11 +6,12 @@ import time
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.core.database import SessionLocal
-from app.models import DataPlan, Transaction, TransactionStatus, TransactionType
+from app.models import BulkPurchase, BulkPurchaseItem, DataPlan, Transaction, TransactionStatus, TransactionType
 from app.services.amigo import AmigoApiError, AmigoClient, normalize_plan_code, resolve_network_id
 from app.services.wallet import credit_wallet, get_or_create_wallet
 from app.services.outbound_webhooks import dispatch_developer_webhook
@@ -127,6 +128,14 @@ def _tx_age_seconds(tx: Transaction) -> int:
     return max(0, int((now - created).total_seconds()))
 
 
+def _running_bulk_items():
+    return (
+        select(BulkPurchaseItem.reference)
+        .join(BulkPurchase, BulkPurchase.id == BulkPurchaseItem.bulk_purchase_id)
+        .where(BulkPurchase.status == "processing")
+    )
+
+
 def reconcile_pending_data_once(limit: int = 50) -> dict[str, int]:
     db = SessionLocal()
     processed = 0
@@ -142,6 +151,8 @@ def reconcile_pending_data_once(limit: int = 50) -> dict[str, int]:
                 Transaction.tx_type == TransactionType.DATA,
                 Transaction.status == TransactionStatus.PENDING,
                 Transaction.created_at <= cutoff,
+                # Items of a running bulk purchase are still being sent by its runner.
+                ~Transaction.reference.in_(_running_bulk_items()),
             )
             .order_by(Transaction.created_at.asc())
             .limit(max(1, limit))
@@ -281,6 +292,7 @@ def reconcile_pending_bills_once(limit: int = 50) -> dict[str, int]:
                 Transaction.tx_type.in_([TransactionType.AIRTIME, TransactionType.CABLE, TransactionType.ELECTRICITY]),
                 Transaction.status == TransactionStatus.PENDING,
                 Transaction.created_at <= cutoff,
+                ~Transaction.reference.in_(_running_bulk_items()),
             )
             .order_by(Transaction.created_at.asc())
             .limit(max(1, limit))
@@ -361,6 +373,16 @@ def reconcile_pending_bills_once(limit: int = 50) -> dict[str, int]:
     }
 
 
+def _recover_stalled_bulk_purchases() -> int:
+    from app.services.bulk_purchase import recover_stalled_bulk_purchases
+
+    db = SessionLocal()
+    try:
+        return recover_stalled_bulk_purchases(db)
+    finally:
+        db.close()
+
+
 def _reconcile_loop() -> None:
     logger.info(
         "Pending data reconciliation worker started (interval=%ss, max_batch=%s).",
@@ -375,6 +397,9 @@ def _reconcile_loop() -> None:
             stats_bills = reconcile_pending_bills_once(limit=settings.pending_reconcile_batch_size)
             if stats_bills["processed"] > 0:
                 logger.info("Pending bills reconcile stats: %s", stats_bills)
+            recovered = _recover_stalled_bulk_purchases()
+            if recovered:
+                logger.info("Finalized %s stalled bulk purchase(s).", recovered)
         except Exception as exc:
             logger.warning("Pending reconciliation loop failed: %s", exc)
         _stop_event.wait(timeout=max(20, settings.pending_reconcile_interval_seconds))
@@ -1,10 +1,20 @@
+import threading
+import time
+import weakref
+from dataclasses import dataclass
 from decimal import Decimal
+from typing import Iterable, NamedTuple
 from sqlalchemy.orm import Session
 from app.models import PricingRule, PricingRole, DataPlan, UserRole
 
 
 SERVICE_KEY_PREFIX = "svc"
 
+# Pricing rules change a few times a week but are read on every purchase and
+# plan listing, so each process keeps a compiled copy. update_pricing drops it
+# immediately; the TTL bounds how long other workers can serve a stale table.
+PRICING_TABLE_TTL_SECONDS = 60
+
 
 def pricing_role_for_user(user_role: UserRole) -> PricingRole:
     # Only explicit resellers get reseller pricing.
@@ -26,18 +36,75 @@ def parse_pricing_key(network: str) -> dict:
     return {"kind": "data", "tx_type": "data", "provider": None, "network": raw}
 
 
+def _normalize_key(key: str) -> str:
+    return str(key or "").strip().lower()
+
+
+def _rule_margin(rule: PricingRule) -> tuple[Decimal, str]:
+    margin_type = str(getattr(rule, "margin_type", None) or "fixed").strip().lower()
+    if margin_type not in ("fixed", "percentage"):
+        margin_type = "fixed"
+    return Decimal(rule.margin), margin_type
+
+
+@dataclass(frozen=True)
+class PricingTable:
+    """(pricing key, role) -> (margin, margin_type), compiled from pricing_rules."""
+
+    rules: dict
+
+    @classmethod
+    def compile(cls, rules: Iterable[PricingRule]) -> "PricingTable":
+        return cls({(_normalize_key(rule.network), PricingRole(rule.role)): _rule_margin(rule) for rule in rules})
+
+    def margin_for(self, key: str, role: PricingRole) -> tuple[Decimal, str]:
+        return self.rules.get((_normalize_key(key), role), (Decimal("0"), "fixed"))
+
+
+_pricing_tables: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_pricing_tables_lock = threading.Lock()
+
+
+def load_pricing_table(db: Session) -> PricingTable | None:
+    """The cached pricing table for ``db``'s engine, loading it in one query when stale.
+
+    Returns None for session stand-ins without an engine; callers then fall
+    back to querying the single rule they need.
+    """
+    get_bind = getattr(db, "get_bind", None)
+    if get_bind is None:
+        return None
+    engine = getattr(get_bind(), "engine", None)
+    if engine is None:
+        return None
+    now = time.monotonic()
+    with _pricing_tables_lock:
+        cached = _pricing_tables.get(engine)
+    if cached and cached[0] > now:
+        return cached[1]
+    table = PricingTable.compile(db.query(PricingRule).all())
+    with _pricing_tables_lock:
+        _pricing_tables[engine] = (now + PRICING_TABLE_TTL_SECONDS, table)
+    return table
+
+
+def invalidate_pricing_table() -> None:
+    with _pricing_tables_lock:
+        _pricing_tables.clear()
+
+
 def get_margin_for_key(db: Session, key: str, role: PricingRole) -> tuple[Decimal, str]:
     """Return (margin_amount, margin_type) for a pricing key and role."""
+    table = load_pricing_table(db)
+    if table is not None:
+        return table.margin_for(key, role)
     rule = db.query(PricingRule).filter(
         PricingRule.network == str(key or "").strip().lower(),
         PricingRule.role == role,
     ).first()
     if not rule:
         return Decimal("0"), "fixed"
-    margin_type = str(getattr(rule, "margin_type", None) or "fixed").strip().lower()
-    if margin_type not in ("fixed", "percentage"):
-        margin_type = "fixed"
-    return Decimal(rule.margin), margin_type
+    return _rule_margin(rule)
 
 
 def apply_margin(base_price: Decimal, margin: Decimal, margin_type: str) -> Decimal:
@@ -49,9 +116,7 @@ def apply_margin(base_price: Decimal, margin: Decimal, margin_type: str) -> Deci
     return base + m
 
 
-def get_price_for_user(db: Session, plan: DataPlan, role: UserRole) -> Decimal:
-    pricing_role = pricing_role_for_user(role)
-    
+def _override_price(plan: DataPlan, pricing_role: PricingRole) -> Decimal | None:
     if pricing_role == PricingRole.RESELLER:
         agent_price = getattr(plan, "agent_price", None)
         if agent_price is not None:
@@ -66,11 +131,42 @@ def get_price_for_user(db: Session, plan: DataPlan, role: UserRole) -> Decimal:
             return Decimal(display)
         except Exception:
             pass
+    return None
+
+
+def get_price_for_user(db: Session, plan: DataPlan, role: UserRole) -> Decimal:
+    pricing_role = pricing_role_for_user(role)
+    override = _override_price(plan, pricing_role)
+    if override is not None:
+        return override
 
     margin, margin_type = get_margin_for_key(db, plan.network, pricing_role)
     return apply_margin(Decimal(plan.base_price), margin, margin_type)
 
 
+class PlanQuote(NamedTuple):
+    plan: DataPlan
+    price: Decimal
+    # base_price plus the network margin, ignoring display/agent overrides.
+    margin_price: Decimal
+
+
+def quote_many(db: Session, plans: Iterable[DataPlan], role: UserRole) -> list[PlanQuote]:
+    """Price a batch of plans for ``role`` against a single pricing-table lookup."""
+    pricing_role = pricing_role_for_user(role)
+    table = load_pricing_table(db)
+    quotes = []
+    for plan in plans:
+        if table is not None:
+            margin, margin_type = table.margin_for(plan.network, pricing_role)
+        else:
+            margin, margin_type = get_margin_for_key(db, plan.network, pricing_role)
+        margin_price = apply_margin(Decimal(str(plan.base_price or "0")), margin, margin_type)
+        override = _override_price(plan, pricing_role)
+        quotes.append(PlanQuote(plan, override if override is not None else margin_price, margin_price))
+    return quotes
+
+
 def get_service_charge_for_user(
     db: Session,
     *,
@@ -84,3 +180,24 @@ def get_service_charge_for_user(
     margin, margin_type = get_margin_for_key(db, key, pricing_role)
     charge_amount = apply_margin(Decimal(base_amount), margin, margin_type)
     return charge_amount, Decimal(margin)
+
+
+def quote_service_charges(
+    db: Session,
+    *,
+    tx_type: str,
+    items: Iterable[tuple[str, Decimal]],
+    user_role: UserRole,
+) -> list[tuple[Decimal, Decimal]]:
+    """``get_service_charge_for_user`` for many (provider, base_amount) pairs against a single pricing-table lookup."""
+    pricing_role = pricing_role_for_user(user_role)
+    table = load_pricing_table(db)
+    margins: dict[str, tuple[Decimal, str]] = {}
+    charges = []
+    for provider, base_amount in items:
+        key = build_service_pricing_key(tx_type, provider)
+        if key not in margins:
+            margins[key] = table.margin_for(key, pricing_role) if table is not None else get_margin_for_key(db, key, pricing_role)
+        margin, margin_type = margins[key]
+        charges.append((apply_margin(Decimal(base_amount), margin, margin_type), Decimal(margin)))
+    return charges
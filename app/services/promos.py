@@ -0,0 +1,214 @@
+"""
+Promo ledger: limited-stock promo prices backed by a redemption table.
+
+Availability used to be derived by counting distinct users over every
+successful transaction at the promo price on each plan listing and purchase.
+Each promo now keeps a ``remaining`` counter and a (promo, user) redemption
+row: checks are indexed lookups and a redemption is one conditional UPDATE
+plus an INSERT guarded by the unique constraint. When a purchase that used a
+promo fails or is refunded, the status-change hook gives the stock back.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from decimal import Decimal
+
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import DataPlan, Promo, PromoRedemption, Transaction, TransactionStatus, TransactionType
+from app.services.transaction_events import StatusChange, on_status_change
+
+logger = logging.getLogger(__name__)
+
+# The promo configured through PROMO_MTN_1GB_* settings.
+MTN_1GB_PROMO_CODE = "mtn_1gb"
+
+_RELEASING_STATUSES = (TransactionStatus.FAILED.value, TransactionStatus.REFUNDED.value)
+
+_promos = Promo.__table__
+_redemptions = PromoRedemption.__table__
+
+
+def plan_code_suffix(plan_code: str | None) -> str:
+    raw = str(plan_code or "").strip().lower()
+    if ":" in raw:
+        return raw.split(":")[-1]
+    return raw
+
+
+def _plan_key(plan: DataPlan) -> tuple[str, str]:
+    return str(plan.network or "").strip().lower(), plan_code_suffix(plan.plan_code)
+
+
+def promo_for_plan(db: Session, plan: DataPlan) -> Promo | None:
+    network, suffix = _plan_key(plan)
+    return (
+        db.query(Promo)
+        .filter(Promo.is_active == True, Promo.network == network, Promo.plan_code == suffix)  # noqa: E712
+        .first()
+    )
+
+
+def active_promos(db: Session) -> dict[tuple[str, str], Promo]:
+    """Active promos keyed by (network, plan code suffix), for matching a whole plan list."""
+    return {(promo.network, promo.plan_code): promo for promo in db.query(Promo).filter(Promo.is_active == True).all()}  # noqa: E712
+
+
+def match_promo(promos: dict[tuple[str, str], Promo], plan: DataPlan) -> Promo | None:
+    return promos.get(_plan_key(plan))
+
+
+def redeemed_promo_ids(db: Session, user_id: int) -> set[int]:
+    return {row[0] for row in db.query(PromoRedemption.promo_id).filter(PromoRedemption.user_id == int(user_id)).all()}
+
+
+def has_redeemed(db: Session, promo: Promo, user_id: int) -> bool:
+    return bool(
+        db.query(PromoRedemption.id)
+        .filter(PromoRedemption.promo_id == promo.id, PromoRedemption.user_id == int(user_id))
+        .first()
+    )
+
+
+def promo_snapshot(promo: Promo | None) -> dict:
+    if promo is None:
+        return {"active": False, "remaining": 0, "limit": 0, "users_used": 0, "price": None}
+    limit = int(promo.stock_limit or 0)
+    remaining = max(int(promo.remaining or 0), 0)
+    return {
+        "active": bool(promo.is_active) and remaining > 0,
+        "remaining": remaining,
+        "limit": limit,
+        "users_used": max(limit - remaining, 0),
+        "price": Decimal(str(promo.price)),
+    }
+
+
+def claim_promo(db: Session, promo: Promo, *, user_id: int, reference: str) -> bool:
+    """Take one unit of stock for ``user_id``; False when sold out or already redeemed.
+
+    The claim is flushed, not committed: it commits with the purchase and
+    disappears with it if the request rolls back.
+    """
+    savepoint = db.begin_nested()
+    try:
+        claimed = (
+            db.query(Promo)
+            .filter(Promo.id == promo.id, Promo.is_active == True, Promo.remaining > 0)  # noqa: E712
+            .update({Promo.remaining: Promo.remaining - 1}, synchronize_session=False)
+        )
+        if claimed:
+            db.add(PromoRedemption(
+                promo_id=promo.id,
+                user_id=int(user_id),
+                transaction_reference=reference,
+                amount=promo.price,
+            ))
+            db.flush()
+    except IntegrityError:
+        savepoint.rollback()
+        return False
+    if not claimed:
+        savepoint.rollback()
+        return False
+    savepoint.commit()
+    return True
+
+
+def _releases_redemption(change: StatusChange) -> bool:
+    return (
+        change.kind == "transaction"
+        and change.tx_type == TransactionType.DATA.value
+        and change.new_status in _RELEASING_STATUSES
+        and change.old_status not in _RELEASING_STATUSES
+    )
+
+
+@on_status_change(wants=_releases_redemption)
+def release_failed_redemptions(connection: Connection, changes: list[StatusChange]) -> None:
+    references = [change.reference for change in changes]
+    rows = connection.execute(
+        select(_redemptions.c.id, _redemptions.c.promo_id).where(
+            _redemptions.c.transaction_reference.in_(references)
+        )
+    ).all()
+    if not rows:
+        return
+    connection.execute(delete(_redemptions).where(_redemptions.c.id.in_([row.id for row in rows])))
+    for promo_id, released in Counter(row.promo_id for row in rows).items():
+        connection.execute(
+            update(_promos)
+            .where(_promos.c.id == promo_id)
+            .values(remaining=_promos.c.remaining + released, updated_at=func.now())
+        )
+
+
+def _backfill_legacy_redemptions(db: Session, promo: Promo) -> None:
+    # Users who bought the plan at the promo price before the ledger existed.
+    buyers = (
+        select(
+            literal(promo.id),
+            Transaction.user_id,
+            func.min(Transaction.reference),
+            literal(promo.price),
+        )
+        .where(
+            Transaction.tx_type == TransactionType.DATA,
+            Transaction.status == TransactionStatus.SUCCESS,
+            Transaction.amount == promo.price,
+            func.lower(Transaction.network) == promo.network,
+        )
+        .group_by(Transaction.user_id)
+    )
+    db.execute(
+        insert(PromoRedemption).from_select(
+            ["promo_id", "user_id", "transaction_reference", "amount"], buyers
+        )
+    )
+
+
+def sync_configured_promos(db: Session) -> Promo | None:
+    """Create or update the settings-driven MTN 1GB promo and re-derive its stock."""
+    settings = get_settings()
+    enabled = bool(getattr(settings, "promo_mtn_1gb_enabled", False))
+    promo = db.query(Promo).filter(Promo.code == MTN_1GB_PROMO_CODE).first()
+    if promo is None and not enabled:
+        return None
+
+    fields = {
+        "network": str(getattr(settings, "promo_mtn_1gb_network", "mtn") or "mtn").strip().lower(),
+        "plan_code": str(getattr(settings, "promo_mtn_1gb_plan_code", "1001") or "1001").strip().lower(),
+        "price": Decimal(str(getattr(settings, "promo_mtn_1gb_price", "199"))),
+        "stock_limit": max(int(getattr(settings, "promo_mtn_1gb_limit", 0) or 0), 0),
+        "is_active": enabled,
+    }
+    if promo is None:
+        promo = Promo(code=MTN_1GB_PROMO_CODE, remaining=0, **fields)
+        db.add(promo)
+        db.flush()
+        _backfill_legacy_redemptions(db, promo)
+    else:
+        for key, value in fields.items():
+            setattr(promo, key, value)
+        db.flush()
+
+    # One statement, so a redemption racing this sync is never lost.
+    redeemed = (
+        select(func.count(_redemptions.c.id))
+        .where(_redemptions.c.promo_id == _promos.c.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(_promos)
+        .where(_promos.c.id == promo.id)
+        .values(remaining=case((redeemed >= _promos.c.stock_limit, 0), else_=_promos.c.stock_limit - redeemed))
+    )
+    db.commit()
+    db.refresh(promo)
+    logger.info("Promo %s synced: %s of %s remaining.", promo.code, promo.remaining, promo.stock_limit)
+    return promo
@@ -5,6 +5,7 @@ from decimal import Decimal
 import secrets
 
 from fastapi import HTTPException
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
@@ -15,6 +16,8 @@ settings = get_settings()
 
 DEFAULT_REWARD_AMOUNT = Decimal("0.00")
 REFERRAL_REWARD_RATE = Decimal("0.02")
+# Data sold (MB) at which a USER is promoted to agent (RESELLER): 50GB.
+AGENT_UPGRADE_DATA_MB = 51200
 
 
 def _utcnow() -> datetime:
@@ -254,46 +257,78 @@ def record_referral_first_deposit_reward(
     return referral
 
 
-def record_referral_data_activity(db: Session, *, user: User, tx_type: str, amount: Decimal, data_mb: float = 0.0) -> Referral | None:
+def _increment_agent_stat(db: Session, agent_id: int, *, data_mb: int, airtime: Decimal) -> int:
+    """Add to the agent's running totals in one statement, creating the row if needed; returns total_data_mb."""
     from app.models.agent import AgentStat
-    from sqlalchemy.orm.attributes import flag_modified
-    
-    # 1. Update Agent Stats with lock to prevent race conditions
-    stat = db.query(AgentStat).filter(AgentStat.agent_id == user.id).with_for_update().first()
-    if not stat:
-        stat = AgentStat(agent_id=user.id)
-        db.add(stat)
-        db.flush()
-        # Lock the newly created stat
-        stat = db.query(AgentStat).filter(AgentStat.agent_id == user.id).with_for_update().first()
-        
-    # Refresh the user object to ensure we have the latest role (in case a concurrent request just upgraded them)
-    db.refresh(user)
-        
+
+    table = AgentStat.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).values(
+            agent_id=agent_id, total_data_mb=data_mb, total_airtime_amount=airtime, total_transactions=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.agent_id],
+            set_={
+                "total_data_mb": table.c.total_data_mb + stmt.excluded.total_data_mb,
+                "total_airtime_amount": table.c.total_airtime_amount + stmt.excluded.total_airtime_amount,
+                "total_transactions": table.c.total_transactions + 1,
+                "updated_at": func.now(),
+            },
+        ).returning(table.c.total_data_mb)
+        return int(db.execute(stmt).scalar_one())
+
+    updated = db.execute(
+        update(table)
+        .where(table.c.agent_id == agent_id)
+        .values(
+            total_data_mb=table.c.total_data_mb + data_mb,
+            total_airtime_amount=table.c.total_airtime_amount + airtime,
+            total_transactions=table.c.total_transactions + 1,
+            updated_at=func.now(),
+        )
+    ).rowcount
+    if not updated:
+        db.execute(
+            insert(table).values(
+                agent_id=agent_id, total_data_mb=data_mb, total_airtime_amount=airtime, total_transactions=1
+            )
+        )
+        return data_mb
+    return int(db.execute(select(table.c.total_data_mb).where(table.c.agent_id == agent_id)).scalar_one())
+
+
+def record_referral_data_activity(db: Session, *, user: User, tx_type: str, amount: Decimal, data_mb: float = 0.0) -> Referral | None:
+    # Running totals are bumped with a single upsert instead of locking and
+    # re-reading the AgentStat row, so concurrent purchases by one agent only
+    # contend for the instant between the UPDATE and their commit.
+    mb = 0
+    airtime = Decimal("0")
     if tx_type == TransactionType.DATA or tx_type == "data":
         # Approximate MB if not provided
-        mb = data_mb if data_mb > 0 else (float(amount) / 250.0 * 1024.0)
-        stat.total_data_mb = int((stat.total_data_mb or 0) + mb)
+        mb = int(data_mb if data_mb > 0 else (float(amount) / 250.0 * 1024.0))
     elif tx_type == TransactionType.AIRTIME or tx_type == "airtime":
-        stat.total_airtime_amount = Decimal(str(float(stat.total_airtime_amount or 0.0) + float(amount)))
-        
-    stat.total_transactions = (stat.total_transactions or 0) + 1
-    db.flush()
+        airtime = Decimal(str(amount))
+    total_data_mb = _increment_agent_stat(db, user.id, data_mb=mb, airtime=airtime)
 
-    # Check qualification criteria: e.g. sold 50GB (51200 MB)
-    target_mb = 51200.0
     referral = None
-    if float(stat.total_data_mb) >= target_mb and user.role == UserRole.USER:
-        # Upgrade user to Agent (RESELLER) role
-        user.role = UserRole.RESELLER
-        user.agent_upgrade_seen = False
-
-        # Note: The automatic ₦2000 reward for the user has been removed. 
+    if total_data_mb >= AGENT_UPGRADE_DATA_MB and user.role == UserRole.USER:
+        # Upgrade user to Agent (RESELLER) role. The role condition makes a
+        # concurrent upgrade of the same user a no-op.
+        # Note: The automatic ₦2000 reward for the user has been removed.
         # Users now claim their reward manually via the Agent Campaign system.
+        upgraded = (
+            db.query(User)
+            .filter(User.id == user.id, User.role == UserRole.USER)
+            .update({User.role: UserRole.RESELLER, User.agent_upgrade_seen: False}, synchronize_session=False)
+        )
+        if upgraded:
+            db.expire(user, ["role", "agent_upgrade_seen"])
 
-        db.flush()
-
-        
     return referral
 
 
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import ApiLog, ApiLogMinute, DailyRollup, ServiceTransaction, Transaction, TransactionType
+from app.services.transaction_events import StatusChange, normalize_status, on_status_change
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DIMENSIONS = ("day", "kind", "tx_type", "status", "network")
+ROLLUP_MEASURES = ("tx_count", "amount", "base_cost", "fee_estimate")
+REBUILD_BATCH_SIZE = 1000
+
+_table = DailyRollup.__table__
+_ZERO = Decimal("0")
+
+
+def estimate_payment_fee(amount: Decimal, provider: str | None) -> Decimal:
+    """Gateway fee estimate for one wallet funding (Billstack 0.5%, Monnify 1% capped, else Paystack 1.5%)."""
+    amount = Decimal(str(amount or 0))
+    provider = str(provider or "").lower()
+    if "billstack" in provider:
+        return amount * Decimal("0.005")
+    if "monnify" in provider:
+        return min(amount * Decimal("0.01"), Decimal("2000.0"))
+    return amount * Decimal("0.015")
+
+
+def _day_of(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _measures(kind: str, tx_type: str, amount: Decimal, provider: str | None, base_cost: Decimal | None) -> list:
+    # Cost falls back to the charged amount when no cost was captured at
+    # purchase time, matching how the dashboards have always estimated margin.
+    fee = estimate_payment_fee(amount, provider) if kind == "transaction" and tx_type == TransactionType.WALLET_FUND.value else _ZERO
+    return [1, amount, base_cost if base_cost is not None else amount, fee]
+
+
+def _add(buckets: dict, key: tuple, measures: list, sign: int) -> None:
+    bucket = buckets.setdefault(key, [0, _ZERO, _ZERO, _ZERO])
+    for index, value in enumerate(measures):
+        bucket[index] += value * sign
+
+
+def _upsert_rollup(connection: Connection, key: tuple, measures: list) -> None:
+    values = dict(zip(ROLLUP_DIMENSIONS, key))
+    values.update(zip(ROLLUP_MEASURES, measures))
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(_table).values(**values)
+        set_ = {name: _table.c[name] + stmt.excluded[name] for name in ROLLUP_MEASURES}
+        set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=[_table.c[name] for name in ROLLUP_DIMENSIONS], set_=set_)
+        connection.execute(stmt)
+        return
+
+    where = [_table.c[name] == values[name] for name in ROLLUP_DIMENSIONS]
+    increments = {name: _table.c[name] + values[name] for name in ROLLUP_MEASURES}
+    updated = connection.execute(update(_table).where(*where).values(updated_at=func.now(), **increments)).rowcount
+    if not updated:
+        connection.execute(insert(_table).values(**values))
+
+
+def _write_buckets(connection: Connection, buckets: dict) -> None:
+    for key, measures in buckets.items():
+        if not any(measures):
+            continue
+        _upsert_rollup(connection, key, measures)
+
+
+@on_status_change
+def apply_rollup_changes(connection: Connection, changes: list[StatusChange]) -> None:
+    buckets: dict[tuple, list] = {}
+    for change in changes:
+        day = _day_of(change.created_at)
+        if change.old_status is not None:
+            # Out of the old bucket with the values it was counted with.
+            old_measures = _measures(change.kind, change.tx_type, change.amount, change.old_provider, change.old_base_amount)
+            _add(buckets, (day, change.kind, change.tx_type, change.old_status, change.old_network or ""), old_measures, -1)
+        measures = _measures(change.kind, change.tx_type, change.amount, change.provider, change.base_amount)
+        _add(buckets, (day, change.kind, change.tx_type, change.new_status, change.network or ""), measures, 1)
+    _write_buckets(connection, buckets)
+
+
+def _api_key(service, success, day: date) -> tuple:
+    status = "success" if int(success or 0) else "failed"
+    return (day, "api", str(service or "").strip().lower(), status, "")
+
+
+def count_api_logs(connection: Connection, logs: Iterable[tuple]) -> None:
+    """Add (service, success, created_at) API log entries to the daily rollups."""
+    today = datetime.now(timezone.utc).date()
+    buckets: dict[tuple, list] = {}
+    for service, success, created_at in logs:
+        _add(buckets, _api_key(service, success, _day_of(created_at) if created_at else today), [1, _ZERO, _ZERO, _ZERO], 1)
+    if buckets:
+        _write_buckets(connection, buckets)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_api_logs(session: Session, flush_context) -> None:
+    logs = [
+        (obj.service, obj.success, obj.__dict__.get("created_at"))
+        for obj in session.new
+        if isinstance(obj, ApiLog)
+    ]
+    if not logs:
+        return
+    connection = session.connection()
+    savepoint = connection.begin_nested()
+    try:
+        count_api_logs(connection, logs)
+        savepoint.commit()
+    except Exception as exc:
+        savepoint.rollback()
+        logger.error("API log rollup failed: %s", exc)
+
+
+def rollup_totals(
+    db: Session,
+    *,
+    kinds: Iterable[str] | None = None,
+    statuses: Iterable[str] | None = None,
+    tx_types: Iterable[str] | None = None,
+    since: date | None = None,
+    group_by: tuple[str, ...] = (),
+) -> dict[tuple, dict]:
+    """Sum rollup measures, keyed by the values of the ``group_by`` dimensions (``()`` when ungrouped)."""
+    group_cols = [_table.c[name] for name in group_by]
+    stmt = select(
+        *group_cols,
+        *(func.coalesce(func.sum(_table.c[name]), 0).label(name) for name in ROLLUP_MEASURES),
+    )
+    if kinds is not None:
+        stmt = stmt.where(_table.c.kind.in_(list(kinds)))
+    if statuses is not None:
+        stmt = stmt.where(_table.c.status.in_(list(statuses)))
+    if tx_types is not None:
+        stmt = stmt.where(_table.c.tx_type.in_(list(tx_types)))
+    if since is not None:
+        stmt = stmt.where(_table.c.day >= since)
+    if group_cols:
+        stmt = stmt.group_by(*group_cols)
+
+    totals: dict[tuple, dict] = {}
+    for row in db.execute(stmt).all():
+        key = tuple(row[: len(group_cols)])
+        totals[key] = {
+            "tx_count": int(row.tx_count or 0),
+            "amount": Decimal(str(row.amount or 0)),
+            "base_cost": Decimal(str(row.base_cost or 0)),
+            "fee_estimate": Decimal(str(row.fee_estimate or 0)),
+        }
+    return totals
+
+
+def empty_totals() -> dict:
+    return {"tx_count": 0, "amount": _ZERO, "base_cost": _ZERO, "fee_estimate": _ZERO}
+
+
+def earliest_source_day(db: Session) -> date | None:
+    candidates = [
+        db.query(func.min(Transaction.created_at)).scalar(),
+        db.query(func.min(ServiceTransaction.created_at)).scalar(),
+        db.query(func.min(ApiLog.created_at)).scalar(),
+        db.query(func.min(ApiLogMinute.minute)).scalar(),
+    ]
+    days = [_day_of(value) for value in candidates if value is not None]
+    return min(days) if days else None
+
+
+def rebuild_daily_rollups(db: Session, start: date, end: date) -> int:
+    """Recompute rollups for days ``start``..``end`` (inclusive) from the source tables.
+
+    Meant for closed days. Today's rows are still incremented by the status
+    hooks, and increments committed between the source reads and the rewrite
+    would be lost.
+    """
+    start_at = datetime.combine(start, time.min)
+    end_at = datetime.combine(end + timedelta(days=1), time.min)
+    buckets: dict[tuple, list] = {}
+
+    tx_rows = (
+        db.query(
+            Transaction.created_at,
+            Transaction.tx_type,
+            Transaction.status,
+            Transaction.network,
+            Transaction.provider,
+            Transaction.amount,
+            Transaction.cost_price,
+        )
+        .filter(Transaction.created_at >= start_at, Transaction.created_at < end_at)
+        .yield_per(REBUILD_BATCH_SIZE)
+    )
+    for created_at, tx_type, status, network, provider, amount, cost_price in tx_rows:
+        tx_type = normalize_status(tx_type)
+        base_cost = Decimal(str(cost_price)) if cost_price is not None else None
+        measures = _measures("transaction", tx_type, Decimal(str(amount or 0)), str(provider or "").lower() or None, base_cost)
+        network = str(network).strip().lower() if network else ""
+        _add(buckets, (_day_of(created_at), "transaction", tx_type, normalize_status(status), network), measures, 1)
+
+    service_rows = (
+        db.query(
+            ServiceTransaction.created_at,
+            ServiceTransaction.tx_type,
+            ServiceTransaction.status,
+            ServiceTransaction.provider,
+            ServiceTransaction.amount,
+            ServiceTransaction.meta,
+        )
+        .filter(ServiceTransaction.created_at >= start_at, ServiceTransaction.created_at < end_at)
+        .yield_per(REBUILD_BATCH_SIZE)
+    )
+    for created_at, tx_type, status, provider, amount, meta in service_rows:
+        base_amount = meta.get("base_amount") if isinstance(meta, dict) else None
+        try:
+            base_cost = Decimal(str(base_amount)) if base_amount not in (None, "") else None
+        except Exception:
+            base_cost = None
+        provider = str(provider).strip().lower() if provider else None
+        measures = _measures("service", normalize_status(tx_type), Decimal(str(amount or 0)), provider, base_cost)
+        _add(buckets, (_day_of(created_at), "service", normalize_status(tx_type), normalize_status(status), provider or ""), measures, 1)
+
+    # API calls older than the raw api_logs retention only survive as minute rollups.
+    raw_since = db.query(func.min(ApiLog.created_at)).scalar()
+    raw_from = end_at
+    if raw_since is not None:
+        if raw_since.tzinfo is not None:
+            raw_since = raw_since.astimezone(timezone.utc).replace(tzinfo=None)
+        raw_from = min(max(start_at, raw_since.replace(second=0, microsecond=0)), end_at)
+    archived_minutes = db.query(ApiLogMinute.minute, ApiLogMinute.service, ApiLogMinute.call_count, ApiLogMinute.success_count).filter(
+        ApiLogMinute.minute >= start_at, ApiLogMinute.minute < raw_from
+    )
+    for minute, service, calls, successes in archived_minutes:
+        day, service = _day_of(minute), str(service or "").strip().lower()
+        _add(buckets, (day, "api", service, "success", ""), [int(successes or 0), _ZERO, _ZERO, _ZERO], 1)
+        _add(buckets, (day, "api", service, "failed", ""), [int(calls or 0) - int(successes or 0), _ZERO, _ZERO, _ZERO], 1)
+
+    api_rows = (
+        db.query(ApiLog.created_at, ApiLog.service, ApiLog.success)
+        # No raw row is older than raw_from's minute, so start_at is the same bound; the
+        # truncated minute itself misses rows stored without fractions at second :00 (SQLite).
+        .filter(ApiLog.created_at >= start_at, ApiLog.created_at < end_at)
+        .yield_per(REBUILD_BATCH_SIZE)
+    )
+    for created_at, service, success in api_rows:
+        status = "success" if int(success or 0) else "failed"
+        _add(buckets, (_day_of(created_at), "api", str(service or "").strip().lower(), status, ""), [1, _ZERO, _ZERO, _ZERO], 1)
+
+    db.execute(delete(_table).where(_table.c.day >= start, _table.c.day <= end))
+    rows = [
+        {**dict(zip(ROLLUP_DIMENSIONS, key)), **dict(zip(ROLLUP_MEASURES, measures))}
+        for key, measures in buckets.items()
+        if any(measures)
+    ]
+    if rows:
+        db.execute(insert(_table), rows)
+    db.commit()
+    logger.info("Rebuilt daily rollups for %s..%s: %s row(s).", start, end, len(rows))
+    return len(rows)
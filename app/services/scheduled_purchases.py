@@ -0,0 +1,455 @@
+"""
+Scheduled and recurring data / airtime purchases.
+
+A ``ScheduledPurchase`` buys a plan or a top-up for one number once, daily,
+weekly or monthly. A worker thread runs them in execution windows:
+
+- every ``scheduled_purchase_window_seconds`` it claims up to
+  ``scheduled_purchase_batch_size`` due schedules with
+  ``SELECT ... FOR UPDATE SKIP LOCKED`` and moves each to its next run time in
+  the same commit, so several workers (one per web process) share the load
+  without waiting on each other and an occurrence is never bought twice;
+- the claimed schedules are grouped per (user, kind) and bought as bulk
+  purchases (app.services.bulk_purchase): one price lookup, limit check and
+  wallet debit per group, provider calls bounded by the shared bulk pool, and
+  failed items refunded in one credit. A group the wallet cannot cover is
+  retried one schedule at a time, so the affordable ones still go through;
+- each schedule records the outcome of its item (``last_reference``) when the
+  item settles, from the transaction status hook, so items still pending at
+  the end of the window are accounted for whenever they resolve. After
+  ``scheduled_purchase_max_failures`` failures in a row it is switched off.
+- a claim commits before its batch is opened, so a worker that dies in
+  between would lose the occurrence. A schedule still ``processing`` with no
+  ``last_reference`` after ``scheduled_purchase_stall_seconds`` is claimed
+  again and bought in the next window (``requeue_stalled_schedules``), much as
+  stalled bulk batches are recovered from their heartbeat.
+
+Every schedule runs at a fixed offset of up to
+``scheduled_purchase_spread_seconds`` after the time it asked for, derived
+from its id. Thousands of renewals set for the 1st of the month at midnight
+are therefore spread over that window instead of all coming due at once.
+"""
+from __future__ import annotations
+
+import calendar
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy import case, or_, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.models import DataPlan, ScheduledPurchase, User
+from app.services.bulk_purchase import (
+    AIRTIME,
+    DATA,
+    SCHEDULED_BATCH_PREFIX,
+    AirtimeOrder,
+    BulkOrder,
+    BulkPurchaseFn,
+    create_bulk_airtime,
+    create_bulk_purchase,
+    run_bulk_purchase,
+)
+from app.services.transaction_events import StatusChange, on_status_change
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INTERVALS = ("once", "daily", "weekly", "monthly")
+KINDS = (DATA, AIRTIME)
+
+_stop_event = threading.Event()
+_worker_thread: threading.Thread | None = None
+
+
+@dataclass(frozen=True)
+class ClaimedRun:
+    schedule_id: int
+    user_id: int
+    kind: str
+    phone: str
+    plan_code: str | None
+    network: str | None
+    amount: Decimal | None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _add_months(moment: datetime, months: int, anchor_day: int | None = None) -> datetime:
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    # Clamped from the anchor every time: the 31st renews on the last day of
+    # shorter months and goes back to the 31st after them.
+    day = min(anchor_day or moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def next_occurrence(moment: datetime, interval: str, anchor_day: int | None = None) -> datetime | None:
+    """The run after ``moment`` for ``interval``; None for one-off schedules.
+
+    Monthly runs land on ``anchor_day`` (the day of the first run) when the month has it.
+    """
+    if interval == "daily":
+        return moment + timedelta(days=1)
+    if interval == "weekly":
+        return moment + timedelta(weeks=1)
+    if interval == "monthly":
+        return _add_months(moment, 1, anchor_day)
+    return None
+
+
+def spread_offset(schedule_id: int) -> timedelta:
+    """A stable offset in [0, scheduled_purchase_spread_seconds) for one schedule."""
+    spread = int(settings.scheduled_purchase_spread_seconds or 0)
+    if spread <= 0:
+        return timedelta(0)
+    # Knuth's multiplicative hash spreads consecutive ids evenly over the window.
+    return timedelta(seconds=(schedule_id * 2654435761) % (2**32) % spread)
+
+
+def create_schedule(
+    db: Session,
+    user: User,
+    *,
+    kind: str,
+    phone: str,
+    interval: str,
+    start_at: datetime | None = None,
+    plan_code: str | None = None,
+    network: str | None = None,
+    amount: Decimal | None = None,
+) -> ScheduledPurchase:
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(KINDS)}")
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of: {', '.join(INTERVALS)}")
+    active = (
+        db.query(ScheduledPurchase)
+        .filter(ScheduledPurchase.user_id == user.id, ScheduledPurchase.is_active == True)
+        .count()
+    )
+    if active >= settings.scheduled_purchase_max_per_user:
+        raise HTTPException(
+            status_code=400,
+            detail=f"You can have at most {settings.scheduled_purchase_max_per_user} active scheduled purchases.",
+        )
+    start_at = _as_utc(start_at) if start_at else _utcnow()
+    schedule = ScheduledPurchase(
+        user_id=user.id,
+        kind=kind,
+        phone_number=phone,
+        plan_code=plan_code,
+        network=network,
+        amount=amount,
+        interval=interval,
+        anchor_day=start_at.day,
+        next_run_at=start_at,
+        is_active=True,
+        failure_count=0,
+    )
+    db.add(schedule)
+    db.flush()
+    offset = spread_offset(schedule.id)
+    schedule.offset_seconds = int(offset.total_seconds())
+    schedule.next_run_at = start_at + offset
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+
+def cancel_schedule(db: Session, user: User, schedule_id: int) -> ScheduledPurchase:
+    schedule = (
+        db.query(ScheduledPurchase)
+        .filter(ScheduledPurchase.id == schedule_id, ScheduledPurchase.user_id == user.id)
+        .first()
+    )
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Scheduled purchase not found.")
+    schedule.is_active = False
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+
+def _claimed_run(schedule: ScheduledPurchase) -> ClaimedRun:
+    return ClaimedRun(
+        schedule.id,
+        schedule.user_id,
+        schedule.kind,
+        schedule.phone_number,
+        schedule.plan_code,
+        schedule.network,
+        Decimal(schedule.amount) if schedule.amount is not None else None,
+    )
+
+
+def claim_due_schedules(db: Session, *, limit: int, now: datetime | None = None) -> list[ClaimedRun]:
+    """Claim up to ``limit`` due schedules and move them to their next run, in one commit."""
+    now = now or _utcnow()
+    rows = (
+        db.query(ScheduledPurchase)
+        .filter(ScheduledPurchase.is_active == True, ScheduledPurchase.next_run_at <= now)
+        .order_by(ScheduledPurchase.next_run_at)
+        .limit(max(1, limit))
+        # Rows another worker is claiming are skipped, not waited on.
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for schedule in rows:
+        claimed.append(_claimed_run(schedule))
+        # Occurrences are computed on the requested times; the spread offset is added back after.
+        offset = timedelta(seconds=schedule.offset_seconds or 0)
+        upcoming = next_occurrence(_as_utc(schedule.next_run_at) - offset, schedule.interval, schedule.anchor_day)
+        # After downtime, missed occurrences are skipped rather than all bought now.
+        while upcoming is not None and upcoming + offset <= now:
+            upcoming = next_occurrence(upcoming, schedule.interval, schedule.anchor_day)
+        if upcoming is None:
+            schedule.is_active = False
+        else:
+            schedule.next_run_at = upcoming + offset
+        schedule.last_run_at = now
+        schedule.last_status = "processing"
+        schedule.last_error = None
+        # Set again once the run's batch is open; until then the run can be requeued.
+        schedule.last_reference = None
+    db.commit()
+    return claimed
+
+
+def requeue_stalled_schedules(db: Session, *, limit: int, now: datetime | None = None) -> list[ClaimedRun]:
+    """Claim again runs whose worker died between the claim and opening their batch."""
+    now = now or _utcnow()
+    cutoff = now - timedelta(seconds=settings.scheduled_purchase_stall_seconds)
+    rows = (
+        db.query(ScheduledPurchase)
+        .filter(
+            ScheduledPurchase.last_status == "processing",
+            ScheduledPurchase.last_reference.is_(None),
+            ScheduledPurchase.last_run_at <= cutoff,
+            # A one-off schedule is switched off when it is claimed, not when it runs.
+            or_(ScheduledPurchase.is_active == True, ScheduledPurchase.interval == "once"),
+        )
+        .order_by(ScheduledPurchase.last_run_at)
+        .limit(max(1, limit))
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    requeued = []
+    for schedule in rows:
+        requeued.append(_claimed_run(schedule))
+        # next_run_at already moved on at the first claim and stays as it is.
+        schedule.last_run_at = now
+    db.commit()
+    if requeued:
+        logger.warning("Requeued %s scheduled purchase run(s) whose worker stopped before buying", len(requeued))
+    return requeued
+
+
+def _record_failure(db: Session, schedule_id: int, reason: str) -> None:
+    schedule = db.get(ScheduledPurchase, schedule_id)
+    if schedule is None:
+        return
+    schedule.last_status = "failed"
+    schedule.last_error = str(reason or "Purchase failed")[:255]
+    schedule.failure_count = int(schedule.failure_count or 0) + 1
+    if schedule.failure_count >= settings.scheduled_purchase_max_failures:
+        schedule.is_active = False
+        logger.info("Scheduled purchase %s switched off after %s failures", schedule_id, schedule.failure_count)
+    db.commit()
+
+
+def _error_detail(exc: Exception) -> str:
+    detail = getattr(exc, "detail", None) or str(exc)
+    if isinstance(detail, dict):
+        detail = detail.get("message") or str(detail)
+    return str(detail)
+
+
+def _open_batch(db: Session, user: User, kind: str, runs: list[ClaimedRun]) -> str:
+    if kind == DATA:
+        codes = {run.plan_code for run in runs}
+        plans = {plan.plan_code: plan for plan in db.query(DataPlan).filter(DataPlan.plan_code.in_(codes))}
+        orders = [BulkOrder(phone=run.phone, plan=plans[run.plan_code]) for run in runs]
+        batch = create_bulk_purchase(db, user, orders, source="scheduled")
+    else:
+        orders = [AirtimeOrder(phone=run.phone, network=run.network, face_value=run.amount) for run in runs]
+        batch = create_bulk_airtime(db, user, orders, source="scheduled")
+    for run, item in zip(runs, batch.items):
+        db.get(ScheduledPurchase, run.schedule_id).last_reference = item.reference
+    db.commit()
+    return batch.batch_id
+
+
+def _open_batches(db: Session, user_id: int, kind: str, runs: list[ClaimedRun]) -> list[tuple[str, list[ClaimedRun]]]:
+    """One bulk batch for the group, or one per schedule when the group as a whole is refused."""
+    user = db.get(User, user_id)
+    if user is None or not user.is_active:
+        for run in runs:
+            _record_failure(db, run.schedule_id, "Account is not active.")
+        return []
+    if kind == DATA:
+        active_codes = {
+            code
+            for (code,) in db.query(DataPlan.plan_code).filter(
+                DataPlan.plan_code.in_({run.plan_code for run in runs}), DataPlan.is_active == True
+            )
+        }
+        for run in runs:
+            if run.plan_code not in active_codes:
+                _record_failure(db, run.schedule_id, "Active data plan not found.")
+        runs = [run for run in runs if run.plan_code in active_codes]
+
+    groups = [runs] if runs else []
+    opened = []
+    while groups:
+        group = groups.pop(0)
+        try:
+            opened.append((_open_batch(db, user, kind, group), group))
+        except HTTPException as exc:
+            db.rollback()
+            if len(group) > 1:
+                groups.extend([run] for run in group)
+                continue
+            _record_failure(db, group[0].schedule_id, _error_detail(exc))
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Opening a scheduled %s batch for user %s failed", kind, user_id)
+            for run in group:
+                _record_failure(db, run.schedule_id, _error_detail(exc))
+    return opened
+
+
+def _settles_scheduled_item(change: StatusChange) -> bool:
+    # Only items of scheduled batches can be a schedule's last_reference.
+    return (
+        change.is_transition
+        and change.reference.startswith(f"{SCHEDULED_BATCH_PREFIX}-")
+        and change.new_status in ("success", "failed", "refunded")
+    )
+
+
+@on_status_change(wants=_settles_scheduled_item)
+def apply_schedule_outcomes(connection: Connection, changes: list[StatusChange]) -> None:
+    """Record the outcome of a scheduled run when its item settles, however late."""
+    settled = {"success": [], "failed": []}
+    for change in changes:
+        if change.new_status == "success":
+            settled["success"].append(change.reference)
+        elif change.new_status in ("failed", "refunded"):
+            settled["failed"].append(change.reference)
+    table = ScheduledPurchase.__table__
+    # Only the first settlement of a run counts (failed then refunded is one failure).
+    unsettled = table.c.last_status.in_(("processing", "pending"))
+    if settled["success"]:
+        connection.execute(
+            update(table)
+            .where(table.c.last_reference.in_(settled["success"]), unsettled)
+            .values(last_status="success", last_error=None, failure_count=0)
+        )
+    if settled["failed"]:
+        failures = table.c.failure_count + 1
+        connection.execute(
+            update(table)
+            .where(table.c.last_reference.in_(settled["failed"]), unsettled)
+            .values(
+                last_status="failed",
+                last_error="Purchase failed",
+                failure_count=failures,
+                is_active=case((failures >= settings.scheduled_purchase_max_failures, False), else_=table.c.is_active),
+            )
+        )
+
+
+def run_due_window(
+    *,
+    session_factory: Callable[[], Session] = SessionLocal,
+    purchase: BulkPurchaseFn | None = None,
+    limit: int | None = None,
+) -> dict[str, int]:
+    """Claim one window of due schedules and buy them; returns counts for the log."""
+    db = session_factory()
+    try:
+        limit = limit or settings.scheduled_purchase_batch_size
+        runs = claim_due_schedules(db, limit=limit)
+        # After the fresh claims, whose claim time is too recent to look stalled.
+        requeued = requeue_stalled_schedules(db, limit=limit)
+        groups: dict[tuple[int, str], list[ClaimedRun]] = defaultdict(list)
+        for run in runs + requeued:
+            groups[(run.user_id, run.kind)].append(run)
+        opened = []
+        for (user_id, kind), group in groups.items():
+            opened.extend((kind, batch_id, batch_runs) for batch_id, batch_runs in _open_batches(db, user_id, kind, group))
+
+        if opened:
+            # Provider calls are bounded by the shared bulk pool; this only
+            # bounds how many batches wait on it at once.
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(len(opened), settings.bulk_purchase_concurrency)),
+                thread_name_prefix="scheduled-purchase",
+            ) as runners:
+                for _, batch_id, _ in opened:
+                    runners.submit(run_bulk_purchase, batch_id, session_factory=session_factory, purchase=purchase)
+        # Items the provider has not confirmed yet settle later, through apply_schedule_outcomes.
+        still_open = [run.schedule_id for _, _, batch_runs in opened for run in batch_runs]
+        if still_open:
+            db.query(ScheduledPurchase).filter(
+                ScheduledPurchase.id.in_(still_open), ScheduledPurchase.last_status == "processing"
+            ).update({ScheduledPurchase.last_status: "pending"}, synchronize_session=False)
+            db.commit()
+        return {"claimed": len(runs), "requeued": len(requeued), "batches": len(opened)}
+    finally:
+        db.close()
+
+
+def _scheduler_loop() -> None:
+    logger.info(
+        "Scheduled purchase worker started (window=%ss, batch=%s).",
+        settings.scheduled_purchase_window_seconds,
+        settings.scheduled_purchase_batch_size,
+    )
+    while not _stop_event.is_set():
+        try:
+            # Drain the backlog window by window before sleeping.
+            while not _stop_event.is_set():
+                stats = run_due_window()
+                if stats["claimed"]:
+                    logger.info("Scheduled purchase window: %s", stats)
+                if stats["claimed"] < settings.scheduled_purchase_batch_size:
+                    break
+        except Exception as exc:
+            logger.warning("Scheduled purchase window failed: %s", exc)
+        _stop_event.wait(timeout=max(5, settings.scheduled_purchase_window_seconds))
+    logger.info("Scheduled purchase worker stopped.")
+
+
+def start_scheduled_purchase_worker() -> None:
+    global _worker_thread
+    if not settings.scheduled_purchases_enabled:
+        logger.info("Scheduled purchase worker disabled by config.")
+        return
+    if _worker_thread and _worker_thread.is_alive():
+        return
+    _stop_event.clear()
+    _worker_thread = threading.Thread(target=_scheduler_loop, name="scheduled-purchase-worker", daemon=True)
+    _worker_thread.start()
+
+
+def stop_scheduled_purchase_worker() -> None:
+    _stop_event.set()
@@ -0,0 +1,111 @@
+"""
+Admin search routing.
+
+A free-text ``q`` used to become ``ILIKE '%q%'`` over every searchable column,
+which no ordinary index can serve. Queries are now classified first: exact
+references, emails and phone numbers hit their equality indexes, and only free
+text falls back to substring matching. On Postgres substring matches are served
+by pg_trgm GIN indexes; SQLite (local/dev) has no trigram support, so free text
+there becomes an index-friendly prefix range instead.
+
+Prefix matches are ``LIKE 'x%'`` on Postgres, served by ``text_pattern_ops``
+indexes: under a non-C collation a ``>= x AND < x || U+10FFFF`` range can skip
+rows. Emails are matched on ``lower(email)`` because they are stored as typed.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import and_, false, func, or_
+
+SEARCH_REFERENCE = "reference"
+SEARCH_EMAIL = "email"
+SEARCH_PHONE = "phone"
+SEARCH_TEXT = "text"
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_PHONE_RE = re.compile(r"^\+?[\d\s\-()]{10,18}$")
+# Generated references look like DATA-1712345678-AB12CD34, DEV_7_abc, AG-RWD-3-9-1712345678.
+_REFERENCE_RE = re.compile(r"^(?=.*\d)(?=.*[-_:])[A-Za-z0-9][A-Za-z0-9_\-:.]{5,}$")
+_PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    kind: str
+    text: str
+
+    @property
+    def phone_variants(self) -> list[str]:
+        digits = "".join(ch for ch in self.text if ch.isdigit())
+        variants = [digits]
+        if digits.startswith("234") and len(digits) == 13:
+            variants += ["0" + digits[3:], "+" + digits]
+        elif digits.startswith("0") and len(digits) == 11:
+            variants += ["234" + digits[1:], "+234" + digits[1:]]
+        return variants
+
+    @property
+    def exact_variants(self) -> list[str]:
+        return list(dict.fromkeys([self.text, self.text.upper(), self.text.lower()]))
+
+
+def classify_search(q: str | None) -> SearchQuery | None:
+    text = str(q or "").strip()
+    if not text:
+        return None
+    if _EMAIL_RE.match(text):
+        return SearchQuery(SEARCH_EMAIL, text)
+    if _PHONE_RE.match(text) and sum(ch.isdigit() for ch in text) >= 10:
+        return SearchQuery(SEARCH_PHONE, text)
+    if _REFERENCE_RE.match(text):
+        return SearchQuery(SEARCH_REFERENCE, text)
+    return SearchQuery(SEARCH_TEXT, text)
+
+
+def prefix_match(column, text: str, dialect: str = ""):
+    """``LIKE 'x%'`` on Postgres (text_pattern_ops-indexed), a btree range elsewhere."""
+    if dialect == "postgresql":
+        return column.startswith(text, autoescape=True)
+    return and_(column >= text, column < text + _PREFIX_UPPER_BOUND)
+
+
+def text_match(column, text: str, dialect: str):
+    """Substring match on Postgres (trigram-indexed), prefix range elsewhere."""
+    if dialect == "postgresql":
+        return column.icontains(text, autoescape=True)
+    return prefix_match(column, text, dialect)
+
+
+def search_clause(
+    search: SearchQuery,
+    dialect: str,
+    *,
+    references=(),
+    emails=(),
+    phones=(),
+    texts=(),
+):
+    """Build the WHERE clause for ``search`` over the given column groups.
+
+    References, emails and phones match their own columns by exact value or
+    prefix (so a partially pasted reference still finds its row); free text is
+    matched against ``texts`` plus every other group. Emails compare
+    ``lower(column)`` with the lowered query.
+    """
+    routed = {SEARCH_REFERENCE: references, SEARCH_EMAIL: emails, SEARCH_PHONE: phones}.get(search.kind)
+    if routed:
+        if search.kind == SEARCH_EMAIL:
+            return or_(*(prefix_match(func.lower(col), search.text.lower(), dialect) for col in routed))
+        variants = search.phone_variants if search.kind == SEARCH_PHONE else search.exact_variants
+        return or_(*(prefix_match(col, variant, dialect) for col in routed for variant in variants))
+    columns = [*references, *emails, *phones, *texts]
+    if not columns:
+        return false()
+    return or_(*(text_match(col, search.text, dialect) for col in columns))
+
+
+def dialect_of(db) -> str:
+    bind = getattr(db, "bind", None)
+    return bind.dialect.name if bind is not None else ""
@@ -0,0 +1,244 @@
+"""
+Flush-time hook that reports transaction status changes to incremental counters.
+
+Purchases move to SUCCESS from many places (purchase endpoints, provider
+webhooks, the pending reconciler, admin tools). Rather than calling every
+counter from each of those sites, handlers register here and receive the status
+transitions detected in each flush. Handlers run on the flushing connection, so
+counter updates commit (or roll back) together with the transaction rows.
+
+Each change also carries the network, provider and cost the row had before
+the flush, so a counter can take the row out of its old bucket with the
+values it was added with. A row whose cost or provider changes without a
+status change (a fallback provider recorded on a pending item) is reported
+with ``old_status == new_status``.
+
+A handler may declare the changes it wants; it is then called (in its own
+savepoint) only for flushes that contain one, with just those changes.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import ServiceTransaction, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusChange:
+    kind: str  # "transaction" | "service"
+    user_id: int
+    reference: str
+    tx_type: str
+    amount: Decimal
+    network: str | None
+    product_code: str | None
+    old_status: str | None  # None for brand new rows
+    new_status: str
+    created_at: datetime
+    provider: str | None = None
+    base_amount: Decimal | None = None  # provider cost captured at purchase, when recorded
+    # The values before this flush (None for brand new rows).
+    old_network: str | None = None
+    old_provider: str | None = None
+    old_base_amount: Decimal | None = None
+
+    @property
+    def is_transition(self) -> bool:
+        return self.new_status != self.old_status
+
+    def became(self, status: str) -> bool:
+        return self.new_status == status and self.old_status != status
+
+    def left(self, status: str) -> bool:
+        return self.old_status == status and self.new_status != status
+
+
+Handler = Callable[[Connection, list[StatusChange]], None]
+ChangeFilter = Callable[[StatusChange], bool]
+
+_handlers: list[tuple[Handler, ChangeFilter | None]] = []
+
+
+def on_status_change(handler: Handler | None = None, *, wants: ChangeFilter | None = None):
+    """Register a handler called with the status changes of each flush.
+
+    With ``wants``, the handler only receives the changes it accepts and is
+    skipped (no savepoint) when a flush has none.
+    """
+    def register(fn: Handler) -> Handler:
+        if all(registered is not fn for registered, _ in _handlers):
+            _handlers.append((fn, wants))
+        return fn
+
+    return register(handler) if handler is not None else register
+
+
+def normalize_status(value) -> str:
+    return str(getattr(value, "value", value) or "").strip().lower()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _loaded(obj, key: str):
+    # Avoid lazy loads mid-flush: expired/server-default columns are not in __dict__.
+    return obj.__dict__.get(key)
+
+
+def _decimal_or_none(value) -> Decimal | None:
+    if value is None or value == "":
+        return None
+    try:
+        return Decimal(str(value))
+    except Exception:
+        return None
+
+
+def _previous(obj, key: str):
+    """The value of ``key`` before this flush."""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return _loaded(obj, key)
+
+
+def _lower(value) -> str | None:
+    return str(value).strip().lower() if value else None
+
+
+def _costing(obj, value) -> tuple[str | None, str | None, Decimal | None]:
+    """(network, provider, base_amount) of ``obj``, read through ``value(obj, key)``."""
+    provider = value(obj, "provider")
+    if isinstance(obj, Transaction):
+        network = value(obj, "network")
+        base_amount = _decimal_or_none(value(obj, "cost_price"))
+    else:
+        network = provider
+        meta = value(obj, "meta")
+        base_amount = _decimal_or_none(meta.get("base_amount")) if isinstance(meta, dict) else None
+    return _lower(network), _lower(provider), base_amount
+
+
+def _change_for(obj, *, is_new: bool) -> StatusChange | None:
+    history = inspect(obj).attrs.status.history
+    network, provider, base_amount = _costing(obj, _loaded)
+    old_network = old_provider = old_base_amount = None
+    if is_new:
+        new_status = normalize_status(_loaded(obj, "status"))
+        old_status = None
+    else:
+        old_network, old_provider, old_base_amount = _costing(obj, _previous)
+        if history.added:
+            new_status = normalize_status(history.added[0])
+            old_status = normalize_status(history.deleted[0]) if history.deleted else None
+            if new_status == old_status:
+                return None
+        elif (old_network, old_provider, old_base_amount) != (network, provider, base_amount):
+            new_status = old_status = normalize_status(_loaded(obj, "status"))
+        else:
+            return None
+    if not new_status:
+        return None
+
+    user_id = _loaded(obj, "user_id")
+    if user_id is None:
+        return None
+
+    created_at = _loaded(obj, "created_at") or _utcnow()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    else:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+
+    if isinstance(obj, Transaction):
+        kind = "transaction"
+        product_code = _loaded(obj, "data_plan_code")
+    else:
+        kind = "service"
+        product_code = _loaded(obj, "product_code")
+
+    return StatusChange(
+        kind=kind,
+        user_id=int(user_id),
+        reference=str(_loaded(obj, "reference") or ""),
+        tx_type=normalize_status(_loaded(obj, "tx_type")),
+        amount=Decimal(str(_loaded(obj, "amount") or 0)),
+        network=network,
+        product_code=str(product_code) if product_code else None,
+        old_status=old_status,
+        new_status=new_status,
+        created_at=created_at,
+        provider=provider,
+        base_amount=base_amount,
+        old_network=old_network,
+        old_provider=old_provider,
+        old_base_amount=old_base_amount,
+    )
+
+
+def collect_status_changes(session: Session) -> list[StatusChange]:
+    changes: list[StatusChange] = []
+    for obj in session.new:
+        if isinstance(obj, (Transaction, ServiceTransaction)):
+            change = _change_for(obj, is_new=True)
+            if change:
+                changes.append(change)
+    for obj in session.dirty:
+        if isinstance(obj, (Transaction, ServiceTransaction)):
+            change = _change_for(obj, is_new=False)
+            if change:
+                changes.append(change)
+    return changes
+
+
+def _keep_status(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the previous value when one of these is set on an expired row (e.g.
+# after a commit): the status, so the change is reported as a transition rather
+# than a new row, and the costing columns, so counters can remove the row from
+# its old bucket with the values it was counted with.
+_HISTORY_COLUMNS = {
+    Transaction: ("status", "network", "provider", "cost_price"),
+    ServiceTransaction: ("status", "provider", "meta"),
+}
+for _model, _columns in _HISTORY_COLUMNS.items():
+    for _column in _columns:
+        event.listen(getattr(_model, _column), "set", _keep_status, active_history=True, retval=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _dispatch_status_changes(session: Session, flush_context) -> None:
+    if not _handlers:
+        return
+    changes = collect_status_changes(session)
+    if not changes:
+        return
+    connection = session.connection()
+    for handler, wants in list(_handlers):
+        relevant = changes if wants is None else [change for change in changes if wants(change)]
+        if not relevant:
+            continue
+        # Counters must never break the purchase flow; a failed handler is logged
+        # and repaired by its rebuild job instead.
+        savepoint = connection.begin_nested()
+        try:
+            handler(connection, relevant)
+            savepoint.commit()
+        except Exception as exc:
+            savepoint.rollback()
+            logger.error("Status change handler %s failed: %s", getattr(handler, "__name__", handler), exc)
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from fastapi import HTTPException
 from app.models import Wallet, WalletLedger, LedgerType, User, Transaction, TransactionType, TransactionStatus
+from app.services.wallet_cache import WalletSnapshot, cache_for, mark_wallets_changed, read_snapshot
+from app.services.wallet_stripes import debit_stripe, gather_debit
 
 
 def _find_matching_ledger(db: Session, *, wallet: Wallet, amount: Decimal, reference: str, description: str, entry_type: LedgerType) -> WalletLedger | None:
@@ -20,6 +22,58 @@ def _find_matching_ledger(db: Session, *, wallet: Wallet, amount: Decimal, refer
     )
 
 
+def _change_balance(db: Session, wallet_id: int, amount: Decimal, *, debit: bool = False) -> bool:
+    """Atomically credit (or, if funds allow, debit) an unlocked wallet; False if no row matched."""
+    query = db.query(Wallet).filter(Wallet.id == wallet_id, Wallet.is_locked == False)
+    if debit:
+        query = query.filter(Wallet.balance >= amount)
+    rows_updated = query.update(
+        {
+            Wallet.balance: (Wallet.balance - amount) if debit else (Wallet.balance + amount),
+            Wallet.version: Wallet.version + 1,
+        },
+        synchronize_session=False,
+    )
+    if rows_updated == 0:
+        return False
+    # The new balance is cached for reads once the caller commits.
+    mark_wallets_changed(db, [wallet_id])
+    return True
+
+
+def _debit_balance(db: Session, wallet: Wallet, amount: Decimal) -> bool:
+    """Debit ``amount`` if funds allow; striped wallets try a single stripe before locking the wallet row."""
+    if not wallet.stripe_count:
+        return _change_balance(db, wallet.id, amount, debit=True)
+    return (
+        debit_stripe(db, wallet.id, amount)
+        or _change_balance(db, wallet.id, amount, debit=True)
+        or gather_debit(db, wallet.id, amount)
+    )
+
+
+def spendable_balance(wallet: Wallet) -> Decimal:
+    """Balance for purchase pre-checks; only striped wallets pay for the stripes subquery."""
+    return Decimal(wallet.total_balance if wallet.stripe_count else wallet.balance)
+
+
+def get_wallet_snapshot(db: Session, user_id: int) -> WalletSnapshot:
+    """Balance for read-only endpoints: the cached snapshot, or the wallet row on a miss."""
+    cache = cache_for(db)
+    snapshot = cache.get(user_id) if cache is not None else None
+    if snapshot is not None:
+        return snapshot
+    snapshot = read_snapshot(db, user_id)
+    if snapshot is None:
+        wallet = get_or_create_wallet(db, user_id)
+        snapshot = WalletSnapshot.from_row(
+            (wallet.id, wallet.user_id, spendable_balance(wallet), wallet.is_locked, wallet.version, wallet.stripe_count)
+        )
+    if cache is not None:
+        cache.put(snapshot)
+    return snapshot
+
+
 def get_or_create_wallet(db: Session, user_id: int, *, commit: bool = True) -> Wallet:
     wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
     if not wallet:
@@ -57,14 +111,7 @@ def credit_wallet(
         return existing
 
     # Atomically increment the wallet balance
-    rows_updated = db.query(Wallet).filter(
-        Wallet.id == wallet.id,
-        Wallet.is_locked == False
-    ).update(
-        {Wallet.balance: Wallet.balance + amount},
-        synchronize_session=False
-    )
-    if rows_updated == 0:
+    if not _change_balance(db, wallet.id, amount):
         db.refresh(wallet)
         if wallet.is_locked:
             raise HTTPException(status_code=423, detail="Wallet is locked")
@@ -105,7 +152,15 @@ def credit_wallet(
     return entry
 
 
-def debit_wallet(db: Session, wallet: Wallet, amount: Decimal, reference: str, description: str) -> WalletLedger:
+def debit_wallet(
+    db: Session,
+    wallet: Wallet,
+    amount: Decimal,
+    reference: str,
+    description: str,
+    *,
+    commit: bool = True,
+) -> WalletLedger:
     if wallet.is_locked:
         raise HTTPException(status_code=423, detail="Wallet is locked")
     existing = _find_matching_ledger(
@@ -120,15 +175,7 @@ def debit_wallet(db: Session, wallet: Wallet, amount: Decimal, reference: str, d
         return existing
 
     # Atomically decrement the wallet balance only if it is sufficient
-    rows_updated = db.query(Wallet).filter(
-        Wallet.id == wallet.id,
-        Wallet.balance >= amount,
-        Wallet.is_locked == False
-    ).update(
-        {Wallet.balance: Wallet.balance - amount},
-        synchronize_session=False
-    )
-    if rows_updated == 0:
+    if not _debit_balance(db, wallet, amount):
         db.refresh(wallet)
         if wallet.is_locked:
             raise HTTPException(status_code=423, detail="Wallet is locked")
@@ -142,9 +189,17 @@ def debit_wallet(db: Session, wallet: Wallet, amount: Decimal, reference: str, d
         description=description,
     )
     db.add(entry)
+    if not commit:
+        db.flush()
+        return entry
     db.commit()
     db.refresh(entry)
     db.refresh(wallet)
+    notify_wallet_debit(wallet, amount, reference)
+    return entry
+
+
+def notify_wallet_debit(wallet: Wallet, amount: Decimal, reference: str) -> None:
     try:
         if wallet.user and wallet.user.fcm_token:
             from app.services.push_notification import PushNotificationService
@@ -157,7 +212,6 @@ def debit_wallet(db: Session, wallet: Wallet, amount: Decimal, reference: str, d
     except Exception as push_exc:
         import logging
         logging.getLogger(__name__).warning("Failed to send debit wallet push notification: %s", push_exc)
-    return entry
 
 def verify_transfer_recipient(db: Session, identifier: str) -> User | None:
     return db.query(User).filter(
@@ -171,15 +225,7 @@ def execute_wallet_transfer(db: Session, sender: User, recipient: User, amount:
     sender_wallet = get_or_create_wallet(db, sender.id, commit=False)
     
     # 1. Atomically debit sender
-    rows_updated = db.query(Wallet).filter(
-        Wallet.id == sender_wallet.id,
-        Wallet.balance >= amount,
-        Wallet.is_locked == False
-    ).update(
-        {Wallet.balance: Wallet.balance - amount},
-        synchronize_session=False
-    )
-    if rows_updated == 0:
+    if not _debit_balance(db, sender_wallet, amount):
         return False
         
     import uuid
@@ -205,13 +251,7 @@ def execute_wallet_transfer(db: Session, sender: User, recipient: User, amount:
     
     # 2. Atomically credit receiver
     receiver_wallet = get_or_create_wallet(db, recipient.id, commit=False)
-    db.query(Wallet).filter(
-        Wallet.id == receiver_wallet.id,
-        Wallet.is_locked == False
-    ).update(
-        {Wallet.balance: Wallet.balance + amount},
-        synchronize_session=False
-    )
+    _change_balance(db, receiver_wallet.id, amount)
     
     receiver_ledger = WalletLedger(
         wallet_id=receiver_wallet.id,
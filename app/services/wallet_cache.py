@@ -0,0 +1,329 @@
+"""
+Wallet balance read cache.
+
+Balance polling (``/wallet/me``, the dashboard, the developer ``/wallet``
+endpoints) is served from a per-user snapshot of the wallet row instead of a
+query per request. Snapshots are written through, not invalidated:
+
+- every balance UPDATE in app.services.wallet (and the admin bulk settlement)
+  bumps ``wallets.version`` and marks the wallet on the session, as do ORM
+  writes to a Wallet (new wallets, ``wallet.balance = ...``);
+- just before the session commits, the marked rows are read back in one
+  query, and the snapshots go into the cache once the commit succeeds;
+- a rollback drops the marks.
+
+A put is ignored unless its version is newer than the cached one, so a slow
+request that read the row before a concurrent commit cannot overwrite the
+newer balance. A miss reads the row and fills the cache the same way.
+
+Striped wallets (app.services.wallet_stripes) are not cached: their balance is
+spread over rows that commit independently, so no single version orders their
+snapshots. Reads of those go to the rows, and a wallet that becomes striped
+has its cached snapshot dropped at commit.
+
+With REDIS_URL set the snapshots live in a Redis hash per user (version check
+done atomically in Lua), so every worker sees the same balance. Without Redis,
+or while it is unreachable, each process keeps its own copy and entries expire
+after ``wallet_cache_ttl_seconds`` to bound staleness from writes made by other
+processes.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Wallet
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REDIS_RETRY_SECONDS = 30
+_CHANGED_KEY = "wallet_cache_changed"
+_SNAPSHOTS_KEY = "wallet_cache_snapshots"
+
+SNAPSHOT_COLUMNS = (
+    Wallet.id, Wallet.user_id, Wallet.total_balance, Wallet.is_locked, Wallet.version, Wallet.stripe_count
+)
+
+# KEYS[1] = hash; ARGV = version, wallet_id, balance, is_locked, ttl. Returns 1 when stored.
+_PUT_IF_NEWER = """
+local current = redis.call('HGET', KEYS[1], 'version')
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', ARGV[1], 'wallet_id', ARGV[2], 'balance', ARGV[3], 'is_locked', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class WalletSnapshot:
+    wallet_id: int
+    user_id: int
+    balance: Decimal
+    is_locked: bool
+    version: int
+    striped: bool = False
+
+    @classmethod
+    def from_row(cls, row) -> "WalletSnapshot":
+        wallet_id, user_id, balance, is_locked, version, stripe_count = row
+        return cls(
+            int(wallet_id), int(user_id), Decimal(str(balance)), bool(is_locked), int(version or 0), bool(stripe_count)
+        )
+
+
+class _LocalSnapshots:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[int, tuple[WalletSnapshot, float]] = {}
+
+    def get(self, user_id: int) -> WalletSnapshot | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[0]
+
+    def put(self, snapshot: WalletSnapshot, ttl: float) -> bool:
+        with self._lock:
+            current = self._entries.get(snapshot.user_id)
+            if current is not None and current[1] > time.monotonic() and current[0].version >= snapshot.version:
+                return False
+            self._entries[snapshot.user_id] = (snapshot, time.monotonic() + ttl)
+            return True
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _RedisSnapshots:
+    """Per-user Redis hash ``wallet:balance:<user_id>``."""
+
+    def __init__(self, url: str | None) -> None:
+        self._url = url
+        self._client = None
+        self._put_script = None
+        self._retry_at = 0.0
+
+    def _redis(self):
+        if not self._url or time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            try:
+                import redis
+
+                self._client = redis.Redis.from_url(self._url, socket_timeout=0.25, socket_connect_timeout=0.25)
+                self._put_script = self._client.register_script(_PUT_IF_NEWER)
+            except Exception as exc:
+                self._unavailable(exc)
+        return self._client
+
+    def _unavailable(self, exc: Exception) -> None:
+        logger.warning("Wallet cache Redis unavailable, using local snapshots: %s", exc)
+        self._client = None
+        self._put_script = None
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"wallet:balance:{int(user_id)}"
+
+    def get(self, user_id: int) -> WalletSnapshot | None:
+        """Returns the snapshot, None on a miss; raises LookupError when Redis is not usable."""
+        client = self._redis()
+        if client is None:
+            raise LookupError("redis unavailable")
+        try:
+            fields = client.hgetall(self._key(user_id))
+        except Exception as exc:
+            self._unavailable(exc)
+            raise LookupError("redis unavailable") from exc
+        if not fields:
+            return None
+        values = {
+            (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+            for key, value in fields.items()
+        }
+        return WalletSnapshot(
+            wallet_id=int(values["wallet_id"]),
+            user_id=int(user_id),
+            balance=Decimal(values["balance"]),
+            is_locked=values["is_locked"] == "1",
+            version=int(values["version"]),
+        )
+
+    def put(self, snapshot: WalletSnapshot, ttl: float) -> bool | None:
+        if self._redis() is None:
+            return None
+        try:
+            return bool(
+                self._put_script(
+                    keys=[self._key(snapshot.user_id)],
+                    args=[
+                        snapshot.version,
+                        snapshot.wallet_id,
+                        str(snapshot.balance),
+                        int(snapshot.is_locked),
+                        max(int(ttl), 1),
+                    ],
+                )
+            )
+        except Exception as exc:
+            self._unavailable(exc)
+            return None
+
+    def discard(self, user_id: int) -> None:
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.delete(self._key(user_id))
+        except Exception as exc:
+            self._unavailable(exc)
+
+
+class WalletBalanceCache:
+    def __init__(self, *, ttl_seconds: float, redis: _RedisSnapshots | None = None) -> None:
+        self.ttl_seconds = max(float(ttl_seconds), 1.0)
+        self._local = _LocalSnapshots()
+        self._redis = redis
+
+    def get(self, user_id: int) -> WalletSnapshot | None:
+        if self._redis is not None:
+            try:
+                return self._redis.get(user_id)
+            except LookupError:
+                pass
+        return self._local.get(user_id)
+
+    def put(self, snapshot: WalletSnapshot) -> bool:
+        """Store ``snapshot`` unless a snapshot at the same or a newer version is already cached."""
+        if snapshot.striped:
+            self.discard(snapshot.user_id)
+            return False
+        stored = self._local.put(snapshot, self.ttl_seconds)
+        if self._redis is not None:
+            shared = self._redis.put(snapshot, self.ttl_seconds)
+            if shared is not None:
+                return shared
+        return stored
+
+    def discard(self, user_id: int) -> None:
+        self._local.discard(user_id)
+        if self._redis is not None:
+            self._redis.discard(user_id)
+
+    def clear(self) -> None:
+        self._local.clear()
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+_redis_snapshots = _RedisSnapshots(settings.redis_url) if settings.redis_url else None
+
+
+def _engine_of(db) -> object | None:
+    get_bind = getattr(db, "get_bind", None)
+    if get_bind is None:
+        return None
+    return getattr(get_bind(), "engine", None)
+
+
+def cache_for(db) -> WalletBalanceCache | None:
+    if not settings.wallet_cache_enabled:
+        return None
+    engine = _engine_of(db)
+    if engine is None:
+        return None
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = WalletBalanceCache(
+                ttl_seconds=settings.wallet_cache_ttl_seconds, redis=_redis_snapshots
+            )
+        return cache
+
+
+def read_snapshot(db: Session, user_id: int) -> WalletSnapshot | None:
+    row = db.execute(select(*SNAPSHOT_COLUMNS).where(Wallet.user_id == user_id)).first()
+    return WalletSnapshot.from_row(row) if row is not None else None
+
+
+def mark_wallets_changed(db: Session, wallet_ids) -> None:
+    """Record wallets whose balance ``db`` changed; they are re-read and cached when it commits."""
+    if isinstance(db, Session):
+        db.info.setdefault(_CHANGED_KEY, set()).update(int(wallet_id) for wallet_id in wallet_ids)
+
+
+def _wallets_in(objects) -> list[Wallet]:
+    return [obj for obj in objects if isinstance(obj, Wallet)]
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_orm_wallet_versions(session: Session, flush_context, instances) -> None:
+    for wallet in _wallets_in(session.dirty):
+        if session.is_modified(wallet, include_collections=False):
+            wallet.version = Wallet.version + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_orm_wallet_writes(session: Session, flush_context) -> None:
+    wallets = _wallets_in(session.new) + [
+        wallet for wallet in _wallets_in(session.dirty) if session.is_modified(wallet, include_collections=False)
+    ]
+    if wallets:
+        mark_wallets_changed(session, [wallet.id for wallet in wallets if wallet.id is not None])
+
+
+@event.listens_for(Session, "before_commit")
+def _snapshot_changed_wallets(session: Session) -> None:
+    # Also fired when a savepoint is released; only the outer commit counts.
+    if session.in_nested_transaction():
+        return
+    if _wallets_in(session.new) or _wallets_in(session.dirty):
+        session.flush()
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if not changed or cache_for(session) is None:
+        return
+    # Read inside the committing transaction, which still holds the row locks
+    # taken by its balance UPDATEs: these are exactly the committed values.
+    rows = session.execute(select(*SNAPSHOT_COLUMNS).where(Wallet.id.in_(sorted(changed)))).all()
+    session.info[_SNAPSHOTS_KEY] = [WalletSnapshot.from_row(row) for row in rows]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_wallet_snapshots(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    snapshots = session.info.pop(_SNAPSHOTS_KEY, None)
+    cache = cache_for(session) if snapshots else None
+    if cache is None:
+        return
+    for snapshot in snapshots:
+        cache.put(snapshot)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_wallet_snapshots(session: Session, previous_transaction) -> None:
+    # A rolled-back savepoint keeps the marks: the rows are re-read at commit.
+    if previous_transaction.parent is None:
+        session.info.pop(_CHANGED_KEY, None)
+        session.info.pop(_SNAPSHOTS_KEY, None)
@@ -0,0 +1,86 @@
+"""
+Wallet holds: reserve a purchase's funds in one commit and settle them in one more.
+
+A purchase used to commit the wallet debit, then the PENDING transaction, and
+after the provider call the result, the refund and the referral activity each
+on their own. A hold brings that down to one commit on either side of the
+provider call:
+
+- ``place_hold`` inserts the PENDING transaction, debits the wallet and adds
+  the DEBIT ledger entry, then commits once. The transaction is flushed first,
+  so a duplicate reference fails before the wallet row is locked, and the
+  wallet UPDATE is the last statement before COMMIT.
+- ``capture_hold`` (success) and ``release_hold`` (failure: refund credit plus
+  REFUNDED status) only stage the outcome; the caller adds whatever else
+  belongs to it and commits once. A pending result leaves the hold open for
+  the reconcile worker, which settles it with the usual refund path.
+
+Held funds are off the balance from the moment the hold is placed, and the
+ledger and transaction statuses look exactly as they did with separate
+commits, so webhooks, reconciliation and admin tools need no changes.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.models import ServiceTransaction, Transaction, TransactionStatus, Wallet
+from app.services.wallet import credit_wallet, debit_wallet, notify_wallet_debit
+
+PurchaseRecord = Transaction | ServiceTransaction
+
+
+@dataclass(frozen=True)
+class WalletHold:
+    wallet_id: int
+    transaction_id: int
+    reference: str
+    amount: Decimal
+    model: type = Transaction
+
+
+def _set_status(record: PurchaseRecord, status: TransactionStatus) -> None:
+    # ServiceTransaction keeps plain string statuses.
+    record.status = status if isinstance(record, Transaction) else status.value
+
+
+def place_hold(db: Session, wallet: Wallet, transaction: PurchaseRecord, description: str) -> WalletHold:
+    """Debit ``transaction.amount`` and insert the PENDING ``transaction`` in a single commit."""
+    try:
+        db.add(transaction)
+        db.flush()
+        debit_wallet(db, wallet, transaction.amount, transaction.reference, description, commit=False)
+        hold = WalletHold(
+            wallet.id, transaction.id, transaction.reference, Decimal(transaction.amount), type(transaction)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    notify_wallet_debit(wallet, hold.amount, hold.reference)
+    return hold
+
+
+def hold_transaction(db: Session, hold: WalletHold) -> PurchaseRecord:
+    return db.get(hold.model, hold.transaction_id)
+
+
+def capture_hold(db: Session, hold: WalletHold) -> PurchaseRecord:
+    """Keep the held funds: the purchase succeeded. The caller commits."""
+    transaction = hold_transaction(db, hold)
+    _set_status(transaction, TransactionStatus.SUCCESS)
+    return transaction
+
+
+def release_hold(
+    db: Session, hold: WalletHold, description: str, *, failure_reason: str | None = None
+) -> PurchaseRecord:
+    """Refund the held funds and mark the transaction REFUNDED. The caller commits."""
+    transaction = hold_transaction(db, hold)
+    credit_wallet(db, db.get(Wallet, hold.wallet_id), hold.amount, hold.reference, description, commit=False)
+    _set_status(transaction, TransactionStatus.REFUNDED)
+    if failure_reason is not None:
+        transaction.failure_reason = failure_reason
+    return transaction
@@ -0,0 +1,236 @@
+"""
+Striped wallets: spread a hot wallet's balance over several rows.
+
+Every debit of a single-row wallet updates the same ``wallets`` row, so
+concurrent purchases by one high-volume account (a developer integration)
+queue on that row lock. A wallet with ``stripe_count = N`` keeps its balance
+in N ``wallet_stripes`` rows plus the wallet row itself:
+
+- a debit picks, at random, a stripe that covers the amount and decrements
+  it with a conditional UPDATE, so concurrent debits mostly land on different
+  rows. It takes no lock on the wallet row: a debit that finds no stripe has
+  locked nothing, and can fall back to updating the wallet row without
+  upgrading a shared lock another debit also holds. When no single stripe
+  covers it, the wallet row is tried, then the wallet and all its stripes are
+  locked and the amount is taken across them (wallet row first, then stripes
+  in stripe_no order);
+- credits go to the wallet row, as for any wallet;
+- ``rebalance_wallet`` (cron: ``scripts/rebalance_wallet_stripes.py``) spreads
+  the whole balance evenly over the stripes again.
+
+``Wallet.total_balance`` (wallet row + stripes) is the user's balance; the
+ledger still gets exactly one entry per debit or credit, against the wallet.
+Striping is switched on and off per wallet by an admin (``set_stripe_count``).
+"""
+from __future__ import annotations
+
+import logging
+import random
+from decimal import ROUND_DOWN, Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Wallet, WalletStripe
+from app.services.wallet_cache import mark_wallets_changed
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_CENT = Decimal("0.01")
+
+
+def _set_stripe_balance(db: Session, stripe_id: int, balance: Decimal) -> None:
+    db.execute(
+        update(WalletStripe)
+        .where(WalletStripe.id == stripe_id)
+        .values(balance=balance, version=WalletStripe.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _set_wallet_balance(db: Session, wallet_id: int, balance: Decimal) -> None:
+    db.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet_id)
+        .values(balance=balance, version=Wallet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lock_wallet(db: Session, wallet_id: int):
+    """Lock the wallet row, then its stripes (always in that order); returns (row, stripes)."""
+    row = db.execute(
+        select(Wallet.balance, Wallet.is_locked, Wallet.stripe_count).where(Wallet.id == wallet_id).with_for_update()
+    ).first()
+    stripes = db.execute(
+        select(WalletStripe.id, WalletStripe.stripe_no, WalletStripe.balance)
+        .where(WalletStripe.wallet_id == wallet_id)
+        .order_by(WalletStripe.stripe_no)
+        .with_for_update()
+    ).all()
+    return row, stripes
+
+
+def debit_stripe(db: Session, wallet_id: int, amount: Decimal) -> bool:
+    """Take ``amount`` from one stripe that covers it, without updating the wallet row."""
+    # No wallet row lock: a stripe debit only ever locks the one stripe it
+    # updates. The conditional UPDATE re-checks the balance after waiting on a
+    # gather, collapse or rebalance that holds the stripe, so it can't overdraw.
+    row = db.execute(select(Wallet.is_locked).where(Wallet.id == wallet_id)).first()
+    if row is None or row.is_locked:
+        return False
+    candidates = [
+        stripe_id
+        for (stripe_id,) in db.execute(
+            select(WalletStripe.id).where(WalletStripe.wallet_id == wallet_id, WalletStripe.balance >= amount)
+        )
+    ]
+    random.shuffle(candidates)
+    for stripe_id in candidates:
+        # Another debit may have drained this stripe since it was read.
+        result = db.execute(
+            update(WalletStripe)
+            .where(WalletStripe.id == stripe_id, WalletStripe.balance >= amount)
+            .values(balance=WalletStripe.balance - amount, version=WalletStripe.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            mark_wallets_changed(db, [wallet_id])
+            return True
+    return False
+
+
+def gather_debit(db: Session, wallet_id: int, amount: Decimal) -> bool:
+    """Take ``amount`` across the wallet row and its stripes when no single row covers it."""
+    row, stripes = _lock_wallet(db, wallet_id)
+    if row is None or row.is_locked:
+        return False
+    main = Decimal(row.balance)
+    if main + sum((Decimal(s.balance) for s in stripes), Decimal("0")) < amount:
+        return False
+    remaining = amount
+    taken = min(max(main, Decimal("0")), remaining)
+    if taken:
+        _set_wallet_balance(db, wallet_id, main - taken)
+        remaining -= taken
+    for stripe in sorted(stripes, key=lambda s: s.balance, reverse=True):
+        if not remaining:
+            break
+        taken = min(Decimal(stripe.balance), remaining)
+        if taken > 0:
+            _set_stripe_balance(db, stripe.id, Decimal(stripe.balance) - taken)
+            remaining -= taken
+    mark_wallets_changed(db, [wallet_id])
+    return True
+
+
+def collapse_stripes(db: Session, wallet_id: int) -> Decimal:
+    """Move every stripe's funds into the wallet row (locking both); returns the amount moved."""
+    row, stripes = _lock_wallet(db, wallet_id)
+    moved = sum((Decimal(s.balance) for s in stripes), Decimal("0"))
+    if row is None or not moved:
+        return Decimal("0")
+    for stripe in stripes:
+        if stripe.balance:
+            _set_stripe_balance(db, stripe.id, Decimal("0"))
+    _set_wallet_balance(db, wallet_id, Decimal(row.balance) + moved)
+    mark_wallets_changed(db, [wallet_id])
+    return moved
+
+
+def _even_shares(total: Decimal, count: int) -> tuple[Decimal, Decimal]:
+    """(per-stripe share, remainder left on the wallet row)."""
+    if count <= 0 or total <= 0:
+        return Decimal("0"), total
+    share = (total / count).quantize(_CENT, rounding=ROUND_DOWN)
+    return share, total - share * count
+
+
+def rebalance_wallet(db: Session, wallet_id: int) -> bool:
+    """Spread the wallet's whole balance evenly over its stripes; False when nothing had to move."""
+    row, stripes = _lock_wallet(db, wallet_id)
+    if row is None or not stripes:
+        return False
+    main = Decimal(row.balance)
+    total = main + sum((Decimal(s.balance) for s in stripes), Decimal("0"))
+    share, remainder = _even_shares(total, len(stripes))
+    changed = False
+    for stripe in stripes:
+        if Decimal(stripe.balance) != share:
+            _set_stripe_balance(db, stripe.id, share)
+            changed = True
+    if main != remainder:
+        _set_wallet_balance(db, wallet_id, remainder)
+        changed = True
+    if changed:
+        mark_wallets_changed(db, [wallet_id])
+    return changed
+
+
+def needs_rebalance(main: Decimal, stripe_balances: list[Decimal]) -> bool:
+    """True once credits have piled up on the wallet row or a stripe has drained below half its share."""
+    if not stripe_balances:
+        return False
+    share, _ = _even_shares(main + sum(stripe_balances, Decimal("0")), len(stripe_balances))
+    return main > share or min(stripe_balances) < share / 2
+
+
+def rebalance_striped_wallets(db: Session) -> int:
+    """Rebalance every striped wallet that needs it, committing per wallet; returns how many moved funds."""
+    wallet_ids = [wallet_id for (wallet_id,) in db.query(Wallet.id).filter(Wallet.stripe_count > 0).order_by(Wallet.id)]
+    rebalanced = 0
+    for wallet_id in wallet_ids:
+        main = db.query(Wallet.balance).filter(Wallet.id == wallet_id).scalar()
+        balances = [
+            Decimal(balance)
+            for (balance,) in db.query(WalletStripe.balance).filter(WalletStripe.wallet_id == wallet_id)
+        ]
+        if main is None or not needs_rebalance(Decimal(main), balances):
+            continue
+        try:
+            if rebalance_wallet(db, wallet_id):
+                rebalanced += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Rebalancing wallet %s failed", wallet_id)
+    return rebalanced
+
+
+def set_stripe_count(db: Session, wallet: Wallet, count: int) -> None:
+    """Switch striping on (count > 0), resize it, or switch it off (0). The caller commits."""
+    if count < 0 or count > settings.wallet_stripes_max:
+        raise HTTPException(status_code=400, detail=f"Stripe count must be between 0 and {settings.wallet_stripes_max}")
+    # Funds of every stripe come back to the wallet row first, so nothing is
+    # lost when stripes are removed; rebalance_wallet spreads them out again.
+    collapse_stripes(db, wallet.id)
+    existing = {stripe.stripe_no: stripe for stripe in db.query(WalletStripe).filter(WalletStripe.wallet_id == wallet.id)}
+    for stripe_no, stripe in existing.items():
+        if stripe_no >= count:
+            db.delete(stripe)
+    db.add_all(WalletStripe(wallet_id=wallet.id, stripe_no=n, balance=0) for n in range(count) if n not in existing)
+    wallet.stripe_count = count
+    db.flush()
+    if count:
+        rebalance_wallet(db, wallet.id)
+    mark_wallets_changed(db, [wallet.id])
+
+
+def stripe_view(db: Session, wallet: Wallet) -> dict:
+    stripes = (
+        db.query(WalletStripe.stripe_no, WalletStripe.balance)
+        .filter(WalletStripe.wallet_id == wallet.id)
+        .order_by(WalletStripe.stripe_no)
+        .all()
+    )
+    unallocated = Decimal(db.query(Wallet.balance).filter(Wallet.id == wallet.id).scalar() or 0)
+    return {
+        "wallet_id": wallet.id,
+        "stripe_count": len(stripes),
+        "unallocated": unallocated,
+        "stripes": [{"stripe_no": stripe_no, "balance": Decimal(balance)} for stripe_no, balance in stripes],
+        "total_balance": unallocated + sum((Decimal(balance) for _, balance in stripes), Decimal("0")),
+    }
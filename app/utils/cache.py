@@ -16,3 +16,7 @@ def get_cached(key: str):
 
 def set_cached(key: str, value, ttl_seconds: int = 60):
     _cache[key] = (value, time.time() + ttl_seconds)
+
+
+def delete_cached(key: str):
+    _cache.pop(key, None)
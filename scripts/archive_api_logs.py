@@ -0,0 +1,32 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.api_log_retention import run_api_log_retention
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Hourly: roll new api_logs rows into api_log_minutes, then archive rows
+    # older than API_LOG_RETENTION_DAYS.
+    db = SessionLocal()
+    try:
+        result = run_api_log_retention(db)
+        logger.info(
+            f"api_logs: {result['minutes_rolled_up']} minute row(s) rolled up, "
+            f"{result['archived']} row(s) archived before {result['cutoff']:%Y-%m-%d %H:%M}."
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error running api_logs retention: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.services.index_audit import run_index_audit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # EXPLAIN each hot query in app.services.index_audit.CATALOG against the
+    # configured database and exit non-zero if any of them needs a full scan.
+    with engine.connect() as conn:
+        results = run_index_audit(conn)
+    flagged = [result for result in results if result["seq_scans"]]
+    for result in results:
+        status = "SEQ SCAN " + ", ".join(result["seq_scans"]) if result["seq_scans"] else "ok"
+        logger.info(f"{result['name']} ({result['source']}): {status}")
+        for line in result["plan"]:
+            logger.info(f"    {line}")
+    logger.info(f"{len(results)} queries audited, {len(flagged)} flagged.")
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
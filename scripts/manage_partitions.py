@@ -0,0 +1,48 @@
+import os
+import sys
+import logging
+import argparse
+from datetime import date
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.services.partitions import (
+    PARTITIONED_TABLES,
+    convert_to_partitioned,
+    detach_partitions_before,
+    ensure_all_partitions,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Daily: create the upcoming monthly partitions of transactions and
+    # service_transactions. No-op unless the tables are partitioned (Postgres).
+    parser = argparse.ArgumentParser(description="Manage monthly transaction partitions (Postgres).")
+    parser.add_argument("--convert", action="store_true", help="Rebuild the tables as partitioned tables first.")
+    parser.add_argument("--detach-before", metavar="YYYY-MM", help="Detach partitions for months before this one.")
+    args = parser.parse_args()
+
+    try:
+        if args.convert:
+            with engine.begin() as conn:
+                for table in PARTITIONED_TABLES:
+                    count = convert_to_partitioned(conn, table)
+                    logger.info(f"{table}: converted with {count} partition(s).")
+        created = ensure_all_partitions(engine)
+        logger.info(f"Partitions created: {sum(len(names) for names in created.values())}.")
+        if args.detach_before:
+            before = date.fromisoformat(f"{args.detach_before}-01")
+            with engine.begin() as conn:
+                for table in PARTITIONED_TABLES:
+                    detached = detach_partitions_before(conn, table, before)
+                    logger.info(f"{table}: detached {', '.join(detached) or 'nothing'}.")
+    except Exception as e:
+        logger.error(f"Error managing partitions: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.idempotency import purge_expired_keys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    db = SessionLocal()
+    try:
+        count = purge_expired_keys(db)
+        logger.info(f"Purged {count} expired idempotency key(s).")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error purging idempotency keys: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
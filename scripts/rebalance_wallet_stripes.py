@@ -0,0 +1,27 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.wallet_stripes import rebalance_striped_wallets
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Spreads credits that landed on striped wallets' main rows back over their stripes.
+    db = SessionLocal()
+    try:
+        count = rebalance_striped_wallets(db)
+        logger.info(f"Rebalanced {count} striped wallet(s).")
+    except Exception as e:
+        logger.error(f"Error rebalancing wallet stripes: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
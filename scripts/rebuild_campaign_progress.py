@@ -0,0 +1,28 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.agent import rebuild_campaign_progress
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Usage: python scripts/rebuild_campaign_progress.py [CAMPAIGN_ID ...]  (defaults to every active volume campaign)
+    campaign_ids = [int(arg) for arg in sys.argv[1:]]
+    db = SessionLocal()
+    try:
+        count = rebuild_campaign_progress(db, campaign_ids or None)
+        logger.info(f"Campaign progress rebuilt for {count} row(s).")
+    except Exception as e:
+        logger.error(f"Error rebuilding campaign progress: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
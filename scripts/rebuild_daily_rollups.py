@@ -0,0 +1,45 @@
+import os
+import sys
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models import DailyRollup
+from app.services.rollups import earliest_source_day, rebuild_daily_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Usage: python scripts/rebuild_daily_rollups.py [START [END]]  (YYYY-MM-DD, inclusive)
+    # Nightly default: yesterday. On an empty table, backfills from the earliest record.
+    # Only closed days are rebuilt: today's rows are still being incremented by
+    # the flush-time counters, and increments committed while the rebuild runs
+    # would be lost.
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        if len(sys.argv) > 1:
+            start = date.fromisoformat(sys.argv[1])
+            end = min(date.fromisoformat(sys.argv[2]), yesterday) if len(sys.argv) > 2 else yesterday
+        elif db.query(DailyRollup.id).first() is None:
+            start = earliest_source_day(db) or yesterday
+            end = yesterday
+        else:
+            start = end = yesterday
+        if start > end:
+            logger.info(f"Nothing to rebuild: {start} is not a closed day.")
+            return
+        count = rebuild_daily_rollups(db, start, end)
+        logger.info(f"Daily rollups {start}..{end} rebuilt: {count} row(s).")
+    except Exception as e:
+        logger.error(f"Error rebuilding daily rollups: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
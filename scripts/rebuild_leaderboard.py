@@ -0,0 +1,29 @@
+import os
+import sys
+import logging
+
+# Add the project root to the python path so we can import 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.leaderboard import month_key, rebuild_leaderboard_month
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Usage: python scripts/rebuild_leaderboard.py [YYYY-MM ...]  (defaults to current month)
+    months = sys.argv[1:] or [month_key()]
+    db = SessionLocal()
+    try:
+        for month in months:
+            count = rebuild_leaderboard_month(db, month)
+            logger.info(f"Leaderboard {month} rebuilt for {count} user(s).")
+    except Exception as e:
+        logger.error(f"Error rebuilding leaderboard: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
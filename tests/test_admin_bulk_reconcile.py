@@ -0,0 +1,153 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import (
+    AdminAuditLog,
+    LedgerType,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+    UserRole,
+    Wallet,
+    WalletLedger,
+)
+from app.schemas.admin import ReconcileTransactionsBulkRequest
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN, email="ops@example.com")
+
+
+def _user(db, tag: str, balance: str) -> User:
+    user = User(
+        email=f"bulk-{tag}@example.com",
+        full_name=f"Bulk {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"BULK{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    db.add(Wallet(user_id=user.id, balance=Decimal(balance)))
+    db.commit()
+    return user
+
+
+def _balance(db, user) -> Decimal:
+    db.expire_all()
+    return Decimal(db.query(Wallet).filter(Wallet.user_id == user.id).one().balance)
+
+
+def _count_statements(fn):
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(ENGINE, "before_cursor_execute", _record)
+    try:
+        return fn(), statements
+    finally:
+        event.remove(ENGINE, "before_cursor_execute", _record)
+
+
+def test_bulk_fail_and_refund_is_set_based_and_reports_per_reference():
+    db = SessionLocal()
+    try:
+        ada = _user(db, "ada", "0")
+        ben = _user(db, "ben", "10")
+        ada_wallet = db.query(Wallet).filter(Wallet.user_id == ada.id).one()
+        for i, user in enumerate((ada, ada, ben)):
+            db.add(Transaction(
+                user_id=user.id, reference=f"BK-P{i}", amount=Decimal("100"),
+                status=TransactionStatus.PENDING, tx_type=TransactionType.DATA,
+            ))
+        db.add(ServiceTransaction(
+            user_id=ada.id, reference="BK-S0", tx_type="airtime", amount=Decimal("50"), status="pending",
+        ))
+        db.add(Transaction(
+            user_id=ben.id, reference="BK-DONE", amount=Decimal("100"),
+            status=TransactionStatus.SUCCESS, tx_type=TransactionType.DATA,
+        ))
+        # A refund credited by an earlier, interrupted attempt must not be paid twice.
+        db.add(WalletLedger(
+            wallet_id=ada_wallet.id, amount=Decimal("100"), entry_type=LedgerType.CREDIT,
+            reference="ADMIN_REFUND_BK-P1", description="Admin refund for pending transaction BK-P1",
+        ))
+        db.commit()
+
+        payload = ReconcileTransactionsBulkRequest(
+            references=["BK-P0", "BK-P1", "BK-P2", "BK-S0", "BK-DONE", "BK-MISSING", "BK-P0"],
+            note="Provider outage",
+        )
+        response, statements = _count_statements(
+            lambda: admin_endpoints.fail_and_refund_pending_transactions_bulk(payload=payload, admin=ADMIN, db=db)
+        )
+
+        assert response["processed"] == 6
+        assert response["succeeded"] == 4
+        by_ref = {item["reference"]: item for item in response["results"]}
+        assert [item["reference"] for item in response["results"]][:4] == ["BK-P0", "BK-P1", "BK-P2", "BK-S0"]
+        assert by_ref["BK-DONE"]["status_code"] == 409
+        assert by_ref["BK-MISSING"]["status_code"] == 404
+        assert by_ref["BK-S0"]["result"]["source"] == "service_transaction"
+        # One balance UPDATE covers both wallets.
+        assert statements.count("UPDATE") <= 3
+
+        assert _balance(db, ada) == Decimal("150")
+        assert _balance(db, ben) == Decimal("110")
+        assert {tx.status for tx in db.query(Transaction).filter(Transaction.reference.like("BK-P%"))} == {
+            TransactionStatus.REFUNDED
+        }
+        assert db.query(ServiceTransaction).filter_by(reference="BK-S0").one().status == "refunded"
+        assert db.query(AdminAuditLog).filter(AdminAuditLog.action == "fail_refund_pending").count() == 4
+    finally:
+        db.close()
+
+
+def test_bulk_reconcile_delivered_reverses_refunds_within_balance():
+    db = SessionLocal()
+    try:
+        cy = _user(db, "cy", "150")
+        for i in range(2):
+            db.add(Transaction(
+                user_id=cy.id, reference=f"BK-R{i}", amount=Decimal("100"),
+                status=TransactionStatus.REFUNDED, tx_type=TransactionType.DATA, failure_reason="timeout",
+            ))
+        db.add(Transaction(
+            user_id=cy.id, reference="BK-PENDING", amount=Decimal("40"),
+            status=TransactionStatus.PENDING, tx_type=TransactionType.DATA,
+        ))
+        db.commit()
+
+        payload = ReconcileTransactionsBulkRequest(references=["BK-R0", "BK-R1", "BK-PENDING"])
+        response = admin_endpoints.reconcile_transactions_delivered_bulk(payload=payload, admin=ADMIN, db=db)
+
+        by_ref = {item["reference"]: item for item in response["results"]}
+        assert by_ref["BK-R0"]["result"]["wallet_action"] == "refund_reversal_debit"
+        assert by_ref["BK-R1"]["status_code"] == 409
+        assert by_ref["BK-PENDING"]["result"]["wallet_action"] == "none"
+        assert _balance(db, cy) == Decimal("50")
+        statuses = {tx.reference: tx.status for tx in db.query(Transaction).filter(Transaction.user_id == cy.id)}
+        assert statuses == {
+            "BK-R0": TransactionStatus.SUCCESS,
+            "BK-R1": TransactionStatus.REFUNDED,
+            "BK-PENDING": TransactionStatus.SUCCESS,
+        }
+    finally:
+        db.close()
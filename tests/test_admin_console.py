@@ -30,7 +30,7 @@ class _StubQuery:
     def correlate(self, *args, **kwargs):
         return self
 
-    def as_scalar(self, *args, **kwargs):
+    def scalar_subquery(self, *args, **kwargs):
         return self
 
     def label(self, *args, **kwargs):
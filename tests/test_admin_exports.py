@@ -0,0 +1,125 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.api.v1.endpoints.finance import export_ledger
+from app.core.database import Base
+from app.models import (
+    EntryType,
+    FinancialCategory,
+    FinancialLedger,
+    LedgerType,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+    UserRole,
+    Wallet,
+    WalletLedger,
+)
+from app.services import exports
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN)
+
+
+def _body(response) -> str:
+    async def collect():
+        return [chunk async for chunk in response.body_iterator]
+
+    return "".join(asyncio.run(collect()))
+
+
+def _seed(db):
+    user = User(
+        email="export@example.com",
+        full_name="Export User",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code="EXPORT",
+    )
+    db.add(user)
+    db.commit()
+    wallet = Wallet(user_id=user.id, balance=Decimal("0"))
+    db.add(wallet)
+    db.commit()
+    for i in range(7):
+        created_at = datetime(2026, 3, 1 + i, 10, 0, 0)
+        status = TransactionStatus.FAILED if i % 3 == 0 else TransactionStatus.SUCCESS
+        db.add(Transaction(
+            user_id=user.id, reference=f"EX-T{i}", amount=Decimal("100.50"),
+            status=status, tx_type=TransactionType.DATA, created_at=created_at,
+        ))
+        db.add(ServiceTransaction(
+            user_id=user.id, reference=f"EX-S{i}", tx_type="airtime", amount=Decimal("50"),
+            status="success", created_at=created_at,
+        ))
+        db.add(WalletLedger(
+            wallet_id=wallet.id, amount=Decimal("100.50"), entry_type=LedgerType.DEBIT,
+            reference=f"EX-T{i}", description="Data purchase", created_at=created_at,
+        ))
+    db.add(FinancialLedger(
+        reference="FIN-EX-1", source="manual", category=FinancialCategory.OWNER_CAPITAL,
+        entry_type=EntryType.CREDIT, amount=Decimal("5000"), party="Owner", created_at=datetime(2026, 3, 2),
+    ))
+    db.commit()
+
+
+def test_exports_stream_filtered_rows_in_batches(monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    db = SessionLocal()
+    try:
+        _seed(db)
+
+        response = admin_endpoints.export_transactions(
+            admin=ADMIN, db=db, status="success", from_date=date(2026, 3, 2), to_date=date(2026, 3, 6),
+        )
+        assert response.media_type == "text/csv"
+        assert "transactions_2026-03-02_2026-03-06.csv" in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(_body(response))))
+        assert [row["reference"] for row in rows] == ["EX-T1", "EX-T2", "EX-T4", "EX-T5"]
+        assert rows[0]["status"] == "success"
+        assert rows[0]["amount"] == "100.50"
+        assert rows[0]["user_email"] == "export@example.com"
+
+        services = admin_endpoints.export_service_transactions(
+            admin=ADMIN, db=db, status=None, tx_type=None, from_date=None, to_date=None, format="ndjson",
+        )
+        lines = [json.loads(line) for line in _body(services).splitlines()]
+        assert [line["reference"] for line in lines] == [f"EX-S{i}" for i in range(7)]
+
+        ledger = admin_endpoints.export_wallet_ledger(
+            admin=ADMIN, db=db, entry_type="debit", from_date=None, to_date=date(2026, 3, 3),
+        )
+        assert len(list(csv.DictReader(io.StringIO(_body(ledger))))) == 3
+
+        finance = export_ledger(category=FinancialCategory.OWNER_CAPITAL, format="ndjson", db=db, user=ADMIN)
+        entries = [json.loads(line) for line in _body(finance).splitlines()]
+        assert entries[0]["reference"] == "FIN-EX-1"
+        assert entries[0]["category"] == "owner_capital"
+
+        with pytest.raises(HTTPException) as exc:
+            admin_endpoints.export_transactions(admin=ADMIN, db=db, format="xlsx", from_date=None, to_date=None)
+        assert exc.value.status_code == 400
+    finally:
+        db.close()
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import ServiceTransaction, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.utils.cache import delete_cached
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN)
+
+
+def _seed(db):
+    users = [
+        User(
+            email=f"page-{i}@example.com",
+            full_name=f"Page {i}",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code=f"PAGE{i}",
+        )
+        for i in range(5)
+    ]
+    db.add_all(users)
+    db.commit()
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(7):
+        # Rows from both tables share timestamps (and ids) to exercise the tie-breakers.
+        created_at = base + timedelta(minutes=i // 2)
+        db.add(Transaction(
+            user_id=users[i % 5].id, reference=f"PG-T{i}", amount=Decimal("100"),
+            status=TransactionStatus.SUCCESS, tx_type=TransactionType.DATA, created_at=created_at,
+        ))
+        db.add(ServiceTransaction(
+            user_id=users[i % 5].id, reference=f"PG-S{i}", tx_type="airtime", amount=Decimal("50"),
+            status="success", created_at=created_at,
+        ))
+    db.commit()
+
+
+def _list_transactions(db, **kwargs):
+    admin_endpoints._GENERIC_CACHE.clear()
+    return admin_endpoints.list_all_transactions(admin=ADMIN, db=db, from_date=None, to_date=None, **kwargs)
+
+
+def test_transaction_cursor_walks_every_row_once():
+    db = SessionLocal()
+    try:
+        _seed(db)
+        seen = []
+        cursor = None
+        while True:
+            page = _list_transactions(db, page_size=4, cursor=cursor)
+            seen.extend(item["reference"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == 14
+        assert set(seen) == {f"PG-T{i}" for i in range(7)} | {f"PG-S{i}" for i in range(7)}
+
+        offset_order = [item["reference"] for item in _list_transactions(db, page_size=14)["items"]]
+        assert seen == offset_order
+
+        exact = _list_transactions(db, page_size=4, exact_count=True)
+        assert exact["total"] == 14
+        assert exact["total_is_estimate"] is False
+
+        with pytest.raises(HTTPException) as exc:
+            _list_transactions(db, cursor="not-a-cursor")
+        assert exc.value.status_code == 400
+    finally:
+        db.close()
+
+
+def test_filtered_totals_are_cached_until_exact_count():
+    db = SessionLocal()
+    try:
+        delete_cached("admin:users:count:page-")
+        admin_endpoints._GENERIC_CACHE.clear()
+        first = admin_endpoints.list_users(admin=ADMIN, db=db, q="page-", page_size=2)
+        assert first["total"] == 5
+        assert first["total_is_estimate"] is False
+
+        db.add(User(email="page-new@example.com", full_name="New", hashed_password="hash", referral_code="PAGENEW"))
+        db.commit()
+
+        admin_endpoints._GENERIC_CACHE.clear()
+        cached = admin_endpoints.list_users(admin=ADMIN, db=db, q="page-", page_size=2)
+        assert cached["total"] == 5
+        assert cached["total_is_estimate"] is True
+
+        admin_endpoints._GENERIC_CACHE.clear()
+        exact = admin_endpoints.list_users(admin=ADMIN, db=db, q="page-", page_size=2, exact_count=True)
+        assert exact["total"] == 6
+
+        admin_endpoints._GENERIC_CACHE.clear()
+        second = admin_endpoints.list_users(admin=ADMIN, db=db, q="page-", page_size=2, cursor=exact["next_cursor"])
+        expected = db.query(User.id).filter(User.email.like("page-%")).order_by(User.id.desc()).offset(2).limit(2)
+        assert [item["id"] for item in second["items"]] == [row.id for row in expected]
+    finally:
+        db.close()
+
+
+class _QueryOnlySession:
+    """A session wrapper without ``execute``, which sends the endpoint down its ORM fallback."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def query(self, *entities):
+        return self._db.query(*entities)
+
+
+def test_orm_fallback_honours_cursor_and_exact_count():
+    db = SessionLocal()
+    try:
+        if not db.query(Transaction).filter(Transaction.reference == "PG-T0").first():
+            _seed(db)
+        stub = _QueryOnlySession(db)
+        seen = []
+        cursor = None
+        while True:
+            page = _list_transactions(stub, page_size=3, cursor=cursor, exact_count=True)
+            assert page["total"] == db.query(Transaction).count()
+            assert page["total_is_estimate"] is False
+            seen.extend(item["reference"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        expected = db.query(Transaction.reference).order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        assert seen == [row.reference for row in expected]
+    finally:
+        db.close()
+
+
+def test_keyset_predicate_seeks_on_the_leading_column():
+    from sqlalchemy import select, text
+
+    from app.utils.pagination import keyset_before
+
+    predicate = keyset_before((Transaction.created_at, Transaction.id), (datetime(2026, 1, 1), 10))
+    assert "transactions.created_at <= " in str(predicate)
+
+    with ENGINE.connect() as conn:
+        compiled = select(Transaction.id).where(predicate).compile(ENGINE, compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert "SEARCH" in plan and "created_at<" in plan.replace(" ", "")
@@ -0,0 +1,125 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import ServiceTransaction, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.services.search import classify_search, search_clause
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN)
+
+
+def test_classify_routes_by_pattern():
+    assert classify_search("DATA-1712345678-AB12CD34").kind == "reference"
+    assert classify_search("ada@example.com").kind == "email"
+    assert classify_search("+234 803 123 4567").kind == "phone"
+    assert classify_search("+2348031234567").phone_variants == ["2348031234567", "08031234567", "+2348031234567"]
+    assert classify_search("08031234567").phone_variants == ["08031234567", "2348031234567", "+2348031234567"]
+    assert classify_search("Ada Lovelace").kind == "text"
+    assert classify_search("   ") is None
+
+    text = classify_search("love")
+    clause = search_clause(text, "postgresql", texts=(User.full_name,))
+    assert "ILIKE" in str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_postgres_prefix_matches_use_like_and_pattern_ops_indexes():
+    reference = search_clause(
+        classify_search("DATA-1712345678"), "postgresql", references=(Transaction.reference,)
+    )
+    sql = str(reference.compile(dialect=postgresql.dialect()))
+    assert "transactions.reference LIKE" in sql and ">=" not in sql
+
+    email = search_clause(classify_search("Ada@Example.com"), "postgresql", emails=(User.email,))
+    compiled = email.compile(dialect=postgresql.dialect())
+    assert "lower(users.email) LIKE" in str(compiled)
+    assert "ada@example.com" in compiled.params.values()
+
+    indexes = {index.name: index for index in User.__table__.indexes | Transaction.__table__.indexes}
+    assert "lower(email) text_pattern_ops" in str(
+        CreateIndex(indexes["ix_users_email_lower"]).compile(dialect=postgresql.dialect())
+    )
+    assert "reference text_pattern_ops" in str(
+        CreateIndex(indexes["ix_transactions_reference_prefix"]).compile(dialect=postgresql.dialect())
+    )
+
+
+def test_admin_transaction_search_uses_routed_matches():
+    db = SessionLocal()
+    try:
+        user = User(
+            email="search-ada@example.com",
+            full_name="Ada Search",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code="SEARCHADA",
+            phone_number="08031234567",
+        )
+        db.add(user)
+        db.commit()
+        db.add(Transaction(
+            user_id=user.id, reference="DATA-1712345678-AB12CD34", amount=Decimal("100"),
+            status=TransactionStatus.SUCCESS, tx_type=TransactionType.DATA, recipient_phone="08030000001",
+        ))
+        db.add(ServiceTransaction(
+            user_id=user.id, reference="AIRTIME-1712345678-ZZ", tx_type="airtime", amount=Decimal("50"),
+            status="success", customer="08030000002",
+        ))
+        db.commit()
+
+        def refs(q):
+            admin_endpoints._GENERIC_CACHE.clear()
+            page = admin_endpoints.list_all_transactions(admin=ADMIN, db=db, q=q, from_date=None, to_date=None)
+            return sorted(item["reference"] for item in page["items"])
+
+        assert refs("DATA-1712345678-AB12CD34") == ["DATA-1712345678-AB12CD34"]
+        assert refs("data-1712345678") == ["DATA-1712345678-AB12CD34"]
+        assert refs("search-ada@example.com") == ["AIRTIME-1712345678-ZZ", "DATA-1712345678-AB12CD34"]
+        assert refs("2348030000002") == ["AIRTIME-1712345678-ZZ"]
+
+        admin_endpoints._GENERIC_CACHE.clear()
+        users = admin_endpoints.list_users(admin=ADMIN, db=db, q="+234 803 123 4567")
+        assert [item["email"] for item in users["items"]] == ["search-ada@example.com"]
+    finally:
+        db.close()
+
+
+def test_email_and_phone_search_ignore_case_and_international_format():
+    db = SessionLocal()
+    try:
+        db.add(User(
+            email="Grace.Hopper@Example.com",
+            full_name="Grace Hopper",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code="SEARCHGRACE",
+            phone_number="+2348059876543",
+        ))
+        db.commit()
+
+        def emails(q):
+            admin_endpoints._GENERIC_CACHE.clear()
+            page = admin_endpoints.list_users(admin=ADMIN, db=db, q=q)
+            return [item["email"] for item in page["items"]]
+
+        assert emails("grace.hopper@example.com") == ["Grace.Hopper@Example.com"]
+        assert emails("GRACE.HOPPER@EXAMPLE.COM") == ["Grace.Hopper@Example.com"]
+        assert emails("08059876543") == ["Grace.Hopper@Example.com"]
+        assert emails("2348059876543") == ["Grace.Hopper@Example.com"]
+    finally:
+        db.close()
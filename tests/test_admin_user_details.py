@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import (
+    LedgerType,
+    Referral,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+    UserRole,
+    Wallet,
+    WalletLedger,
+)
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN)
+
+
+def _seed(db) -> User:
+    existing = db.query(User).filter(User.email == "profile@example.com").first()
+    if existing:
+        return existing
+    user = User(
+        email="profile@example.com",
+        full_name="Big Reseller",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code="PROFILE",
+    )
+    db.add(user)
+    db.commit()
+    wallet = Wallet(user_id=user.id, balance=Decimal("500"))
+    db.add(wallet)
+    db.commit()
+
+    base = datetime(2026, 2, 1, 9, 0, 0)
+    for i in range(5):
+        created_at = base + timedelta(minutes=i)
+        status = TransactionStatus.FAILED if i == 0 else TransactionStatus.SUCCESS
+        db.add(Transaction(
+            user_id=user.id, reference=f"UD-T{i}", amount=Decimal("100"),
+            status=status, tx_type=TransactionType.DATA, created_at=created_at,
+        ))
+        db.add(ServiceTransaction(
+            user_id=user.id, reference=f"UD-S{i}", tx_type="airtime", amount=Decimal("50"),
+            status="success", created_at=created_at,
+        ))
+        db.add(WalletLedger(
+            wallet_id=wallet.id, amount=Decimal("100"), entry_type=LedgerType.DEBIT,
+            reference=f"UD-T{i}", description="Data purchase", created_at=created_at,
+        ))
+    for i in range(3):
+        referred = User(
+            email=f"referred-{i}@example.com",
+            full_name=f"Referred {i}",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code=f"REFD{i}",
+        )
+        db.add(referred)
+        db.flush()
+        db.add(Referral(
+            referrer_id=user.id, referred_user_id=referred.id, referral_code_used="PROFILE",
+            created_at=base + timedelta(hours=i),
+        ))
+    db.commit()
+    return user
+
+
+def _walk(fetch) -> list:
+    seen, cursor = [], None
+    while True:
+        page = fetch(cursor)
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_user_detail_sub_resources_page_with_cursors():
+    db = SessionLocal()
+    try:
+        user = _seed(db)
+
+        activity = _walk(lambda c: admin_endpoints.get_user_activity(user.id, cursor=c, page_size=3, admin=ADMIN, db=db))
+        assert len(activity) == 10
+        assert [item["created_at"] for item in activity] == sorted((item["created_at"] for item in activity), reverse=True)
+
+        transactions = _walk(lambda c: admin_endpoints.get_user_transactions(user.id, cursor=c, page_size=2, admin=ADMIN, db=db))
+        assert [item["reference"] for item in transactions] == [f"UD-T{i}" for i in reversed(range(5))]
+
+        services = _walk(lambda c: admin_endpoints.get_user_service_transactions(user.id, cursor=c, page_size=2, admin=ADMIN, db=db))
+        assert {item["source"] for item in services} == {"service"}
+        assert len(services) == 5
+
+        referrals = _walk(lambda c: admin_endpoints.get_user_referrals(user.id, cursor=c, page_size=2, admin=ADMIN, db=db))
+        assert [item["referred_email"] for item in referrals] == [f"referred-{i}@example.com" for i in (2, 1, 0)]
+
+        ledger = _walk(lambda c: admin_endpoints.get_user_ledger(user.id, cursor=c, page_size=4, admin=ADMIN, db=db))
+        assert [item["reference"] for item in ledger] == [f"UD-T{i}" for i in reversed(range(5))]
+
+        with pytest.raises(HTTPException) as exc:
+            admin_endpoints.get_user_ledger(user.id, cursor="bogus", admin=ADMIN, db=db)
+        assert exc.value.status_code == 400
+    finally:
+        db.close()
+
+
+def test_user_details_header_uses_aggregates():
+    db = SessionLocal()
+    try:
+        user = _seed(db)
+        details = admin_endpoints.get_user_details(user.id, admin=ADMIN, db=db)
+
+        summary = details["summary"]
+        assert summary["transaction_count"] == 10
+        assert summary["by_status"]["failed"]["count"] == 1
+        assert summary["successful_spend"] == Decimal("650")
+        assert summary["referral_count"] == 3
+        assert len(details["recent_transactions"]) == 10
+        assert details["recent_transactions_next_cursor"] is None
+        assert len(details["referred_users"]) == 3
+
+        with pytest.raises(HTTPException) as exc:
+            admin_endpoints.get_user_details(999999, admin=ADMIN, db=db)
+        assert exc.value.status_code == 404
+    finally:
+        db.close()
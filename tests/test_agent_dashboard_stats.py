@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import DataPlan, ServiceTransaction, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.services.agent import get_agent_dashboard_stats, resolve_plan_sizes_mb
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _plan(code: str, size: str) -> DataPlan:
+    return DataPlan(
+        network="mtn",
+        plan_code=code,
+        plan_name=f"MTN {size}",
+        data_size=size,
+        validity="30 Days",
+        base_price=Decimal("100"),
+    )
+
+
+def test_data_plan_derives_size_and_suffix():
+    plan = _plan("amigo:mtn:1001", "1.5GB")
+    assert plan.data_size_mb == 1536
+    assert plan.plan_code_suffix == "1001"
+    plan.data_size = "500 MB"
+    assert plan.data_size_mb == 500
+
+
+def test_agent_stats_aggregate_in_sql_with_suffix_matching():
+    db = SessionLocal()
+    try:
+        agent = User(
+            email="agent-stats@example.com",
+            full_name="Agent Stats",
+            hashed_password="hash",
+            role=UserRole.RESELLER,
+            referral_code="AGSTATS",
+        )
+        db.add_all([agent, _plan("amigo:mtn:1001", "1GB"), _plan("smeplug:airtel:77", "500MB")])
+        db.commit()
+
+        def tx(ref, code, amount, tx_type=TransactionType.DATA, status=TransactionStatus.SUCCESS):
+            db.add(Transaction(
+                user_id=agent.id,
+                reference=ref,
+                amount=Decimal(amount),
+                status=status,
+                tx_type=tx_type,
+                data_plan_code=code,
+            ))
+
+        tx("AG-1", "amigo:mtn:1001", "300")  # exact match: 1GB
+        tx("AG-2", "1001", "300")  # legacy code matched by suffix: 1GB
+        tx("AG-3", "unknown", "800")  # unmatched: 800 / 400 = 2GB estimate
+        tx("AG-4", "amigo:mtn:1001", "300", status=TransactionStatus.FAILED)
+        tx("AG-5", None, "1000", tx_type=TransactionType.AIRTIME)
+        db.add(ServiceTransaction(
+            user_id=agent.id, reference="AG-S1", tx_type="Data", amount=Decimal("150"),
+            status="success", product_code="77",
+        ))
+        db.add(ServiceTransaction(
+            user_id=agent.id, reference="AG-S2", tx_type="airtime", amount=Decimal("250"), status="success",
+        ))
+        db.commit()
+
+        stats = get_agent_dashboard_stats(db, agent)
+        # 1 + 1 + 2 + 0.5 (service row via suffix "77")
+        assert stats["month_data_gb"] == 4.5
+        assert stats["today_data_gb"] == 4.5
+        assert stats["month_airtime"] == Decimal("1250")
+        assert stats["today_airtime"] == Decimal("1250")
+        assert stats["total_transactions"] == 7
+        assert stats["agent_status"] == "Inactive"
+
+        assert resolve_plan_sizes_mb(db, ["1001", "77", "missing", None]) == {"1001": 1024, "77": 500}
+    finally:
+        db.close()
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import ApiLog, ApiLogArchive, ApiLogMinute, DailyRollup
+from app.services.api_log_retention import api_health, run_api_log_retention
+from app.services.rollups import rebuild_daily_rollups
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+NOW = datetime(2026, 3, 20, 12, 30, tzinfo=timezone.utc)
+
+
+def _log(created_at: datetime, duration_ms: str, success: int, reference: str) -> ApiLog:
+    return ApiLog(
+        service="amigo", endpoint="/data/purchase", status_code=200, duration_ms=Decimal(duration_ms),
+        reference=reference, success=success, created_at=created_at, updated_at=created_at,
+    )
+
+
+def test_old_logs_are_rolled_up_per_minute_then_archived():
+    db = SessionLocal()
+    try:
+        old_minute = NOW - timedelta(days=20)
+        db.add_all([
+            _log(old_minute + timedelta(seconds=5), "100", 1, "RET-1"),
+            _log(old_minute + timedelta(seconds=20), "900", 0, "RET-2"),
+            _log(old_minute + timedelta(seconds=40), "200", 1, "RET-3"),
+            _log(NOW - timedelta(hours=1), "150", 1, "RET-4"),
+        ])
+        db.commit()
+
+        result = run_api_log_retention(db, now=NOW)
+        assert (result["minutes_rolled_up"], result["archived"]) == (2, 3)
+        assert [ref for (ref,) in db.query(ApiLog.reference)] == ["RET-4"]
+        assert {ref for (ref,) in db.query(ApiLogArchive.reference)} == {"RET-1", "RET-2", "RET-3"}
+
+        minute = db.query(ApiLogMinute).order_by(ApiLogMinute.minute).first()
+        assert (minute.call_count, minute.success_count) == (3, 2)
+        assert (minute.duration_p50_ms, minute.duration_p95_ms, minute.duration_max_ms) == (200, 900, 900)
+
+        # A second run only recomputes the last few minutes and archives nothing.
+        again = run_api_log_retention(db, now=NOW)
+        assert again["archived"] == 0
+        assert db.query(ApiLogMinute).count() == 2
+
+        health = api_health(db, NOW - timedelta(days=30))
+        assert [(row["service"], row["calls"], row["failures"]) for row in health] == [("amigo", 4, 1)]
+        assert health[0]["avg_ms"] == 337.5
+
+        # Rebuilding the daily rollups for an archived day reads the minute rollups.
+        old_day = old_minute.date()
+        rebuild_daily_rollups(db, old_day, old_day)
+        counts = {
+            row.status: row.tx_count
+            for row in db.query(DailyRollup).filter(DailyRollup.kind == "api", DailyRollup.day == old_day)
+        }
+        assert counts == {"success": 2, "failed": 1}
+    finally:
+        db.close()
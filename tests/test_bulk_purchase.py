@@ -0,0 +1,293 @@
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import (
+    BulkPurchase,
+    DataPlan,
+    LedgerType,
+    PricingRole,
+    PricingRule,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    User,
+    UserRole,
+    WalletLedger,
+)
+from app.services import bulk_purchase
+from app.services.bills import MockBillsProvider
+from app.services.bulk_purchase import (
+    AirtimeOrder,
+    BulkOrder,
+    bulk_purchase_view,
+    create_bulk_airtime,
+    create_bulk_purchase,
+    finalize_bulk_purchase,
+    recover_stalled_bulk_purchases,
+    run_bulk_purchase,
+    stream_bulk_purchase,
+)
+from app.services.pricing import build_service_pricing_key, invalidate_pricing_table
+from app.services.wallet import credit_wallet, get_or_create_wallet
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _reseller(db, tag: str, funding: str) -> User:
+    user = User(
+        email=f"bulk-{tag}@example.com",
+        full_name=f"Bulk {tag}",
+        hashed_password="hash",
+        role=UserRole.RESELLER,
+        referral_code=f"BULK{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    credit_wallet(db, get_or_create_wallet(db, user.id), Decimal(funding), f"{tag}-FUND", "Funding")
+    return user
+
+
+def _plan(db, code: str, network: str, price: str) -> DataPlan:
+    plan = DataPlan(
+        network=network,
+        plan_code=code,
+        plan_name=f"{code} 1GB",
+        data_size="1GB",
+        validity="30d",
+        base_price=Decimal(price),
+        agent_price=Decimal(price),
+        provider="amigo",
+    )
+    db.add(plan)
+    db.commit()
+    return plan
+
+
+def _fake_provider(job):
+    # The last digit of the phone number picks the outcome.
+    outcome = {"1": "success", "2": "failed", "3": "pending"}[job.phone[-1]]
+    return {"status": outcome, "provider_reference": f"P-{job.reference}", "error": "Rejected"}, "amigo"
+
+
+def test_a_batch_is_paid_once_and_failures_are_refunded_in_one_credit():
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "ada", "1000.00")
+        mtn = _plan(db, "BULK-MTN-1GB", "mtn", "100.00")
+        glo = _plan(db, "BULK-GLO-1GB", "glo", "150.00")
+        orders = [
+            BulkOrder("08030000001", mtn),
+            BulkOrder("08050000002", glo),
+            BulkOrder("08030000002", mtn),
+            BulkOrder("08030000003", mtn),
+        ]
+        batch = create_bulk_purchase(db, user, orders)
+        wallet = get_or_create_wallet(db, user.id)
+        assert (batch.total_amount, wallet.total_balance) == (Decimal("450.00"), Decimal("550.00"))
+
+        run_bulk_purchase(batch.batch_id, session_factory=SessionLocal, purchase=_fake_provider)
+
+        db.expire_all()
+        view = bulk_purchase_view(db, db.query(BulkPurchase).filter_by(batch_id=batch.batch_id).one())
+        assert view["status"] == "completed"
+        assert [item["status"] for item in view["items"]] == ["success", "refunded", "refunded", "pending"]
+        assert (view["refunded_amount"], view["counts"]) == (Decimal("250.00"), {"success": 1, "refunded": 2, "pending": 1})
+        assert db.query(Transaction).filter_by(reference=f"{batch.batch_id}-000").one().external_reference == (
+            f"P-{batch.batch_id}-000"
+        )
+
+        # One debit for the batch, one netted refund; finalizing again changes nothing.
+        finalize_bulk_purchase(db, batch.batch_id)
+        entries = db.query(WalletLedger.entry_type, WalletLedger.amount, WalletLedger.reference).filter(
+            WalletLedger.wallet_id == wallet.id
+        ).order_by(WalletLedger.id).all()
+        assert entries == [
+            (LedgerType.CREDIT, Decimal("1000.00"), "ada-FUND"),
+            (LedgerType.DEBIT, Decimal("450.00"), batch.batch_id),
+            (LedgerType.CREDIT, Decimal("250.00"), f"{batch.batch_id}-REFUND"),
+        ]
+        db.refresh(wallet)
+        assert wallet.total_balance == Decimal("800.00")
+
+        lines = [json.loads(line) for line in stream_bulk_purchase(batch.batch_id, session_factory=SessionLocal)]
+        assert [line["type"] for line in lines] == ["item"] * 4 + ["summary"]
+        assert lines[-1]["refunded_amount"] == "250.00"
+    finally:
+        db.close()
+
+
+def test_a_batch_that_cannot_be_paid_leaves_nothing_behind():
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "ben", "120.00")
+        plan = _plan(db, "BULK-AIRTEL-1GB", "airtel", "100.00")
+        with pytest.raises(HTTPException) as exc:
+            create_bulk_purchase(db, user, [BulkOrder("08020000001", plan), BulkOrder("08020000002", plan)])
+        assert exc.value.status_code == 400
+        assert db.query(BulkPurchase).filter_by(user_id=user.id).count() == 0
+        assert db.query(Transaction).filter_by(user_id=user.id).count() == 0
+
+        create_bulk_purchase(db, user, [BulkOrder("08020000001", plan, reference="ref-1")], source="developer")
+        with pytest.raises(HTTPException) as exc:
+            create_bulk_purchase(db, user, [BulkOrder("08020000001", plan, reference="ref-1")], source="developer")
+        assert exc.value.status_code == 409
+        assert get_or_create_wallet(db, user.id).total_balance == Decimal("20.00")
+    finally:
+        db.close()
+
+
+def test_airtime_batches_are_priced_once_and_settled_like_data_batches(monkeypatch):
+    monkeypatch.setattr(bulk_purchase, "get_bills_provider", MockBillsProvider)
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "cy", "1000.00")
+        db.add(
+            PricingRule(
+                network=build_service_pricing_key("airtime", "mtn"),
+                role=PricingRole.RESELLER,
+                margin=Decimal("-2"),
+                margin_type="percentage",
+            )
+        )
+        db.commit()
+        invalidate_pricing_table()
+
+        # The mock provider rejects numbers starting with 0000.
+        orders = [AirtimeOrder("08030000001", "mtn", Decimal("100")), AirtimeOrder("00000000002", "glo", Decimal("200"))]
+        batch = create_bulk_airtime(db, user, orders)
+        assert batch.total_amount == Decimal("298.00")
+
+        run_bulk_purchase(batch.batch_id, session_factory=SessionLocal)
+
+        db.expire_all()
+        rows = (
+            db.query(ServiceTransaction.customer, ServiceTransaction.status, ServiceTransaction.amount)
+            .filter(ServiceTransaction.user_id == user.id)
+            .order_by(ServiceTransaction.reference)
+            .all()
+        )
+        assert rows == [("08030000001", "success", Decimal("98.00")), ("00000000002", "refunded", Decimal("200.00"))]
+        entries = db.query(WalletLedger.entry_type, WalletLedger.amount, WalletLedger.reference).filter(
+            WalletLedger.reference.like(f"{batch.batch_id}%")
+        ).order_by(WalletLedger.id).all()
+        assert entries == [
+            (LedgerType.DEBIT, Decimal("298.00"), batch.batch_id),
+            (LedgerType.CREDIT, Decimal("200.00"), f"{batch.batch_id}-REFUND"),
+        ]
+        view = bulk_purchase_view(db, db.query(BulkPurchase).filter_by(batch_id=batch.batch_id).one())
+        assert (view["kind"], view["items"][0]["face_value"]) == ("airtime", Decimal("100.00"))
+    finally:
+        db.close()
+
+
+def test_only_batches_with_a_quiet_runner_are_recovered_and_late_failures_are_refunded(monkeypatch):
+    monkeypatch.setattr(bulk_purchase.settings, "bulk_purchase_stall_seconds", 60)
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "dee", "1000.00")
+        plan = _plan(db, "BULK-9MOBILE-1GB", "9mobile", "100.00")
+        batch = create_bulk_purchase(db, user, [BulkOrder("08090000001", plan)])
+        now = datetime.now(timezone.utc)
+        batch.created_at = now - timedelta(hours=2)
+        batch.heartbeat_at = now
+        db.commit()
+        # Old, but its runner checked in just now.
+        assert recover_stalled_bulk_purchases(db) == 0
+        batch.heartbeat_at = now - timedelta(minutes=5)
+        db.commit()
+        assert recover_stalled_bulk_purchases(db) == 1
+
+        # The batch is finalized while its item is still with the provider.
+        late = create_bulk_purchase(db, user, [BulkOrder("08090000002", plan)])
+
+        def recovered_mid_flight(job):
+            session = SessionLocal()
+            try:
+                finalize_bulk_purchase(session, late.batch_id)
+            finally:
+                session.close()
+            return _fake_provider(job)
+
+        run_bulk_purchase(late.batch_id, session_factory=SessionLocal, purchase=recovered_mid_flight)
+
+        db.expire_all()
+        assert db.query(Transaction).filter_by(reference=f"{late.batch_id}-000").one().status.value == "refunded"
+        assert db.query(BulkPurchase).filter_by(batch_id=late.batch_id).one().refunded_amount == Decimal("100.00")
+        assert db.query(WalletLedger.amount).filter_by(reference=f"{late.batch_id}-000-REFUND").scalar() == Decimal("100.00")
+        assert get_or_create_wallet(db, user.id).total_balance == Decimal("900.00")
+    finally:
+        db.close()
+
+
+def test_items_settled_elsewhere_are_not_sent_to_the_provider(monkeypatch):
+    monkeypatch.setattr(bulk_purchase.settings, "bulk_purchase_concurrency", 1)
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "eve", "1000.00")
+        plan = _plan(db, "BULK-MTN-2GB", "mtn", "100.00")
+        batch = create_bulk_purchase(db, user, [BulkOrder("08030000001", plan), BulkOrder("08030000011", plan)])
+        calls = []
+
+        def settle_the_next_item_elsewhere(job):
+            calls.append(job.reference)
+            session = SessionLocal()
+            try:
+                session.query(Transaction).filter_by(reference=f"{batch.batch_id}-001").one().status = (
+                    TransactionStatus.SUCCESS
+                )
+                session.commit()
+            finally:
+                session.close()
+            return _fake_provider(job)
+
+        run_bulk_purchase(batch.batch_id, session_factory=SessionLocal, purchase=settle_the_next_item_elsewhere)
+        assert calls == [f"{batch.batch_id}-000"]
+    finally:
+        db.close()
+
+
+def test_items_served_by_the_fallback_provider_keep_its_cost(monkeypatch):
+    from app.services import data_routing
+
+    def primary_fails(route, provider, provider_plan_id, phone, reference, price):
+        if provider == route.provider:
+            return {"status": "failed", "error": "Primary down"}, provider
+        return {"status": "success", "provider_reference": f"P-{reference}"}, provider
+
+    monkeypatch.setattr(data_routing, "_execute_provider", primary_fails)
+    db = SessionLocal()
+    try:
+        user = _reseller(db, "fay", "1000.00")
+        plan = _plan(db, "BULK-FALLBACK-1GB", "airtel", "100.00")
+        plan.fallback_provider, plan.fallback_provider_plan_id = "smeplug", "SME-AIRTEL-1GB"
+        db.add(DataPlan(
+            network="airtel", plan_code="smeplug:airtel:1gb", plan_name="Airtel 1GB", data_size="1GB",
+            validity="30d", base_price=Decimal("90.00"), provider="smeplug", provider_plan_id="SME-AIRTEL-1GB",
+        ))
+        db.commit()
+        batch = create_bulk_purchase(db, user, [BulkOrder("08020000001", plan)])
+        assert db.query(Transaction).filter_by(reference=f"{batch.batch_id}-000").one().cost_price == Decimal("100.00")
+
+        run_bulk_purchase(batch.batch_id, session_factory=SessionLocal, purchase=bulk_purchase.buy_data_item)
+
+        db.expire_all()
+        tx = db.query(Transaction).filter_by(reference=f"{batch.batch_id}-000").one()
+        assert (tx.status, tx.provider) == (TransactionStatus.SUCCESS, "smeplug")
+        assert (tx.cost_price, tx.margin) == (Decimal("90.00"), Decimal("10.00"))
+    finally:
+        db.close()
@@ -0,0 +1,183 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.api.v1.endpoints.finance import get_finance_overview
+from app.core.database import Base
+from app.models import (
+    ApiLog,
+    DailyRollup,
+    ServiceTransaction,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+    UserRole,
+)
+from app.services.rollups import rebuild_daily_rollups, rollup_totals
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _snapshot(db) -> dict:
+    return {
+        (str(row.day), row.kind, row.tx_type, row.status, row.network): (
+            row.tx_count,
+            Decimal(str(row.amount)),
+            Decimal(str(row.base_cost)),
+            Decimal(str(row.fee_estimate)),
+        )
+        for row in db.query(DailyRollup).all()
+        if row.tx_count
+    }
+
+
+def test_rollups_track_status_changes_and_feed_dashboards():
+    db = SessionLocal()
+    try:
+        user = User(
+            email="rollup@example.com",
+            full_name="Rollup User",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code="ROLLUP",
+        )
+        db.add(user)
+        db.commit()
+
+        db.add(Transaction(
+            user_id=user.id, reference="RU-1", amount=Decimal("300"), status=TransactionStatus.PENDING,
+            tx_type=TransactionType.DATA, network="mtn", data_plan_code="mtn-1gb", cost_price=Decimal("250"),
+        ))
+        db.add(Transaction(
+            user_id=user.id, reference="RU-2", amount=Decimal("1000"), status=TransactionStatus.SUCCESS,
+            tx_type=TransactionType.WALLET_FUND, provider="billstack",
+        ))
+        db.add(ServiceTransaction(
+            user_id=user.id, reference="RU-S1", tx_type="airtime", amount=Decimal("100"), status="success",
+            provider="mtn", meta={"base_amount": "97"},
+        ))
+        db.add(ApiLog(service="amigo", endpoint="/data", status_code=200, duration_ms=Decimal("12"), success=1))
+        db.commit()
+
+        pending = rollup_totals(db, kinds=("transaction",), statuses=("pending",)).get(())
+        assert pending["tx_count"] == 1
+
+        tx = db.query(Transaction).filter(Transaction.reference == "RU-1").first()
+        assert tx.margin == Decimal("50")
+        tx.status = TransactionStatus.SUCCESS
+        db.commit()
+
+        totals = rollup_totals(db, kinds=("transaction",), statuses=("success",), group_by=("tx_type",))
+        assert totals[("data",)]["amount"] == Decimal("300")
+        assert totals[("data",)]["base_cost"] == Decimal("250")
+        assert totals[("wallet_fund",)]["fee_estimate"] == Decimal("5")
+        assert rollup_totals(db, kinds=("transaction",), statuses=("pending",)).get(())["tx_count"] == 0
+
+        admin_endpoints._ANALYTICS_CACHE.clear()
+        stats = admin_endpoints.analytics(admin=SimpleNamespace(role=UserRole.ADMIN), db=db)
+        assert stats["data_revenue"] == Decimal("300")
+        assert stats["data_cost_estimate"] == Decimal("250")
+        assert stats["service_revenue"] == 100.0
+        assert stats["service_cost_estimate"] == 97.0
+        assert stats["today_successful_tx"] == 3
+        assert stats["api_success"] == 1
+        assert stats["profit_period_estimates"]["daily"]["tx_count"] == 3
+        assert stats["profit_period_estimates"]["all_time"]["revenue"] == 1400.0
+
+        overview = get_finance_overview(db=db, user=None)
+        assert overview["revenue"]["actual"] == 300.0
+        assert overview["cogs"]["data_cogs_estimated"] == 250.0
+        assert overview["payment_fees"]["total"] == 5.0
+
+        # The nightly rebuild must agree with the incremental counters.
+        before = _snapshot(db)
+        today = datetime.now(timezone.utc).date()
+        rebuild_daily_rollups(db, today, today)
+        assert _snapshot(db) == before
+    finally:
+        db.close()
+
+
+def test_rebuild_counts_api_calls_logged_on_a_whole_minute():
+    db = SessionLocal()
+    try:
+        # SQLite's now() stores no fractional seconds; the rebuild's minute bound must still include this row.
+        db.execute(text(
+            "INSERT INTO api_logs (service, endpoint, status_code, duration_ms, success, created_at, updated_at) "
+            "VALUES ('vtpass', '/pay', 200, 5, 1, '2026-01-05 10:00:00', '2026-01-05 10:00:00')"
+        ))
+        db.commit()
+        rebuild_daily_rollups(db, date(2026, 1, 5), date(2026, 1, 5))
+        rows = db.query(DailyRollup).filter(DailyRollup.day == date(2026, 1, 5), DailyRollup.kind == "api").all()
+        assert [(row.tx_type, row.status, row.tx_count) for row in rows] == [("vtpass", "success", 1)]
+    finally:
+        db.close()
+
+
+def test_rollups_move_rows_out_with_the_cost_and_provider_they_were_counted_with():
+    db = SessionLocal()
+    try:
+        user = User(
+            email="rollup-cost@example.com",
+            full_name="Rollup Cost",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code="ROLLCOST",
+        )
+        db.add(user)
+        db.commit()
+        db.add(Transaction(
+            user_id=user.id, reference="RC-1", amount=Decimal("500"), status=TransactionStatus.PENDING,
+            tx_type=TransactionType.DATA, network="glo", data_plan_code="glo-2gb", cost_price=Decimal("450"),
+            provider="amigo",
+        ))
+        db.add(ServiceTransaction(
+            user_id=user.id, reference="RC-S1", tx_type="airtime", amount=Decimal("200"), status="pending",
+            provider="glo", meta={"base_amount": "196"},
+        ))
+        db.commit()
+
+        def glo(kind, status):
+            return rollup_totals(db, kinds=(kind,), statuses=(status,), group_by=("network",)).get(("glo",))
+
+        # A fallback provider serves the item; it stays pending at its cost.
+        tx = db.query(Transaction).filter(Transaction.reference == "RC-1").one()
+        tx.provider, tx.cost_price = "smeplug", Decimal("430")
+        db.commit()
+        assert glo("transaction", "pending")["base_cost"] == Decimal("430")
+
+        # Expired after the commit: the old values are loaded when the new ones are set.
+        tx.status, tx.cost_price = TransactionStatus.SUCCESS, Decimal("420")
+        service = db.query(ServiceTransaction).filter(ServiceTransaction.reference == "RC-S1").one()
+        db.commit()
+        service.status, service.provider, service.meta = "success", "9mobile", {"base_amount": "194"}
+        db.commit()
+
+        assert glo("transaction", "pending")["tx_count"] == 0
+        assert glo("transaction", "pending")["base_cost"] == Decimal("0")
+        assert glo("transaction", "success")["base_cost"] == Decimal("420")
+        assert glo("service", "pending") == {
+            "tx_count": 0, "amount": Decimal("0"), "base_cost": Decimal("0"), "fee_estimate": Decimal("0")
+        }
+        moved = rollup_totals(db, kinds=("service",), statuses=("success",), group_by=("network",))[("9mobile",)]
+        assert (moved["tx_count"], moved["base_cost"]) == (1, Decimal("194"))
+
+        before = _snapshot(db)
+        today = datetime.now(timezone.utc).date()
+        rebuild_daily_rollups(db, today, today)
+        assert _snapshot(db) == before
+    finally:
+        db.close()
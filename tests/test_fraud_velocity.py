@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import ServiceTransaction, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.services import fraud
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+ADMIN = SimpleNamespace(role=UserRole.ADMIN, email="ops@example.com")
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(fraud.settings, "fraud_guard_enabled", True)
+    monkeypatch.setattr(fraud.settings, "fraud_single_tx_limit_ngn", Decimal("5000"))
+    monkeypatch.setattr(fraud.settings, "fraud_daily_total_limit_ngn", Decimal("1000"))
+    monkeypatch.setattr(fraud.settings, "fraud_daily_purchase_count_limit", 3)
+
+
+def _user(db, tag: str) -> User:
+    user = User(
+        email=f"velocity-{tag}@example.com",
+        full_name=f"Velocity {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"VEL{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _buy(db, user, reference: str, amount: str) -> ServiceTransaction:
+    fraud.enforce_purchase_limits(db, user_id=user.id, amount=Decimal(amount), tx_type="airtime")
+    tx = ServiceTransaction(
+        user_id=user.id, reference=reference, tx_type="airtime", amount=Decimal(amount), status="pending",
+    )
+    db.add(tx)
+    db.commit()
+    return tx
+
+
+def _error_code(fn) -> str:
+    with pytest.raises(HTTPException) as exc:
+        fn()
+    return exc.value.detail["code"]
+
+
+def test_velocity_counters_follow_purchases_and_refunds_without_aggregate_queries(limits):
+    db = SessionLocal()
+    try:
+        ada = _user(db, "ada")
+        assert _error_code(lambda: _buy(db, ada, "VEL-BIG", "6000")) == "FRAUD_SINGLE_TX_LIMIT"
+
+        _buy(db, ada, "VEL-1", "400")
+        second = _buy(db, ada, "VEL-2", "400")
+        assert fraud.velocity_totals(db, ada.id) == (2, Decimal("800"))
+        assert _error_code(lambda: _buy(db, ada, "VEL-3", "300")) == "FRAUD_DAILY_TOTAL_LIMIT"
+
+        # A refund gives the amount back on commit.
+        second.status = "refunded"
+        db.commit()
+        assert fraud.velocity_totals(db, ada.id) == (1, Decimal("400"))
+
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(ENGINE, "before_cursor_execute", _record)
+        try:
+            _buy(db, ada, "VEL-3", "300")
+        finally:
+            event.remove(ENGINE, "before_cursor_execute", _record)
+        # Warm counters are checked without touching the purchase tables.
+        assert not [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+        _buy(db, ada, "VEL-4", "100")
+        assert _error_code(lambda: _buy(db, ada, "VEL-5", "100")) == "FRAUD_DAILY_COUNT_LIMIT"
+
+        snapshot = admin_endpoints.get_user_velocity(user_id=ada.id, admin=ADMIN, db=db)
+        assert (snapshot["purchase_count"], snapshot["remaining_count"]) == (3, 0)
+        assert snapshot["remaining_total"] == Decimal("200")
+        reset = admin_endpoints.reset_user_velocity(user_id=ada.id, admin=ADMIN, db=db)
+        assert (reset["purchase_count"], reset["purchase_total"]) == (0, Decimal("0"))
+        _buy(db, ada, "VEL-5", "100")
+    finally:
+        db.close()
+
+
+def test_cold_counters_are_warmed_from_the_last_day_of_purchases(limits, monkeypatch):
+    monkeypatch.setattr(fraud, "_stores", fraud.weakref.WeakKeyDictionary())
+    db = SessionLocal()
+    try:
+        ben = _user(db, "ben")
+        now = datetime.now(timezone.utc)
+        db.add_all([
+            Transaction(
+                user_id=ben.id, reference="VEL-D1", amount=Decimal("500"), tx_type=TransactionType.DATA,
+                status=TransactionStatus.SUCCESS, created_at=now - timedelta(hours=2),
+            ),
+            Transaction(
+                user_id=ben.id, reference="VEL-D2", amount=Decimal("500"), tx_type=TransactionType.DATA,
+                status=TransactionStatus.SUCCESS, created_at=now - timedelta(hours=30),
+            ),
+            Transaction(
+                user_id=ben.id, reference="VEL-F1", amount=Decimal("50000"), tx_type=TransactionType.WALLET_FUND,
+                status=TransactionStatus.SUCCESS, created_at=now - timedelta(hours=1),
+            ),
+            ServiceTransaction(
+                user_id=ben.id, reference="VEL-S1", tx_type="cable", amount=Decimal("300"),
+                status="failed", created_at=now - timedelta(hours=1),
+            ),
+        ])
+        db.commit()
+
+        assert fraud.velocity_totals(db, ben.id) == (1, Decimal("500"))
+        assert _error_code(lambda: _buy(db, ben, "VEL-S2", "600")) == "FRAUD_DAILY_TOTAL_LIMIT"
+    finally:
+        db.close()
+
+
+class _FakeRedis:
+    """Just the hash commands the velocity mirror uses; ``down`` makes every call fail."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.down = False
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self)
+
+    def hgetall(self, key):
+        if self.down:
+            raise ConnectionError("redis down")
+        return {field.encode(): str(value).encode() for field, value in self.hashes.get(key, {}).items()}
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.ops = redis, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+    def execute(self):
+        if self.redis.down:
+            raise ConnectionError("redis down")
+        hashes = self.redis.hashes
+        for name, args, kwargs in self.ops:
+            if name == "hincrby":
+                fields = hashes.setdefault(args[0], {})
+                fields[args[1]] = int(fields.get(args[1], 0)) + args[2]
+            elif name == "hset":
+                hashes.setdefault(args[0], {}).update(kwargs["mapping"])
+            elif name == "hdel":
+                hashes.get(args[0], {}).pop(args[1], None)
+            elif name == "delete":
+                hashes.pop(args[0], None)
+
+
+def test_shared_windows_are_seeded_from_the_database_and_reseeded_after_lost_pushes(limits, monkeypatch):
+    redis = _FakeRedis()
+    mirror = fraud._RedisMirror("redis://velocity")
+    mirror._client = redis
+    monkeypatch.setattr(fraud, "_mirror", mirror)
+    monkeypatch.setattr(fraud, "_stores", fraud.weakref.WeakKeyDictionary())
+    db = SessionLocal()
+    try:
+        cal = _user(db, "cal")
+        key = mirror._key(cal.id)
+        db.add(ServiceTransaction(
+            user_id=cal.id, reference="VEL-R1", tx_type="airtime", amount=Decimal("300"), status="success",
+            created_at=datetime.now(timezone.utc) - timedelta(hours=1),
+        ))
+        db.commit()
+        redis.hashes.pop(key, None)
+
+        # No hash yet (first deploy, expiry, flush): seeded from the database and shared.
+        assert fraud.velocity_totals(db, cal.id) == (1, Decimal("300"))
+        assert redis.hashes[key]["warm"] == 1
+        _buy(db, cal, "VEL-R2", "300")
+        assert fraud.velocity_totals(db, cal.id) == (2, Decimal("600"))
+
+        # A purchase committed while Redis was down never reached the hash...
+        redis.down = True
+        _buy(db, cal, "VEL-R3", "300")
+        assert sum(value for field, value in redis.hashes[key].items() if field.endswith(":n")) == 2
+        redis.down = False
+        mirror._client, mirror._retry_at = redis, 0.0
+        # ...so on recovery the hash was unmarked and reseeded with it.
+        assert fraud.velocity_totals(db, cal.id) == (3, Decimal("900"))
+        assert redis.hashes[key]["warm"] == 1
+        assert sum(value for field, value in redis.hashes[key].items() if field.endswith(":n")) == 3
+        assert _error_code(lambda: _buy(db, cal, "VEL-R4", "200")) == "FRAUD_DAILY_COUNT_LIMIT"
+
+        fraud.reset_velocity(db, cal.id)
+        assert fraud.velocity_totals(db, cal.id) == (0, Decimal("0"))
+    finally:
+        db.close()
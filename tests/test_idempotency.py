@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import IdempotencyKey, User, UserRole
+from app.services import idempotency
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _user(db, tag: str) -> User:
+    user = User(
+        email=f"idem-{tag}@example.com",
+        full_name=f"Idem {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"IDEM{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _request(key: str | None = None):
+    return SimpleNamespace(headers={idempotency.IDEMPOTENCY_KEY_HEADER: key} if key else {})
+
+
+def _purchase_endpoint(calls: list, outcome=None):
+    @idempotency.idempotent("airtime.purchase")
+    def purchase(request, payload, user, db):
+        calls.append(payload.amount)
+        if outcome is not None:
+            raise outcome
+        return {"reference": f"AIRTIME-{len(calls)}", "status": "success", "amount": Decimal(payload.amount)}
+
+    return purchase
+
+
+def test_retries_replay_the_stored_response_without_rerunning_the_purchase():
+    db = SessionLocal()
+    try:
+        ada = _user(db, "ada")
+        calls = []
+        purchase = _purchase_endpoint(calls)
+        payload = SimpleNamespace(amount="100", client_request_id=None)
+
+        first = purchase(_request("retry-1"), payload, ada, db)
+        again = purchase(request=_request("retry-1"), payload=payload, user=ada, db=db)
+        assert calls == ["100"]
+        assert again == {"reference": first["reference"], "status": "success", "amount": 100.0}
+
+        # client_request_id works as the key when there is no header.
+        by_body = SimpleNamespace(amount="100", client_request_id="body-key")
+        purchase(_request(), by_body, ada, db)
+        purchase(_request(), by_body, ada, db)
+        assert calls == ["100", "100"]
+
+        # Keyless requests always run.
+        keyless = SimpleNamespace(amount="100", client_request_id=None)
+        purchase(_request(), keyless, ada, db)
+        assert len(calls) == 3
+
+        with pytest.raises(HTTPException) as reused:
+            purchase(_request("retry-1"), SimpleNamespace(amount="500", client_request_id=None), ada, db)
+        assert reused.value.status_code == 422
+
+        record_id, _ = idempotency.begin(db, user_id=ada.id, key="slow", scope="airtime.purchase",
+                                         request_hash=idempotency.request_fingerprint("airtime.purchase", payload))
+        assert record_id is not None
+        with pytest.raises(HTTPException) as in_flight:
+            purchase(_request("slow"), payload, ada, db)
+        assert in_flight.value.status_code == 409
+        assert len(calls) == 3
+    finally:
+        db.close()
+
+
+def test_client_errors_release_the_key_and_server_errors_are_replayed():
+    db = SessionLocal()
+    try:
+        ben = _user(db, "ben")
+        payload = SimpleNamespace(amount="50", client_request_id=None)
+
+        calls = []
+        rejected = _purchase_endpoint(calls, HTTPException(status_code=400, detail="Insufficient balance"))
+        with pytest.raises(HTTPException):
+            rejected(_request("k-400"), payload, ben, db)
+        assert db.query(IdempotencyKey).filter(IdempotencyKey.key == "k-400").count() == 0
+        _purchase_endpoint(calls)(_request("k-400"), payload, ben, db)
+        assert len(calls) == 2
+
+        failed = _purchase_endpoint(calls, HTTPException(status_code=502, detail="Provider failed"))
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc:
+                failed(_request("k-502"), payload, ben, db)
+            assert (exc.value.status_code, exc.value.detail) == (502, "Provider failed")
+        assert len(calls) == 3
+
+        db.query(IdempotencyKey).filter(IdempotencyKey.user_id == ben.id).update(
+            {IdempotencyKey.expires_at: datetime.now(timezone.utc) - timedelta(minutes=1)}
+        )
+        db.commit()
+        assert idempotency.purge_expired_keys(db) == 2
+        assert db.query(IdempotencyKey).filter(IdempotencyKey.user_id == ben.id).count() == 0
+    finally:
+        db.close()
+
+
+def test_unexpected_errors_never_leave_the_key_in_flight():
+    db = SessionLocal()
+    try:
+        cy = _user(db, "cy")
+        payload = SimpleNamespace(amount="75", client_request_id=None)
+        calls = []
+
+        # Nothing was committed: the key is released and a retry runs.
+        crashed = _purchase_endpoint(calls, RuntimeError("provider client bug"))
+        with pytest.raises(RuntimeError):
+            crashed(_request("k-crash"), payload, cy, db)
+        assert db.query(IdempotencyKey).filter(IdempotencyKey.key == "k-crash").count() == 0
+        _purchase_endpoint(calls)(_request("k-crash"), payload, cy, db)
+        assert len(calls) == 2
+
+        # The wallet may have moved: retries get the stored 500, not 409.
+        @idempotency.idempotent("airtime.purchase")
+        def commits_then_crashes(request, payload, user, db):
+            calls.append(payload.amount)
+            db.commit()
+            raise RuntimeError("failed after the debit")
+
+        with pytest.raises(RuntimeError):
+            commits_then_crashes(_request("k-late"), payload, cy, db)
+        with pytest.raises(HTTPException) as exc:
+            commits_then_crashes(_request("k-late"), payload, cy, db)
+        assert (exc.value.status_code, exc.value.detail) == (500, "Internal error")
+        assert len(calls) == 3
+    finally:
+        db.close()
+
+
+def test_a_stale_in_flight_claim_is_taken_over_by_the_next_retry():
+    db = SessionLocal()
+    try:
+        dee = _user(db, "dee")
+        payload = SimpleNamespace(amount="120", client_request_id=None)
+        request_hash = idempotency.request_fingerprint("airtime.purchase", payload)
+
+        # The first request claimed the key, then its worker died.
+        record_id, _ = idempotency.begin(
+            db, user_id=dee.id, key="k-dead", scope="airtime.purchase", request_hash=request_hash
+        )
+        calls = []
+        purchase = _purchase_endpoint(calls)
+        with pytest.raises(HTTPException) as exc:
+            purchase(_request("k-dead"), payload, dee, db)
+        assert exc.value.status_code == 409
+
+        db.query(IdempotencyKey).filter(IdempotencyKey.id == record_id).update(
+            {IdempotencyKey.claimed_at: datetime.now(timezone.utc) - timedelta(minutes=5)}
+        )
+        db.commit()
+
+        # A different body still can't reuse the key.
+        other = SimpleNamespace(amount="999", client_request_id=None)
+        with pytest.raises(HTTPException) as exc:
+            purchase(_request("k-dead"), other, dee, db)
+        assert exc.value.status_code == 422
+
+        first = purchase(_request("k-dead"), payload, dee, db)
+        assert purchase(_request("k-dead"), payload, dee, db) == first
+        assert len(calls) == 1
+        record = db.query(IdempotencyKey).filter(IdempotencyKey.key == "k-dead").one()
+        assert (record.id, record.status) == (record_id, idempotency.COMPLETED)
+    finally:
+        db.close()
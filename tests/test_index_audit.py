@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.services.index_audit import CATALOG, run_index_audit
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def test_every_catalog_query_is_served_by_an_index():
+    with ENGINE.connect() as conn:
+        results = run_index_audit(conn)
+    assert len(results) == len(CATALOG)
+    assert {result["name"]: result["seq_scans"] for result in results if result["seq_scans"]} == {}
+
+    plans = {result["name"]: " ".join(result["plan"]) for result in results}
+    assert "ix_wallet_ledger_wallet_reference_type" in plans["wallet.find_matching_ledger"]
+    assert "ix_transactions_type_status_created_at" in plans["reconcile.pending_data"]
+    assert "ix_transactions_user_created_at" in plans["transactions.user_history"]
+
+
+def test_missing_index_is_flagged_as_a_sequential_scan():
+    engine = create_engine("sqlite+pysqlite:///:memory:", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in ("ix_referrals_referrer_created_at", "ix_referrals_referrer_status", "ix_referrals_referrer_id"):
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+    referrals = [query for query in CATALOG if query.name == "referrals.by_referrer"]
+    with engine.connect() as conn:
+        [result] = run_index_audit(conn, tuple(referrals))
+    assert result["seq_scans"] == ["referrals"]
@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.services.agent  # noqa: F401  (registers status handlers, as the app does)
+import app.services.promos  # noqa: F401
+import app.services.rollups  # noqa: F401
+import app.services.scheduled_purchases  # noqa: F401
+from app.core.database import Base
+from app.models import LeaderboardScore, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.services.leaderboard import (
+    get_top_scores,
+    get_user_rank,
+    month_key,
+    rebuild_leaderboard_month,
+)
+from app.utils.cache import delete_cached
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _seed_user(db, email: str, role: UserRole = UserRole.USER) -> User:
+    user = User(
+        email=email,
+        full_name=email.split("@")[0].title(),
+        hashed_password="hash",
+        role=role,
+        referral_code=email.split("@")[0].upper(),
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _purchase(db, user: User, reference: str, amount: str, status=TransactionStatus.PENDING) -> Transaction:
+    tx = Transaction(
+        user_id=user.id,
+        reference=reference,
+        amount=Decimal(amount),
+        status=status,
+        tx_type=TransactionType.DATA,
+        network="mtn",
+    )
+    db.add(tx)
+    db.commit()
+    return tx
+
+
+def _score(db, user: User) -> LeaderboardScore | None:
+    return (
+        db.query(LeaderboardScore)
+        .filter(LeaderboardScore.month == month_key(), LeaderboardScore.user_id == user.id)
+        .first()
+    )
+
+
+def test_scores_follow_success_transitions():
+    db = SessionLocal()
+    try:
+        user = _seed_user(db, "lb-one@example.com")
+        tx = _purchase(db, user, "LB-1", "500")
+        assert _score(db, user) is None
+
+        tx = db.query(Transaction).filter(Transaction.reference == "LB-1").first()
+        tx.status = TransactionStatus.SUCCESS
+        db.commit()
+        _purchase(db, user, "LB-2", "250", status=TransactionStatus.SUCCESS)
+        _purchase(db, user, "LB-3", "999", status=TransactionStatus.FAILED)
+
+        row = _score(db, user)
+        assert Decimal(str(row.score)) == Decimal("750")
+        assert row.tx_count == 2
+
+        tx = db.query(Transaction).filter(Transaction.reference == "LB-1").first()
+        tx.status = TransactionStatus.REFUNDED
+        db.commit()
+        db.refresh(row)
+        assert Decimal(str(row.score)) == Decimal("250")
+        assert row.tx_count == 1
+    finally:
+        db.close()
+
+
+def test_rank_and_top_users_read_from_scores():
+    db = SessionLocal()
+    try:
+        month = month_key()
+        delete_cached(f"leaderboard:top:{month}")
+        big = _seed_user(db, "lb-big@example.com")
+        small = _seed_user(db, "lb-small@example.com")
+        admin = _seed_user(db, "lb-admin@example.com", role=UserRole.ADMIN)
+        _purchase(db, big, "LB-BIG", "9000", status=TransactionStatus.SUCCESS)
+        _purchase(db, small, "LB-SMALL", "10", status=TransactionStatus.SUCCESS)
+        _purchase(db, admin, "LB-ADMIN", "50000", status=TransactionStatus.SUCCESS)
+
+        top_ids = [row["id"] for row in get_top_scores(db, month)]
+        assert admin.id not in top_ids
+        assert top_ids.index(big.id) < top_ids.index(small.id)
+
+        rank, score = get_user_rank(db, month, small.id)
+        assert score == Decimal("10")
+        assert rank == db.query(LeaderboardScore).filter(
+            LeaderboardScore.month == month, LeaderboardScore.score > Decimal("10")
+        ).count() + 1
+    finally:
+        db.close()
+
+
+def test_rebuild_matches_incremental_scores():
+    db = SessionLocal()
+    try:
+        month = month_key()
+        before = {row.user_id: Decimal(str(row.score)) for row in db.query(LeaderboardScore).filter(LeaderboardScore.month == month)}
+        rebuild_leaderboard_month(db, month)
+        after = {row.user_id: Decimal(str(row.score)) for row in db.query(LeaderboardScore).filter(LeaderboardScore.month == month)}
+        assert after == {user_id: score for user_id, score in before.items() if score != 0}
+    finally:
+        db.close()
+
+
+def test_status_handlers_open_a_savepoint_only_when_they_have_work():
+    db = SessionLocal()
+    savepoints = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.upper().startswith("SAVEPOINT"):
+            savepoints.append(statement)
+
+    try:
+        user = _seed_user(db, "lb-savepoints@example.com")
+        event.listen(ENGINE, "before_cursor_execute", record)
+        # A new pending purchase only moves the daily rollups.
+        _purchase(db, user, "LB-SP-1", "100")
+        assert len(savepoints) == 1
+
+        # Success also moves the leaderboard and campaign progress.
+        del savepoints[:]
+        tx = db.query(Transaction).filter(Transaction.reference == "LB-SP-1").first()
+        tx.status = TransactionStatus.SUCCESS
+        db.commit()
+        assert len(savepoints) == 3
+    finally:
+        if event.contains(ENGINE, "before_cursor_execute", record):
+            event.remove(ENGINE, "before_cursor_execute", record)
+        db.close()
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import AdminAuditLog, ApiLog, DailyRollup
+from app.services.log_writer import BufferedLogWriter, write_audit_log
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _api_log(reference: str, success: int = 1) -> dict:
+    return {
+        "service": "amigo",
+        "endpoint": "/data/purchase",
+        "status_code": 200,
+        "duration_ms": Decimal("12.5"),
+        "reference": reference,
+        "success": success,
+    }
+
+
+def _api_rollups(db) -> dict:
+    return {
+        row.status: row.tx_count
+        for row in db.query(DailyRollup).filter(DailyRollup.kind == "api", DailyRollup.tx_type == "amigo")
+    }
+
+
+def test_buffered_logs_are_batched_drained_on_stop_and_bounded():
+    db = SessionLocal()
+    try:
+        # Long interval and batch size: nothing is written until stop() drains.
+        writer = BufferedLogWriter(max_records=2, batch_size=100, flush_interval_ms=60_000)
+
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-DIRECT"))
+        assert db.query(ApiLog).count() == 1
+
+        writer.start()
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-1"))
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-2", success=0))
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-3"))
+        assert db.query(ApiLog).count() == 1
+
+        writer.stop()
+        stats = writer.stats()
+        assert {ref for (ref,) in db.query(ApiLog.reference)} == {"LOG-DIRECT", "LOG-1", "LOG-2"}
+        assert (stats["enqueued"], stats["dropped"]) == (2, 1)
+        assert stats["running"] is False and stats["queued"] == 0
+        # Bulk inserts still feed the API call rollups.
+        assert _api_rollups(db) == {"success": 2, "failed": 1}
+    finally:
+        db.close()
+
+
+def test_a_failed_batch_is_retried_row_by_row():
+    db = SessionLocal()
+    try:
+        writer = BufferedLogWriter(max_records=10, batch_size=10, flush_interval_ms=60_000)
+        writer.start()
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-GOOD-1"))
+        writer.submit(ENGINE, ApiLog, {**_api_log("LOG-BAD"), "endpoint": None})
+        writer.submit(ENGINE, ApiLog, _api_log("LOG-GOOD-2"))
+        writer.stop()
+
+        stats = writer.stats()
+        refs = {ref for (ref,) in db.query(ApiLog.reference).filter(ApiLog.reference.like("LOG-%-%"))}
+        assert refs == {"LOG-GOOD-1", "LOG-GOOD-2"}
+        assert (stats["retried"], stats["failed"]) == (3, 1)
+    finally:
+        db.close()
+
+
+def test_audit_rows_commit_and_roll_back_with_the_admin_action():
+    db = SessionLocal()
+    try:
+        write_audit_log(db, admin_email="ops@example.com", action="audit_rolled_back", target="1")
+        db.rollback()
+        write_audit_log(db, admin_email="ops@example.com", action="audit_committed", target="2")
+        db.commit()
+        actions = {action for (action,) in db.query(AdminAuditLog.action).filter(AdminAuditLog.action.like("audit_%"))}
+        assert actions == {"audit_committed"}
+    finally:
+        db.close()
@@ -0,0 +1,35 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.services import partitions
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def test_monthly_partition_plan_spans_existing_rows_through_months_ahead():
+    months = partitions.planned_months(
+        datetime(2025, 11, 14, 23, 30, tzinfo=timezone.utc), date(2026, 1, 31), months_ahead=2
+    )
+    assert months == [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+    assert partitions.partition_name("transactions", months[1]) == "transactions_p202512"
+    assert partitions.partition_bounds_sql(months[1]) == (
+        "FOR VALUES FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')"
+    )
+
+
+def test_sqlite_tables_stay_unpartitioned():
+    assert partitions.ensure_all_partitions(ENGINE) == {}
+    with ENGINE.begin() as conn:
+        assert partitions.is_partitioned(conn, "transactions") is False
+        assert partitions.convert_to_partitioned(conn, "transactions") == 0
+        assert partitions.ensure_partitions(conn, "transactions") == []
+        assert partitions.detach_partitions_before(conn, "transactions", date(2026, 1, 1)) == []
@@ -1,5 +1,11 @@
 from decimal import Decimal
-from app.services.pricing import get_price_for_user
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.services.pricing import get_price_for_user, get_service_charge_for_user, invalidate_pricing_table, quote_many
 from app.models import PricingRule, PricingRole, DataPlan, UserRole
 
 
@@ -39,3 +45,42 @@ def test_pricing_admin_uses_user_pricing():
     db = DummyDB(rule)
     price = get_price_for_user(db, plan, UserRole.ADMIN)
     assert price == Decimal("115")
+
+
+def test_pricing_table_is_cached_until_invalidated():
+    engine = create_engine("sqlite+pysqlite:///:memory:", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        PricingRule(network="mtn", role=PricingRole.USER, margin=Decimal("10")),
+        PricingRule(network="mtn", role=PricingRole.RESELLER, margin=Decimal("5"), margin_type="percentage"),
+        PricingRule(network="svc:airtime:mtn", role=PricingRole.USER, margin=Decimal("2")),
+    ])
+    db.commit()
+    plans = [
+        DataPlan(network="mtn", base_price=Decimal("100"), plan_code="A", plan_name="A", data_size="1GB", validity="1d"),
+        DataPlan(network="glo", base_price=Decimal("50"), plan_code="B", plan_name="B", data_size="1GB", validity="1d"),
+        DataPlan(network="mtn", base_price=Decimal("200"), plan_code="C", plan_name="C", data_size="2GB", validity="1d",
+                 display_price=Decimal("199")),
+    ]
+
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    invalidate_pricing_table()
+    assert [q.price for q in quote_many(db, plans, UserRole.USER)] == [Decimal("110"), Decimal("50"), Decimal("199")]
+    assert quote_many(db, plans, UserRole.USER)[2].margin_price == Decimal("210")
+    assert [q.price for q in quote_many(db, plans[:1], UserRole.RESELLER)] == [Decimal("105")]
+    charge, margin = get_service_charge_for_user(
+        db, tx_type="airtime", provider="MTN", base_amount=Decimal("100"), user_role=UserRole.USER
+    )
+    assert (charge, margin) == (Decimal("102"), Decimal("2"))
+    assert len(queries) == 1
+
+    db.query(PricingRule).filter(PricingRule.network == "mtn", PricingRule.role == PricingRole.USER).update(
+        {PricingRule.margin: Decimal("20")}
+    )
+    db.commit()
+    assert get_price_for_user(db, plans[0], UserRole.USER) == Decimal("110")
+    invalidate_pricing_table()
+    assert get_price_for_user(db, plans[0], UserRole.USER) == Decimal("120")
+    db.close()
@@ -0,0 +1,100 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import DataPlan, Promo, PromoRedemption, Transaction, TransactionStatus, TransactionType, User, UserRole
+from app.services import promos
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _settings(**overrides):
+    values = {
+        "promo_mtn_1gb_enabled": True,
+        "promo_mtn_1gb_limit": 3,
+        "promo_mtn_1gb_price": Decimal("199"),
+        "promo_mtn_1gb_network": "mtn",
+        "promo_mtn_1gb_plan_code": "1001",
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _users(db, count: int) -> list[User]:
+    users = [
+        User(
+            email=f"promo-{i}@example.com",
+            full_name=f"Promo {i}",
+            hashed_password="hash",
+            role=UserRole.USER,
+            referral_code=f"PROMO{i}",
+        )
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def test_promo_stock_is_claimed_once_per_user_and_released_on_failure(monkeypatch):
+    db = SessionLocal()
+    try:
+        early, ada, ben, cy = _users(db, 4)
+        # Bought before the ledger existed: backfilled as a redemption.
+        db.add(Transaction(
+            user_id=early.id, reference="PROMO-OLD", amount=Decimal("199"), network="MTN",
+            status=TransactionStatus.SUCCESS, tx_type=TransactionType.DATA,
+        ))
+        db.commit()
+
+        monkeypatch.setattr(promos, "get_settings", lambda: _settings())
+        promo = promos.sync_configured_promos(db)
+        assert (promo.stock_limit, promo.remaining) == (3, 2)
+        assert promos.has_redeemed(db, promo, early.id)
+
+        plan = DataPlan(network="mtn", plan_code="amigo:1001", plan_name="MTN 1GB", data_size="1GB",
+                        validity="30d", base_price=Decimal("230"))
+        assert promos.promo_for_plan(db, plan).id == promo.id
+        assert promos.match_promo(promos.active_promos(db), plan).id == promo.id
+
+        assert promos.claim_promo(db, promo, user_id=ada.id, reference="PROMO-ADA")
+        assert not promos.claim_promo(db, promo, user_id=ada.id, reference="PROMO-ADA-2")
+        assert promos.claim_promo(db, promo, user_id=ben.id, reference="PROMO-BEN")
+        assert not promos.claim_promo(db, promo, user_id=cy.id, reference="PROMO-CY")
+        db.add(Transaction(
+            user_id=ben.id, reference="PROMO-BEN", amount=Decimal("199"), network="mtn",
+            status=TransactionStatus.PENDING, tx_type=TransactionType.DATA,
+        ))
+        db.commit()
+        db.refresh(promo)
+        assert promo.remaining == 0
+        assert promos.promo_snapshot(promo)["active"] is False
+
+        # A failed purchase hands its unit back and lets the user try again.
+        tx = db.query(Transaction).filter(Transaction.reference == "PROMO-BEN").one()
+        tx.status = TransactionStatus.FAILED
+        db.commit()
+        db.refresh(promo)
+        assert promo.remaining == 1
+        assert not promos.has_redeemed(db, promo, ben.id)
+        assert promos.claim_promo(db, promo, user_id=cy.id, reference="PROMO-CY")
+        db.commit()
+
+        # Raising the limit re-derives stock from the redemptions on record.
+        monkeypatch.setattr(promos, "get_settings", lambda: _settings(promo_mtn_1gb_limit=10))
+        promo = promos.sync_configured_promos(db)
+        assert promo.remaining == 10 - db.query(PromoRedemption).filter(PromoRedemption.promo_id == promo.id).count()
+        assert db.query(Promo).count() == 1
+    finally:
+        db.close()
@@ -313,3 +313,33 @@ def test_agent_upgrade_on_50gb_sales():
     finally:
         db.close()
 
+
+
+def test_agent_stats_are_incremented_in_place():
+    from app.models import AgentStat
+
+    db = SessionLocal()
+    try:
+        seller = _seed_user(db, email="stat_seller@example.com", full_name="Stat Seller")
+        record_referral_data_activity(db, user=seller, tx_type="data", amount=Decimal("500.00"), data_mb=1024.0)
+        record_referral_data_activity(db, user=seller, tx_type="airtime", amount=Decimal("250.50"))
+        db.commit()
+
+        stat = db.query(AgentStat).filter(AgentStat.agent_id == seller.id).one()
+        assert (stat.total_data_mb, stat.total_airtime_amount, stat.total_transactions) == (1024, Decimal("250.50"), 2)
+        assert seller.role == UserRole.USER
+
+        # Crossing 50GB promotes the seller once; later purchases leave the role alone.
+        record_referral_data_activity(db, user=seller, tx_type="data", amount=Decimal("9000.00"), data_mb=50176.0)
+        assert seller.role == UserRole.RESELLER
+        db.commit()
+        seller.agent_upgrade_seen = True
+        db.commit()
+        record_referral_data_activity(db, user=seller, tx_type="data", amount=Decimal("500.00"), data_mb=1024.0)
+        db.commit()
+        db.refresh(seller)
+        assert (seller.role, seller.agent_upgrade_seen) == (UserRole.RESELLER, True)
+        db.refresh(stat)
+        assert (stat.total_data_mb, stat.total_transactions) == (52224, 4)
+    finally:
+        db.close()
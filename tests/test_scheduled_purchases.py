@@ -0,0 +1,159 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import BulkPurchase, DataPlan, ScheduledPurchase, Transaction, TransactionStatus, User, UserRole
+from app.core.config import get_settings
+from app.services.scheduled_purchases import claim_due_schedules, create_schedule, next_occurrence, run_due_window
+from app.services.wallet import credit_wallet, get_or_create_wallet
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _user(db, tag: str, funding: str) -> User:
+    user = User(
+        email=f"sched-{tag}@example.com",
+        full_name=f"Sched {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"SCHED{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    credit_wallet(db, get_or_create_wallet(db, user.id), Decimal(funding), f"{tag}-FUND", "Funding")
+    return user
+
+
+def _fake_provider(job):
+    outcome = {"1": "success", "2": "failed", "3": "pending"}[job.phone[-1]]
+    return {"status": outcome, "provider_reference": f"P-{job.reference}", "error": "Rejected"}, "amigo"
+
+
+def test_monthly_schedules_keep_their_day_and_clamp_short_months():
+    jan_31 = datetime(2026, 1, 31, 9, 0, tzinfo=timezone.utc)
+    runs = [jan_31]
+    for _ in range(4):
+        runs.append(next_occurrence(runs[-1], "monthly", anchor_day=31))
+    assert [run.date() for run in runs] == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30), date(2026, 5, 31)
+    ]
+    assert next_occurrence(datetime(2026, 12, 15, tzinfo=timezone.utc), "monthly") == datetime(2027, 1, 15, tzinfo=timezone.utc)
+    assert next_occurrence(jan_31, "weekly") == jan_31 + timedelta(weeks=1)
+    assert next_occurrence(jan_31, "once") is None
+
+
+def test_a_window_buys_due_schedules_as_one_batch_per_user():
+    db = SessionLocal()
+    try:
+        user = _user(db, "ada", "1000.00")
+        db.add(
+            DataPlan(
+                network="mtn",
+                plan_code="SCHED-MTN-1GB",
+                plan_name="MTN 1GB",
+                data_size="1GB",
+                validity="30d",
+                base_price=Decimal("100.00"),
+                agent_price=Decimal("100.00"),
+                provider="amigo",
+            )
+        )
+        db.commit()
+        yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+        renewal = create_schedule(
+            db, user, kind="data", phone="08030000001", interval="monthly", start_at=yesterday, plan_code="SCHED-MTN-1GB"
+        )
+        one_off = create_schedule(
+            db, user, kind="data", phone="08030000002", interval="once", start_at=yesterday, plan_code="SCHED-MTN-1GB"
+        )
+        slow = create_schedule(
+            db, user, kind="data", phone="08030000003", interval="weekly", start_at=yesterday, plan_code="SCHED-MTN-1GB"
+        )
+        later = create_schedule(
+            db, user, kind="data", phone="08030000001", interval="daily",
+            start_at=datetime.now(timezone.utc) + timedelta(days=1), plan_code="SCHED-MTN-1GB",
+        )
+        # The first run is pushed back by the schedule's spread offset, never earlier.
+        assert renewal.next_run_at.replace(tzinfo=timezone.utc) >= yesterday
+
+        assert run_due_window(session_factory=SessionLocal, purchase=_fake_provider) == {"claimed": 3, "requeued": 0, "batches": 1}
+
+        db.expire_all()
+        batch = db.query(BulkPurchase).filter_by(user_id=user.id).one()
+        assert (batch.source, batch.item_count, batch.total_amount) == ("scheduled", 3, Decimal("300.00"))
+        assert batch.batch_id.startswith("SCHED-")
+        renewal, one_off, slow, later = (db.get(ScheduledPurchase, s.id) for s in (renewal, one_off, slow, later))
+        assert (renewal.is_active, renewal.last_status, renewal.failure_count) == (True, "success", 0)
+        assert renewal.next_run_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(days=25)
+        assert db.query(Transaction).filter_by(reference=renewal.last_reference).one().status.value == "success"
+        assert (one_off.is_active, one_off.last_status, one_off.failure_count) == (False, "failed", 1)
+        assert (later.last_run_at, later.last_status) == (None, None)
+        assert get_or_create_wallet(db, user.id).total_balance == Decimal("800.00")
+
+        # An item still pending after its window is recorded when it settles.
+        assert (slow.last_status, slow.failure_count) == ("pending", 0)
+        db.query(Transaction).filter_by(reference=slow.last_reference).one().status = TransactionStatus.REFUNDED
+        db.commit()
+        db.refresh(slow)
+        assert (slow.last_status, slow.failure_count, slow.is_active) == ("failed", 1, True)
+
+        # Everything due was claimed; a second window finds nothing.
+        assert run_due_window(session_factory=SessionLocal, purchase=_fake_provider) == {"claimed": 0, "requeued": 0, "batches": 0}
+    finally:
+        db.close()
+
+
+def test_a_run_claimed_by_a_worker_that_died_is_requeued_after_the_stall_timeout():
+    db = SessionLocal()
+    try:
+        user = _user(db, "ben", "500.00")
+        db.add(
+            DataPlan(
+                network="mtn",
+                plan_code="SCHED-MTN-2GB",
+                plan_name="MTN 2GB",
+                data_size="2GB",
+                validity="30d",
+                base_price=Decimal("150.00"),
+                agent_price=Decimal("150.00"),
+                provider="amigo",
+            )
+        )
+        db.commit()
+        schedule = create_schedule(
+            db, user, kind="data", phone="08030000001", interval="daily",
+            start_at=datetime.now(timezone.utc) - timedelta(hours=1), plan_code="SCHED-MTN-2GB",
+        )
+
+        # The worker claims the run, then dies before opening its batch.
+        assert [run.schedule_id for run in claim_due_schedules(db, limit=10)] == [schedule.id]
+        db.refresh(schedule)
+        next_run_at = schedule.next_run_at
+        assert (schedule.last_status, schedule.last_reference) == ("processing", None)
+
+        # Not stalled yet: a live worker may still be opening it.
+        assert run_due_window(session_factory=SessionLocal, purchase=_fake_provider) == {"claimed": 0, "requeued": 0, "batches": 0}
+
+        stall = timedelta(seconds=get_settings().scheduled_purchase_stall_seconds + 1)
+        schedule.last_run_at = datetime.now(timezone.utc) - stall
+        db.commit()
+        assert run_due_window(session_factory=SessionLocal, purchase=_fake_provider) == {"claimed": 0, "requeued": 1, "batches": 1}
+
+        db.expire_all()
+        schedule = db.get(ScheduledPurchase, schedule.id)
+        assert (schedule.last_status, schedule.next_run_at) == ("success", next_run_at)
+        assert get_or_create_wallet(db, user.id).total_balance == Decimal("350.00")
+        assert run_due_window(session_factory=SessionLocal, purchase=_fake_provider) == {"claimed": 0, "requeued": 0, "batches": 0}
+    finally:
+        db.close()
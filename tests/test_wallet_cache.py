@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import User, UserRole, Wallet
+from app.services.wallet import credit_wallet, debit_wallet, get_or_create_wallet, get_wallet_snapshot
+from app.services.wallet_cache import WalletSnapshot, cache_for
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _user(db, tag: str) -> User:
+    user = User(
+        email=f"wcache-{tag}@example.com",
+        full_name=f"Cache {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"WCACHE{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _cached(db, user_id: int) -> WalletSnapshot | None:
+    return cache_for(db).get(user_id)
+
+
+def test_balance_changes_are_written_through_on_commit():
+    db = SessionLocal()
+    try:
+        ada = _user(db, "ada")
+        wallet = get_or_create_wallet(db, ada.id)
+        assert _cached(db, ada.id).balance == Decimal("0")
+
+        credit_wallet(db, wallet, Decimal("500.00"), "WC-1", "Funding")
+        debit_wallet(db, wallet, Decimal("120.00"), "WC-2", "Data purchase")
+        snapshot = _cached(db, ada.id)
+        assert (snapshot.balance, snapshot.version) == (Decimal("380.00"), 2)
+
+        # Reads are served from the snapshot, not the row.
+        with ENGINE.begin() as conn:
+            conn.execute(text("UPDATE wallets SET balance = 1 WHERE id = :id"), {"id": wallet.id})
+        assert get_wallet_snapshot(db, ada.id).balance == Decimal("380.00")
+
+        # A snapshot older than the cached one never overwrites it.
+        cache = cache_for(db)
+        assert cache.put(WalletSnapshot(wallet.id, ada.id, Decimal("999"), False, 1)) is False
+        assert cache.get(ada.id).balance == Decimal("380.00")
+
+        # ORM writes bump the version and are cached too.
+        wallet.balance = Decimal("50.00")
+        db.commit()
+        snapshot = _cached(db, ada.id)
+        assert (snapshot.balance, snapshot.version) == (Decimal("50.00"), 3)
+    finally:
+        db.close()
+
+
+def test_rollbacks_never_reach_the_cache_and_misses_read_the_row():
+    db = SessionLocal()
+    try:
+        ben = _user(db, "ben")
+        wallet = get_or_create_wallet(db, ben.id)
+        credit_wallet(db, wallet, Decimal("200.00"), "WC-3", "Funding")
+
+        credit_wallet(db, wallet, Decimal("75.00"), "WC-4", "Refund", commit=False)
+        db.rollback()
+        assert _cached(db, ben.id).balance == Decimal("200.00")
+
+        # A savepoint that is rolled back is re-read at commit: only the outer credit lands.
+        credit_wallet(db, wallet, Decimal("10.00"), "WC-5", "Cashback", commit=False)
+        savepoint = db.begin_nested()
+        credit_wallet(db, wallet, Decimal("40.00"), "WC-6", "Bonus", commit=False)
+        savepoint.rollback()
+        db.commit()
+        assert _cached(db, ben.id).balance == Decimal("210.00")
+
+        with pytest.raises(HTTPException):
+            debit_wallet(db, wallet, Decimal("5000.00"), "WC-7", "Too much")
+        db.rollback()
+
+        cache_for(db).discard(ben.id)
+        snapshot = get_wallet_snapshot(db, ben.id)
+        assert snapshot.balance == Decimal("210.00")
+        assert _cached(db, ben.id) == snapshot
+        assert db.query(Wallet).filter(Wallet.user_id == ben.id).one().version == snapshot.version
+    finally:
+        db.close()
@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import LedgerType, ServiceTransaction, Transaction, TransactionStatus, TransactionType, User, UserRole, WalletLedger
+from app.services.wallet import credit_wallet, get_or_create_wallet
+from app.services.wallet_holds import capture_hold, place_hold, release_hold
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _funded_user(db, tag: str, amount: str) -> User:
+    user = User(
+        email=f"holds-{tag}@example.com",
+        full_name=f"Holds {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"HOLDS{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    credit_wallet(db, get_or_create_wallet(db, user.id), Decimal(amount), f"{tag}-FUND", "Funding")
+    return user
+
+
+def _data_tx(user: User, reference: str, amount: str) -> Transaction:
+    return Transaction(
+        user_id=user.id,
+        amount=Decimal(amount),
+        tx_type=TransactionType.DATA,
+        status=TransactionStatus.PENDING,
+        reference=reference,
+        network="mtn",
+    )
+
+
+def _commits(db) -> list:
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+    return commits
+
+
+def test_a_purchase_takes_one_commit_to_hold_and_one_to_settle():
+    db = SessionLocal()
+    try:
+        user = _funded_user(db, "ada", "1000.00")
+        wallet = get_or_create_wallet(db, user.id)
+        commits = _commits(db)
+
+        hold = place_hold(db, wallet, _data_tx(user, "HOLD-1", "300.00"), "Data Purchase: 1GB")
+        assert len(commits) == 1
+        db.refresh(wallet)
+        assert wallet.balance == Decimal("700.00")
+        assert db.get(Transaction, hold.transaction_id).status == TransactionStatus.PENDING
+
+        capture_hold(db, hold).external_reference = "PROV-1"
+        db.commit()
+        assert len(commits) == 2
+        tx = db.get(Transaction, hold.transaction_id)
+        assert (tx.status, tx.external_reference) == (TransactionStatus.SUCCESS, "PROV-1")
+
+        # A failed airtime purchase is refunded in the settling commit.
+        airtime = ServiceTransaction(
+            user_id=user.id, reference="HOLD-2", tx_type="airtime", amount=Decimal("200.00"), status="pending"
+        )
+        hold = place_hold(db, wallet, airtime, "API Airtime")
+        release_hold(db, hold, "API Refund: Airtime purchase failed", failure_reason="Provider rejected")
+        db.commit()
+        assert len(commits) == 4
+        airtime = db.get(ServiceTransaction, hold.transaction_id)
+        assert (airtime.status, airtime.failure_reason) == ("refunded", "Provider rejected")
+        db.refresh(wallet)
+        assert wallet.balance == Decimal("700.00")
+        entries = db.query(WalletLedger.entry_type, WalletLedger.amount).filter(WalletLedger.reference == "HOLD-2").all()
+        assert entries == [(LedgerType.DEBIT, Decimal("200.00")), (LedgerType.CREDIT, Decimal("200.00"))]
+    finally:
+        db.close()
+
+
+def test_a_hold_that_cannot_be_funded_leaves_no_transaction():
+    db = SessionLocal()
+    try:
+        user = _funded_user(db, "ben", "50.00")
+        wallet = get_or_create_wallet(db, user.id)
+        with pytest.raises(HTTPException) as exc:
+            place_hold(db, wallet, _data_tx(user, "HOLD-3", "80.00"), "Data Purchase: 2GB")
+        assert exc.value.status_code == 400
+        assert db.query(Transaction).filter(Transaction.reference == "HOLD-3").count() == 0
+        db.refresh(wallet)
+        assert wallet.balance == Decimal("50.00")
+    finally:
+        db.close()
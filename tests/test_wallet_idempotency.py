@@ -81,6 +81,8 @@ class _DummySession:
 
 
 class _Wallet(SimpleNamespace):
+    stripe_count = 0
+
     @property
     def name(self):
         # Mock Column.name behavior for Wallet.balance inside values mapping
@@ -0,0 +1,199 @@
+import threading
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin as admin_endpoints
+from app.core.database import Base
+from app.models import LedgerType, User, UserRole, Wallet, WalletLedger, WalletStripe
+from app.services.wallet import credit_wallet, debit_wallet, get_or_create_wallet, get_wallet_snapshot, spendable_balance
+from app.services.wallet_cache import cache_for
+from app.services.wallet_stripes import rebalance_striped_wallets, set_stripe_count, stripe_view
+
+
+ENGINE = create_engine(
+    "sqlite+pysqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+SessionLocal = sessionmaker(bind=ENGINE, autocommit=False, autoflush=False)
+Base.metadata.create_all(bind=ENGINE)
+
+
+def _striped_wallet(db, tag: str, funding: str, stripes: int) -> Wallet:
+    user = User(
+        email=f"stripes-{tag}@example.com",
+        full_name=f"Stripes {tag}",
+        hashed_password="hash",
+        role=UserRole.USER,
+        referral_code=f"STRIPE{tag.upper()}",
+    )
+    db.add(user)
+    db.commit()
+    wallet = get_or_create_wallet(db, user.id)
+    credit_wallet(db, wallet, Decimal(funding), f"{tag}-FUND", "Funding")
+    set_stripe_count(db, wallet, stripes)
+    db.commit()
+    return wallet
+
+
+def _balances(db, wallet: Wallet) -> tuple[Decimal, list[Decimal]]:
+    view = stripe_view(db, wallet)
+    return view["unallocated"], [stripe["balance"] for stripe in view["stripes"]]
+
+
+def test_debits_land_on_stripes_and_reads_see_the_total():
+    db = SessionLocal()
+    try:
+        wallet = _striped_wallet(db, "ada", "1000.01", 4)
+        assert _balances(db, wallet) == (Decimal("0.01"), [Decimal("250.00")] * 4)
+        # Striped wallets are read from the rows, never from the balance cache.
+        assert cache_for(db).get(wallet.user_id) is None
+
+        debit_wallet(db, wallet, Decimal("100.00"), "ADA-1", "Data purchase")
+        main, stripes = _balances(db, wallet)
+        assert main == Decimal("0.01")
+        assert sorted(stripes) == [Decimal("150.00")] + [Decimal("250.00")] * 3
+        assert get_wallet_snapshot(db, wallet.user_id).balance == Decimal("900.01")
+        assert db.query(Wallet).filter(Wallet.id == wallet.id).one().total_balance == Decimal("900.01")
+
+        # No single stripe covers 800: it is gathered across the wallet row and the stripes.
+        debit_wallet(db, wallet, Decimal("800.00"), "ADA-2", "Bulk purchase")
+        assert get_wallet_snapshot(db, wallet.user_id).balance == Decimal("100.01")
+        assert sum(_balances(db, wallet)[1]) == Decimal("100.01")
+
+        with pytest.raises(HTTPException) as exc:
+            debit_wallet(db, wallet, Decimal("100.02"), "ADA-3", "Too much")
+        assert exc.value.status_code == 400
+        db.rollback()
+
+        entries = db.query(WalletLedger).filter(WalletLedger.wallet_id == wallet.id).all()
+        assert [(e.entry_type, e.amount) for e in entries] == [
+            (LedgerType.CREDIT, Decimal("1000.01")),
+            (LedgerType.DEBIT, Decimal("100.00")),
+            (LedgerType.DEBIT, Decimal("800.00")),
+        ]
+    finally:
+        db.close()
+
+
+def test_credits_are_rebalanced_and_switching_off_returns_funds_to_the_wallet_row():
+    db = SessionLocal()
+    try:
+        wallet = _striped_wallet(db, "ben", "300.00", 3)
+        credit_wallet(db, wallet, Decimal("600.00"), "BEN-1", "Funding")
+        assert _balances(db, wallet) == (Decimal("600.00"), [Decimal("100.00")] * 3)
+
+        assert rebalance_striped_wallets(db) >= 1
+        assert _balances(db, wallet) == (Decimal("0.00"), [Decimal("300.00")] * 3)
+        assert rebalance_striped_wallets(db) == 0
+
+        set_stripe_count(db, wallet, 0)
+        db.commit()
+        assert db.query(WalletStripe).filter(WalletStripe.wallet_id == wallet.id).count() == 0
+        db.refresh(wallet)
+        assert (wallet.balance, wallet.stripe_count) == (Decimal("900.00"), 0)
+        assert cache_for(db).get(wallet.user_id).balance == Decimal("900.00")
+
+        with pytest.raises(HTTPException):
+            set_stripe_count(db, wallet, 1000)
+    finally:
+        db.close()
+
+
+def test_purchase_pre_checks_only_query_stripes_of_striped_wallets():
+    db = SessionLocal()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    try:
+        plain = _striped_wallet(db, "plain", "300.00", 0)
+        striped = _striped_wallet(db, "busy", "300.00", 3)
+        db.refresh(plain)
+        db.refresh(striped)
+        event.listen(ENGINE, "before_cursor_execute", record)
+        assert spendable_balance(plain) == Decimal("300.00")
+        assert statements == []
+        assert spendable_balance(striped) == Decimal("300.00")
+        assert len(statements) == 1
+    finally:
+        if event.contains(ENGINE, "before_cursor_execute", record):
+            event.remove(ENGINE, "before_cursor_execute", record)
+        db.close()
+
+
+def test_wallet_aggregates_add_stripes_once_not_per_wallet():
+    db = SessionLocal()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    try:
+        _striped_wallet(db, "sum-a", "300.00", 3)
+        plain = _striped_wallet(db, "sum-b", "120.50", 0)
+        credit_wallet(db, plain, Decimal("10.00"), "SUM-B-1", "Funding")
+        admin_endpoints._GENERIC_CACHE.clear()
+        event.listen(ENGINE, "before_cursor_execute", record)
+        page = admin_endpoints.list_wallets(
+            admin=SimpleNamespace(role=UserRole.ADMIN), db=db, q="stripes-sum", exact_count=True
+        )
+        assert page["aggregate_balance"] == 430.5
+        aggregate = [statement.lower() for statement in statements if "sum(wallets.balance)" in statement.lower()]
+        assert len(aggregate) == 1
+        assert "wallet_stripes.wallet_id = wallets.id" not in aggregate[0]
+    finally:
+        if event.contains(ENGINE, "before_cursor_execute", record):
+            event.remove(ENGINE, "before_cursor_execute", record)
+        db.close()
+
+
+def test_concurrent_debits_that_miss_every_stripe_fall_back_without_failing(tmp_path):
+    # A file database so each thread has its own connection. pysqlite ignores
+    # FOR UPDATE, so transactions start IMMEDIATE to stand in for row locks.
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'stripes.db'}", connect_args={"timeout": 30})
+    event.listen(engine, "connect", lambda conn, _: setattr(conn, "isolation_level", None))
+    event.listen(engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN IMMEDIATE"))
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = Session()
+    try:
+        wallet = _striped_wallet(db, "cat", "300.00", 3)
+        credit_wallet(db, wallet, Decimal("200.00"), "CAT-1", "Funding")
+        wallet_id = wallet.id
+        db.commit()
+        # No stripe covers 150: one debit takes the wallet row, the other gathers.
+        start = threading.Barrier(2)
+        errors = []
+
+        def debit(reference):
+            session = Session()
+            try:
+                start.wait()
+                debit_wallet(session, session.get(Wallet, wallet_id), Decimal("150.00"), reference, "Data purchase")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                session.close()
+
+        threads = [threading.Thread(target=debit, args=(f"CAT-D{i}",)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        assert errors == []
+        db.expire_all()
+        main, stripes = _balances(db, db.get(Wallet, wallet_id))
+        assert main + sum(stripes) == Decimal("200.00")
+        assert db.query(WalletLedger).filter(WalletLedger.reference.like("CAT-D%")).count() == 2
+    finally:
+        db.close()
+        engine.dispose()